@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+bench_decay.py - Measure effective mastery for whole-model views, with
+distinct review times (every concept's own) and with one review time shared
+by all concepts, the best case a cache keyed on review time could have.
+
+Usage:
+    python benchmarks/bench_decay.py [--concepts N]
+"""
+
+import argparse
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import student
+from bench_save import build_model, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--concepts', type=int, default=100000)
+    args = parser.parse_args()
+
+    concepts = build_model(args.concepts)["concepts"]
+    shared = timed(lambda: student.effective_masteries(concepts))
+    start = datetime(2024, 1, 1)
+    for i, concept in enumerate(concepts.values()):
+        concept["last_reviewed"] = (start + timedelta(minutes=i)).isoformat()
+    distinct = timed(lambda: student.effective_masteries(concepts))
+    stored = timed(lambda: {name: c["mastery"] for name, c in concepts.items()})
+
+    print(f"concepts: {args.concepts}")
+    print(f"distinct review times: {distinct * 1000:8.1f} ms")
+    print(f"shared review time:    {shared * 1000:8.1f} ms")
+    print(f"stored mastery only:   {stored * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
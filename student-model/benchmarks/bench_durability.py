@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+bench_durability.py - Measure save_model latency at each durability level,
+and the throughput of GroupCommitter under many small mutations.
+
+Usage:
+    python benchmarks/bench_durability.py [--concepts N] [--dir PATH]
+
+Run with --dir on the filesystem you care about; tmpfs makes fsync free.
+"""
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import student
+from bench_save import build_model
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--concepts', type=int, default=1000)
+    parser.add_argument('--saves', type=int, default=30)
+    parser.add_argument('--dir', type=str, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        student.DATA_FILE = Path(tmp) / "student_model.json"
+        student.save_model(build_model(args.concepts))
+        model = student.load_model()
+
+        print(f"concepts: {args.concepts}, saves per level: {args.saves}\n")
+        print(f"{'level':<20} {'median ms':>10} {'p95 ms':>10}")
+        for level in student.DURABILITY_LEVELS:
+            samples = []
+            for _ in range(args.saves):
+                model["concepts"]["Concept 000000"]["mastery"] += 1
+                student.mark_dirty(model, concept="Concept 000000")
+                start = time.perf_counter()
+                student.save_model(model, durability=level)
+                samples.append((time.perf_counter() - start) * 1000)
+            samples.sort()
+            p95 = samples[int(len(samples) * 0.95) - 1]
+            print(f"{level:<20} {statistics.median(samples):>10.2f} {p95:>10.2f}")
+
+        mutations = args.saves * 20
+        committer = student.GroupCommitter(interval=0.05)
+        start = time.perf_counter()
+        for _ in range(mutations):
+            with committer.lock:
+                model["concepts"]["Concept 000000"]["mastery"] += 1
+                student.mark_dirty(model, concept="Concept 000000")
+                ticket = committer.submit(model)
+        committer.wait(ticket)
+        committer.close()
+        elapsed = time.perf_counter() - start
+        print(f"\ngroup commit: {mutations} mutations durable in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+bench_load.py - Compare parsing the model file with loading the read cache.
+
+Usage:
+    python benchmarks/bench_load.py [--concepts N]
+"""
+
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import student
+from bench_save import build_model, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--concepts', type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        student.DATA_FILE = Path(tmp) / "student_model.json"
+        student.BACKUPS_ENABLED = False
+        student.save_model(build_model(args.concepts))
+
+        def parsed_load():
+            student.drop_cache()
+            student.load_model()
+
+        student.MODEL_CACHE = False
+        parsed = timed(parsed_load)
+        student.MODEL_CACHE = True
+        student.load_model()
+        cached = timed(student.load_model)
+        cache_size = student.cache_path().stat().st_size
+        file_size = student.DATA_FILE.stat().st_size
+
+    print(f"concepts:          {args.concepts}")
+    print(f"model file:        {file_size / 1e6:8.1f} MB (cache {cache_size / 1e6:.1f} MB)")
+    print(f"parsed load:       {parsed * 1000:8.1f} ms")
+    print(f"cached load:       {cached * 1000:8.1f} ms")
+    print(f"speedup:           {parsed / cached:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
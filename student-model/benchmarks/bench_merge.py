@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+bench_merge.py - Diff and merge cost of two diverged copies of a large model.
+
+Builds a model, copies it twice and changes a fraction of the concepts on
+each side (mastery updates, new struggles, some added and deleted
+concepts), then times diff_models, a three-way merge_models in memory and
+the merge-file save, which rewrites only the merged concepts.
+
+Usage:
+    python benchmarks/bench_merge.py [--concepts N] [--changed FRACTION] [--repeat N]
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import student
+from bench_save import build_model, timed
+
+
+def diverge(model, fraction, offset, reviewed):
+    """Change every 1/fraction-th concept, starting at offset."""
+    step = max(int(1 / fraction), 1)
+    keys = list(model["concepts"])
+    for key in keys[offset::step]:
+        concept = model["concepts"][key]
+        concept["mastery"] = (concept["mastery"] + 7) % 101
+        concept["last_reviewed"] = reviewed
+        concept["struggles"].append(f"new struggle {offset}")
+    for key in keys[offset + 1::step * 10]:
+        del model["concepts"][key]
+    for i in range(len(keys) // step // 10):
+        model["concepts"][f"Added {offset} {i:06d}"] = dict(model["concepts"][keys[0]])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concepts', type=int, default=100_000)
+    parser.add_argument('--changed', type=float, default=0.01,
+                        help='Fraction of concepts changed on each side (default: 0.01)')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    base = build_model(args.concepts)
+    ours = json.loads(json.dumps(base))
+    theirs = json.loads(json.dumps(base))
+    diverge(ours, args.changed, 0, "2024-07-01T12:00:00")
+    diverge(theirs, args.changed, 3, "2024-08-01T12:00:00")
+
+    diff = timed(lambda: student.diff_models(ours, theirs), args.repeat)
+    merge = timed(lambda: student.merge_models(json.loads(json.dumps(ours)), theirs, base), 1)
+    report = student.merge_models(json.loads(json.dumps(ours)), theirs, base)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        student.DATA_FILE = Path(tmp) / "student_model.json"
+        student.BACKUPS_ENABLED = False
+        student.save_model(ours)
+        other = Path(tmp) / "theirs.json"
+        other.write_text(json.dumps(theirs))
+        original = Path(tmp) / "base.json"
+        original.write_text(json.dumps(base))
+        model = student.StudentModel.open()
+        model.data  # load before timing
+        save = timed(lambda: model.merge_file(other, base=original), 1)
+
+    print(f"concepts:            {args.concepts}, {args.changed:.1%} changed per side")
+    print(f"diff_models:         {diff * 1000:8.1f} ms")
+    print(f"merge_models:        {merge * 1000:8.1f} ms (includes copying ours)")
+    print(f"merge-file and save: {save * 1000:8.1f} ms (reads both files)")
+    print(f"merged:              {len(report['added'])} added, {len(report['updated'])} updated, "
+          f"{len(report['removed'])} removed, {len(report['conflicts'])} conflicts")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+bench_save.py - Compare full vs incremental save cost on a large model.
+
+Usage:
+    python benchmarks/bench_save.py [--concepts N]
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import student
+
+
+def build_model(n):
+    model = student.get_default_model()
+    for i in range(n):
+        model["concepts"][f"Concept {i:06d}"] = {
+            "mastery": i % 101,
+            "confidence": ["low", "medium", "high"][i % 3],
+            "first_encountered": "2024-01-01T12:00:00",
+            "last_reviewed": "2024-06-01T12:00:00",
+            "struggles": [f"struggle {i}"],
+            "breakthroughs": [],
+            "related_concepts": [f"Concept {(i + 1) % n:06d}"],
+        }
+    return model
+
+
+def timed(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--concepts', type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        student.DATA_FILE = Path(tmp) / "student_model.json"
+        student.save_model(build_model(args.concepts))
+        model = student.load_model()
+
+        def full_save():
+            student.save_model(dict(model))
+
+        def incremental_save():
+            model["concepts"]["Concept 000000"]["mastery"] += 1
+            student.mark_dirty(model, concept="Concept 000000")
+            student.save_model(model)
+
+        full = timed(full_save)
+        incremental = timed(incremental_save)
+
+    print(f"concepts:          {args.concepts}")
+    print(f"full save:         {full * 1000:8.1f} ms")
+    print(f"incremental save:  {incremental * 1000:8.1f} ms")
+    print(f"speedup:           {full / incremental:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+bench_server.py - Load-test the HTTP/JSON server with many concurrent learners.
+
+Each learner keeps its own connections open and loops over a tutor-like mix
+of requests: show a concept, update its mastery, log a struggle. Server and
+clients share one event loop, so the figures include client overhead.
+
+Usage:
+    python benchmarks/bench_server.py [--learners N] [--requests N]
+                                      [--connections N] [--durability LEVEL]
+                                      [--no-backups]
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import student
+
+
+async def request(conn, verb, path, body=None):
+    reader, writer = conn
+    data = json.dumps(body).encode() if body is not None else b""
+    writer.write(f"{verb} {path} HTTP/1.1\r\nHost: bench\r\n"
+                 f"Content-Length: {len(data)}\r\n\r\n".encode() + data)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while (line := await reader.readline()) != b"\r\n":
+        if line.lower().startswith(b"content-length:"):
+            length = int(line.split(b":")[1])
+    await reader.readexactly(length)
+    return status
+
+
+async def connection_loop(port, learner, requests, latencies):
+    conn = await asyncio.open_connection("127.0.0.1", port)
+    base = f"/students/learner{learner:04d}"
+    for i in range(requests):
+        kind = i % 3
+        start = time.perf_counter()
+        if kind == 0:
+            status = await request(conn, "POST", f"{base}/get_concept", {"name": "Closures"})
+        elif kind == 1:
+            status = await request(conn, "POST", f"{base}/update",
+                                   {"name": "Closures", "mastery": (learner + i) % 101})
+        else:
+            status = await request(conn, "POST", f"{base}/log_struggle",
+                                   {"name": "Closures", "text": f"struggle {i}"})
+        latencies[kind].append(time.perf_counter() - start)
+        assert status == 200, status
+    conn[1].close()
+
+
+async def run(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        server = student.StudentServer(Path(tmp))
+        listener = await server.start(port=0)
+        port = listener.sockets[0].getsockname()[1]
+
+        # Every learner starts with one concept
+        for learner in range(args.learners):
+            model = await server.model(f"learner{learner:04d}")
+            await model.add_concept("Closures", 40, "low")
+        initial_writes = sum(m.writes for m in server.models.values())
+
+        latencies = ([], [], [])
+        start = time.perf_counter()
+        await asyncio.gather(*(connection_loop(port, learner, args.requests, latencies)
+                               for learner in range(args.learners)
+                               for _ in range(args.connections)))
+        elapsed = time.perf_counter() - start
+
+        listener.close()
+        await listener.wait_closed()
+        writes = sum(m.writes for m in server.models.values()) - initial_writes
+
+    total = args.learners * args.connections * args.requests
+    write_requests = sum(len(l) for l in latencies[1:])
+    every = sorted(latencies[0] + latencies[1] + latencies[2])
+
+    print(f"learners:          {args.learners} x {args.connections} connection(s)")
+    print(f"durability:        {student.DURABILITY}, backups {'on' if student.BACKUPS_ENABLED else 'off'}")
+    print(f"requests:          {total} in {elapsed:.2f} s")
+    print(f"throughput:        {total / elapsed:8.0f} req/s")
+    print(f"latency p50:       {statistics.median(every) * 1000:8.1f} ms")
+    print(f"latency p99:       {every[int(len(every) * 0.99)] * 1000:8.1f} ms")
+    for name, values in zip(("read", "update", "struggle"), latencies):
+        print(f"  {name + ' p50:':<17}{statistics.median(values) * 1000:8.1f} ms")
+    print(f"writes coalesced:  {write_requests} write requests -> {writes} saves")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--learners', type=int, default=300)
+    parser.add_argument('--requests', type=int, default=30,
+                        help='Requests per connection')
+    parser.add_argument('--connections', type=int, default=2,
+                        help='Concurrent connections per learner')
+    parser.add_argument('--durability', choices=student.DURABILITY_LEVELS, default=None)
+    parser.add_argument('--no-backups', action='store_true',
+                        help='Skip backup generations on save')
+    args = parser.parse_args()
+
+    if args.durability:
+        student.DURABILITY = args.durability
+    if args.no_backups:
+        student.BACKUPS_ENABLED = False
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+bench_shards.py - Load time of a sharded model against worker count.
+
+Saves one large model as a single file and split into shards, then times
+load_model (read cache off) for the single file and for the shards decoded
+by 1, 2, 4, ... worker processes up to the number of cores. Also times an
+incremental save, which rewrites one shard instead of the whole file.
+
+Usage:
+    python benchmarks/bench_shards.py [--concepts N] [--shards N] [--repeat N]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import student
+from bench_save import build_model, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concepts', type=int, default=1_000_000)
+    parser.add_argument('--shards', type=int, default=None,
+                        help='Shard count (default: 4 per core)')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    shards = args.shards or 4 * cores
+    workers = [1]
+    while workers[-1] * 2 <= cores:
+        workers.append(workers[-1] * 2)
+    if workers[-1] != cores:
+        workers.append(cores)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        student.DATA_FILE = Path(tmp) / "student_model.json"
+        student.BACKUPS_ENABLED = False
+        student.MODEL_CACHE = False
+        student.save_model(build_model(args.concepts))
+        file_size = student.DATA_FILE.stat().st_size
+
+        single = timed(student.load_model, args.repeat)
+
+        model = student.load_model()
+        model.layout = student.ShardLayout(shards)
+        student.save_model(model)
+        del model
+
+        student.SHARD_PARALLEL_MIN_BYTES = 0
+        by_workers = {}
+        for count in workers:
+            student.SHARD_WORKERS = count
+            by_workers[count] = timed(student.load_model, args.repeat)
+
+        model = student.load_model()
+
+        def incremental_save():
+            model["concepts"]["Concept 000000"]["mastery"] += 1
+            student.mark_dirty(model, concept="Concept 000000")
+            student.save_model(model)
+        save = timed(incremental_save, args.repeat)
+
+    print(f"concepts:          {args.concepts} ({file_size / 1e6:.1f} MB), {shards} shards, {cores} core(s)")
+    print(f"single file load:  {single * 1000:8.1f} ms")
+    for count, elapsed in by_workers.items():
+        print(f"{count:>3} worker(s):      {elapsed * 1000:8.1f} ms   {single / elapsed:5.2f}x single file"
+              f"   {by_workers[1] / elapsed:5.2f}x one worker")
+    print(f"incremental save:  {save * 1000:8.1f} ms (one shard of {shards})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+bench_sync.py - Cost of syncing a few changes between two large replicas.
+
+Builds a model, copies it to two replicas and syncs them both ways (the
+first exchange sends everything, and the next sync re-checks what it
+applied), then changes a handful of concepts on one side and times
+finding the changes, exporting the changeset and applying it on the other
+side. The later sync should cost about the same whatever the model size.
+
+Usage:
+    python benchmarks/bench_sync.py [--concepts N] [--changed N]
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import student
+from bench_save import build_model, timed
+
+
+def use(root, name):
+    student.DATA_FILE = root / name / "student_model.json"
+
+
+def export(since=None):
+    state = student.SyncState()
+    model = student.load_model()
+    student.absorb_local_changes(state, model)
+    changeset = student.sync_export(model, state, state.since() if since is None else since)
+    state.save()
+    return changeset
+
+
+def apply(changeset):
+    state = student.SyncState()
+    model = student.load_model()
+    student.absorb_local_changes(state, model)
+    student.sync_apply(model, state, changeset)
+    student.save_model(model)
+    state.save()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concepts', type=int, default=100_000)
+    parser.add_argument('--changed', type=int, default=10,
+                        help='Concepts changed before the timed sync (default: 10)')
+    args = parser.parse_args()
+
+    student.BACKUPS_ENABLED = False
+    text = json.dumps(build_model(args.concepts))
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        for name in ("a", "b"):
+            (root / name).mkdir()
+            (root / name / "student_model.json").write_text(text)
+
+        full = {}
+
+        def first_sync():
+            use(root, "a")
+            full["changeset"] = export()
+            use(root, "b")
+            apply(full["changeset"])
+            back = export()
+            use(root, "a")
+            apply(back)
+            export()
+        first = timed(first_sync, 1)
+
+        use(root, "a")
+        model = student.StudentModel.open()
+        for i in range(args.changed):
+            model.update(f"Concept {i * 97 % args.concepts:06d}", mastery=i % 101)
+
+        result = {}
+        export_time = timed(lambda: result.update(changeset=export()), 1)
+        use(root, "b")
+        apply_time = timed(lambda: apply(result["changeset"]), 1)
+        size = len(json.dumps(result["changeset"]))
+
+    print(f"concepts:           {args.concepts}")
+    print(f"first sync:         {first * 1000:8.1f} ms (both ways, {len(full['changeset']['entities'])} entities)")
+    print(f"export {args.changed:>4} changes: {export_time * 1000:8.1f} ms "
+          f"({len(result['changeset']['entities'])} entities, {size / 1024:.1f} KB, includes loading the model)")
+    print(f"apply changeset:    {apply_time * 1000:8.1f} ms (includes loading and saving the model)")
+
+
+if __name__ == '__main__':
+    main()
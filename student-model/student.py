@@ -5,19 +5,113 @@ Tracks conceptual knowledge mastery across learning sessions.
 Phase 1, 2, and 3 Complete (including batch operations)
 """
 
+import gzip
+import hashlib
+import io
 import json
+import os
+import pickle
+import re
 import shutil
+import sys
 import argparse
+import asyncio
+import bisect
+import concurrent.futures
+import contextlib
+import contextvars
+import fnmatch
+import inspect
+import threading
+import time
+from collections import abc, deque
 from pathlib import Path
-from datetime import datetime
-from typing import Dict, Any, Optional
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Any, Optional, List, Sequence, Tuple, Union, get_args, get_origin
+
+try:
+    import fcntl
+except ImportError:     # Windows: pack appends aren't locked against other processes
+    fcntl = None
 
 # Default data file location
 DATA_FILE = Path.home() / "student_model.json"
 
+# Session log: one JSONL partition per month, indexed lazily
+LOG_TIME_INDEX_EVERY = 32
+
+# Time travel: a checkpoint at least every N logged events bounds how many
+# events --as-of has to replay. Past the recent ones, checkpoints are thinned
+# to at most one per CHECKPOINT_KEEP_EVERY events, so replay stays bounded
+# at every age; the oldest one is always kept
+CHECKPOINT_EVERY = 256
+CHECKPOINT_KEEP_RECENT = 20
+CHECKPOINT_KEEP_EVERY = 1024
+
+# Mastery trends
+MASTERY_TARGET = 80          # mastery considered "mastered" for projections
+PLATEAU_MIN_DAYS = 7         # a plateau spans at least this long...
+PLATEAU_TOLERANCE = 5        # ...with mastery moving no more than this
+TREND_MIN_DAYS = 1           # shorter histories give velocity per review, not per day
+
+# Effective mastery: stored mastery decays from last_reviewed with a half-life
+# that grows with every recorded review, but never below DECAY_FLOOR of it
+DECAY_HALF_LIFE_DAYS = 14
+DECAY_REVIEW_GROWTH = 1.5
+DECAY_FLOOR = 0.25
+
+# Tutor context: neighbourhood size and output budget (about 4 characters a
+# token); no concept entry fits in fewer than CONTEXT_MIN_ITEM_TOKENS
+CONTEXT_HOPS = 2
+CONTEXT_BUDGET = 1500
+CONTEXT_MIN_ITEM_TOKENS = 16
+CONTEXT_STRUGGLES = 3        # most recent struggles included per concept
+
+# Command output: "text" for people, "json" (one object per command) or
+# "jsonl" (one line per listed item) for programs; set by --json/--jsonl
+OUTPUT_FORMATS = ("text", "json", "jsonl")
+OUTPUT = "text"
+
 # JSON Schema for student model
 SCHEMA_VERSION = "1.0"
 
+# How hard save_model works to survive a crash or power loss:
+#   none               - write the file in place; a crash can truncate it
+#   rename-only        - write a temp file and atomically rename it over
+#   fsync-file         - also fsync the temp file before the rename
+#   fsync-file-and-dir - also fsync the directory so the rename is durable
+DURABILITY_LEVELS = ("none", "rename-only", "fsync-file", "fsync-file-and-dir")
+DURABILITY = "fsync-file"
+
+# GroupCommitter: a failed commit is retried after its interval, doubling
+# up to GROUP_COMMIT_MAX_DELAY seconds, and given up after this many retries
+GROUP_COMMIT_RETRIES = 5
+GROUP_COMMIT_MAX_DELAY = 30.0
+
+# Read cache: load_model keeps the parsed model in a pickle beside the file
+# and reuses it while the file's size, mtime, ctime and inode are unchanged.
+MODEL_CACHE = True
+
+# Sharded layout: processes that decode shard files on load (None for one
+# per CPU core, 1 to decode in this process). Small models are always
+# decoded in this process, where starting workers would cost more.
+SHARD_WORKERS = None
+SHARD_PARALLEL_MIN_BYTES = 4 << 20
+
+# Backup store: every save records a generation; older generations are
+# thinned out to the most recent ones, one per hour and one per day.
+BACKUPS_ENABLED = True
+BACKUP_COMPRESS = False
+BACKUP_KEEP_RECENT = 10
+BACKUP_KEEP_HOURLY = 24
+BACKUP_KEEP_DAILY = 30
+BACKUP_GC_EVERY = 50
+# New blobs go to the current pack file until it reaches this size
+BACKUP_PACK_BYTES = 8 << 20
+# Generations list the concepts changed since their base; a new base is
+# written once that passes an eighth of the concepts (and at least this many)
+BACKUP_REBASE_MIN = 256
+
 def get_default_model() -> Dict[str, Any]:
     """Return the default/empty student model structure."""
     return {
@@ -32,115 +126,4830 @@ def get_default_model() -> Dict[str, Any]:
         "sessions": []
     }
 
-def validate_model(model: Dict[str, Any]) -> bool:
-    """Validate that model has required structure."""
-    required_keys = ["metadata", "concepts", "sessions"]
-    if not all(key in model for key in required_keys):
-        return False
+def validate_model(model: Dict[str, Any]) -> bool:
+    """Validate that model has required structure."""
+    required_keys = ["metadata", "concepts", "sessions"]
+    if not all(key in model for key in required_keys):
+        return False
+
+    required_metadata = ["created", "last_updated"]
+    if not all(key in model["metadata"] for key in required_metadata):
+        return False
+
+    return True
+
+# =============================================================================
+# MODEL FILE BINDING
+# =============================================================================
+#
+# The storage functions below work on "the model file" and report progress
+# as printed lines. Both default to DATA_FILE and stdout; FileStore binds
+# its own path and message sink for the duration of a call, in a context
+# variable so concurrent stores in other threads see theirs.
+
+_binding: contextvars.ContextVar = contextvars.ContextVar("binding", default=(None, None))
+
+
+def data_file() -> Path:
+    """The model file the storage functions are working on."""
+    path = _binding.get()[0]
+    return path if path is not None else DATA_FILE
+
+
+def say(message: str = "") -> None:
+    """Print a storage message to the bound sink, or stdout."""
+    print(message, file=_binding.get()[1])
+
+
+@contextlib.contextmanager
+def bind_model_file(path: Optional[Path] = None, sink=None):
+    """Point data_file() at path and say() at sink (a file object) in this context."""
+    token = _binding.set((path, sink))
+    try:
+        yield
+    finally:
+        _binding.reset(token)
+
+# =============================================================================
+# INCREMENTAL PERSISTENCE
+# =============================================================================
+#
+# A model loaded from disk keeps the encoded text of every top-level section
+# and of every concept record.  Saving re-encodes only what was touched and
+# splices the cached text back in for everything else, so the cost of a save
+# tracks the size of the change rather than the size of the model.  The file
+# stays byte-for-byte what json.dump(model, indent=2) would have produced,
+# except that a concept's history array is written on one line: under
+# indent=2 every [t, mastery, confidence] point would take five.
+
+INDENT = "  "
+
+# Sections that always change on save (last_updated) and are never cached
+_ALWAYS_DIRTY = {"metadata"}
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_DECODER = json.JSONDecoder()
+# json.dumps(key, ensure_ascii=False) without the per-call overhead
+_encode_key = json.encoder.encode_basestring
+
+
+class ConceptMap(dict):
+    """
+    The "concepts" section of a loaded model.
+    Records every key that is added, replaced or removed. In-place edits of a
+    concept record must be reported with mark_dirty(model, concept=key).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fragments: Dict[str, str] = {}
+        self.dirty = set()
+        self.index: Optional["ConceptIndex"] = None  # built by concept_index()
+        # Bumped on every change, so indexes over concept fields know when
+        # they are stale (see sorted_index())
+        self.version = 0
+
+    def __setitem__(self, key, value):
+        if self.index is not None:
+            if key in self:
+                self.index.drop(key, self[key])
+            self.index.put(key, value)
+        super().__setitem__(key, value)
+        self.dirty.add(key)
+        self.version += 1
+
+    def __delitem__(self, key):
+        if self.index is not None and key in self:
+            self.index.drop(key, self[key])
+        super().__delitem__(key)
+        self.dirty.add(key)
+        self.version += 1
+
+    def pop(self, key, *default):
+        if self.index is not None and key in self:
+            self.index.drop(key, self[key])
+        self.dirty.add(key)
+        self.version += 1
+        return super().pop(key, *default)
+
+    def popitem(self):
+        key, value = super().popitem()
+        if self.index is not None:
+            self.index.drop(key, value)
+        self.dirty.add(key)
+        self.version += 1
+        return key, value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return super().__getitem__(key)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def clear(self):
+        self.dirty.update(self.keys())
+        self.index = None
+        self.version += 1
+        super().clear()
+
+
+class TrackedModel(dict):
+    """
+    A student model loaded from disk, with the encoded text of its sections.
+    Behaves exactly like the plain dict returned by get_default_model().
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fragments: Dict[str, str] = {}
+        self.dirty = set()
+        self.pending_events: List[str] = []
+        # Derived lookup structures, built on first use and kept up to date
+        # by the commands that change what they index
+        self.indexes: Dict[str, Any] = {}
+        # Where the concepts live on disk when they aren't in the model file
+        # (ShardLayout or ConceptFiles), and a layout just switched away from
+        # whose files the next save removes
+        self.layout = None
+        self.retired = None
+        # Stat key (see _cache_key) of the model file this was read from or
+        # last saved to, so the backup store knows what it has already seen
+        self.source = None
+
+    def __setitem__(self, key, value):
+        if key == "concepts" and not isinstance(value, ConceptMap):
+            value = ConceptMap(value)
+        super().__setitem__(key, value)
+        self.dirty.add(key)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.dirty.add(key)
+
+
+def track(model: Dict[str, Any]) -> "TrackedModel":
+    """Wrap a plain dict model so changes and events can be tracked."""
+    if isinstance(model, TrackedModel):
+        return model
+    tracked = TrackedModel()
+    for key, value in model.items():
+        if key == "concepts" and isinstance(value, dict):
+            value = ConceptMap(value)
+        dict.__setitem__(tracked, key, value)
+    return tracked
+
+
+def mark_dirty(model: Dict[str, Any], concept: Optional[str] = None,
+               section: Optional[str] = None) -> None:
+    """
+    Record an in-place change so the next save re-encodes it.
+    A no-op for plain dict models, which are always encoded in full.
+    """
+    if not isinstance(model, TrackedModel):
+        return
+    if concept is not None:
+        concepts = model.get("concepts")
+        if isinstance(concepts, ConceptMap):
+            concepts.dirty.add(concept)
+            concepts.version += 1
+        else:
+            model.dirty.add("concepts")
+    if section is not None:
+        model.dirty.add(section)
+
+
+def _encode_value(value: Any, level: int) -> str:
+    """
+    Encode a value as json.dump(indent=2) would at the given nesting level,
+    with history arrays on one line (see INCREMENTAL PERSISTENCE).
+    """
+    if isinstance(value, dict) and isinstance(value.get("history"), list):
+        return _join_object([(key, json.dumps(item, ensure_ascii=False) if key == "history"
+                              else _encode_value(item, level + 1))
+                             for key, item in value.items()], level)
+    text = json.dumps(value, indent=2, ensure_ascii=False)
+    if level and "\n" in text:
+        # JSON strings never contain raw newlines, so this only re-indents
+        text = text.replace("\n", "\n" + INDENT * level)
+    return text
+
+
+def _join_object(items, level: int) -> str:
+    """Join pre-encoded (key, fragment) pairs into an indented JSON object."""
+    if not items:
+        return "{}"
+    inner = INDENT * (level + 1)
+    body = ",\n".join(
+        f"{inner}{_encode_key(key)}: {fragment}"
+        for key, fragment in items
+    )
+    return "{\n" + body + "\n" + INDENT * level + "}"
+
+
+def _skip_ws(text: str, idx: int) -> int:
+    return _WHITESPACE.match(text, idx).end()
+
+
+def _scan_object(text: str, idx: int, nested_key: Optional[str] = None):
+    """
+    Decode the JSON object starting at text[idx], keeping the source text of
+    each member value. If nested_key is given, that member is itself scanned
+    member by member. Returns (members, end) where members is a list of
+    (key, value, fragment, nested_members_or_None).
+    """
+    if text[idx:idx + 1] != '{':
+        raise json.JSONDecodeError("Expecting '{'", text, idx)
+    members = []
+    idx = _skip_ws(text, idx + 1)
+    if text[idx:idx + 1] == '}':
+        return members, idx + 1
+
+    while True:
+        if text[idx:idx + 1] != '"':
+            raise json.JSONDecodeError(
+                "Expecting property name enclosed in double quotes", text, idx)
+        key, idx = json.decoder.scanstring(text, idx + 1)
+        idx = _skip_ws(text, idx)
+        if text[idx:idx + 1] != ':':
+            raise json.JSONDecodeError("Expecting ':' delimiter", text, idx)
+        start = _skip_ws(text, idx + 1)
+
+        if key == nested_key and text[start:start + 1] == '{':
+            nested, idx = _scan_object(text, start)
+            value = None
+        else:
+            value, idx = _DECODER.raw_decode(text, start)
+            nested = None
+        members.append((key, value, text[start:idx], nested))
+
+        idx = _skip_ws(text, idx)
+        char = text[idx:idx + 1]
+        if char == '}':
+            return members, idx + 1
+        if char != ',':
+            raise json.JSONDecodeError("Expecting ',' delimiter", text, idx)
+        idx = _skip_ws(text, idx + 1)
+
+
+def decode_model(text: str) -> Dict[str, Any]:
+    """
+    Decode model JSON into a TrackedModel with cached section fragments.
+    Raises json.JSONDecodeError exactly like json.loads.
+    """
+    idx = _skip_ws(text, 0)
+    if text[idx:idx + 1] != '{':
+        # Not an object - let validation reject it
+        return json.loads(text)
+
+    members, end = _scan_object(text, idx, nested_key="concepts")
+    if _skip_ws(text, end) != len(text):
+        raise json.JSONDecodeError("Extra data", text, _skip_ws(text, end))
+
+    # Cached fragments are only spliced back when the file already uses the
+    # layout save_model writes; anything else is re-encoded on first save.
+    canonical = text.startswith('{\n' + INDENT + '"')
+
+    model = TrackedModel()
+    for key, value, fragment, nested in members:
+        if nested is not None:
+            concepts = ConceptMap()
+            for c_key, c_value, c_fragment, _ in nested:
+                dict.__setitem__(concepts, c_key, c_value)
+                if canonical:
+                    concepts.fragments[c_key] = c_fragment
+            value = concepts
+            fragment = None
+        elif key == "concepts" and isinstance(value, dict):
+            value = ConceptMap(value)
+            fragment = None
+        dict.__setitem__(model, key, value)
+        if canonical and fragment is not None:
+            model.fragments[key] = fragment
+    return model
+
+
+def serialize_model(model: Dict[str, Any]):
+    """
+    Encode a model for saving.
+    Returns (text, section_fragments, concept_fragments). Plain dict models
+    are encoded in full; loaded models reuse their cached fragments.
+    """
+    tracked = isinstance(model, TrackedModel)
+    sections = {}
+    concept_fragments = None
+    for key, value in model.items():
+        if key == "concepts" and isinstance(value, dict):
+            cached = value.fragments if isinstance(value, ConceptMap) else {}
+            dirty = value.dirty if isinstance(value, ConceptMap) else ()
+            concept_fragments = {}
+            for c_key, c_value in value.items():
+                fragment = cached.get(c_key)
+                if fragment is None or c_key in dirty:
+                    fragment = _encode_value(c_value, 2)
+                concept_fragments[c_key] = fragment
+            sections[key] = _join_object(list(concept_fragments.items()), 1)
+            continue
+
+        sections[key] = _section_fragment(model, key, value)
+
+    return _join_object(list(sections.items()), 0), sections, concept_fragments
+
+
+def _section_fragment(model: Dict[str, Any], key: str, value: Any) -> str:
+    """A top-level section's encoded text, reused from the last save if unchanged."""
+    tracked = isinstance(model, TrackedModel)
+    fragment = model.fragments.get(key) if tracked else None
+    if fragment is None or (tracked and key in model.dirty) or key in _ALWAYS_DIRTY:
+        fragment = _encode_value(value, 1)
+    return fragment
+
+
+def _adopt_fragments(model: Dict[str, Any], sections, concept_fragments) -> None:
+    """After a successful save, cache the written fragments and clear dirt."""
+    if not isinstance(model, TrackedModel):
+        return
+    model.fragments = {k: v for k, v in sections.items()
+                       if k != "concepts" and k not in _ALWAYS_DIRTY}
+    model.dirty.clear()
+    concepts = model.get("concepts")
+    if isinstance(concepts, ConceptMap) and concept_fragments is not None:
+        concepts.fragments = concept_fragments
+        concepts.dirty.clear()
+
+
+# Bumped whenever the cached layout or TrackedModel's attributes change
+_CACHE_FORMAT = 3
+
+
+def cache_path() -> Path:
+    """Parsed-model cache for the current model file."""
+    return data_file().with_suffix('.cache')
+
+
+def _cache_key(path: Path) -> tuple:
+    """
+    What a model file looks like on disk: its stat, and a digest of the
+    names and stats of the shard and concept files beside it, which can
+    change (a git checkout) while the model file stays the same.
+    """
+    stat = path.stat()
+    layout = hashlib.blake2b(digest_size=8)
+    for directory in (path.with_suffix('.shards'), path.with_suffix('.concepts'),
+                      path.with_suffix('.concepts') / "concepts"):
+        try:
+            entries = sorted(os.scandir(directory), key=lambda entry: entry.name)
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        for entry in entries:
+            if entry.is_file():
+                info = entry.stat()
+                layout.update(f"{entry.name}\0{info.st_size}\0{info.st_mtime_ns}\0"
+                              f"{info.st_ctime_ns}\0{info.st_ino}\n".encode('utf-8'))
+    return (_CACHE_FORMAT, stat.st_size, stat.st_mtime_ns, stat.st_ctime_ns, stat.st_ino,
+            layout.hexdigest())
+
+
+def _read_cache(key: tuple) -> Optional["TrackedModel"]:
+    """The cached model if it was parsed from the file as it is now."""
+    try:
+        with open(cache_path(), 'rb') as f:
+            if pickle.load(f) != key:
+                return None
+            sections, fragments, concept_fragments, layout = pickle.load(f)
+    except Exception:
+        # Missing, stale format or damaged: parse the JSON instead
+        return None
+
+    model = TrackedModel()
+    for section, value in sections.items():
+        if section == "concepts":
+            concepts = ConceptMap()
+            dict.update(concepts, value)
+            concepts.fragments = concept_fragments
+            value = concepts
+        dict.__setitem__(model, section, value)
+    model.fragments = fragments
+    model.layout = layout
+    return model
+
+
+def _write_cache(model: "TrackedModel", key: tuple, path: Optional[Path] = None) -> None:
+    """Store a freshly parsed model under the key of the file it came from."""
+    concepts = model.get("concepts")
+    sections = {section: dict(value) if section == "concepts" else value
+                for section, value in model.items()}
+    concept_fragments = concepts.fragments if isinstance(concepts, ConceptMap) else {}
+    path = path or cache_path()
+    temp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(temp, 'wb') as f:
+            # The key is pickled on its own so a stale cache is rejected unread
+            pickle.dump(key, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump((sections, model.fragments, concept_fragments, model.layout), f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        temp.replace(path)
+    except (OSError, pickle.PicklingError):
+        temp.unlink(missing_ok=True)
+
+
+def drop_cache() -> None:
+    """Forget the parsed-model cache; the next load parses the file."""
+    try:
+        cache_path().unlink(missing_ok=True)
+    except OSError:
+        pass
+
+
+# A command that changes the model would make a cache written when it
+# loaded stale at once, so inside deferred_cache() cache misses are held as
+# (model, key, cache file, model file) and only written at the end for
+# models the command left as loaded. The list belongs to the context and
+# thread that opened the block; loads anywhere else (a server's worker
+# threads, other contexts) cache a miss at once.
+_cache_pending: contextvars.ContextVar = contextvars.ContextVar("cache_pending", default=None)
+
+
+def _deferred() -> Optional[List[tuple]]:
+    """The cache misses held back for this call, or None to cache at once."""
+    pending = _cache_pending.get()
+    if pending is None or pending[0] != threading.get_ident():
+        return None
+    return pending[1]
+
+
+@contextlib.contextmanager
+def deferred_cache():
+    """Cache models parsed in this block once it ends, if still unchanged."""
+    pending = []
+    token = _cache_pending.set((threading.get_ident(), pending))
+    try:
+        yield
+    finally:
+        _cache_pending.reset(token)
+    for model, key, path, source in pending:
+        concepts = model.get("concepts")
+        if model.dirty or model.pending_events or (isinstance(concepts, ConceptMap) and concepts.dirty):
+            continue
+        try:
+            if _cache_key(source) != key:
+                continue
+        except OSError:
+            continue
+        _write_cache(model, key, path)
+
+
+def load_model() -> Dict[str, Any]:
+    """
+    Load the student model from disk with error handling.
+    Creates a new model if file doesn't exist.
+    """
+    if not data_file().exists():
+        say(f"ℹ️  No model found at {data_file()}")
+        say("   Run 'python student.py init' to create one")
+        return track(get_default_model())
+
+    try:
+        # Stat before reading: a change after this only makes the key stale
+        key = _cache_key(data_file())
+        if MODEL_CACHE:
+            cached = _read_cache(key)
+            if cached is not None:
+                cached.source = key
+                return cached
+
+        with open(data_file(), 'r', encoding='utf-8') as f:
+            text = f.read()
+        model = decode_model(text)
+        if isinstance(model, TrackedModel):
+            model.source = key
+        if isinstance(model, TrackedModel) and "shards" in model:
+            _attach_shards(model)
+        elif isinstance(model, TrackedModel) and "concept_files" in model:
+            _attach_concept_files(model)
+
+        # Validate structure
+        if not validate_model(model):
+            say(f"⚠️  Model at {data_file()} has invalid structure")
+
+            restored = _restore_latest_backup()
+            if restored is not None:
+                return restored
+
+            say("   Creating new model")
+            return get_default_model()
+
+        if MODEL_CACHE and isinstance(model, TrackedModel):
+            pending = _deferred()
+            if pending is None:
+                _write_cache(model, key)
+            else:
+                pending.append((model, key, cache_path(), data_file()))
+        return model
+
+    except LayoutLoadError as e:
+        say(f"❌ Error: {e}")
+
+        restored = _restore_latest_backup()
+        if restored is not None:
+            return restored
+
+        say("   Creating new model")
+        return get_default_model()
+
+    except json.JSONDecodeError as e:
+        say(f"❌ Error: Corrupt JSON in {data_file()}")
+        say(f"   {str(e)}")
+
+        # Keep every complete record rather than falling back wholesale
+        salvaged = _salvage_data_file(text)
+        if salvaged is not None:
+            return salvaged
+
+        restored = _restore_latest_backup()
+        if restored is not None:
+            return restored
+
+        say("   Creating new model")
+        return get_default_model()
+
+    except Exception as e:
+        say(f"❌ Unexpected error loading model: {str(e)}")
+        return get_default_model()
+
+
+def _fsync_dir(path: Path) -> None:
+    """fsync a directory so a rename inside it survives power loss."""
+    try:
+        fd = os.open(str(path), os.O_RDONLY)
+    except OSError:
+        return  # Platforms without directory handles (Windows)
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def save_model(model: Dict[str, Any], durability: Optional[str] = None,
+               checkpoint: bool = False) -> bool:
+    """
+    Save model to disk with atomic writes and a backup generation.
+    durability overrides the module-wide DURABILITY level for this save.
+    checkpoint keeps the generation for --as-of; pass it when the model was
+    replaced wholesale rather than changed through logged events.
+    Returns True on success, False on failure.
+    """
+    try:
+        level = durability or DURABILITY
+        if level not in DURABILITY_LEVELS:
+            say(f"❌ Error: Unknown durability level '{level}'")
+            return False
+
+        # Validate before saving
+        if not validate_model(model):
+            say("❌ Error: Model structure is invalid, refusing to save")
+            return False
+
+        # Update timestamp
+        model["metadata"]["last_updated"] = datetime.now().isoformat()
+        # Noted before anything is written, so sync never misses a change
+        note_sync_changes(model)
+
+        # Only touched sections/concepts are re-encoded; in the sharded and
+        # concept-files layouts only the files holding them are rewritten
+        layout = model.layout if isinstance(model, TrackedModel) else None
+        concepts = model.get("concepts")
+        cached = dict(concepts.fragments) if isinstance(concepts, ConceptMap) else None
+        if isinstance(layout, ShardLayout):
+            sections, concept_fragments, shard_texts = serialize_sharded(model, layout)
+            _write_shards(layout, shard_texts, level)
+            text = layout_model_text(sections, "shards", layout.manifest())
+        elif isinstance(layout, ConceptFiles):
+            sections, concept_fragments = write_concept_files(model, layout, level)
+            text = layout_model_text(sections, "concept_files", layout.manifest(model))
+        else:
+            text, sections, concept_fragments = serialize_model(model)
+        drop_cache()
+        pending = _deferred()
+        if pending:
+            pending[:] = [p for p in pending if p[3] != data_file()]
+        _write_model_text(text, level)
+        if isinstance(layout, ShardLayout):
+            _remove_stale_shards(layout)
+        if isinstance(model, TrackedModel) and model.retired is not None:
+            remove_layout_files(model.retired)
+            model.retired = None
+        _adopt_fragments(model, sections, concept_fragments)
+        source = None
+        written = _cache_key(data_file())
+        if isinstance(model, TrackedModel):
+            source, model.source = model.source, written
+
+        # The model is on disk now, so nothing below fails the save.
+        # Events describe changes that are now on disk
+        pending = model.pending_events if isinstance(model, TrackedModel) else []
+        if pending:
+            try:
+                append_events(pending)
+                model.pending_events = []
+            except Exception as e:
+                say(f"⚠️  Session log write failed: {str(e)}")
+
+        # History lives in the backup store
+        if BACKUPS_ENABLED:
+            # Concept files can change one by one (a git checkout) while the
+            # model file stays the same, so there every concept is hashed
+            changed = None
+            if cached is not None and concept_fragments is not None \
+                    and not isinstance(layout, ConceptFiles):
+                changed = [key for key, text in concept_fragments.items() if cached.get(key) is not text]
+            try:
+                snapshot_backup(sections, concept_fragments, len(pending), checkpoint,
+                                changed=changed, source=source, written=written)
+            except Exception as e:
+                say(f"⚠️  Backup failed: {str(e)}")
+
+        return True
+
+    except Exception as e:
+        say(f"❌ Error saving model: {str(e)}")
+        return False
+
+
+def _write_model_text(text: str, level: str, path: Optional[Path] = None) -> None:
+    """Write encoded model text to path (default: the model file) at the given durability level."""
+    path = path or data_file()
+    if level == "none":
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return
+
+    # Write to temp file first (atomic operation)
+    temp = path.with_suffix('.json.tmp')
+    with open(temp, 'w', encoding='utf-8') as f:
+        f.write(text)
+        if level in ("fsync-file", "fsync-file-and-dir"):
+            f.flush()
+            os.fsync(f.fileno())
+
+    # Atomic rename
+    temp.replace(path)
+    if level == "fsync-file-and-dir":
+        _fsync_dir(path.parent)
+
+
+class GroupCommitter:
+    """
+    Coalesce saves from a long-running process into one durable write per
+    interval. Callers submit the model after mutating it and may wait() for
+    their ticket; every mutation submitted within one interval shares the
+    same write and fsync.
+
+    A commit serialises the model while holding lock, so a thread that
+    mutates a submitted model while the committer may be writing it must
+    hold lock too (mutate and submit inside "with committer.lock:").
+
+    With store given, commits go through store.save and the committer is
+    itself a store (save() submits), so a StudentModel can write through
+    it. Such a save is acknowledged before it is durable: it returns once
+    the model is queued, and wait() or flush() tell whether it reached the
+    disk. background=False starts no flusher thread; the owner calls flush().
+
+    A commit that fails stays pending: the background thread retries it
+    with a doubling delay, up to retries times in a row, then gives up and
+    sets error. Waiters on a failed commit get False, and once error is set
+    save() returns False too; a flush() that succeeds clears it.
+    """
+
+    def __init__(self, interval: float = 0.2,
+                 durability: str = "fsync-file-and-dir",
+                 store=None, background: bool = True,
+                 retries: Optional[int] = None):
+        self.interval = interval
+        self.durability = durability
+        self.store = store
+        self.retries = GROUP_COMMIT_RETRIES if retries is None else retries
+        self.lock = threading.RLock()
+        self.writes = 0     # commits performed
+        self.failures = 0   # commits failed since the last one that succeeded
+        self.error: Optional[str] = None
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._pending = None
+        self._checkpoint = False
+        self._submitted = 0
+        self._committed = 0
+        self._failed = 0
+        self._closed = False
+        self._thread = None
+        if background:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    @property
+    def submitted(self) -> int:
+        """The last ticket handed out."""
+        return self._submitted
+
+    @property
+    def committed(self) -> int:
+        """The last ticket that is on disk."""
+        return self._committed
+
+    def submit(self, model: Dict[str, Any], checkpoint: bool = False) -> int:
+        """Queue model for the next group write. Returns a ticket."""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("GroupCommitter is closed")
+            self._pending = model
+            self._checkpoint = self._checkpoint or checkpoint
+            self._submitted += 1
+            self._cond.notify_all()
+            return self._submitted
+
+    def wait(self, ticket: int, timeout: Optional[float] = None) -> bool:
+        """Block until the write covering ticket is durable. False on failure."""
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self._committed >= ticket or self._failed >= ticket,
+                timeout)
+            return self._committed >= ticket
+
+    def flush(self) -> bool:
+        """Write any pending model now."""
+        with self._write_lock:
+            with self._cond:
+                model, ticket, checkpoint = self._pending, self._submitted, self._checkpoint
+                self._pending, self._checkpoint = None, False
+            if model is None:
+                return True
+            return self._commit(model, ticket, checkpoint)
+
+    def close(self) -> bool:
+        """Flush and stop the background thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        return self.flush()
+
+    def _commit(self, model: Dict[str, Any], ticket: int, checkpoint: bool) -> bool:
+        with self.lock:
+            if self.store is None:
+                ok = save_model(model, durability=self.durability, checkpoint=checkpoint)
+            else:
+                ok = self.store.save(model, checkpoint=checkpoint)
+        with self._cond:
+            if ok:
+                self.writes += 1
+                self.failures = 0
+                self.error = None
+                self._committed = max(self._committed, ticket)
+            else:
+                self.failures += 1
+                if self.failures > self.retries:
+                    self.error = f"Failed to save model ({self.failures} attempts in a row)"
+                self._failed = max(self._failed, ticket)
+                if self._pending is None:
+                    self._pending = model
+                self._checkpoint = self._checkpoint or checkpoint
+            self._cond.notify_all()
+        return ok
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: (self._pending is not None and self.error is None)
+                                    or self._closed)
+                # Let more mutations pile up behind the first one, and back
+                # off while commits keep failing
+                delay = min(self.interval * 2 ** self.failures, GROUP_COMMIT_MAX_DELAY)
+                if self._cond.wait_for(lambda: self._closed, delay):
+                    return
+            self.flush()
+
+    # Store interface, for a StudentModel writing through the committer
+
+    @property
+    def location(self) -> str:
+        return self.store.location
+
+    def load(self) -> Dict[str, Any]:
+        return self.store.load()
+
+    def as_of(self, value: str) -> Dict[str, Any]:
+        return self.store.as_of(value)
+
+    def log_summary(self, until: Optional[str] = None) -> Dict[str, int]:
+        return self.store.log_summary(until)
+
+    def save(self, model: Dict[str, Any], checkpoint: bool = False) -> bool:
+        """Queue model for the next commit; False once the committer has given up."""
+        self.submit(model, checkpoint)
+        return self.error is None
+
+
+# =============================================================================
+# SHARDED LAYOUT
+# =============================================================================
+#
+# student_model.json          every section but concepts, which are replaced
+#                             by a "shards" manifest listing the shard files
+# student_model.shards/
+#   007-3f9a1c2e5b7d.json     {"concepts": {...}} for the keys hashing to 7
+#
+# A concept's shard is fixed by a hash of its key, so a save rewrites only
+# the shards holding changed concepts. Shard files are named after their
+# content and the manifest is written last: a save that dies part way leaves
+# the old manifest pointing at the old, intact files. On load the shards are
+# decoded in parallel, one process per core, and merged in manifest order.
+
+# Shard numbers are three digits in file names
+MAX_SHARDS = 999
+
+
+class LayoutLoadError(Exception):
+    """A file listed in a shard or concept-files manifest is missing or unreadable."""
+
+
+def shard_dir() -> Path:
+    """Directory holding the shard files for the current model file."""
+    return data_file().with_suffix('.shards')
+
+
+def shard_of(key: str, count: int) -> int:
+    """The shard a concept key belongs to; the same on every run and machine."""
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % count
+
+
+class ShardLayout:
+    """
+    The shard files of a sharded model and the keys each one holds, in file
+    order. A layout without members has not been written yet; the next save
+    splits every concept into it.
+    """
+
+    def __init__(self, count: int, files: Optional[List[str]] = None,
+                 members: Optional[List[Dict[str, None]]] = None):
+        self.count = count
+        self.files = files or [None] * count
+        self.members = members
+
+    def manifest(self) -> Dict[str, Any]:
+        return {"directory": shard_dir().name, "files": self.files}
+
+
+def _decode_shard(path: str) -> List[tuple]:
+    """(key, value, fragment, None) for every concept in a shard file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    members, end = _scan_object(text, _skip_ws(text, 0), nested_key="concepts")
+    if _skip_ws(text, end) != len(text):
+        raise json.JSONDecodeError("Extra data", text, _skip_ws(text, end))
+    for key, _, _, nested in members:
+        if key == "concepts" and nested is not None:
+            if not text.startswith('{\n' + INDENT + '"'):
+                # Fragments are only reused from the layout saves write
+                nested = [(c_key, c_value, None, None) for c_key, c_value, _, _ in nested]
+            return nested
+    raise json.JSONDecodeError("Expecting a concepts object", text, 0)
+
+
+def _decode_shards(paths: List[Path]) -> List[List[tuple]]:
+    """Decode shard files, across processes when they are big enough to pay off."""
+    workers = min(SHARD_WORKERS or os.cpu_count() or 1, len(paths))
+    if workers > 1 and sum(p.stat().st_size for p in paths) >= SHARD_PARALLEL_MIN_BYTES:
+        try:
+            with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+                return list(pool.map(_decode_shard, map(str, paths)))
+        except (concurrent.futures.process.BrokenProcessPool, NotImplementedError, PermissionError):
+            pass  # No usable process pool here: decode in this process
+    return [_decode_shard(str(p)) for p in paths]
+
+
+def _attach_shards(model: "TrackedModel") -> None:
+    """Replace a loaded manifest's "shards" section with the concepts it lists."""
+    manifest = model["shards"]
+    try:
+        directory = data_file().parent / manifest["directory"]
+        files = [str(name) for name in manifest["files"]]
+    except (KeyError, TypeError) as e:
+        raise LayoutLoadError(f"Invalid shard manifest in {data_file()}: {e}") from e
+    try:
+        decoded = _decode_shards([directory / name for name in files])
+    except (OSError, ValueError) as e:
+        raise LayoutLoadError(f"Unreadable shard in {directory}: {e}") from e
+
+    concepts = ConceptMap()
+    members = []
+    for entries in decoded:
+        keys = {}
+        for key, value, fragment, _ in entries:
+            dict.__setitem__(concepts, key, value)
+            if fragment is not None:
+                concepts.fragments[key] = fragment
+            keys[key] = None
+        members.append(keys)
+
+    # Concepts take the manifest's place among the sections
+    sections = list(dict.items(model))
+    dict.clear(model)
+    for key, value in sections:
+        dict.__setitem__(model, "concepts" if key == "shards" else key,
+                         concepts if key == "shards" else value)
+    model.fragments.pop("shards", None)
+    model.layout = ShardLayout(len(files), files, members)
+
+
+def serialize_sharded(model: "TrackedModel", layout: ShardLayout):
+    """
+    Encode a sharded model for saving. Returns (section_fragments,
+    concept_fragments, shard_texts), where shard_texts maps each shard
+    holding a changed concept to its new text. Updates layout.members.
+    """
+    concepts = model["concepts"]
+    if not isinstance(concepts, ConceptMap):
+        concepts = model["concepts"] = ConceptMap(concepts)
+    fragments = concepts.fragments
+    dirty = concepts.dirty
+    count = layout.count
+
+    if layout.members is None or "concepts" in model.dirty:
+        # First save in this layout, or concepts replaced wholesale
+        layout.members = [{} for _ in range(count)]
+        for key in concepts:
+            layout.members[shard_of(key, count)][key] = None
+        changed = set(range(count))
+    else:
+        changed = set()
+        for key in dirty:
+            shard = shard_of(key, count)
+            changed.add(shard)
+            if key in concepts:
+                layout.members[shard][key] = None
+            else:
+                layout.members[shard].pop(key, None)
+                fragments.pop(key, None)
+
+    def fragment(key):
+        text = fragments.get(key)
+        if text is None or key in dirty:
+            text = fragments[key] = _encode_value(concepts[key], 2)
+        return text
+
+    shard_texts = {}
+    for shard in sorted(changed):
+        items = [(key, fragment(key)) for key in layout.members[shard]]
+        shard_texts[shard] = _join_object([("concepts", _join_object(items, 1))], 0)
+
+    # Backups record every concept; without them only changed shards are touched
+    concept_fragments = {key: fragment(key) for key in concepts} if BACKUPS_ENABLED else fragments
+    sections = {key: None if key == "concepts" else _section_fragment(model, key, value)
+                for key, value in model.items()}
+    return sections, concept_fragments, shard_texts
+
+
+def _write_shards(layout: ShardLayout, shard_texts: Dict[int, str], level: str) -> None:
+    """Write changed shards under content-derived names and record them in layout."""
+    directory = shard_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    for shard, text in shard_texts.items():
+        digest = hashlib.blake2b(text.encode('utf-8'), digest_size=6).hexdigest()
+        name = f"{shard:03d}-{digest}.json"
+        if not (directory / name).exists():
+            # Always through a temp file: a listed name never holds partial content
+            _write_model_text(text, "rename-only" if level == "none" else "fsync-file",
+                              directory / name)
+        layout.files[shard] = name
+    if shard_texts and level == "fsync-file-and-dir":
+        _fsync_dir(directory)
+
+
+def _remove_stale_shards(layout: ShardLayout) -> None:
+    """Delete shard files the manifest no longer lists."""
+    directory = shard_dir()
+    if not directory.exists():
+        return
+    live = set(layout.files)
+    for path in directory.iterdir():
+        if path.name not in live:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+
+# =============================================================================
+# CONCEPT FILES LAYOUT
+# =============================================================================
+#
+# student_model.json             schema_version, metadata and a
+#                                "concept_files" manifest
+# student_model.concepts/
+#   index.jsonl                  a line per concept write: its file and the
+#                                fields list and info show; the newest line
+#                                for a concept wins
+#   concepts/react-hooks-1f0c9a2b.json   one concept, {"concepts": {...}}
+#   misconceptions.json
+#   sessions.json
+#
+# A change to one concept rewrites only that concept's file, through a temp
+# file and rename, appends its index line and rewrites the small model file.
+# misconceptions.json and sessions.json are written when they change. Names
+# stay the same from save to save, so a model kept in git diffs concept by
+# concept. list and info read the index rather than every concept file; the
+# index is compacted once it holds more than twice as many lines as concepts.
+
+# Fields kept per concept in index.jsonl
+INDEX_FIELDS = ("mastery", "confidence", "last_reviewed")
+_SLUG = re.compile(r'[^a-z0-9]+')
+
+
+def concept_dir() -> Path:
+    """Directory holding the concept files for the current model file."""
+    return data_file().with_suffix('.concepts')
+
+
+def concept_file_name(key: str) -> str:
+    """A concept's file name: readable, and the same for as long as the name is."""
+    slug = _SLUG.sub('-', key.casefold()).strip('-')[:40].rstrip('-') or "concept"
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=4).hexdigest()
+    return f"{slug}-{digest}.json"
+
+
+def _index_entry(key: str, concept: Dict[str, Any]) -> Dict[str, Any]:
+    entry = {"concept": key, "file": concept_file_name(key)}
+    entry.update((field, concept.get(field)) for field in INDEX_FIELDS)
+    entry["reviews"] = len(concept.get('history') or ())
+    return entry
+
+
+class ConceptFiles:
+    """
+    The concept-files layout of a loaded model: how many lines the index
+    holds. An unwritten layout is filled in full by the next save.
+    """
+
+    def __init__(self, index_lines: int = 0, written: bool = False):
+        self.index_lines = index_lines
+        self.written = written
+
+    def manifest(self, model: Dict[str, Any]) -> Dict[str, Any]:
+        # The session count lets info answer without reading sessions.json
+        return {"directory": concept_dir().name, "sessions": len(model.get('sessions', []))}
+
+
+def read_concept_index(directory: Path) -> tuple:
+    """
+    (entries, lines): the live index entries by concept, in the order the
+    concepts were first written, and how many lines the index holds.
+    """
+    entries: Dict[str, Dict[str, Any]] = {}
+    lines = 0
+    with open(directory / "index.jsonl", 'r', encoding='utf-8') as f:
+        for lines, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by a crash; the next save rewrites its concept
+            if entry.get("removed"):
+                entries.pop(entry["concept"], None)
+            else:
+                entries[entry["concept"]] = entry
+    return entries, lines
+
+
+def _attach_concept_files(model: "TrackedModel") -> None:
+    """Replace a loaded manifest with the concepts, misconceptions and sessions it points at."""
+    manifest = model["concept_files"]
+    try:
+        directory = data_file().parent / manifest["directory"]
+    except (KeyError, TypeError) as e:
+        raise LayoutLoadError(f"Invalid concept-files manifest in {data_file()}: {e}") from e
+
+    concepts = ConceptMap()
+    try:
+        entries, lines = read_concept_index(directory)
+        for key, entry in entries.items():
+            for c_key, c_value, c_fragment, _ in _decode_shard(str(directory / "concepts" / entry["file"])):
+                dict.__setitem__(concepts, c_key, c_value)
+                if c_fragment is not None:
+                    concepts.fragments[c_key] = c_fragment
+        extra = {}
+        for section in ("misconceptions", "sessions"):
+            path = directory / f"{section}.json"
+            extra[section] = json.loads(path.read_text(encoding='utf-8')) if path.exists() else []
+    except (OSError, ValueError, KeyError) as e:
+        raise LayoutLoadError(f"Unreadable concept file in {directory}: {e}") from e
+
+    # The sections take the manifest's place, in the order a single file has them
+    sections = list(dict.items(model))
+    dict.clear(model)
+    for key, value in sections:
+        if key == "concept_files":
+            dict.__setitem__(model, "concepts", concepts)
+            for section, data in extra.items():
+                dict.__setitem__(model, section, data)
+        else:
+            dict.__setitem__(model, key, value)
+    model.fragments.pop("concept_files", None)
+    model.layout = ConceptFiles(index_lines=lines, written=True)
+
+
+def concept_summary() -> Optional[Dict[str, Any]]:
+    """
+    What list and info need, from the model file and index alone: metadata,
+    the index fields of every concept and the session count. None unless the
+    model on disk is in the concept-files layout.
+    """
+    if not concept_dir().exists():
+        return None
+    try:
+        main = json.loads(data_file().read_text(encoding='utf-8'))
+        manifest = main["concept_files"]
+        entries, _ = read_concept_index(data_file().parent / manifest["directory"])
+        return {"metadata": main["metadata"], "session_count": manifest.get("sessions", 0),
+                "concepts": {key: {field: entry.get(field) for field in INDEX_FIELDS + ("reviews",)}
+                             for key, entry in entries.items()}}
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _append_index(path: Path, entries: List[Dict[str, Any]], level: str) -> None:
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries))
+        if level in ("fsync-file", "fsync-file-and-dir"):
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def write_concept_files(model: "TrackedModel", layout: ConceptFiles, level: str):
+    """
+    Write the files of changed concepts and sections and their index lines.
+    Returns (section_fragments, concept_fragments) for the backup store.
+    """
+    concepts = model["concepts"]
+    if not isinstance(concepts, ConceptMap):
+        concepts = model["concepts"] = ConceptMap(concepts)
+    fragments = concepts.fragments
+    directory = concept_dir()
+    (directory / "concepts").mkdir(parents=True, exist_ok=True)
+    # Every file is replaced through a temp file, so none is ever left half
+    # written; the directories are fsynced once at the end
+    file_level = "rename-only" if level == "none" else level.replace("-and-dir", "")
+    full = not layout.written or "concepts" in model.dirty
+
+    def fragment(key):
+        text = fragments.get(key)
+        if text is None or key in concepts.dirty:
+            text = fragments[key] = _encode_value(concepts[key], 2)
+        return text
+
+    changed = list(concepts) if full else sorted(concepts.dirty)
+    index, removed = [], []
+    for key in changed:
+        path = directory / "concepts" / concept_file_name(key)
+        if key in concepts:
+            text = _join_object([("concepts", _join_object([(key, fragment(key))], 1))], 0)
+            _write_model_text(text + "\n", file_level, path)
+            index.append(_index_entry(key, concepts[key]))
+        else:
+            fragments.pop(key, None)
+            index.append({"concept": key, "removed": True})
+            removed.append(path)
+
+    index_path = directory / "index.jsonl"
+    if full or layout.index_lines + len(index) > 2 * len(concepts) + 16:
+        # Rewrite compacted: one line per concept, in model order
+        lines = [_index_entry(key, value) for key, value in concepts.items()]
+        _write_model_text("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in lines),
+                          file_level, index_path)
+        layout.index_lines = len(lines)
+    elif index:
+        _append_index(index_path, index, level)
+        layout.index_lines += len(index)
+
+    # Files are deleted only once the index no longer lists them
+    for path in removed:
+        path.unlink(missing_ok=True)
+    if full:
+        live = {concept_file_name(key) for key in concepts}
+        for path in (directory / "concepts").iterdir():
+            if path.name not in live:
+                path.unlink(missing_ok=True)
+
+    sections = {}
+    for key, value in model.items():
+        if key == "concepts":
+            sections[key] = None
+            continue
+        if key not in ("misconceptions", "sessions"):
+            sections[key] = _section_fragment(model, key, value)
+            continue
+        if full or key in model.dirty:
+            _write_model_text(_encode_value(value, 0) + "\n", file_level, directory / f"{key}.json")
+        # Only the backup store needs these encoded at model-file indentation
+        sections[key] = _section_fragment(model, key, value) if BACKUPS_ENABLED else None
+    if level == "fsync-file-and-dir":
+        _fsync_dir(directory / "concepts")
+        _fsync_dir(directory)
+    layout.written = True
+
+    concept_fragments = {key: fragment(key) for key in concepts} if BACKUPS_ENABLED else fragments
+    return sections, concept_fragments
+
+
+# Switching layouts
+
+LAYOUTS = ("file", "shards", "concepts")
+
+
+def layout_name(layout) -> str:
+    if isinstance(layout, ShardLayout):
+        return "shards"
+    return "concepts" if isinstance(layout, ConceptFiles) else "file"
+
+
+def layout_model_text(sections: Dict[str, Optional[str]], manifest_key: str,
+                      manifest: Dict[str, Any]) -> str:
+    """
+    The model file of a model stored in a layout: its own sections, with
+    the manifest where the concepts would be.
+    """
+    moved = ("concepts",) if manifest_key == "shards" else ("concepts", "misconceptions", "sessions")
+    items = []
+    for key, fragment in sections.items():
+        if key == "concepts":
+            items.append((manifest_key, _encode_value(manifest, 1)))
+        elif key not in moved:
+            items.append((key, fragment))
+    return _join_object(items, 0)
+
+
+def stored_layout():
+    """A fresh layout like the one of the model on disk; None for a single file."""
+    if not shard_dir().exists() and not concept_dir().exists():
+        return None
+    try:
+        main = json.loads(data_file().read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+    if isinstance(main, dict) and isinstance(main.get("shards"), dict):
+        files = main["shards"].get("files")
+        return ShardLayout(len(files)) if isinstance(files, list) and files else None
+    if isinstance(main, dict) and "concept_files" in main:
+        return ConceptFiles()
+    return None
+
+
+def keep_layout(model: "TrackedModel") -> None:
+    """Have a model replacing the one on disk (a restored backup) saved in its layout."""
+    if isinstance(model, TrackedModel) and model.layout is None:
+        model.layout = stored_layout()
+
+
+def remove_layout_files(layout) -> None:
+    """Delete the files of a layout the model has been saved out of."""
+    directory = shard_dir() if isinstance(layout, ShardLayout) else concept_dir()
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+# =============================================================================
+# BACKUP STORE
+# =============================================================================
+#
+# student_model.backups/
+#   packs/<id>.pack         blobs (one per distinct section or concept
+#                           fragment) appended back to back
+#   packs/index.jsonl       [hash, pack, offset, length] per blob
+#   bases/<id>.json         a full ordered list of concept hashes that
+#                           generations are recorded against
+#   generations/<id>.json   manifest: section hashes, its base, and the
+#                           concepts that differ from the base
+#   checkpoints/<id>.json   copies of generation manifests kept for --as-of,
+#                           thinned by event count (see TIME TRAVEL)
+#   state.json              the newest generation and the model file it saw
+#
+# Processes saving the same model append to the same pack and index; a
+# flush holds an exclusive lock on index.jsonl while it does, so each one
+# takes its offsets from the end of the pack as it finds it.
+#
+# A CLI mutation writes about six files on the hot path: the model file,
+# a line in the session log, the pack and its index (only for fragments
+# the store lacks), the generation manifest and state.json, plus a note in
+# touched.jsonl when sync is set up. Each is small and appended or
+# replaced whole; DURABILITY applies only to the model file, the rest can
+# be rebuilt or is only needed for history. A long-running process that
+# saves often should go through GroupCommitter, which folds many saves
+# into one.
+#
+# A save hashes only the concepts it re-encoded: when the model was read
+# from the file the newest generation recorded, every other concept still
+# has the hash that generation gives it. New blobs are appended to the
+# current pack and a manifest lists only what changed since its base, so a
+# generation costs the changed fragments plus a manifest of about the same
+# size. A new base is written once the changes since the last one pass an
+# eighth of the concepts, or the concepts were reordered.
+
+_GENERATION_FORMAT = "%Y%m%dT%H%M%S%f"
+_GZIP_MAGIC = b'\x1f\x8b'
+# Per store: the newest base read (bases never change once written) and the
+# pack index with the stat key of index.jsonl it was read at
+_base_cache: Dict[str, tuple] = {}
+_pack_indexes: Dict[str, tuple] = {}
+
+
+def backup_dir() -> Path:
+    """Directory holding the backup store for the current model file."""
+    return data_file().with_suffix('.backups')
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = path.with_name(path.name + '.tmp')
+    with open(temp, 'wb') as f:
+        f.write(data)
+    temp.replace(path)
+
+
+@contextlib.contextmanager
+def _exclusive(f):
+    """Hold an exclusive lock on an open file against other processes."""
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    try:
+        yield f
+    finally:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _new_name(directory: Path, suffix: str) -> str:
+    """A timestamp name for a file not yet in directory."""
+    name = stamp = datetime.now().strftime(_GENERATION_FORMAT)
+    count = 0
+    while (directory / f"{name}{suffix}").exists():
+        count += 1
+        name = f"{stamp}-{count}"
+    return name
+
+
+def _pack_entries(store: Path) -> List[list]:
+    """The pack index lines, oldest first."""
+    try:
+        lines = (store / "packs" / "index.jsonl").read_text(encoding='utf-8').splitlines()
+    except FileNotFoundError:
+        return []
+    try:
+        return json.loads("[" + ",".join(lines) + "]")
+    except ValueError:
+        # A line cut short by a crash: its blob is written again when needed
+        entries = []
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+        return entries
+
+
+def pack_index(store: Path) -> Dict[str, list]:
+    """Where each packed blob lives: hash -> [pack, offset, length]."""
+    try:
+        stat = (store / "packs" / "index.jsonl").stat()
+    except FileNotFoundError:
+        return {}
+    key = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+    cached = _pack_indexes.get(str(store))
+    if cached is None or cached[0] != key:
+        index = {entry[0]: entry[1:] for entry in _pack_entries(store) if len(entry) == 4}
+        cached = _pack_indexes[str(store)] = (key, index)
+    return cached[1]
+
+
+def _decode_blob(data: bytes) -> str:
+    if data[:2] == _GZIP_MAGIC:
+        data = gzip.decompress(data)
+    return data.decode('utf-8')
+
+
+def _loose_blob(store: Path, digest: str) -> bytes:
+    """A blob from a store written before packs, one file per blob."""
+    path = store / "objects" / digest[:2] / digest
+    if not path.exists():
+        path = path.with_name(digest + '.gz')
+    return path.read_bytes()
+
+
+def _get_blobs(store: Path, digests) -> Dict[str, str]:
+    """Read blobs by hash, opening each pack once and reading in offset order."""
+    wanted = set(digests)
+    index = pack_index(store)
+    located = sorted((*index[d], d) for d in wanted if d in index)
+    blobs = {}
+    handle, current = None, None
+    try:
+        for pack, offset, length, digest in located:
+            if pack != current:
+                if handle is not None:
+                    handle.close()
+                handle, current = open(store / "packs" / f"{pack}.pack", 'rb'), pack
+            handle.seek(offset)
+            data = handle.read(length)
+            if len(data) != length:
+                raise OSError(f"Blob {digest} is cut short in pack {pack}")
+            blobs[digest] = _decode_blob(data)
+    finally:
+        if handle is not None:
+            handle.close()
+    for digest in wanted - blobs.keys():
+        blobs[digest] = _decode_blob(_loose_blob(store, digest))
+    return blobs
+
+
+def _get_blob(store: Path, digest: str) -> str:
+    return _get_blobs(store, [digest])[digest]
+
+
+class _BlobWriter:
+    """
+    Collects the new blobs of one generation and appends them to the
+    store's current pack. known holds hashes that need no writing.
+    """
+
+    def __init__(self, store: Path, state: Dict[str, Any], known: set):
+        self.store = store
+        self.state = state
+        self.known = known
+        self.pending: Dict[str, bytes] = {}
+
+    def put(self, text: str) -> str:
+        """Queue a fragment unless it is already stored. Returns its hash."""
+        data = text.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        if digest not in self.known and digest not in self.pending:
+            self.pending[digest] = gzip.compress(data) if BACKUP_COMPRESS else data
+        return digest
+
+    def flush(self) -> None:
+        """Append the queued blobs, then their index lines."""
+        if not self.pending:
+            return
+        packs = self.store / "packs"
+        packs.mkdir(parents=True, exist_ok=True)
+        index = packs / "index.jsonl"
+        with open(index, 'a+b') as index_file, _exclusive(index_file):
+            pack = self.state.get("pack")
+            path = packs / f"{pack}.pack"
+            if not pack or not path.exists() or path.stat().st_size >= BACKUP_PACK_BYTES:
+                pack = self.state["pack"] = _new_name(packs, ".pack")
+                path = packs / f"{pack}.pack"
+            lines = []
+            with open(path, 'ab') as f:
+                # Not tell() at open: another process may have appended since
+                offset = f.seek(0, os.SEEK_END)
+                for digest, data in self.pending.items():
+                    f.write(data)
+                    lines.append(json.dumps([digest, pack, offset, len(data)]) + "\n")
+                    offset += len(data)
+            if index_file.seek(0, os.SEEK_END):
+                index_file.seek(-1, os.SEEK_END)
+                if index_file.read(1) != b"\n":
+                    index_file.write(b"\n")    # finish a line a crash cut short
+            index_file.write("".join(lines).encode('utf-8'))
+        self.known.update(self.pending)
+        self.pending = {}
+
+
+def _read_base(store: Path, base_id: str) -> tuple:
+    """A base's concept (names, hashes)."""
+    cached = _base_cache.get(str(store))
+    if cached is None or cached[0] != base_id:
+        data = json.loads((store / "bases" / f"{base_id}.json").read_text(encoding='utf-8'))
+        cached = _base_cache[str(store)] = (base_id, data["names"], data["hashes"])
+    return cached[1], cached[2]
+
+
+def manifest_concepts(manifest: Dict[str, Any], store: Optional[Path] = None) -> List[list]:
+    """A manifest's ordered [name, hash] pairs, resolved against its base."""
+    if "base" not in manifest:
+        return manifest.get("concepts", [])     # recorded before bases
+    names, hashes = _read_base(store or backup_dir(), manifest["base"])
+    changed = dict(manifest["concepts"])
+    removed = set(manifest["removed"])
+    items = [[name, changed.pop(name, digest)]
+             for name, digest in zip(names, hashes) if name not in removed]
+    # What is left was added after the base, in model order
+    return items + [[name, digest] for name, digest in changed.items()]
+
+
+def _manifest_hashes(manifest: Dict[str, Any]) -> set:
+    """Blobs a manifest names itself (its base's are listed by the base)."""
+    hashes = {h for _, h in manifest.get("sections", []) if h}
+    hashes.update(h for _, h in manifest.get("concepts", []))
+    return hashes
+
+
+def _generation_time(gen_id: str) -> datetime:
+    return datetime.strptime(gen_id.split('-')[0], _GENERATION_FORMAT)
+
+
+def list_generations(store: Optional[Path] = None, kind: str = "generations") -> List[str]:
+    """Generation IDs, oldest first. kind="checkpoints" lists checkpoints."""
+    gen_dir = (store or backup_dir()) / kind
+    if not gen_dir.exists():
+        return []
+    return sorted(p.stem for p in gen_dir.glob('*.json'))
+
+
+def read_generation(gen_id: str, store: Optional[Path] = None,
+                    kind: str = "generations") -> Dict[str, Any]:
+    """Load a generation (or checkpoint) manifest."""
+    path = (store or backup_dir()) / kind / f"{gen_id}.json"
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def generation_text(gen_id: str, store: Optional[Path] = None,
+                    kind: str = "generations") -> str:
+    """Rebuild the exact model file text recorded by a generation."""
+    store = store or backup_dir()
+    manifest = read_generation(gen_id, store, kind)
+    concepts = manifest_concepts(manifest, store) \
+        if any(digest is None for _, digest in manifest["sections"]) else []
+    blobs = _get_blobs(store, [d for _, d in manifest["sections"] if d] + [d for _, d in concepts])
+    items = []
+    for key, digest in manifest["sections"]:
+        if key == "concepts" and digest is None:
+            items.append((key, _join_object([(name, blobs[h]) for name, h in concepts], 1)))
+        else:
+            items.append((key, blobs[digest]))
+    return _join_object(items, 0)
+
+
+def _read_backup_state(store: Path) -> Dict[str, Any]:
+    state_file = store / "state.json"
+    return json.loads(state_file.read_text()) if state_file.exists() else {}
+
+
+def _write_backup_state(store: Path, state: Dict[str, Any]) -> None:
+    _write_atomic(store / "state.json", json.dumps(state).encode())
+
+
+def _record_concepts(manifest: Dict[str, Any], gen_id: str, store: Path, writer: _BlobWriter,
+                     fragments: Dict[str, str], last: Optional[Dict[str, Any]],
+                     changed: Optional[List[str]]) -> None:
+    """
+    Add the concepts to a manifest as changes against the last generation's
+    base, or write a new base. With changed given, last is trusted for every
+    concept not in it.
+    """
+    base = None
+    if last is not None and "base" in last:
+        try:
+            base = _read_base(store, last["base"])
+        except (OSError, ValueError, KeyError):
+            base = None
+
+    names = list(fragments)
+    lookup: Dict[str, str] = {}
+    if base is not None:
+        base_names, base_hashes = base
+        lookup = dict(zip(base_names, base_hashes))
+        if changed is not None:
+            writer.known.update(base_hashes)
+            delta = {name: h for name, h in last["concepts"] if name in fragments}
+            for name in changed:
+                delta[name] = writer.put(fragments[name])
+        else:
+            delta = {}
+            for name, text in fragments.items():
+                digest = writer.put(text)
+                if lookup.get(name) != digest:
+                    delta[name] = digest
+        kept = [name for name in base_names if name in fragments]
+        removed = [name for name in base_names if name not in fragments]
+        # Base concepts must still come first and in order, additions after
+        if names[:len(kept)] == kept and \
+                len(delta) + len(removed) <= max(BACKUP_REBASE_MIN, len(names) // 8):
+            tail = names[len(kept):]
+            for name in tail:
+                if name not in delta:
+                    delta[name] = writer.put(fragments[name])
+            manifest.update(base=last["base"], removed=removed,
+                            concepts=[[n, h] for n, h in delta.items() if n in lookup]
+                            + [[n, delta[n]] for n in tail])
+            return
+        lookup.update(delta)
+
+    hashes = [lookup.get(name) or writer.put(fragments[name]) for name in names]
+    _write_atomic(store / "bases" / f"{gen_id}.json",
+                  json.dumps({"names": names, "hashes": hashes}, ensure_ascii=False).encode('utf-8'))
+    _base_cache[str(store)] = (gen_id, names, hashes)
+    manifest.update(base=gen_id, removed=[], concepts=[])
+
+
+def snapshot_backup(sections: Dict[str, str],
+                    concept_fragments: Optional[Dict[str, str]],
+                    events: int = 0, checkpoint: bool = False,
+                    changed: Optional[List[str]] = None,
+                    source: Optional[tuple] = None,
+                    written: Optional[tuple] = None) -> str:
+    """
+    Record a generation from freshly saved fragments. Returns its ID.
+    events is the number of log events the save flushes; the generation is
+    also kept as a checkpoint when checkpoint is True, when none exists yet,
+    or once CHECKPOINT_EVERY events have been logged since the last one.
+    changed names the concepts this save re-encoded, source and written
+    are the stat keys of the model file before and after it: when source
+    is the file the newest generation recorded, only changed concepts are
+    hashed.
+    """
+    store = backup_dir()
+    state = _read_backup_state(store)
+    head = state.get("head") or {}
+    last = None
+    if head.get("generation"):
+        try:
+            last = read_generation(head["generation"], store)
+        except (OSError, ValueError):
+            last = None
+    trusted = (last is not None and changed is not None and source is not None
+               and head.get("file") == list(source))
+
+    if trusted:
+        known = _manifest_hashes(last)
+    else:
+        known = set(pack_index(store))
+    writer = _BlobWriter(store, state, known)
+    gen_id = _new_name(store / "generations", ".json")
+    manifest = {
+        "created": datetime.now().isoformat(),
+        "compressed": BACKUP_COMPRESS,
+        # The save's own events are already logged: replay starts after them
+        "log": log_position(),
+        "sections": [],
+    }
+    for key, fragment in sections.items():
+        if key == "concepts" and concept_fragments is not None:
+            manifest["sections"].append([key, None])
+            manifest["count"] = len(concept_fragments)
+            _record_concepts(manifest, gen_id, store, writer, concept_fragments,
+                             last, changed if trusted else None)
+        else:
+            manifest["sections"].append([key, writer.put(fragment)])
+    writer.flush()
+
+    data = json.dumps(manifest, ensure_ascii=False).encode('utf-8')
+    _write_atomic(store / "generations" / f"{gen_id}.json", data)
+
+    since = state.get("events_since_checkpoint")
+    logged = state["events_logged"] = state.get("events_logged", 0) + events
+    if checkpoint or since is None or since + events >= CHECKPOINT_EVERY:
+        _write_atomic(store / "checkpoints" / f"{gen_id}.json", data)
+        state["events_since_checkpoint"] = 0
+        # How far into the log it is, and whether events can't replay past it
+        state.setdefault("checkpoints", {})[gen_id] = [logged, checkpoint or since is None]
+    else:
+        state["events_since_checkpoint"] = since + events
+    state["head"] = {"generation": gen_id, "file": list(written) if written else None}
+    _write_backup_state(store, state)
+
+    prune_backups(store)
+    return gen_id
+
+
+def _retained_generations(gen_ids: List[str], now: datetime,
+                          keep_recent: int = None) -> set:
+    """Apply the recent/hourly/daily retention policy."""
+    keep_recent = BACKUP_KEEP_RECENT if keep_recent is None else keep_recent
+    keep = set(gen_ids[-keep_recent:]) if keep_recent else set()
+    hours, days = set(), set()
+    for gen_id in reversed(gen_ids):
+        created = _generation_time(gen_id)
+        age = now - created
+        hour = created.strftime('%Y%m%d%H')
+        day = created.strftime('%Y%m%d')
+        if age <= timedelta(hours=BACKUP_KEEP_HOURLY) and hour not in hours:
+            hours.add(hour)
+            keep.add(gen_id)
+        if age <= timedelta(days=BACKUP_KEEP_DAILY) and day not in days:
+            days.add(day)
+            keep.add(gen_id)
+    return keep
+
+
+def _retained_checkpoints(checkpoint_ids: List[str], marks: Dict[str, list]) -> set:
+    """
+    Apply the checkpoint retention policy (see TIME TRAVEL) to checkpoints
+    oldest first; marks holds [events logged, forced] for each.
+    """
+    keep = set(checkpoint_ids[:1])
+    if CHECKPOINT_KEEP_RECENT:
+        keep.update(checkpoint_ids[-CHECKPOINT_KEEP_RECENT:])
+    last = None
+    for i, gen_id in enumerate(checkpoint_ids):
+        mark = marks.get(gen_id)
+        following = marks.get(checkpoint_ids[i + 1]) if i + 1 < len(checkpoint_ids) else None
+        # Unknown and forced ones stay; others once dropping them would
+        # leave more than CHECKPOINT_KEEP_EVERY events to the next kept one
+        if (gen_id in keep or mark is None or mark[1] or last is None or following is None
+                or following[0] - last > CHECKPOINT_KEEP_EVERY):
+            keep.add(gen_id)
+            last = mark[0] if mark is not None else None
+    return keep
+
+
+def prune_backups(store: Optional[Path] = None, keep_recent: int = None,
+                  collect: bool = False) -> Dict[str, int]:
+    """
+    Delete generations outside the retention policy, and checkpoints
+    outside theirs (see TIME TRAVEL). Unreferenced blobs are collected
+    every BACKUP_GC_EVERY removals, or immediately when collect is True.
+    """
+    store = store or backup_dir()
+    now = datetime.now()
+    gen_ids = list_generations(store)
+    keep = _retained_generations(gen_ids, now, keep_recent)
+    removed = 0
+    for gen_id in gen_ids:
+        if gen_id not in keep:
+            (store / "generations" / f"{gen_id}.json").unlink()
+            removed += 1
+
+    state = _read_backup_state(store)
+    checkpoint_ids = list_generations(store, "checkpoints")
+    marks = state.get("checkpoints", {})
+    keep = _retained_checkpoints(checkpoint_ids, marks)
+    removed_checkpoints = 0
+    for gen_id in checkpoint_ids:
+        if gen_id not in keep:
+            (store / "checkpoints" / f"{gen_id}.json").unlink()
+            removed_checkpoints += 1
+    removed += removed_checkpoints
+    if marks:
+        state["checkpoints"] = {gen_id: mark for gen_id, mark in marks.items() if gen_id in keep}
+
+    pending = state.get("removed_since_gc", 0) + removed
+    result = {"generations_removed": removed - removed_checkpoints,
+              "checkpoints_removed": removed_checkpoints, "blobs_removed": 0, "bytes_freed": 0}
+
+    if collect or pending >= BACKUP_GC_EVERY:
+        result.update(_collect_blobs(store, state))
+        pending = 0
+    if removed or collect:
+        state["removed_since_gc"] = pending
+        _write_backup_state(store, state)
+    return result
+
+
+def _collect_blobs(store: Path, state: Dict[str, Any]) -> Dict[str, int]:
+    """
+    Mark and sweep blobs and bases no generation or checkpoint references.
+    Packs at least half garbage are rewritten with their live blobs.
+    """
+    live, bases = set(), set()
+    for kind in ("generations", "checkpoints"):
+        for gen_id in list_generations(store, kind):
+            manifest = read_generation(gen_id, store, kind)
+            live |= _manifest_hashes(manifest)
+            if "base" in manifest:
+                bases.add(manifest["base"])
+    for base_id in bases:
+        live.update(_read_base(store, base_id)[1])
+
+    removed = freed = 0
+    if (store / "bases").exists():
+        for path in (store / "bases").glob('*.json'):
+            if path.stem not in bases:
+                freed += path.stat().st_size
+                path.unlink()
+    objects = store / "objects"
+    if objects.exists():
+        for path in objects.glob('*/*'):
+            if path.name.split('.')[0] not in live:
+                freed += path.stat().st_size
+                path.unlink()
+                removed += 1
+
+    packs = store / "packs"
+    if packs.exists():
+        index = pack_index(store)
+        kept = {digest: where for digest, where in index.items() if digest in live}
+        removed += len(index) - len(kept)
+        live_bytes: Dict[str, int] = {}
+        for pack, _, length in kept.values():
+            live_bytes[pack] = live_bytes.get(pack, 0) + length
+        rewrite = [path for path in packs.glob('*.pack')
+                   if live_bytes.get(path.stem, 0) * 2 <= path.stat().st_size]
+        if rewrite or len(kept) < len(index):
+            moved = {}
+            for path in rewrite:
+                with open(path, 'rb') as f:
+                    for digest, (pack, offset, length) in kept.items():
+                        if pack == path.stem:
+                            f.seek(offset)
+                            moved[digest] = f.read(length)
+                freed += path.stat().st_size
+            if moved:
+                pack = _new_name(packs, ".pack")
+                offset = 0
+                with open(packs / f"{pack}.pack", 'wb') as f:
+                    for digest, data in moved.items():
+                        f.write(data)
+                        kept[digest] = [pack, offset, len(data)]
+                        offset += len(data)
+                freed -= offset
+                state["pack"] = pack
+            lines = "".join(json.dumps([digest, *where]) + "\n" for digest, where in kept.items())
+            _write_atomic(packs / "index.jsonl", lines.encode('utf-8'))
+            # Only now that the index no longer points into them
+            for path in rewrite:
+                path.unlink()
+    _base_cache.pop(str(store), None)
+    return {"blobs_removed": removed, "bytes_freed": freed}
+
+
+def store_usage(store: Path) -> tuple:
+    """(blobs, bytes) held by the store's packs, bases and loose objects."""
+    blobs = len(pack_index(store))
+    size = 0
+    for pattern in ('packs/*.pack', 'bases/*.json', 'objects/*/*'):
+        for path in store.glob(pattern):
+            size += path.stat().st_size
+            blobs += pattern.startswith('objects')
+    return blobs, size
+
+
+def resolve_generation(ref: str, store: Optional[Path] = None) -> Optional[str]:
+    """Resolve 'latest', a full ID or a unique ID prefix to a generation ID."""
+    gen_ids = list_generations(store)
+    if not gen_ids:
+        return None
+    if ref == "latest":
+        return gen_ids[-1]
+    matches = [g for g in gen_ids if g.startswith(ref)]
+    return matches[0] if len(matches) == 1 else None
+
+
+def latest_backup() -> Optional[tuple]:
+    """
+    The newest valid backup as (model, source): a legacy .json.backup file
+    if one is present, otherwise the backup store's generations, newest first.
+    """
+    candidates = []
+    legacy = data_file().with_suffix('.json.backup')
+    if legacy.exists():
+        candidates.append((legacy.name, lambda: legacy.read_text(encoding='utf-8')))
+    for gen_id in reversed(list_generations()):
+        candidates.append((f"generation {gen_id}",
+                           lambda gen_id=gen_id: generation_text(gen_id)))
+
+    for source, read_text in candidates:
+        try:
+            model = decode_model(read_text())
+        except (OSError, ValueError, KeyError):
+            continue
+        if validate_model(model):
+            return model, source
+    return None
+
+
+def _restore_latest_backup() -> Optional[Dict[str, Any]]:
+    """Replace the model file with the newest valid backup, if any."""
+    if not data_file().with_suffix('.json.backup').exists() and not list_generations():
+        return None
+
+    say(f"   Attempting to restore from backup...")
+    found = latest_backup()
+    if found is None:
+        return None
+    model, _ = found
+    say("✅ Restored from backup successfully")
+    keep_layout(model)
+    save_model(model, checkpoint=True)  # Save the good backup as main file
+    return model
+
+
+# =============================================================================
+# CORRUPTION SALVAGE
+# =============================================================================
+#
+# A truncated or partly overwritten file still holds many complete records.
+# The salvage scanner decodes member by member; when a record is damaged it
+# skips forward to the next line that starts a record at the indentation
+# save_model writes, so the whole file is scanned once, front to back.
+
+_TOP_MEMBER = re.compile(r'\n  "')
+_NESTED_MEMBER = re.compile(r'\n    "')
+_NESTED_ITEM = re.compile(r'\n    \{')
+
+
+def _read_member_key(text: str, idx: int) -> tuple:
+    """Read '"key":' at idx. Returns (key, index of the value)."""
+    if text[idx:idx + 1] != '"':
+        raise json.JSONDecodeError("Expecting property name", text, idx)
+    key, idx = json.decoder.scanstring(text, idx + 1)
+    idx = _skip_ws(text, idx)
+    if text[idx:idx + 1] != ':':
+        raise json.JSONDecodeError("Expecting ':' delimiter", text, idx)
+    return key, _skip_ws(text, idx + 1)
+
+
+def _resync(text: str, idx: int, inner) -> tuple:
+    """
+    Find where scanning resumes after damage at idx.
+    Returns (position, True) for the next record of the current container,
+    or (position, False) when the next top-level member comes first.
+    """
+    top = _TOP_MEMBER.search(text, idx + 1)
+    nested = inner.search(text, idx + 1) if inner is not None else None
+    if nested and (top is None or nested.start() < top.start()):
+        return nested.start() + 1, True
+    return (top.start() + 1 if top else len(text)), False
+
+
+def _salvage_container(text: str, idx: int, section: str, closing: str,
+                       keyed: bool, out, damaged: List[Dict[str, Any]]) -> int:
+    """Recover complete members of the object/array body starting at idx."""
+    inner = _NESTED_MEMBER if keyed else _NESTED_ITEM
+    while True:
+        idx = _skip_ws(text, idx)
+        char = text[idx:idx + 1]
+        if char == '':
+            return idx
+        if char == closing:
+            return idx + 1
+        if char == ',':
+            idx += 1
+            continue
+
+        name = None
+        try:
+            if keyed:
+                name, start = _read_member_key(text, idx)
+            else:
+                start = idx
+            value, end = _DECODER.raw_decode(text, start)
+        except json.JSONDecodeError:
+            damaged.append({"section": section, "name": name, "offset": idx})
+            idx, same_container = _resync(text, idx, inner)
+            if not same_container:
+                return idx
+            continue
+
+        if keyed:
+            out[name] = value
+        else:
+            out.append(value)
+        idx = end
+
+
+def salvage_text(text: str) -> tuple:
+    """
+    Recover every complete section, concept and list item from damaged
+    model JSON in one forward pass.
+    Returns (sections, damaged) where damaged lists skipped records.
+    """
+    sections: Dict[str, Any] = {}
+    damaged: List[Dict[str, Any]] = []
+    idx = _skip_ws(text, 0)
+    if text[idx:idx + 1] != '{':
+        damaged.append({"section": None, "name": None, "offset": idx})
+        return sections, damaged
+    idx += 1
+
+    while True:
+        idx = _skip_ws(text, idx)
+        char = text[idx:idx + 1]
+        if char in ('', '}'):
+            return sections, damaged
+        if char == ',':
+            idx += 1
+            continue
+
+        key = None
+        try:
+            key, start = _read_member_key(text, idx)
+            opening = text[start:start + 1]
+            if key == "concepts" and opening == '{':
+                sections[key] = {}
+                idx = _salvage_container(text, start + 1, key, '}', True,
+                                         sections[key], damaged)
+                continue
+            if key in ("misconceptions", "sessions") and opening == '[':
+                sections[key] = []
+                idx = _salvage_container(text, start + 1, key, ']', False,
+                                         sections[key], damaged)
+                continue
+            sections[key], idx = _DECODER.raw_decode(text, start)
+        except json.JSONDecodeError:
+            damaged.append({"section": key, "name": None, "offset": idx})
+            idx, _ = _resync(text, idx, None)
+
+
+def salvage_model(text: str) -> tuple:
+    """
+    Rebuild a model from damaged JSON, filling gaps from the newest backup.
+    Salvaged records win over backup records since they are newer.
+    Returns (model, report).
+    """
+    sections, damaged = salvage_text(text)
+    found = latest_backup()
+    backup, source = found if found else (None, None)
+
+    model = get_default_model()
+    for key, value in sections.items():
+        if key not in ("concepts", "misconceptions", "sessions", "metadata"):
+            model[key] = value
+
+    metadata = sections.get("metadata")
+    if isinstance(metadata, dict) and all(k in metadata for k in ("created", "last_updated")):
+        model["metadata"] = metadata
+    elif backup is not None:
+        model["metadata"] = dict(backup["metadata"])
+
+    concepts = {k: v for k, v in sections.get("concepts", {}).items() if isinstance(v, dict)}
+    model["concepts"] = concepts
+    recovered_names = {name.casefold() for name in concepts}
+    from_backup = []
+    if backup is not None:
+        for name, record in backup["concepts"].items():
+            if name.casefold() not in recovered_names:
+                concepts[name] = record
+                from_backup.append(name)
+
+    misconceptions = [m for m in sections.get("misconceptions", []) if isinstance(m, dict)]
+    recovered_misconceptions = len(misconceptions)
+    seen = {(str(m.get("concept", "")).casefold(), str(m.get("belief", "")).casefold())
+            for m in misconceptions}
+    if backup is not None:
+        for m in backup.get("misconceptions", []):
+            key = (str(m.get("concept", "")).casefold(), str(m.get("belief", "")).casefold())
+            if key not in seen:
+                misconceptions.append(m)
+                seen.add(key)
+    model["misconceptions"] = misconceptions
+
+    if "sessions" in sections:
+        model["sessions"] = sections["sessions"]
+    elif backup is not None:
+        model["sessions"] = backup.get("sessions", [])
+
+    all_names = {name.casefold() for name in concepts}
+    lost = [d for d in damaged
+            if d["section"] != "concepts" or not d["name"]
+            or d["name"].casefold() not in all_names]
+
+    report = {
+        "recovered_concepts": len(sections.get("concepts", {})),
+        "recovered_misconceptions": recovered_misconceptions,
+        "from_backup": from_backup,
+        "backup_source": source,
+        "damaged": damaged,
+        "lost": lost,
+    }
+    return model, report
+
+
+def print_salvage_report(report: Dict[str, Any]) -> None:
+    say(f"🩹 Salvaged {report['recovered_concepts']} concepts and "
+          f"{report['recovered_misconceptions']} misconceptions from the damaged file")
+    if report["from_backup"]:
+        names = ", ".join(report["from_backup"][:10])
+        more = len(report["from_backup"]) - 10
+        say(f"   Restored {len(report['from_backup'])} concepts from {report['backup_source']}: "
+              f"{names}{f' (+{more} more)' if more > 0 else ''}")
+    if report["damaged"]:
+        say(f"   Skipped {len(report['damaged'])} damaged records")
+    for item in report["lost"]:
+        if item["name"]:
+            what = f"concept '{item['name']}'"
+        else:
+            what = f"an unnamed {item['section'] or 'top-level'} record"
+        say(f"   ⚠️  Lost {what} (damaged at offset {item['offset']}, not in any backup)")
+
+
+def _salvage_data_file(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Salvage the model file after a decode error. Keeps the damaged original as
+    .json.corrupt and saves the rebuilt model. None if nothing was salvageable.
+    """
+    model, report = salvage_model(text)
+    if not report["recovered_concepts"] and not report["recovered_misconceptions"]:
+        return None
+
+    print_salvage_report(report)
+    corrupt = data_file().with_suffix('.json.corrupt')
+    shutil.copy(data_file(), corrupt)
+    say(f"   Damaged original kept at {corrupt}")
+    save_model(model, checkpoint=True)
+    return model
+
+
+# =============================================================================
+# STREAMING VALIDATION
+# =============================================================================
+#
+# The validator never holds the whole model in memory: it walks the
+# top-level object and the concepts/misconceptions/sessions containers
+# token by token, and decodes one record at a time. References to concepts
+# not seen yet go into a deferred table that is settled as names appear.
+
+CONFIDENCE_LEVELS = ('low', 'medium', 'high')
+_IDENTIFIER = re.compile(r'[A-Za-z_][A-Za-z0-9_]*\Z')
+
+
+class JSONStreamError(ValueError):
+    """Malformed JSON found while streaming, with its absolute offset."""
+
+    def __init__(self, msg: str, offset: int):
+        super().__init__(f"{msg} (offset {offset})")
+        self.msg = msg
+        self.offset = offset
+
+
+_NUMBER_CHARS = frozenset("0123456789+-.eE")
+
+
+class JSONStream:
+    """
+    Incremental reader over a text file object.
+    Memory use is bounded by the chunk size plus the largest single value
+    read with read_value(), independent of file size.
+    """
+
+    def __init__(self, fp, chunk_size: int = 1 << 16):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.base = 0  # file offset of buf[0]
+        self.eof = False
+
+    @property
+    def offset(self) -> int:
+        return self.base + self.pos
+
+    def _fill(self) -> bool:
+        """Read another chunk, dropping consumed text. False at EOF."""
+        if self.eof:
+            return False
+        chunk = self.fp.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        if self.pos:
+            self.base += self.pos
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        self.buf += chunk
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character, or '' at end of input."""
+        while True:
+            self.pos = _skip_ws(self.buf, self.pos)
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            found = repr(self.buf[self.pos]) if self.pos < len(self.buf) else "end of input"
+            raise JSONStreamError(f"Expecting '{char}', found {found}", self.offset)
+        self.pos += 1
+
+    def read_key(self) -> str:
+        """Read an object key and its ':' separator."""
+        if self.peek() != '"':
+            raise JSONStreamError("Expecting property name enclosed in double quotes",
+                                  self.offset)
+        key = self.read_value()
+        self.expect(':')
+        return key
+
+    def read_value(self) -> Any:
+        """Decode one complete JSON value."""
+        char = self.peek()
+        if char and char in "-0123456789":
+            # Buffer the whole number first: cut at "1." or "1e" it would
+            # decode as just the digits before the cut
+            length = 0
+            while True:
+                while self.pos + length < len(self.buf) and self.buf[self.pos + length] in _NUMBER_CHARS:
+                    length += 1
+                if self.pos + length < len(self.buf) or not self._fill():
+                    break
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                # A value cut at the buffer edge just needs more input
+                near_end = e.pos >= len(self.buf) - 8 or e.msg.startswith("Unterminated")
+                if near_end and self._fill():
+                    continue
+                raise JSONStreamError(e.msg, self.base + e.pos)
+            self.pos = end
+            return value
+
+    def items(self):
+        """Iterate (key, stream) over an object; the caller consumes each value."""
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            yield self.read_key()
+            char = self.peek()
+            self.pos += 1
+            if char == '}':
+                return
+            if char != ',':
+                self.pos -= 1
+                raise JSONStreamError("Expecting ',' delimiter", self.offset)
+
+    def elements(self):
+        """Iterate over an array; the caller consumes each element."""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        index = 0
+        while True:
+            yield index
+            index += 1
+            char = self.peek()
+            self.pos += 1
+            if char == ']':
+                return
+            if char != ',':
+                self.pos -= 1
+                raise JSONStreamError("Expecting ',' delimiter", self.offset)
+
+
+def json_path(*parts) -> str:
+    """Format a JSONPath like $.concepts["React Hooks"].mastery"""
+    path = "$"
+    for part in parts:
+        if isinstance(part, int):
+            path += f"[{part}]"
+        elif _IDENTIFIER.match(part):
+            path += f".{part}"
+        else:
+            path += f"[{_encode_key(part)}]"
+    return path
+
+
+def _parse_timestamp(value: Any) -> Optional[datetime]:
+    if not isinstance(value, str):
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+class ModelValidator:
+    """
+    One-pass invariant checker. Feed records in file order, then call
+    finish() to settle deferred references. Issues are dicts with
+    path, severity ('error' or 'warning') and message.
+    """
+
+    def __init__(self):
+        self.issues: List[Dict[str, str]] = []
+        self.seen_keys = set()
+        self.concepts = {}  # casefolded name -> name
+        self.deferred: Dict[str, List[tuple]] = {}  # casefolded name -> [(parts, message, severity)]
+        self.ids = set()
+
+    def issue(self, parts: tuple, message: str, severity: str = "error") -> None:
+        """Record an issue. Paths travel as parts and are formatted only here."""
+        self.issues.append({"path": json_path(*parts), "severity": severity,
+                            "message": message})
+
+    def _check_timestamp(self, value, path: tuple, required=True):
+        if value is None and not required:
+            return None
+        parsed = _parse_timestamp(value)
+        if parsed is None:
+            self.issue(path, f"Malformed timestamp: {value!r}")
+        return parsed
+
+    def _refer(self, name: str, path: tuple, message: str, severity: str) -> None:
+        """Check a concept reference now, or once the name has been seen."""
+        if not isinstance(name, str):
+            self.issue(path, f"Concept reference must be a string, got {type(name).__name__}")
+        elif name.casefold() not in self.concepts:
+            self.deferred.setdefault(name.casefold(), []).append((path, message, severity))
+
+    def section(self, key: str) -> None:
+        self.seen_keys.add(key)
+
+    def metadata(self, value: Any) -> None:
+        if not isinstance(value, dict):
+            self.issue(("metadata",), "metadata must be an object")
+            return
+        for field in ("created", "last_updated"):
+            if field not in value:
+                self.issue(("metadata",), f"Missing required field '{field}'")
+            else:
+                self._check_timestamp(value[field], ("metadata", field))
+
+    def concept(self, name: str, record: Any) -> None:
+        folded = name.casefold()
+        if folded in self.concepts:
+            self.issue(("concepts", name),
+                       f"Duplicate of concept '{self.concepts[folded]}' (names are case-insensitive)")
+        self.concepts[folded] = name
+        self.deferred.pop(folded, None)
+
+        if not isinstance(record, dict):
+            self.issue(("concepts", name), "Concept record must be an object")
+            return
+
+        mastery = record.get("mastery")
+        if isinstance(mastery, bool) or not isinstance(mastery, (int, float)):
+            self.issue(("concepts", name, "mastery"),
+                       f"Mastery must be a number, got {mastery!r}")
+        elif not 0 <= mastery <= 100:
+            self.issue(("concepts", name, "mastery"),
+                       f"Mastery out of range 0-100: {mastery}")
+
+        if record.get("confidence") not in CONFIDENCE_LEVELS:
+            self.issue(("concepts", name, "confidence"),
+                       f"Confidence must be low, medium or high, got {record.get('confidence')!r}")
+
+        if "id" in record:
+            self._check_id(record["id"], ("concepts", name, "id"))
+        for field, ids_field in ENTRY_ID_FIELDS.items():
+            ids = record.get(ids_field)
+            if ids is None:
+                continue
+            items = record.get(field)
+            if not isinstance(ids, list) or len(ids) > (len(items) if isinstance(items, list) else 0):
+                self.issue(("concepts", name, ids_field), f"{ids_field} must be a list no longer than {field}")
+                continue
+            for i, value in enumerate(ids):
+                self._check_id(value, ("concepts", name, ids_field, i))
+
+        first = self._check_timestamp(record.get("first_encountered"),
+                                      ("concepts", name, "first_encountered"))
+        last = self._check_timestamp(record.get("last_reviewed"),
+                                     ("concepts", name, "last_reviewed"))
+        if first and last and first > last:
+            self.issue(("concepts", name, "last_reviewed"),
+                       "last_reviewed is earlier than first_encountered", "warning")
+
+        for field in ("struggles", "breakthroughs", "related_concepts"):
+            items = record.get(field, [])
+            if not isinstance(items, list):
+                self.issue(("concepts", name, field), f"{field} must be a list")
+                continue
+            for i, item in enumerate(items):
+                if not isinstance(item, str):
+                    self.issue(("concepts", name, field, i),
+                               f"Expected a string, got {type(item).__name__}")
+
+        related = record.get("related_concepts", [])
+        if isinstance(related, list):
+            for i, target in enumerate(related):
+                if not isinstance(target, str):
+                    continue
+                path = ("concepts", name, "related_concepts", i)
+                if target.casefold() == folded:
+                    self.issue(path, "Concept is linked to itself", "warning")
+                else:
+                    self._refer(target, path, f"Related concept '{target}' is not tracked", "warning")
+
+        history = record.get("history")
+        if history is not None:
+            self._check_history(history, ("concepts", name, "history"))
+
+    def _check_id(self, value: Any, path: tuple) -> None:
+        if not isinstance(value, str) or not value:
+            self.issue(path, f"ID must be a non-empty string, got {value!r}")
+        elif value in self.ids:
+            self.issue(path, f"Duplicate ID {value}")
+        else:
+            self.ids.add(value)
+
+    def _check_history(self, history: Any, path: tuple) -> None:
+        if not isinstance(history, list):
+            self.issue(path, "history must be a list")
+            return
+        mastery = 0
+        for i, entry in enumerate(history):
+            if (not isinstance(entry, list) or len(entry) != 3
+                    or not all(isinstance(v, int) and not isinstance(v, bool) for v in entry)):
+                self.issue(path + (i,), "History entries must be [time, mastery, confidence] integers")
+                return
+            if i and entry[0] < 0:
+                self.issue(path + (i,), "History goes back in time", "warning")
+            mastery += entry[1]
+            if not 0 <= mastery <= 100:
+                self.issue(path + (i,), f"History mastery out of range 0-100: {mastery}")
+            if not 0 <= entry[2] < len(CONFIDENCE_LEVELS):
+                self.issue(path + (i,), f"Unknown confidence code {entry[2]}")
+
+    def misconception(self, index: int, record: Any) -> None:
+        path = ("misconceptions", index)
+        if not isinstance(record, dict):
+            self.issue(path, "Misconception must be an object")
+            return
+        for field in ("belief", "correction"):
+            if not isinstance(record.get(field), str) or not record.get(field):
+                self.issue(("misconceptions", index, field), f"Missing {field}")
+        if "id" in record:
+            self._check_id(record["id"], ("misconceptions", index, "id"))
+        if "concept" not in record:
+            self.issue(path, "Missing concept")
+        else:
+            self._refer(record["concept"], ("misconceptions", index, "concept"),
+                        f"Misconception refers to missing concept '{record['concept']}'", "error")
+
+        self._check_timestamp(record.get("date_identified"),
+                              ("misconceptions", index, "date_identified"))
+        resolved = record.get("resolved")
+        if not isinstance(resolved, bool):
+            self.issue(("misconceptions", index, "resolved"), "resolved must be true or false")
+        elif resolved:
+            self._check_timestamp(record.get("date_resolved"),
+                                  ("misconceptions", index, "date_resolved"))
+        elif record.get("date_resolved") is not None:
+            self.issue(("misconceptions", index, "date_resolved"),
+                       "Unresolved misconception has a resolution date", "warning")
+
+    def session(self, index: int, record: Any) -> None:
+        if not isinstance(record, dict):
+            self.issue(("sessions", index), "Session must be an object")
+
+    def finish(self) -> List[Dict[str, str]]:
+        for key in ("metadata", "concepts", "sessions"):
+            if key not in self.seen_keys:
+                self.issue((), f"Missing required section '{key}'")
+        for pending in self.deferred.values():
+            for path, message, severity in pending:
+                self.issue(path, message, severity)
+        self.deferred.clear()
+        return self.issues
+
+
+def validate_stream(fp, chunk_size: int = 1 << 16,
+                    base: Optional[Path] = None) -> List[Dict[str, str]]:
+    """
+    Validate model JSON from a text file object in one streaming pass. The
+    files of a sharded or concept-files model are streamed from their
+    directory in base.
+    """
+    validator = ModelValidator()
+    stream = JSONStream(fp, chunk_size)
+    try:
+        for key in stream.items():
+            if key == "shards" and base is not None:
+                validator.section("concepts")
+                _validate_shards(validator, stream.read_value(), base, chunk_size)
+            elif key == "concept_files" and base is not None:
+                _validate_concept_files(validator, stream.read_value(), base, chunk_size)
+            else:
+                _validate_section(validator, stream, key)
+        if stream.peek() != '':
+            raise JSONStreamError("Extra data", stream.offset)
+    except JSONStreamError as e:
+        validator.issue((), f"Malformed JSON: {e}")
+        return validator.issues
+    return validator.finish()
+
+
+def _validate_section(validator: ModelValidator, stream: JSONStream, key: str) -> None:
+    """Feed the value of one top-level section to the validator."""
+    validator.section(key)
+    if key == "concepts" and stream.peek() == '{':
+        for name in stream.items():
+            validator.concept(name, stream.read_value())
+    elif key == "misconceptions" and stream.peek() == '[':
+        for i in stream.elements():
+            validator.misconception(i, stream.read_value())
+    elif key == "sessions" and stream.peek() == '[':
+        for i in stream.elements():
+            validator.session(i, stream.read_value())
+    else:
+        value = stream.read_value()
+        if key == "metadata":
+            validator.metadata(value)
+        elif key in ("concepts", "misconceptions", "sessions"):
+            validator.issue((key,), f"{key} has the wrong type")
+
+
+def _validate_part(validator: ModelValidator, path: Path, label: tuple, chunk_size: int,
+                   section: Optional[str] = None) -> None:
+    """
+    Feed a file holding part of a model to the validator: the concepts of
+    a {"concepts": {...}} file, or the whole file as the value of section.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            stream = JSONStream(f, chunk_size)
+            if section is not None:
+                _validate_section(validator, stream, section)
+                return
+            for key in stream.items():
+                if key == "concepts" and stream.peek() == '{':
+                    for concept in stream.items():
+                        validator.concept(concept, stream.read_value())
+                else:
+                    stream.read_value()
+    except OSError as e:
+        validator.issue(label, f"File unreadable: {e}")
+    except JSONStreamError as e:
+        validator.issue(label, f"Malformed JSON: {e}")
+
+
+def _validate_shards(validator: ModelValidator, manifest: Any, base: Path,
+                     chunk_size: int) -> None:
+    """Feed the concepts of every shard file in a manifest to the validator."""
+    if not isinstance(manifest, dict) or not isinstance(manifest.get("files"), list):
+        validator.issue(("shards",), "Shard manifest must list its files")
+        return
+    directory = base / str(manifest.get("directory", ""))
+    for name in manifest["files"]:
+        _validate_part(validator, directory / str(name), ("shards", name), chunk_size)
+
+
+def _validate_concept_files(validator: ModelValidator, manifest: Any, base: Path,
+                            chunk_size: int) -> None:
+    """Feed every concept file the index lists, and the other sections, to the validator."""
+    if not isinstance(manifest, dict) or not isinstance(manifest.get("directory"), str):
+        validator.issue(("concept_files",), "Concept-files manifest must name its directory")
+        return
+    directory = base / manifest["directory"]
+    validator.section("concepts")
+    try:
+        entries, _ = read_concept_index(directory)
+    except (OSError, KeyError, TypeError) as e:
+        validator.issue(("concept_files", "index.jsonl"), f"Index unreadable: {e}")
+        entries = {}
+    for key, entry in entries.items():
+        name = str(entry.get("file"))
+        _validate_part(validator, directory / "concepts" / name, ("concepts", key), chunk_size)
+    for section in ("misconceptions", "sessions"):
+        if (directory / f"{section}.json").exists():
+            _validate_part(validator, directory / f"{section}.json", (section,), chunk_size, section)
+        else:
+            validator.section(section)
+
+
+def validate_file(path: Path) -> List[Dict[str, str]]:
+    """Validate a model file on disk, with its shards. See validate_stream."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return validate_stream(f, base=path.parent)
+
+
+# =============================================================================
+# SESSION LOG
+# =============================================================================
+#
+# student_model.sessions/
+#   2026-10.jsonl       one compact event per line, appended in time order
+#   2026-10.idx.json    offsets by concept and session, sparse time index,
+#                       renames
+#
+# Appends touch only the partition file. An index records how many bytes of
+# its partition it covers and is brought up to date by scanning the tail the
+# next time the partition is queried, so writes stay O(1) and queries read
+# only the events they return.
+#
+# Events are partitioned by their own month but appended in save order, so
+# within a partition a late save or a skewed clock puts them out of time
+# order. The time index samples the latest time logged so far rather than
+# the sampled event's, and the index notes whether the partition is still
+# in order; only then may a scan stop at the first event past until.
+# Events name a concept as it was called then: a concept's log follows its
+# rename events back to its earlier names.
+
+def log_dir() -> Path:
+    """Directory holding the session log for the current model file."""
+    return data_file().with_suffix('.sessions')
+
+
+def record_event(model: Dict[str, Any], op: str, concept: Optional[str] = None,
+                 session: Optional[str] = None, **fields) -> Dict[str, Any]:
+    """
+    Describe a mutation. The event is written to the log by the next
+    successful save_model (immediately for untracked models).
+    fields may include set/add/remove patches and extra op-specific data.
+    """
+    event = {"t": datetime.now().isoformat(), "op": op}
+    if concept is not None:
+        event["concept"] = concept
+    if session is not None:
+        event["session"] = session
+    event.update({k: v for k, v in fields.items() if v is not None})
+    line = json.dumps(event, ensure_ascii=False, separators=(',', ':'))
+
+    if isinstance(model, TrackedModel):
+        model.pending_events.append(line)
+    else:
+        append_events([line])
+    return event
+
+
+def append_events(lines: List[str]) -> None:
+    """Append encoded events to their monthly partitions."""
+    directory = log_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    by_partition: Dict[str, List[str]] = {}
+    for line in lines:
+        # "t" is always the first field: {"t":"YYYY-MM...
+        by_partition.setdefault(line[6:13], []).append(line)
+    for partition, group in by_partition.items():
+        with open(directory / f"{partition}.jsonl", 'a', encoding='utf-8') as f:
+            f.write("\n".join(group) + "\n")
+
+
+def list_partitions() -> List[str]:
+    """Partition names (YYYY-MM), oldest first."""
+    directory = log_dir()
+    if not directory.exists():
+        return []
+    return sorted(p.stem for p in directory.glob('*.jsonl'))
+
+
+def _empty_index() -> Dict[str, Any]:
+    return {"size": 0, "count": 0, "concepts": {}, "sessions": {}, "times": [], "ops": {},
+            "latest": "", "ordered": True, "renames": []}
+
+
+def partition_index(partition: str) -> Dict[str, Any]:
+    """Load a partition's index, indexing any events appended since."""
+    directory = log_dir()
+    data = directory / f"{partition}.jsonl"
+    index_file = directory / f"{partition}.idx.json"
+    index = _empty_index()
+    if index_file.exists():
+        try:
+            index = json.loads(index_file.read_text(encoding='utf-8'))
+        except ValueError:
+            pass  # Rebuild a damaged index from scratch
+
+    size = data.stat().st_size
+    # Rebuilt when the partition was rewritten or the index predates renames
+    if size < index["size"] or "renames" not in index:
+        index = _empty_index()
+    if size == index["size"]:
+        return index
+
+    with open(data, 'rb') as f:
+        f.seek(index["size"])
+        offset = index["size"]
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break  # Partial line from an interrupted append
+            try:
+                event = json.loads(raw)
+            except ValueError:
+                offset += len(raw)
+                continue
+            t = event.get("t", "")
+            if t < index["latest"]:
+                index["ordered"] = False
+            index["latest"] = max(index["latest"], t)
+            if index["count"] % LOG_TIME_INDEX_EVERY == 0:
+                index["times"].append([index["latest"], offset])
+            index["count"] += 1
+            index["ops"][event.get("op")] = index["ops"].get(event.get("op"), 0) + 1
+            if event.get("concept"):
+                index["concepts"].setdefault(event["concept"].casefold(), []).append(offset)
+                if event.get("op") == "rename" and event.get("old"):
+                    index["renames"].append([event["concept"].casefold(),
+                                             event["old"].casefold(), t])
+            if event.get("session"):
+                index["sessions"].setdefault(event["session"], []).append(offset)
+            offset += len(raw)
+        index["size"] = offset
+
+    _write_atomic(index_file, json.dumps(index, ensure_ascii=False,
+                                         separators=(',', ':')).encode('utf-8'))
+    return index
+
+
+def _read_events_at(partition: str, offsets: List[int]):
+    with open(log_dir() / f"{partition}.jsonl", 'rb') as f:
+        for offset in offsets:
+            f.seek(offset)
+            yield json.loads(f.readline())
+
+
+def _partitions_between(since: Optional[str], until: Optional[str]) -> List[str]:
+    return [p for p in list_partitions()
+            if (since is None or p >= since[:7]) and (until is None or p <= until[:7])]
+
+
+def _concept_names(concept: str) -> Dict[str, tuple]:
+    """
+    The names a concept's events are logged under, casefolded, each with
+    the times (after, before) it held that name: its own name since it was
+    last renamed away from (another concept had it then), and each name a
+    rename moved it away from, up to that rename. None means unbounded.
+    """
+    renames: Dict[str, list] = {}
+    departures: Dict[str, list] = {}
+    for partition in list_partitions():
+        for new, old, t in partition_index(partition)["renames"]:
+            if new != old:
+                renames.setdefault(new, []).append((old, t))
+                departures.setdefault(old, []).append(t)
+
+    def held(name, before):
+        after = max((t for t in departures.get(name, []) if before is None or t < before),
+                    default=None)
+        return after, before
+
+    names = {concept.casefold(): held(concept.casefold(), None)}
+    pending = [concept.casefold()]
+    while pending:
+        name = pending.pop()
+        after, before = names[name]
+        for old, t in renames.get(name, []):
+            if old not in names and (after is None or t >= after) and (before is None or t < before):
+                names[old] = held(old, t)
+                pending.append(old)
+    return names
+
+
+def query_events(concept: Optional[str] = None, since: Optional[str] = None,
+                 until: Optional[str] = None, session: Optional[str] = None,
+                 ops: Optional[set] = None):
+    """
+    Yield logged events partition by partition in the order they were
+    logged, filtered by concept (case-insensitive, following renames), ISO
+    time range [since, until), session and op. Concept and session filters
+    read only matching lines; time filters skip whole partitions and seek
+    within a partition through the sparse time index.
+    """
+    names = _concept_names(concept) if concept is not None else None
+    for partition in _partitions_between(since, until):
+        index = partition_index(partition)
+        if names is not None:
+            offsets = sorted(offset for name in names
+                             for offset in index["concepts"].get(name, []))
+            events = _read_events_at(partition, offsets)
+        elif session is not None:
+            events = _read_events_at(partition, index["sessions"].get(session, []))
+        else:
+            events = _scan_partition(partition, index, since)
+
+        for event in events:
+            t = event.get("t", "")
+            if since is not None and t < since:
+                continue
+            if until is not None and t >= until:
+                if index["ordered"]:
+                    break
+                continue
+            if names is not None:
+                after, before = names[event.get("concept", "").casefold()]
+                if (after is not None and t < after) or (before is not None and t >= before):
+                    continue
+            if session is not None and event.get("session") != session:
+                continue
+            if ops is not None and event.get("op") not in ops:
+                continue
+            yield event
+
+
+def _scan_partition(partition: str, index: Dict[str, Any], since: Optional[str]):
+    """Read a partition sequentially, starting near since."""
+    start = 0
+    if since is not None:
+        for t, offset in index["times"]:
+            if t >= since:
+                break
+            start = offset
+    with open(log_dir() / f"{partition}.jsonl", 'rb') as f:
+        f.seek(start)
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                return
+            try:
+                yield json.loads(raw)
+            except ValueError:
+                continue
+
+
+def log_position() -> Dict[str, int]:
+    """The size of every partition: where the log ends now (see events_after)."""
+    directory = log_dir()
+    return {partition: (directory / f"{partition}.jsonl").stat().st_size
+            for partition in list_partitions()}
+
+
+def events_after(position: Dict[str, int], until: Optional[str] = None):
+    """
+    Yield the events appended since log_position() returned position, in
+    the order they were appended, leaving out any stamped at or after until.
+    """
+    for partition in _partitions_between(None, until):
+        path = log_dir() / f"{partition}.jsonl"
+        start = position.get(partition, 0)
+        if path.stat().st_size <= start:
+            continue
+        with open(path, 'rb') as f:
+            f.seek(start)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break   # Partial line from an interrupted append
+                try:
+                    event = json.loads(raw)
+                except ValueError:
+                    continue
+                if until is None or event.get("t", "") < until:
+                    yield event
+
+
+def log_summary(until: Optional[str] = None) -> Dict[str, int]:
+    """
+    Event and session counts across all partitions, from the indexes. With
+    until (an ISO bound), only of the events logged before it, which means
+    reading the partition until falls in.
+    """
+    events = sessions = 0
+    for partition in _partitions_between(None, until):
+        index = partition_index(partition)
+        if until is not None and partition == until[:7]:
+            for event in _scan_partition(partition, index, None):
+                if event.get("t", "") < until:
+                    events += 1
+                    sessions += event.get("op") == "session_end"
+            continue
+        events += index["count"]
+        sessions += index["ops"].get("session_end", 0)
+    return {"events": events, "sessions": sessions}
+
+
+def describe_event(event: Dict[str, Any]) -> str:
+    """One-line human description of a logged event."""
+    op = event.get("op")
+    changes = event.get("set", {})
+    previous = event.get("prev", {})
+    if op == "update":
+        parts = []
+        if "mastery" in changes:
+            parts.append(f"mastery {previous.get('mastery', '?')}% → {changes['mastery']}%")
+        if "confidence" in changes:
+            parts.append(f"confidence {previous.get('confidence', '?')} → {changes['confidence']}")
+        return ", ".join(parts) or "reviewed"
+    if op == "add":
+        return f"added at {changes.get('mastery', 0)}% ({changes.get('confidence', '?')})"
+    if op in ("struggle", "breakthrough"):
+        return f"\"{event.get('add', {}).get(op + 's', [''])[0]}\""
+    if op == "link":
+        return f"→ {', '.join(event.get('add', {}).get('related_concepts', []))}"
+    if op == "unlink":
+        return f"✗ {', '.join(event.get('remove', {}).get('related_concepts', []))}"
+    if op == "misconception_add":
+        return f"belief \"{event.get('misconception', {}).get('belief', '')}\""
+    if op == "misconception_resolve":
+        return f"resolved \"{event.get('belief', '')}\""
+    if op == "rename":
+        return f"renamed from '{event.get('old', '')}'"
+    if op == "merge":
+        return f"merged in '{event.get('source', '')}'"
+    if op == "merge_file":
+        summary = event.get("summary", {})
+        return f"merged {event.get('source') or 'a model'}: " + ", ".join(f"{n} {k}" for k, n in summary.items())
+    if op == "sync":
+        return f"applied {event.get('changesets', 0)} changeset(s): {event.get('entities', 0)} change(s)"
+    if op == "session_end":
+        summary = event.get("summary", {})
+        return ", ".join(f"{n} {k}" for k, n in summary.items())
+    return ""
+
+
+def new_session_id() -> str:
+    return "S" + datetime.now().strftime(_GENERATION_FORMAT)
+
+
+# =============================================================================
+# MASTERY HISTORY
+# =============================================================================
+#
+# Each concept carries its own history as a delta-encoded array:
+#   "history": [[t0, m0, c0], [dt1, dm1, c1], ...]
+# where t0 is a Unix timestamp in seconds, m0 the mastery at that time,
+# later entries hold the change in time and mastery since the previous
+# point, and c is the confidence code (0 low, 1 medium, 2 high). Reading a
+# concept's history never touches any other concept.
+
+CONFIDENCE_CODES = {level: code for code, level in enumerate(CONFIDENCE_LEVELS)}
+
+
+def decode_history(history: List[List[int]]) -> List[Dict[str, Any]]:
+    """Expand a delta-encoded history into absolute points, oldest first."""
+    points = []
+    t = mastery = 0
+    for entry in history:
+        dt, dm, code = entry
+        t += dt
+        mastery += dm
+        points.append({"t": t, "mastery": mastery,
+                       "confidence": CONFIDENCE_LEVELS[code]
+                       if 0 <= code < len(CONFIDENCE_LEVELS) else "unknown"})
+    return points
+
+
+def seed_history(concept: Dict[str, Any], before: Optional[datetime] = None) -> None:
+    """
+    Give a concept that predates history tracking a baseline point: its
+    current mastery and confidence as of its last review. Call before
+    changing either value.
+    """
+    if "history" in concept or "mastery" not in concept:
+        return
+    seeded = _parse_timestamp(concept.get("last_reviewed") or "")
+    if seeded is not None and seeded.tzinfo is not None:
+        seeded = seeded.astimezone().replace(tzinfo=None)
+    if seeded is None or (before is not None and seeded > before):
+        return
+    concept["history"] = [[int(seeded.timestamp()), concept["mastery"],
+                           CONFIDENCE_CODES.get(concept.get("confidence"), 0)]]
+
+
+def encode_history(points: List[Dict[str, Any]]) -> List[List[int]]:
+    """Delta-encode absolute points (as returned by decode_history)."""
+    history = []
+    t = mastery = 0
+    for point in points:
+        history.append([point["t"] - t, point["mastery"] - mastery,
+                        CONFIDENCE_CODES.get(point["confidence"], 0)])
+        t, mastery = point["t"], point["mastery"]
+    return history
+
+
+def append_history(concept: Dict[str, Any], mastery: int, confidence: str,
+                   when: Optional[datetime] = None) -> None:
+    """
+    Record a mastery/confidence point on a concept. A concept without
+    history is seeded first (see seed_history), so callers changing values
+    in place should seed before they do.
+    """
+    when = when or datetime.now()
+    seed_history(concept, when)
+    history = concept.setdefault("history", [])
+
+    t = int(when.timestamp())
+    code = CONFIDENCE_CODES.get(confidence, 0)
+    if not history:
+        history.append([t, mastery, code])
+        return
+
+    last_t = last_m = 0
+    for dt, dm, _ in history:
+        last_t += dt
+        last_m += dm
+    history.append([max(t - last_t, 0), mastery - last_m, code])
+
+
+def settle_history(concept: Dict[str, Any], when: Any = None) -> None:
+    """
+    Make a concept's history end at its current mastery and confidence,
+    appending that point (at when, an ISO timestamp, if it's later than
+    the last point) when the values were taken from elsewhere, as a merge
+    does.
+    """
+    history = concept.get("history")
+    mastery = concept.get("mastery")
+    if not history or isinstance(mastery, bool) or not isinstance(mastery, int):
+        return
+    last = decode_history(history)[-1]
+    code = CONFIDENCE_CODES.get(concept.get("confidence"), 0)
+    if last["mastery"] == mastery and CONFIDENCE_CODES.get(last["confidence"], 0) == code:
+        return
+    moment = _parse_timestamp(when)
+    t = max(last["t"], int(moment.timestamp())) if moment is not None else last["t"]
+    concept["history"] = history + [[t - last["t"], mastery - last["mastery"], code]]
+
+
+def _least_squares(xs: Sequence[float], ys: Sequence[float]) -> Optional[float]:
+    """Slope of the least-squares line through (xs, ys); None if every x is the same."""
+    xs = list(xs)
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    var_x = sum((x - mean_x) ** 2 for x in xs)
+    if var_x == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var_x
+
+
+def mastery_trend(points: List[Dict[str, Any]], target: int = None) -> Dict[str, Any]:
+    """
+    Summarize learning velocity from history points: least-squares slope in
+    mastery points per day, projected days to reach target, and plateaus
+    (stretches of at least PLATEAU_MIN_DAYS where mastery stayed within
+    PLATEAU_TOLERANCE points). Points spanning less than TREND_MIN_DAYS
+    would give absurd daily rates, so they give slope_per_review and
+    reviews_to_target instead. O(points).
+    """
+    target = MASTERY_TARGET if target is None else target
+    result = {"points": len(points), "slope_per_day": None, "slope_per_review": None,
+              "current": None, "target": target, "days_to_target": None,
+              "reviews_to_target": None, "projected_date": None, "plateaus": []}
+    if not points:
+        return result
+
+    current = points[-1]["mastery"]
+    result["current"] = current
+    if len(points) >= 2:
+        values = [p["mastery"] for p in points]
+        if (points[-1]["t"] - points[0]["t"]) / 86400 >= TREND_MIN_DAYS:
+            result["slope_per_day"] = _least_squares(
+                [(p["t"] - points[0]["t"]) / 86400 for p in points], values)
+        else:
+            result["slope_per_review"] = _least_squares(range(len(points)), values)
+
+    slope = result["slope_per_day"]
+    per_review = result["slope_per_review"]
+    if current >= target:
+        result["days_to_target"] = 0
+        result["reviews_to_target"] = 0
+    elif slope and slope > 0:
+        days_left = (target - current) / slope
+        result["days_to_target"] = days_left
+        result["projected_date"] = (datetime.fromtimestamp(points[-1]["t"])
+                                    + timedelta(days=days_left)).isoformat()
+    elif per_review and per_review > 0:
+        result["reviews_to_target"] = (target - current) / per_review
+
+    # Plateaus: grow a window while its mastery range stays within tolerance
+    start = 0
+    low = high = points[0]["mastery"]
+    for i in range(1, len(points) + 1):
+        if i < len(points):
+            m = points[i]["mastery"]
+            if max(high, m) - min(low, m) <= PLATEAU_TOLERANCE:
+                low, high = min(low, m), max(high, m)
+                continue
+        span = (points[i - 1]["t"] - points[start]["t"]) / 86400
+        if i - 1 > start and span >= PLATEAU_MIN_DAYS:
+            result["plateaus"].append({
+                "start": datetime.fromtimestamp(points[start]["t"]).isoformat(),
+                "end": datetime.fromtimestamp(points[i - 1]["t"]).isoformat(),
+                "days": span, "mastery": points[start]["mastery"],
+                "points": i - start,
+            })
+        if i < len(points):
+            start = i
+            low = high = points[i]["mastery"]
+    return result
+
+
+# =============================================================================
+# MASTERY DECAY
+# =============================================================================
+#
+# Stored mastery is what the student showed at their last review. Effective
+# mastery is what is likely left now: an exponential forgetting curve whose
+# half-life grows by DECAY_REVIEW_GROWTH with every point in the concept's
+# history. Values are not cached: review times are distinct per concept,
+# so no key repeats across concepts, and a CLI read computes them once
+# anyway. One pass is mostly parsing last_reviewed
+# (benchmarks/bench_decay.py).
+
+
+def effective_masteries(concepts: Dict[str, Dict[str, Any]],
+                        now: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    Effective mastery for every concept in one pass. Concepts never
+    reviewed keep their stored mastery. A record may give its review count
+    as "reviews" instead of a history (see concept_summary).
+    """
+    at = now or datetime.now()
+    if at.tzinfo is not None:
+        at = at.astimezone().replace(tzinfo=None)
+    half_lives = [DECAY_HALF_LIFE_DAYS * 86400 * DECAY_REVIEW_GROWTH ** n for n in range(100)]
+    effective = {}
+    for name, c in concepts.items():
+        mastery = c.get('mastery', 0)
+        reviewed = _parse_timestamp(c.get('last_reviewed'))
+        if reviewed is None or isinstance(mastery, bool) or not isinstance(mastery, (int, float)):
+            effective[name] = mastery
+            continue
+        if reviewed.tzinfo is not None:
+            reviewed = reviewed.astimezone().replace(tzinfo=None)
+        age = max((at - reviewed).total_seconds(), 0)
+        reviews = c['reviews'] if 'reviews' in c else len(c.get('history') or ())
+        half_life = half_lives[min(max(reviews, 1), 100) - 1]
+        effective[name] = round(mastery * (DECAY_FLOOR + (1 - DECAY_FLOOR) * 2 ** (-age / half_life)))
+    return effective
+
+
+def effective_mastery(concept: Dict[str, Any], now: Optional[datetime] = None) -> int:
+    """Effective mastery of a single concept."""
+    return effective_masteries({"": concept}, now)[""]
+
+
+# =============================================================================
+# IDENTIFIERS AND INDEXES
+# =============================================================================
+
+_CROCKFORD = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+
+
+def new_id(when: Optional[datetime] = None, seed: Optional[str] = None) -> str:
+    """
+    A 16-character sortable ID in Crockford base32, like a short ULID:
+    48 bits of millisecond timestamp then 32 random bits. seed makes the
+    random part deterministic, so records that predate IDs get the same
+    ID every time one is derived for them.
+    """
+    millis = max(int((when or datetime.now()).timestamp() * 1000), 0) & ((1 << 48) - 1)
+    if seed is None:
+        tail = os.urandom(4)
+    else:
+        tail = hashlib.sha256(seed.encode('utf-8')).digest()[:4]
+    value = (millis << 32) | int.from_bytes(tail, 'big')
+    return ''.join(_CROCKFORD[(value >> shift) & 31] for shift in range(75, -1, -5))
+
+
+def concept_id(key: str, concept: Dict[str, Any]) -> str:
+    """A concept's ID, deriving a stable one for concepts that predate IDs."""
+    if not concept.get("id"):
+        concept["id"] = new_id(_parse_timestamp(concept.get("first_encountered")),
+                               f"concept\0{key.casefold()}")
+    return concept["id"]
+
+
+# Struggles and breakthroughs stay lists of strings; their IDs are kept in
+# parallel lists so existing readers of the text are unaffected
+ENTRY_ID_FIELDS = {"struggles": "struggle_ids", "breakthroughs": "breakthrough_ids"}
+
+
+def entry_ids(key: str, concept: Dict[str, Any], field: str) -> List[str]:
+    """IDs parallel to concept[field], deriving stable ones for older entries."""
+    items = concept.get(field, [])
+    ids = concept.setdefault(ENTRY_ID_FIELDS[field], [])
+    if len(ids) < len(items):
+        when = _parse_timestamp(concept.get("first_encountered"))
+        ids.extend(new_id(when, f"{field}\0{key.casefold()}\0{i}\0{items[i]}")
+                   for i in range(len(ids), len(items)))
+    return ids
+
+
+def add_entry(key: str, concept: Dict[str, Any], field: str, text: str) -> Optional[str]:
+    """
+    Append a struggle or breakthrough with a new ID. Returns the ID, or
+    None if the exact text is already logged for this concept.
+    """
+    if text in concept.get(field, []):
+        return None
+    ids = entry_ids(key, concept, field)
+    concept.setdefault(field, []).append(text)
+    ids.append(new_id())
+    return ids[-1]
+
+
+class ConceptIndex:
+    """
+    Concept keys by casefolded name and by ID. Owned by a ConceptMap, which
+    updates it as keys are added and removed. The ID side is built on the
+    first @ID lookup, since older concepts need their IDs derived.
+    """
+
+    def __init__(self, concepts: Dict[str, Any]):
+        self.concepts = concepts
+        self.names: Dict[str, str] = {}
+        self.ids: Optional[Dict[str, str]] = None
+        for key in concepts:
+            self.names.setdefault(key.casefold(), key)
+
+    def put(self, key: str, record: Any) -> None:
+        self.names.setdefault(key.casefold(), key)
+        if self.ids is not None and isinstance(record, dict):
+            self.ids[concept_id(key, record)] = key
+
+    def drop(self, key: str, record: Any) -> None:
+        if self.names.get(key.casefold()) == key:
+            del self.names[key.casefold()]
+        if self.ids is not None and isinstance(record, dict) and self.ids.get(record.get("id")) == key:
+            del self.ids[record["id"]]
+
+    def find(self, ref: str) -> Optional[str]:
+        if not ref.startswith('@'):
+            return self.names.get(ref.casefold())
+        if self.ids is None:
+            self.ids = {concept_id(key, record): key for key, record in self.concepts.items()
+                        if isinstance(record, dict)}
+        return self.ids.get(ref[1:].upper())
+
+
+def concept_index(concepts: "ConceptMap") -> ConceptIndex:
+    """The name/ID index of a loaded concepts section, built on first use."""
+    if concepts.index is None:
+        concepts.index = ConceptIndex(concepts)
+    return concepts.index
+
+
+class MisconceptionIndex:
+    """
+    Positions of misconceptions in the flat list, by concept (casefolded)
+    and by ID, plus a (concept, belief) set for duplicate checks. Built in
+    one pass; add() keeps it current as misconceptions are appended.
+    """
+
+    def __init__(self, misconceptions: List[Dict[str, Any]]):
+        self.items = misconceptions
+        self._build()
+
+    def _build(self) -> None:
+        self.by_concept: Dict[str, List[int]] = {}
+        self.by_id: Dict[str, int] = {}
+        self.beliefs = set()
+        for position, misconception in enumerate(self.items):
+            self._index(position, misconception)
+
+    def _index(self, position: int, misconception: Dict[str, Any]) -> None:
+        concept = str(misconception.get("concept", "")).casefold()
+        belief = str(misconception.get("belief", "")).casefold()
+        if not misconception.get("id"):
+            # Derived from what the entry says, not where it sits, so it is
+            # stable across loads and edits to the rest of the list until
+            # saved; an exact duplicate of an earlier entry gets a suffix
+            when = _parse_timestamp(misconception.get("date_identified"))
+            seed = f"misconception\0{concept}\0{belief}"
+            misconception["id"] = new_id(when, seed)
+            repeat = 1
+            while misconception["id"] in self.by_id:
+                misconception["id"] = new_id(when, f"{seed}\0{repeat}")
+                repeat += 1
+        self.by_concept.setdefault(concept, []).append(position)
+        self.by_id[misconception["id"]] = position
+        self.beliefs.add((concept, belief))
+
+    def is_current(self, misconceptions: List[Dict[str, Any]]) -> bool:
+        return misconceptions is self.items and len(misconceptions) == len(self.by_id)
+
+    def has(self, concept: str, belief: str) -> bool:
+        return (concept.casefold(), belief.casefold()) in self.beliefs
+
+    def add(self, misconception: Dict[str, Any]) -> None:
+        self.items.append(misconception)
+        self._index(len(self.items) - 1, misconception)
+
+    def for_concept(self, concept: str) -> List[tuple]:
+        """(position, misconception) pairs for one concept, oldest first."""
+        return [(p, self.items[p]) for p in self.by_concept.get(concept.casefold(), [])]
+
+    def get(self, misconception_id: str) -> Optional[tuple]:
+        position = self.by_id.get(misconception_id.upper())
+        return None if position is None else (position, self.items[position])
+
+    def move_concept(self, old: str, new: str) -> int:
+        """Point one concept's misconceptions at another. Returns how many moved."""
+        positions = self.by_concept.pop(old.casefold(), [])
+        for position in positions:
+            misconception = self.items[position]
+            belief = str(misconception.get("belief", "")).casefold()
+            self.beliefs.discard((old.casefold(), belief))
+            self.beliefs.add((new.casefold(), belief))
+            misconception["concept"] = new
+        if positions:
+            merged = self.by_concept.get(new.casefold(), []) + positions
+            self.by_concept[new.casefold()] = sorted(merged)
+        return len(positions)
+
+    def dedupe_concept(self, concept: str) -> int:
+        """
+        Drop repeated beliefs for one concept, keeping the unresolved entry,
+        else the earliest identified. Returns how many were dropped.
+        """
+        best = {}
+        for position in self.by_concept.get(concept.casefold(), []):
+            misconception = self.items[position]
+            belief = str(misconception.get("belief", "")).casefold()
+            rank = (bool(misconception.get("resolved")),
+                    str(misconception.get("date_identified") or ""), position)
+            if belief not in best or rank < best[belief]:
+                best[belief] = rank
+        keep = {rank[-1] for rank in best.values()}
+        drop = set(self.by_concept.get(concept.casefold(), [])) - keep
+        if drop:
+            self.items[:] = [m for p, m in enumerate(self.items) if p not in drop]
+            self._build()
+        return len(drop)
+
+
+def misconception_index(model: Dict[str, Any]) -> MisconceptionIndex:
+    """The model's misconception index, cached on tracked models."""
+    misconceptions = model.setdefault("misconceptions", [])
+    indexes = getattr(model, "indexes", {})
+    index = indexes.get("misconceptions")
+    if index is None or not index.is_current(misconceptions):
+        index = indexes["misconceptions"] = MisconceptionIndex(misconceptions)
+    return index
+
+
+class LinkIndex:
+    """
+    Reverse adjacency: for each casefolded related_concepts target, the keys
+    of the concepts linking to it, in link order.
+    """
+
+    def __init__(self, concepts: Dict[str, Any]):
+        self.concepts = concepts
+        self.linkers: Dict[str, Dict[str, None]] = {}
+        for key, record in concepts.items():
+            if isinstance(record, dict):
+                self.add_all(key, record)
+
+    def add(self, source: str, target: str) -> None:
+        self.linkers.setdefault(target.casefold(), {})[source] = None
+
+    def remove(self, source: str, target: str) -> None:
+        sources = self.linkers.get(target.casefold())
+        if sources is not None:
+            sources.pop(source, None)
+            if not sources:
+                del self.linkers[target.casefold()]
+
+    def add_all(self, source: str, record: Dict[str, Any]) -> None:
+        for target in record.get("related_concepts") or []:
+            if isinstance(target, str):
+                self.add(source, target)
+
+    def remove_all(self, source: str, record: Dict[str, Any]) -> None:
+        for target in record.get("related_concepts") or []:
+            if isinstance(target, str):
+                self.remove(source, target)
+
+    def sources(self, target: str) -> List[str]:
+        """Keys of the concepts whose related_concepts name target."""
+        return list(self.linkers.get(target.casefold(), ()))
+
+
+def link_index(model: Dict[str, Any]) -> LinkIndex:
+    """The model's reverse link index, cached on tracked models."""
+    indexes = getattr(model, "indexes", {})
+    index = indexes.get("links")
+    if index is None or index.concepts is not model["concepts"]:
+        index = indexes["links"] = LinkIndex(model["concepts"])
+    return index
+
+
+def update_links(model: Dict[str, Any], source: str, added: List[str] = (),
+                 removed: List[str] = ()) -> None:
+    """Keep the reverse link index, if one is built, in step with a link edit."""
+    index = getattr(model, "indexes", {}).get("links")
+    if index is None or index.concepts is not model["concepts"]:
+        return
+    for target in removed:
+        index.remove(source, target)
+    for target in added:
+        index.add(source, target)
+
+
+def dependents(model: Dict[str, Any], concept_key: str,
+               transitive: bool = False) -> List[tuple]:
+    """
+    Concepts whose related_concepts lead to concept_key, as
+    (key, depth, via) in breadth-first order; via is the concept one step
+    closer. Work is proportional to the dependents found.
+    """
+    links = link_index(model)
+    seen = {concept_key.casefold()}
+    found = []
+    frontier = [concept_key]
+    depth = 0
+    while frontier and (transitive or depth == 0):
+        depth += 1
+        next_frontier = []
+        for target in frontier:
+            for source in links.sources(target):
+                if source.casefold() in seen:
+                    continue
+                seen.add(source.casefold())
+                found.append((source, depth, target))
+                next_frontier.append(source)
+        frontier = next_frontier
+    return found
+
+
+# =============================================================================
+# RENAME AND MERGE
+# =============================================================================
+#
+# Both rewrite only the references that name the concept: the reverse link
+# index lists the concepts whose related_concepts mention it, and the
+# misconception index lists its misconceptions.
+
+def _retarget_links(model: Dict[str, Any], links: LinkIndex, old: str, new: str,
+                    drop_self: bool = False) -> int:
+    """
+    Rewrite related_concepts entries naming old to new, dropping duplicates
+    this creates (and self links, with drop_self). Returns entries rewritten.
+    """
+    touched = 0
+    for source in links.sources(old):
+        rewritten, seen = [], set()
+        for target in model["concepts"][source]["related_concepts"]:
+            if isinstance(target, str):
+                if target.casefold() == old.casefold():
+                    touched += 1
+                    target = new
+                    if drop_self and new.casefold() == source.casefold():
+                        continue
+                if target.casefold() in seen:
+                    continue
+                seen.add(target.casefold())
+            rewritten.append(target)
+        model["concepts"][source]["related_concepts"] = rewritten
+        links.remove(source, old)
+        if new.casefold() in seen:
+            links.add(source, new)
+        mark_dirty(model, concept=source)
+    return touched
+
+
+def rename_concept(model: Dict[str, Any], old_key: str, new_name: str) -> int:
+    """
+    Rename a concept and every reference to it. Returns the number of
+    references (links and misconceptions) rewritten.
+    """
+    concepts = model["concepts"]
+    links = link_index(model)
+    # Derived IDs are seeded by the name, so store them before it changes
+    concept_id(old_key, concepts[old_key])
+    for field in ENTRY_ID_FIELDS:
+        entry_ids(old_key, concepts[old_key], field)
+    record = concepts.pop(old_key)
+    links.remove_all(old_key, record)
+    concepts[new_name] = record
+    links.add_all(new_name, record)
+    mark_dirty(model, concept=new_name)
+
+    touched = _retarget_links(model, links, old_key, new_name)
+    moved = misconception_index(model).move_concept(old_key, new_name)
+    if moved:
+        mark_dirty(model, section="misconceptions")
+    return touched + moved
+
+
+def merge_concepts(model: Dict[str, Any], source_key: str, target_key: str) -> int:
+    """
+    Fold source into target and delete source. Struggles, breakthroughs and
+    links are combined without duplicates, history points are interleaved,
+    the higher mastery (with its confidence) is kept, and references to
+    source are pointed at target; a misconception both held is kept once.
+    Returns the number of references rewritten.
+    """
+    concepts = model["concepts"]
+    links = link_index(model)
+    source = concepts[source_key]
+    target = concepts[target_key]
+
+    for field in ENTRY_ID_FIELDS:
+        source_ids = entry_ids(source_key, source, field)
+        target_ids = entry_ids(target_key, target, field)
+        for text, entry_id in zip(list(source.get(field, [])), source_ids):
+            if text not in target.setdefault(field, []):
+                target[field].append(text)
+                target_ids.append(entry_id)
+
+    if source.get("mastery", 0) > target.get("mastery", 0):
+        target["mastery"] = source["mastery"]
+        target["confidence"] = source.get("confidence", target.get("confidence"))
+    for field, pick in (("first_encountered", min), ("last_reviewed", max)):
+        values = [c[field] for c in (source, target) if isinstance(c.get(field), str)]
+        if values:
+            target[field] = pick(values)
+    if source.get("history"):
+        points = decode_history(target.get("history", [])) + decode_history(source["history"])
+        target["history"] = encode_history(sorted(points, key=lambda p: p["t"]))
+
+    own = target.setdefault("related_concepts", [])
+    folded = {t.casefold() for t in own if isinstance(t, str)}
+    for rel in source.get("related_concepts", []):
+        if (isinstance(rel, str) and rel.casefold() not in folded
+                and rel.casefold() not in (source_key.casefold(), target_key.casefold())):
+            own.append(rel)
+            folded.add(rel.casefold())
+            links.add(target_key, rel)
+
+    links.remove_all(source_key, source)
+    del concepts[source_key]
+    mark_dirty(model, concept=target_key)
+
+    touched = _retarget_links(model, links, source_key, target_key, drop_self=True)
+    index = misconception_index(model)
+    moved = index.move_concept(source_key, target_key)
+    if moved:
+        # A belief both concepts held is now listed twice under target
+        index.dedupe_concept(target_key)
+        mark_dirty(model, section="misconceptions")
+    return touched + moved
+
+
+# =============================================================================
+# MODEL DIFF AND MERGE
+# =============================================================================
+#
+# Two copies of one learner's model (say laptop and desktop) are compared
+# concept by concept, paired on the casefolded name with a dict built from
+# one side and probed with the other, so the cost is linear in the model.
+# Merging folds theirs into ours:
+#
+# - struggles, breakthroughs and related_concepts are sets: both sides'
+#   entries, less those either side removed since the base
+# - mastery and confidence are taken together from the side reviewed last
+#   (ours on a tie); first_encountered is the earlier, last_reviewed the
+#   later, and history points from both sides are interleaved, ending with
+#   a point for the kept mastery when the other side's points ran later
+# - with a base (the copy both sides started from), a side that left
+#   mastery as it was yields to the side that changed it, and a concept
+#   deleted on one side stays deleted unless the other side changed it
+#
+# Misconceptions and sessions are unions; a misconception resolved on either
+# side is resolved. Where both sides changed mastery differently, or one
+# deleted a concept the other changed, the merge reports a conflict naming
+# the side it kept.
+
+SET_FIELDS = ("struggles", "breakthroughs", "related_concepts")
+DIFF_FIELDS = ("mastery", "confidence", "first_encountered", "last_reviewed") + SET_FIELDS
+# Derived per copy, so they never count as a change
+_ID_FIELDS = ("id",) + tuple(ENTRY_ID_FIELDS.values())
+
+
+def _content(record: Any) -> Any:
+    """A concept record without its IDs."""
+    if not isinstance(record, dict):
+        return record
+    return {k: v for k, v in record.items() if k not in _ID_FIELDS}
+
+
+def _belief_key(misconception: Dict[str, Any]) -> tuple:
+    return (str(misconception.get("concept", "")).casefold(),
+            str(misconception.get("belief", "")).casefold())
+
+
+def join_concepts(ours: Dict[str, Any], theirs: Dict[str, Any]) -> tuple:
+    """
+    Pair the concepts of two models by casefolded name. Returns (pairs,
+    ours_only, theirs_only), pairs as (our key, their key), in model order.
+    """
+    unmatched: Dict[str, str] = {}
+    for key in theirs:
+        unmatched.setdefault(key.casefold(), key)
+    pairs, ours_only = [], []
+    for key in ours:
+        match = unmatched.pop(key.casefold(), None)
+        if match is None:
+            ours_only.append(key)
+        else:
+            pairs.append((key, match))
+    return pairs, ours_only, list(unmatched.values())
+
+
+def _set_items(record: Dict[str, Any], field: str) -> Dict[Any, str]:
+    """A set field's entries by comparison key (casefolded for links)."""
+    items = record.get(field) or []
+    if field == "related_concepts":
+        return {item.casefold(): item for item in items if isinstance(item, str)}
+    return {item: item for item in items if isinstance(item, str)}
+
+
+def _field_changes(ours: Dict[str, Any], theirs: Dict[str, Any]) -> Dict[str, Any]:
+    """Field by field, how their record differs from ours."""
+    changes = {}
+    for field in DIFF_FIELDS:
+        if field in SET_FIELDS:
+            mine, other = _set_items(ours, field), _set_items(theirs, field)
+            added = [item for key, item in other.items() if key not in mine]
+            removed = [item for key, item in mine.items() if key not in other]
+            if added or removed:
+                changes[field] = {"added": added, "removed": removed}
+        elif ours.get(field) != theirs.get(field):
+            changes[field] = {"ours": ours.get(field), "theirs": theirs.get(field)}
+    if (ours.get("history") or []) != (theirs.get("history") or []):
+        changes["history"] = {"ours": len(ours.get("history") or []),
+                              "theirs": len(theirs.get("history") or [])}
+    return changes
+
+
+def diff_models(ours: Dict[str, Any], theirs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    What changes between ours and theirs: concepts added, removed, renamed
+    (the same stored ID under another name) and changed field by field,
+    and misconceptions added, removed or resolved.
+    """
+    concepts, their_concepts = ours["concepts"], theirs["concepts"]
+    pairs, ours_only, theirs_only = join_concepts(concepts, their_concepts)
+
+    # A renamed concept keeps its stored ID
+    by_id = {their_concepts[key].get("id"): key for key in theirs_only
+             if isinstance(their_concepts[key], dict) and their_concepts[key].get("id")}
+    renamed, removed = [], []
+    for key in ours_only:
+        record = concepts[key]
+        other = by_id.pop(record.get("id"), None) if isinstance(record, dict) and record.get("id") else None
+        if other is None:
+            removed.append(key)
+        else:
+            renamed.append({"concept": key, "to": other})
+            pairs.append((key, other))
+    renamed_to = {item["to"] for item in renamed}
+
+    changed, same = [], 0
+    for key, other in pairs:
+        if key != other and other not in renamed_to:
+            renamed.append({"concept": key, "to": other})   # only the case differs
+        if not (isinstance(concepts[key], dict) and isinstance(their_concepts[other], dict)):
+            continue
+        if concepts[key] == their_concepts[other]:
+            same += 1
+            continue
+        fields = _field_changes(concepts[key], their_concepts[other])
+        if fields:
+            changed.append({"concept": key, "fields": fields})
+        else:
+            same += 1
+
+    mine = {_belief_key(m): m for m in ours.get("misconceptions", [])}
+    other = {_belief_key(m): m for m in theirs.get("misconceptions", [])}
+    misconceptions = {
+        "added": [m for key, m in other.items() if key not in mine],
+        "removed": [m for key, m in mine.items() if key not in other],
+        "resolved": [m for key, m in other.items()
+                     if key in mine and m.get("resolved") and not mine[key].get("resolved")],
+        "reopened": [m for key, m in other.items()
+                     if key in mine and not m.get("resolved") and mine[key].get("resolved")],
+    }
+    return {"added": [key for key in theirs_only if key not in renamed_to], "removed": removed,
+            "renamed": renamed, "changed": changed, "unchanged": same,
+            "misconceptions": misconceptions}
+
+
+def _merge_set(key: str, field: str, ours: Dict[str, Any], theirs: Dict[str, Any],
+               base: Optional[Dict[str, Any]]) -> tuple:
+    """(items, ids) of a set field merged; ids None for fields without entry IDs."""
+    removed = set()
+    if base is not None:
+        before = _set_items(base, field)
+        for side in (ours, theirs):
+            removed.update(k for k in before if k not in _set_items(side, field))
+
+    items, ids, seen = [], [], set()
+    id_field = ENTRY_ID_FIELDS.get(field)
+    for side in (ours, theirs):
+        side_ids = []
+        if id_field:
+            # Derive missing IDs on a copy, leaving both records as they are
+            side_ids = entry_ids(key, dict(side, **{id_field: list(side.get(id_field) or [])}), field)
+        for i, item in enumerate(side.get(field) or []):
+            if not isinstance(item, str):
+                continue
+            compare = item.casefold() if field == "related_concepts" else item
+            if compare in seen or compare in removed:
+                continue
+            seen.add(compare)
+            items.append(item)
+            if id_field:
+                ids.append(side_ids[i])
+    return items, (ids if id_field else None)
+
+
+def _reviewed(record: Dict[str, Any]) -> str:
+    return record.get("last_reviewed") or ""
+
+
+def merge_concept(key: str, ours: Dict[str, Any], theirs: Dict[str, Any],
+                  base: Optional[Dict[str, Any]] = None,
+                  conflicts: Optional[List[Dict[str, Any]]] = None,
+                  newer: Callable[[Dict[str, Any]], Any] = _reviewed) -> Dict[str, Any]:
+    """
+    One concept merged from both sides, as a new record (see MODEL DIFF
+    AND MERGE). Conflicts found are appended to conflicts. When both sides
+    changed mastery, the side ranked higher by newer wins (last_reviewed
+    by default).
+    """
+    merged = dict(theirs)
+    merged.update(ours)     # fields merged as a whole come from ours
+    for field in SET_FIELDS:
+        items, ids = _merge_set(key, field, ours, theirs, base)
+        if items or field in merged:
+            merged[field] = items
+        if ids is not None and (ids or ENTRY_ID_FIELDS[field] in merged):
+            merged[ENTRY_ID_FIELDS[field]] = ids
+
+    mine = {"mastery": ours.get("mastery"), "confidence": ours.get("confidence")}
+    other = {"mastery": theirs.get("mastery"), "confidence": theirs.get("confidence")}
+    kept = ours
+    if mine != other:
+        before = None if base is None else {"mastery": base.get("mastery"),
+                                            "confidence": base.get("confidence")}
+        if before == mine:
+            merged.update(other)
+            kept = theirs
+        elif before != other:
+            later = newer(theirs) > newer(ours)
+            if later:
+                merged.update(other)
+                kept = theirs
+            if conflicts is not None:
+                conflicts.append({"concept": key, "field": "mastery", "ours": mine,
+                                  "theirs": other, "kept": "theirs" if later else "ours"})
+
+    for field, pick in (("first_encountered", min), ("last_reviewed", max)):
+        values = [c[field] for c in (ours, theirs) if isinstance(c.get(field), str)]
+        if values:
+            merged[field] = pick(values)
+    if (ours.get("history") or []) != (theirs.get("history") or []):
+        points = {}
+        for side in (ours, theirs):
+            for point in decode_history(side.get("history") or []):
+                points.setdefault((point["t"], point["mastery"], point["confidence"]), point)
+        merged["history"] = encode_history(sorted(points.values(), key=lambda p: p["t"]))
+    settle_history(merged, kept.get("last_reviewed"))
+    return merged
+
+
+def merge_models(ours: Dict[str, Any], theirs: Dict[str, Any],
+                 base: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Fold theirs into ours in place (see MODEL DIFF AND MERGE); base is the
+    copy both descend from, if known. Only concepts whose merged record
+    differs are replaced, so a tracked model saves just those. Returns the
+    concepts added, updated and removed, the misconceptions and sessions
+    taken from theirs, and the conflicts.
+    """
+    concepts, their_concepts = ours["concepts"], theirs["concepts"]
+    base_keys = {}
+    if base is not None:
+        base_keys = {key.casefold(): key for key in base["concepts"]}
+
+    def before(key):
+        found = base_keys.get(key.casefold())
+        return None if found is None else base["concepts"][found]
+
+    report = {"added": [], "updated": [], "removed": [], "conflicts": [],
+              "misconceptions": 0, "sessions": 0}
+    pairs, ours_only, theirs_only = join_concepts(concepts, their_concepts)
+    for key, other in pairs:
+        if not (isinstance(concepts[key], dict) and isinstance(their_concepts[other], dict)):
+            continue
+        if their_concepts[other] == concepts[key]:
+            continue
+        theirs_now = _content(their_concepts[other])
+        original = before(key)
+        # Most concepts are the same on both sides, or untouched on theirs
+        if theirs_now == _content(concepts[key]) or \
+                (original is not None and theirs_now == _content(original)):
+            continue
+        merged = merge_concept(key, concepts[key], their_concepts[other], original,
+                               report["conflicts"])
+        if _content(merged) != _content(concepts[key]):
+            concepts[key] = merged
+            report["updated"].append(key)
+
+    for key in ours_only:
+        original = before(key)
+        if original is None:
+            continue    # added on our side (or no base to tell)
+        if _content(concepts[key]) == _content(original):
+            del concepts[key]
+            report["removed"].append(key)
+        else:
+            report["conflicts"].append({"concept": key, "field": "concept", "ours": "changed",
+                                        "theirs": "deleted", "kept": "ours"})
+    for key in theirs_only:
+        original = before(key)
+        if original is not None:
+            if _content(their_concepts[key]) == _content(original):
+                continue    # we deleted it and they left it alone
+            report["conflicts"].append({"concept": key, "field": "concept", "ours": "deleted",
+                                        "theirs": "changed", "kept": "theirs"})
+        concepts[key] = their_concepts[key]
+        report["added"].append(key)
+    # Links were replaced wholesale; the reverse index is rebuilt on next use
+    getattr(ours, "indexes", {}).pop("links", None)
+
+    misconceptions = list(ours.get("misconceptions", []))
+    positions = {_belief_key(m): i for i, m in enumerate(misconceptions)}
+    for misconception in theirs.get("misconceptions", []):
+        position = positions.get(_belief_key(misconception))
+        if position is None:
+            positions[_belief_key(misconception)] = len(misconceptions)
+            misconceptions.append(misconception)
+        elif misconception.get("resolved") and not misconceptions[position].get("resolved"):
+            misconceptions[position] = dict(misconceptions[position], resolved=True,
+                                            date_resolved=misconception.get("date_resolved"))
+        else:
+            continue
+        report["misconceptions"] += 1
+    if report["misconceptions"]:
+        ours["misconceptions"] = misconceptions
+
+    sessions = list(ours.get("sessions", []))
+    known = {json.dumps(s, sort_keys=True) for s in sessions}
+    for session in theirs.get("sessions", []):
+        if json.dumps(session, sort_keys=True) not in known:
+            sessions.append(session)
+            report["sessions"] += 1
+    if report["sessions"]:
+        ours["sessions"] = sessions
+
+    metadata = ours["metadata"]
+    if isinstance(theirs.get("metadata"), dict):
+        created = [m["created"] for m in (metadata, theirs["metadata"]) if isinstance(m.get("created"), str)]
+        if created:
+            metadata["created"] = min(created)
+        if not metadata.get("student_profile") and theirs["metadata"].get("student_profile"):
+            metadata["student_profile"] = theirs["metadata"]["student_profile"]
+    return report
+
+
+# =============================================================================
+# REPLICA SYNC
+# =============================================================================
+#
+# student_model.sync/
+#   state.json       this replica's ID and clock, how far into touched.jsonl
+#                    its changes have been counted, and what each peer is
+#                    known to have
+#   versions.jsonl   a version vector and content hash per entity (a
+#                    concept or a misconception), a line per change, the
+#                    newest winning
+#   touched.jsonl    the entities each save changed, noted by save_model
+#                    before it writes the model
+#
+# Each sync compares the entities saves noted since the last one with
+# their hashes and bumps the vector of each that changed at this
+# replica's clock. A save of a whole model (a restore, salvage, or an
+# untracked dict), an unreadable note, or a model file changed with no save
+# noted compares every entity instead, so no change that reached the file
+# goes unversioned. A changeset carries the record (or deletion) and vector of every
+# entity whose vector the receiver is not known to cover, so its size
+# follows the changes, not the model. Applying one is idempotent: a record
+# whose vector ours covers is skipped, one whose vector covers ours replaces
+# it, and concurrent ones are joined. Struggles, breakthroughs and links
+# are unioned, and mastery with confidence is a last-writer-wins register
+# keyed on the newest history point, the time mastery was last written (a
+# struggle or breakthrough moves last_reviewed but writes no mastery); a
+# record without history falls back to its last review, and on a tie the
+# record that sorts last wins, so every replica picks the same. A
+# misconception resolved anywhere is resolved, and an edit beats a
+# concurrent deletion.
+# Any shared directory works as the exchange medium: each replica writes
+# its changesets there and applies everyone else's.
+
+SYNC_FORMAT = 1
+# touched.jsonl is emptied once a sync has counted this many bytes of it
+SYNC_TOUCHED_COMPACT = 64 * 1024
+
+
+class SyncError(Exception):
+    """A sync state or changeset that can't be used."""
+
+
+def sync_dir() -> Path:
+    """Directory holding the sync state for the current model file."""
+    return data_file().with_suffix('.sync')
+
+
+def _model_key() -> Optional[list]:
+    """The model file's stat key (see _cache_key), as stored in the sync state."""
+    try:
+        return list(_cache_key(data_file()))
+    except OSError:
+        return None
+
+
+def note_sync_changes(model: Dict[str, Any]) -> None:
+    """
+    Append the entities a save is about to change to touched.jsonl, once
+    the model has a sync state (see REPLICA SYNC). Called by save_model
+    before it writes, so a change on disk is always noted.
+    """
+    directory = sync_dir()
+    if not directory.is_dir():
+        return
+    concepts = model.get("concepts")
+    if isinstance(model, TrackedModel) and isinstance(concepts, ConceptMap) \
+            and "concepts" not in model.dirty:
+        noted = [entity_key("concept", key) for key in concepts.dirty]
+        if "misconceptions" in model.dirty:
+            noted.append("misconceptions")
+        if not noted:
+            return
+    else:
+        noted = "*"
+    with open(directory / "touched.jsonl", 'a', encoding='utf-8') as f:
+        f.write(json.dumps(noted, ensure_ascii=False) + "\n")
+
+
+def entity_hash(record: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Content hash of an entity's record, None for a deleted one."""
+    if record is None:
+        return None
+    text = json.dumps(record, sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def entity_key(kind: str, *names: str) -> str:
+    """The versioned identity of a concept (by name) or misconception (by concept and belief)."""
+    return json.dumps([kind] + [str(name).casefold() for name in names], ensure_ascii=False)
+
+
+def vv_covers(a: Dict[str, int], b: Dict[str, int]) -> bool:
+    """True if version vector a has seen everything b has."""
+    return all(a.get(replica, 0) >= count for replica, count in b.items())
+
+
+def vv_join(a: Dict[str, int], b: Dict[str, int]) -> Dict[str, int]:
+    joined = dict(a)
+    for replica, count in b.items():
+        if count > joined.get(replica, 0):
+            joined[replica] = count
+    return joined
+
+
+class SyncState:
+    """A replica's sync bookkeeping, read from sync_dir() (see REPLICA SYNC)."""
+
+    def __init__(self):
+        directory = sync_dir()
+        self.new = not (directory / "state.json").exists()
+        try:
+            state = {} if self.new else json.loads((directory / "state.json").read_text(encoding='utf-8'))
+            self.replica = state.get("replica") or new_id()
+            self.clock = state.get("clock", 0)
+            self.known: Dict[str, int] = state.get("known", {})
+            # Offset into touched.jsonl (None: unknown, so compare everything)
+            # and the model file's stat key when the state was last saved
+            self.touched: Optional[int] = state.get("touched")
+            self.model_key: Optional[list] = state.get("model")
+            self.peers: Dict[str, Dict[str, Any]] = state.get("peers", {})
+            self.versions: Dict[str, Dict[str, int]] = {}
+            self.hashes: Dict[str, Optional[str]] = {}
+            self.lines = 0
+            if (directory / "versions.jsonl").exists():
+                lines = (directory / "versions.jsonl").read_text(encoding='utf-8').splitlines()
+                self.lines = len(lines)
+                try:
+                    entries = json.loads("[" + ",".join(lines) + "]")
+                except ValueError:
+                    # A line cut short by a crash; its change is counted again
+                    entries = []
+                    for line in lines:
+                        try:
+                            entries.append(json.loads(line))
+                        except ValueError:
+                            continue
+                for entry in entries:
+                    self.versions[entry["key"]] = entry["vv"]
+                    self.hashes[entry["key"]] = entry.get("h", "")
+                # A crash after versions.jsonl but before state.json must
+                # not reuse counters
+                self.clock = max([self.clock] + [vv.get(self.replica, 0) for vv in self.versions.values()])
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            raise SyncError(f"Unreadable sync state in {directory}: {e}") from e
+        self.changed: Dict[str, None] = {}
+
+    def bump(self, key: str, digest: Optional[str] = None) -> None:
+        """Record a local change to an entity, whose content now hashes to digest."""
+        self.clock += 1
+        self.versions[key] = dict(self.versions.get(key, {}), **{self.replica: self.clock})
+        self.hashes[key] = digest
+        self.known[self.replica] = self.clock
+        self.changed[key] = None
+
+    def adopt(self, key: str, vv: Dict[str, int], digest: Optional[str] = None) -> None:
+        """Record the version of an entity taken from a changeset."""
+        self.versions[key] = vv
+        self.hashes[key] = digest
+        self.changed[key] = None
+
+    def read_touched(self) -> Optional[set]:
+        """
+        Keys of the entities saves noted since the last sync ("misconceptions"
+        standing for all of them), or None when every entity must be compared.
+        """
+        start = self.touched
+        try:
+            with open(sync_dir() / "touched.jsonl", 'rb') as f:
+                if os.fstat(f.fileno()).st_size < (start or 0):
+                    start = None        # cut short or replaced: offsets mean nothing
+                f.seek(start or 0)
+                data = f.read()
+        except FileNotFoundError:
+            data = b""
+            start = start and None
+        data = data[:data.rfind(b"\n") + 1]     # a note still being written waits
+        self.touched = (start or 0) + len(data)
+        keys = set()
+        for line in data.splitlines():
+            try:
+                noted = json.loads(line)
+            except ValueError:
+                return None
+            if noted == "*":
+                return None
+            keys.update(noted)
+        if start is None:
+            return None
+        if not keys and self.model_key != _model_key():
+            return None
+        return keys
+
+    def since(self, peer: Optional[str] = None) -> Dict[str, int]:
+        """What peer is known to have; by default what every known peer has."""
+        if peer is not None:
+            return dict(self.peers[peer]["known"])
+        common = None
+        for info in self.peers.values():
+            known = info["known"]
+            common = dict(known) if common is None else \
+                {r: min(c, known[r]) for r, c in common.items() if r in known}
+        return common or {}
+
+    def find_peer(self, ref: str) -> Optional[str]:
+        """A known peer by replica ID or unique prefix."""
+        matches = [peer for peer in self.peers if peer.startswith(ref.upper())]
+        return matches[0] if len(matches) == 1 else None
+
+    def save(self) -> None:
+        """Append changed versions (compacting when mostly superseded), then the state."""
+        directory = sync_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / "versions.jsonl"
+
+        def line(key):
+            return json.dumps({"key": key, "vv": self.versions[key], "h": self.hashes.get(key)},
+                              ensure_ascii=False) + "\n"
+        if self.lines + len(self.changed) > 2 * len(self.versions) + 16:
+            _write_atomic(path, "".join(map(line, self.versions)).encode('utf-8'))
+            self.lines = len(self.versions)
+        elif self.changed:
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write("".join(map(line, self.changed)))
+            self.lines += len(self.changed)
+        self.changed = {}
+        touched = directory / "touched.jsonl"
+        if (self.touched or 0) > SYNC_TOUCHED_COMPACT and touched.stat().st_size == self.touched:
+            # Every note is counted (one appended since would show in the size)
+            touched.write_bytes(b"")
+            self.touched = 0
+        state = {"format": SYNC_FORMAT, "replica": self.replica, "clock": self.clock,
+                 "known": self.known, "touched": self.touched, "model": _model_key(),
+                 "peers": self.peers}
+        _write_atomic(directory / "state.json",
+                      json.dumps(state, indent=2, ensure_ascii=False).encode('utf-8'))
+        self.new = False
+
+
+def _misconception_key(misconception: Dict[str, Any]) -> str:
+    return entity_key("misconception", misconception.get("concept", ""),
+                      misconception.get("belief", ""))
+
+
+def absorb_local_changes(state: SyncState, model: Dict[str, Any]) -> int:
+    """
+    Bump the versions of entities whose content changed since it was last
+    versioned: of those saves noted since the last sync, or of every entity
+    on a replica's first sync or when a change may have gone unnoted.
+    Returns how many.
+    """
+    touched = state.read_touched()
+    beliefs = {_belief_key(m): m for m in model.get("misconceptions", [])
+               if isinstance(m, dict)}
+    if touched is None:
+        keys = set(state.versions)
+        keys.update(entity_key("concept", key) for key in model["concepts"])
+        keys.update(_misconception_key(m) for m in beliefs.values())
+    else:
+        keys = touched
+        if "misconceptions" in keys:
+            keys.discard("misconceptions")
+            keys.update(key for key in state.versions if key.startswith('["misconception"'))
+            keys.update(_misconception_key(m) for m in beliefs.values())
+
+    bumped = 0
+    for key in sorted(keys):
+        try:
+            kind, *names = json.loads(key)
+        except ValueError:
+            continue
+        if kind == "concept":
+            found = find_concept(model, names[0])
+            record = model["concepts"][found] if found else None
+        else:
+            record = beliefs.get(tuple(names))
+        digest = entity_hash(record)
+        if key in state.versions and state.hashes.get(key) == digest:
+            continue
+        if key not in state.versions and record is None:
+            continue        # added and removed again between syncs
+        state.bump(key, digest)
+        bumped += 1
+    return bumped
+
+
+def sync_export(model: Dict[str, Any], state: SyncState,
+                since: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+    """A changeset of every entity whose version since does not cover."""
+    since = since or {}
+    beliefs = None
+    entities = []
+    for key, vv in state.versions.items():
+        if vv_covers(since, vv):
+            continue
+        kind, *names = json.loads(key)
+        if kind == "concept":
+            found = find_concept(model, names[0])
+            entities.append({"kind": kind, "name": found or names[0], "vv": vv,
+                             "record": model["concepts"][found] if found else None})
+        else:
+            if beliefs is None:
+                beliefs = {_belief_key(m): m for m in model.get("misconceptions", [])}
+            record = beliefs.get(tuple(names))
+            entities.append({"kind": kind, "concept": record["concept"] if record else names[0],
+                             "belief": record["belief"] if record else names[1],
+                             "vv": vv, "record": record})
+    return {"format": SYNC_FORMAT, "replica": state.replica, "clock": state.clock,
+            "known": state.known, "since": since, "created": datetime.now().isoformat(),
+            "entities": entities}
+
+
+def _record_order(record: Dict[str, Any]) -> tuple:
+    return (record.get("last_reviewed") or "", json.dumps(record, sort_keys=True, ensure_ascii=False))
+
+
+def _mastery_written(record: Dict[str, Any]) -> tuple:
+    """When a concept's mastery was last set: its newest history point, then its last review."""
+    history = record.get("history") or []
+    try:
+        t = sum(entry[0] for entry in history) if history else float("-inf")
+    except (TypeError, IndexError):
+        t = float("-inf")
+    return (t, _reviewed(record))
+
+
+def join_records(kind: str, name: str, a: Optional[Dict[str, Any]],
+                 b: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Join two concurrent versions of an entity; the same whichever side is a."""
+    if a is None or b is None:
+        return a if b is None else b    # an edit beats a concurrent deletion
+    if kind == "misconception":
+        if bool(a.get("resolved")) != bool(b.get("resolved")):
+            return a if a.get("resolved") else b
+        return max(a, b, key=_record_order)
+    first, second = sorted((a, b), key=_record_order, reverse=True)
+    return merge_concept(name, first, second, newer=_mastery_written)
+
+
+def _check_entity(entity: Any) -> None:
+    """Raise SyncError unless a changeset entity has the fields sync_apply reads."""
+    if not isinstance(entity, dict):
+        raise SyncError(f"Malformed changeset entity: {entity!r}")
+    kind, vv = entity.get("kind"), entity.get("vv")
+    names = {"concept": ("name",), "misconception": ("concept", "belief")}.get(kind)
+    if (names is None
+            or not all(isinstance(entity.get(field), str) for field in names)
+            or not isinstance(vv, dict)
+            or not all(isinstance(k, str) and type(v) is int for k, v in vv.items())
+            or not isinstance(entity.get("record"), (dict, type(None)))):
+        raise SyncError(f"Malformed changeset entity: {json.dumps(entity)[:200]}")
+
+
+def sync_apply(model: Dict[str, Any], state: SyncState, changeset: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Merge a changeset into the model and the sync state (see REPLICA SYNC).
+    Returns counts of the entities taken, joined, deleted and skipped.
+    """
+    if not isinstance(changeset, dict) or changeset.get("format") != SYNC_FORMAT:
+        raise SyncError("Not a changeset (or written by another version)")
+    if not isinstance(changeset.get("entities", []), list):
+        raise SyncError("Malformed changeset: entities is not a list")
+    sender = changeset.get("replica")
+    report = {"replica": sender, "taken": 0, "joined": 0, "deleted": 0, "skipped": 0}
+    if sender == state.replica:
+        report["skipped"] = len(changeset.get("entities", []))
+        return report
+
+    concepts = model["concepts"]
+    misconceptions = list(model.get("misconceptions", []))
+    positions = {_belief_key(m): i for i, m in enumerate(misconceptions)}
+    misconceptions_changed = False
+    for entity in changeset.get("entities", []):
+        _check_entity(entity)      # all of them first, so a bad one changes nothing
+    for entity in changeset.get("entities", []):
+        kind, remote, remote_vv = entity["kind"], entity.get("record"), entity["vv"]
+        if kind == "concept":
+            name = entity["name"]
+            key = entity_key("concept", name)
+            found = find_concept(model, name)
+            current = concepts[found] if found else None
+        else:
+            name = entity["concept"]
+            key = entity_key("misconception", name, entity["belief"])
+            position = positions.get((name.casefold(), entity["belief"].casefold()))
+            current = misconceptions[position] if position is not None else None
+
+        local_vv = state.versions.get(key, {})
+        if vv_covers(local_vv, remote_vv):
+            report["skipped"] += 1
+            continue
+        if vv_covers(remote_vv, local_vv):
+            merged = remote
+            report["taken"] += 1
+        else:
+            merged = join_records(kind, name, current, remote)
+            report["joined"] += 1
+        state.adopt(key, vv_join(local_vv, remote_vv), entity_hash(merged))
+
+        if kind == "concept":
+            if merged is None and found:
+                del concepts[found]
+                report["deleted"] += 1
+            elif merged is not None and (found is None or merged != current):
+                concepts[found or name] = merged
+        elif merged is not current:
+            if merged is None:
+                misconceptions[position] = None
+                report["deleted"] += 1
+            elif position is None:
+                positions[(name.casefold(), entity["belief"].casefold())] = len(misconceptions)
+                misconceptions.append(merged)
+            else:
+                misconceptions[position] = merged
+            misconceptions_changed = True
+
+    if misconceptions_changed:
+        model["misconceptions"] = [m for m in misconceptions if m is not None]
+    getattr(model, "indexes", {}).pop("links", None)
+
+    # known only grows by whole prefixes: a changeset built for a peer that
+    # had more than we do leaves out changes we still lack
+    if vv_covers(state.known, changeset.get("since", {})):
+        state.known = vv_join(state.known, changeset.get("known", {}))
+    else:
+        report["partial"] = True
+    peer = state.peers.setdefault(sender, {"known": {}, "clock": 0})
+    peer["known"] = vv_join(peer["known"], changeset.get("known", {}))
+    peer["clock"] = max(peer["clock"], changeset.get("clock", 0))
+    peer["applied"] = datetime.now().isoformat()
+    return report
+
+
+# =============================================================================
+# CONCEPT FILTERS
+# =============================================================================
+#
+# A small expression language for picking concepts:
+#
+#     mastery<50 and confidence=low and reviewed_before=30d and has:misconception
+#
+# Comparisons and has: tests combine with and, or, not and parentheses. An
+# expression is compiled once into a tree of nodes. Every node can test one
+# concept; nodes backed by an index (sorted mastery, sorted last_reviewed,
+# misconceptions) can also name the concepts that might match, so an "and"
+# only tests the concepts its narrowest indexed term allows.
+
+FILTER_FIELDS = ("mastery", "effective", "confidence", "name", "reviewed_before", "reviewed_after")
+FILTER_HAS = ("misconception", "struggle", "breakthrough", "related")
+FILTER_EXAMPLE = "mastery<50 and confidence=low and reviewed_before=30d and has:misconception"
+
+_FILTER_TOKEN = re.compile(r'\s*(?:(\(|\))|(<=|>=|!=|<|>|=)|"((?:[^"\\]|\\.)*)"|([^\s()<>=!"]+))')
+_DURATION = re.compile(r'(\d+)([hdw])\Z')
+_DURATION_SECONDS = {"h": 3600, "d": 86400, "w": 7 * 86400}
+_NUMBER_OPS = {"<": lambda a, b: a < b, "<=": lambda a, b: a <= b, ">": lambda a, b: a > b,
+               ">=": lambda a, b: a >= b, "=": lambda a, b: a == b, "!=": lambda a, b: a != b}
+
+
+class SortedIndex:
+    """Concept keys ordered by one field, for range lookups with bisect."""
+
+    def __init__(self, concepts: Dict[str, Any], field: str, default: Any):
+        pairs = sorted((concept.get(field) or default, key) for key, concept in concepts.items()
+                       if isinstance(concept, dict))
+        self.values = [value for value, _ in pairs]
+        self.keys = [key for _, key in pairs]
+        self.version = getattr(concepts, "version", None)
+
+    def range(self, op: str, value: Any) -> Optional[set]:
+        """Keys whose value satisfies op value; None for != (no narrowing)."""
+        low, high = 0, len(self.keys)
+        if op in ("<", "<="):
+            high = (bisect.bisect_left if op == "<" else bisect.bisect_right)(self.values, value)
+        elif op in (">", ">="):
+            low = (bisect.bisect_right if op == ">" else bisect.bisect_left)(self.values, value)
+        elif op == "=":
+            low = bisect.bisect_left(self.values, value)
+            high = bisect.bisect_right(self.values, value)
+        else:
+            return None
+        return set(self.keys[low:high])
+
+
+def sorted_index(model: Dict[str, Any], field: str, default: Any) -> SortedIndex:
+    """The model's index of concepts by field, rebuilt when a concept has changed."""
+    concepts = model["concepts"]
+    indexes = getattr(model, "indexes", {})
+    index = indexes.get(f"sorted:{field}")
+    if index is None or index.version is None or index.version != getattr(concepts, "version", None):
+        index = indexes[f"sorted:{field}"] = SortedIndex(concepts, field, default)
+    return index
+
+
+class _FilterContext:
+    """What one evaluation of a filter shares across concepts."""
+
+    def __init__(self, model: Dict[str, Any], now: Optional[datetime]):
+        self.model = model
+        self.now = now
+        self.cutoffs: Dict[Any, str] = {}
+        self._open: Optional[set] = None
+
+    def cutoff(self, spec) -> str:
+        """An ISO time: spec days/hours/weeks before now, or a fixed time."""
+        if spec not in self.cutoffs:
+            moment = spec if isinstance(spec, datetime) else (self.now or datetime.now()) - spec
+            self.cutoffs[spec] = moment.isoformat()
+        return self.cutoffs[spec]
+
+    def open_misconceptions(self) -> set:
+        """Keys of concepts with an unresolved misconception."""
+        if self._open is None:
+            index = misconception_index(self.model)
+            self._open = set()
+            for folded, positions in index.by_concept.items():
+                if any(not index.items[p].get("resolved") for p in positions):
+                    key = find_concept(self.model, folded)
+                    if key:
+                        self._open.add(key)
+        return self._open
+
+
+class _Compare:
+    def __init__(self, field: str, op: str, value: Any):
+        self.field, self.op, self.value = field, op, value
+
+    def test(self, ctx: _FilterContext, key: str, concept: Dict[str, Any]) -> bool:
+        if self.field == "name":
+            matched = fnmatch.fnmatchcase(key.casefold(), self.value)
+            return matched if self.op == "=" else not matched
+        if self.field in ("reviewed_before", "reviewed_after"):
+            reviewed = concept.get("last_reviewed") or ""
+            before = reviewed < ctx.cutoff(self.value)
+            return before if self.field == "reviewed_before" else not before
+        if self.field == "confidence":
+            actual = CONFIDENCE_CODES.get(concept.get("confidence"), -1)
+        elif self.field == "effective":
+            actual = effective_mastery(concept, ctx.now)
+        else:
+            actual = concept.get("mastery") or 0
+        return _NUMBER_OPS[self.op](actual, self.value)
+
+    def candidates(self, ctx: _FilterContext) -> Optional[set]:
+        if self.field == "mastery":
+            return sorted_index(ctx.model, "mastery", 0).range(self.op, self.value)
+        if self.field == "effective" and self.op in (">", ">=", "="):
+            # Effective mastery never exceeds stored mastery (beyond rounding)
+            return sorted_index(ctx.model, "mastery", 0).range(">", self.value - 1)
+        if self.field in ("reviewed_before", "reviewed_after"):
+            op = "<" if self.field == "reviewed_before" else ">="
+            return sorted_index(ctx.model, "last_reviewed", "").range(op, ctx.cutoff(self.value))
+        return None
+
+
+class _Has:
+    def __init__(self, what: str):
+        self.what = what
 
-    required_metadata = ["created", "last_updated"]
-    if not all(key in model["metadata"] for key in required_metadata):
-        return False
+    def test(self, ctx: _FilterContext, key: str, concept: Dict[str, Any]) -> bool:
+        if self.what == "misconception":
+            return key in ctx.open_misconceptions()
+        field = "related_concepts" if self.what == "related" else self.what + "s"
+        return bool(concept.get(field))
 
-    return True
+    def candidates(self, ctx: _FilterContext) -> Optional[set]:
+        return ctx.open_misconceptions() if self.what == "misconception" else None
 
-def load_model() -> Dict[str, Any]:
-    """
-    Load the student model from disk with error handling.
-    Creates a new model if file doesn't exist.
-    """
-    if not DATA_FILE.exists():
-        print(f"ℹ️  No model found at {DATA_FILE}")
-        print("   Run 'python student.py init' to create one")
-        return get_default_model()
 
-    try:
-        with open(DATA_FILE, 'r', encoding='utf-8') as f:
-            model = json.load(f)
+class _And:
+    def __init__(self, terms: List[Any]):
+        self.terms = terms
 
-        # Validate structure
-        if not validate_model(model):
-            print(f"⚠️  Model at {DATA_FILE} has invalid structure")
-
-            # Check for backup
-            backup = DATA_FILE.with_suffix('.json.backup')
-            if backup.exists():
-                print(f"   Attempting to restore from backup...")
-                with open(backup, 'r', encoding='utf-8') as f:
-                    model = json.load(f)
-                if validate_model(model):
-                    print("✅ Restored from backup successfully")
-                    save_model(model)  # Save the good backup as main file
-                    return model
-
-            print("   Creating new model")
-            return get_default_model()
+    def test(self, ctx, key, concept) -> bool:
+        return all(term.test(ctx, key, concept) for term in self.terms)
 
-        return model
+    def candidates(self, ctx) -> Optional[set]:
+        found = [c for c in (term.candidates(ctx) for term in self.terms) if c is not None]
+        return set.intersection(*sorted(found, key=len)) if found else None
 
-    except json.JSONDecodeError as e:
-        print(f"❌ Error: Corrupt JSON in {DATA_FILE}")
-        print(f"   {str(e)}")
 
-        # Try backup
-        backup = DATA_FILE.with_suffix('.json.backup')
-        if backup.exists():
-            print(f"   Attempting to restore from backup...")
-            try:
-                with open(backup, 'r', encoding='utf-8') as f:
-                    model = json.load(f)
-                if validate_model(model):
-                    print("✅ Restored from backup successfully")
-                    save_model(model)
-                    return model
-            except:
-                pass
+class _Or:
+    def __init__(self, terms: List[Any]):
+        self.terms = terms
 
-        print("   Creating new model")
-        return get_default_model()
+    def test(self, ctx, key, concept) -> bool:
+        return any(term.test(ctx, key, concept) for term in self.terms)
+
+    def candidates(self, ctx) -> Optional[set]:
+        found = [term.candidates(ctx) for term in self.terms]
+        return None if any(c is None for c in found) else set().union(*found)
 
-    except Exception as e:
-        print(f"❌ Unexpected error loading model: {str(e)}")
-        return get_default_model()
 
+class _Not:
+    def __init__(self, term):
+        self.term = term
 
-def save_model(model: Dict[str, Any]) -> bool:
+    def test(self, ctx, key, concept) -> bool:
+        return not self.term.test(ctx, key, concept)
+
+    def candidates(self, ctx) -> Optional[set]:
+        return None
+
+
+class ConceptFilter:
     """
-    Save model to disk with atomic writes and backup.
-    Returns True on success, False on failure.
+    A compiled filter expression. select() returns the matching concept
+    keys; candidate sets from indexes only narrow which concepts are tested.
     """
-    try:
-        # Validate before saving
-        if not validate_model(model):
-            print("❌ Error: Model structure is invalid, refusing to save")
-            return False
 
-        # Update timestamp
-        model["metadata"]["last_updated"] = datetime.now().isoformat()
+    def __init__(self, text: str):
+        self.text = text
+        self._tokens = self._tokenize(text)
+        self._pos = 0
+        self.root = self._or()
+        if self._pos < len(self._tokens):
+            self._error("unexpected", self._tokens[self._pos])
+
+    def __str__(self) -> str:
+        return self.text
+
+    def select(self, model: Dict[str, Any], now: Optional[datetime] = None) -> List[str]:
+        """Matching keys in model order; records that aren't objects never match."""
+        ctx = _FilterContext(model, now)
+        concepts = model["concepts"]
+        candidates = self.root.candidates(ctx)
+        return [key for key, concept in concepts.items()
+                if (candidates is None or key in candidates) and isinstance(concept, dict)
+                and self.root.test(ctx, key, concept)]
+
+    def matches(self, model: Dict[str, Any], key: str, now: Optional[datetime] = None) -> bool:
+        return self.root.test(_FilterContext(model, now), key, model["concepts"][key])
+
+    # Parsing
+
+    def _tokenize(self, text: str) -> List[tuple]:
+        tokens, pos = [], 0
+        while text[pos:].strip():
+            match = _FILTER_TOKEN.match(text, pos)
+            if not match:
+                self._error("unexpected", ("word", text[pos:].strip()[:1], pos))
+            paren, op, quoted, word = match.groups()
+            if paren:
+                tokens.append((paren, paren, match.start(1)))
+            elif op:
+                tokens.append(("op", op, match.start(2)))
+            elif quoted is not None:
+                tokens.append(("value", re.sub(r'\\(.)', r'\1', quoted), match.start(3) - 1))
+            else:
+                tokens.append(("word", word, match.start(4)))
+            pos = match.end()
+        return tokens
 
-        # Backup existing file (before any write operations)
-        if DATA_FILE.exists():
-            backup = DATA_FILE.with_suffix('.json.backup')
-            shutil.copy(DATA_FILE, backup)
+    def _error(self, problem: str, token: Optional[tuple] = None, expected: str = "") -> None:
+        if token is None:
+            where = "at end of filter"
+        else:
+            where = f"'{token[1]}' at position {token[2] + 1}"
+        message = f"Invalid filter: {problem} {where}" + (f" (expected {expected})" if expected else "")
+        raise InvalidValueError(message, f"Example: {FILTER_EXAMPLE}",
+                                f"Fields: {', '.join(FILTER_FIELDS)}; has:{'|'.join(FILTER_HAS)}")
+
+    def _peek_word(self, *words: str) -> bool:
+        if self._pos < len(self._tokens):
+            kind, text, _ = self._tokens[self._pos]
+            return kind == "word" and text.lower() in words
+        return False
 
-        # Write to temp file first (atomic operation)
-        temp = DATA_FILE.with_suffix('.json.tmp')
-        with open(temp, 'w', encoding='utf-8') as f:
-            json.dump(model, f, indent=2, ensure_ascii=False)
+    def _next(self, expected: str) -> tuple:
+        if self._pos >= len(self._tokens):
+            self._error("missing term", None, expected)
+        self._pos += 1
+        return self._tokens[self._pos - 1]
+
+    def _or(self):
+        terms = [self._and()]
+        while self._peek_word("or"):
+            self._pos += 1
+            terms.append(self._and())
+        return terms[0] if len(terms) == 1 else _Or(terms)
+
+    def _and(self):
+        terms = [self._not()]
+        while self._peek_word("and"):
+            self._pos += 1
+            terms.append(self._not())
+        return terms[0] if len(terms) == 1 else _And(terms)
+
+    def _not(self):
+        if self._peek_word("not"):
+            self._pos += 1
+            return _Not(self._not())
+        return self._term()
+
+    def _term(self):
+        token = self._next("a comparison, has:, not or '('")
+        kind, text, _ = token
+        if kind == "(":
+            inner = self._or()
+            if self._next("')'")[0] != ")":
+                self._error("unexpected", self._tokens[self._pos - 1], "')'")
+            return inner
+        if kind != "word":
+            self._error("unexpected", token, "a comparison, has:, not or '('")
+        if text.lower().startswith("has:"):
+            what = text[4:].lower()
+            if what not in FILTER_HAS:
+                self._error("unknown test", token, "has:" + "|has:".join(FILTER_HAS))
+            return _Has(what)
+
+        field = text.lower()
+        if field not in FILTER_FIELDS:
+            self._error("unknown field", token, ", ".join(FILTER_FIELDS))
+        op_token = self._next("an operator")
+        if op_token[0] != "op":
+            self._error("unexpected", op_token, "an operator")
+        value_token = self._next("a value")
+        if value_token[0] not in ("word", "value"):
+            self._error("unexpected", value_token, "a value")
+        return _Compare(field, op_token[1], self._value(field, op_token, value_token))
+
+    def _value(self, field: str, op_token: tuple, token: tuple) -> Any:
+        op, text = op_token[1], token[1]
+        if field in ("name", "reviewed_before", "reviewed_after") and op not in ("=", "!=") or \
+                field in ("reviewed_before", "reviewed_after") and op != "=":
+            self._error("unsupported operator", op_token, f"= for {field}")
+        if field == "name":
+            return text.casefold()
+        if field in ("reviewed_before", "reviewed_after"):
+            duration = _DURATION.match(text.lower())
+            if duration:
+                return timedelta(seconds=int(duration.group(1)) * _DURATION_SECONDS[duration.group(2)])
+            moment = _parse_timestamp(text)
+            if moment is None:
+                self._error("bad time", token, "a duration like 30d, 12h, 2w or a date")
+            return moment.astimezone().replace(tzinfo=None) if moment.tzinfo else moment
+        if field == "confidence":
+            if text.lower() not in CONFIDENCE_CODES:
+                self._error("bad confidence", token, "low, medium or high")
+            return CONFIDENCE_CODES[text.lower()]
+        try:
+            return float(text) if '.' in text else int(text)
+        except ValueError:
+            self._error("bad number", token, "a number")
+
+
+def compile_filter(where) -> ConceptFilter:
+    """A ConceptFilter from an expression (an already compiled one is returned as is)."""
+    return where if isinstance(where, ConceptFilter) else ConceptFilter(str(where))
 
-        # Atomic rename
-        temp.replace(DATA_FILE)
 
-        # Create backup after successful save (if it doesn't exist yet)
-        backup = DATA_FILE.with_suffix('.json.backup')
-        if not backup.exists():
-            shutil.copy(DATA_FILE, backup)
+# =============================================================================
+# TUTOR CONTEXT
+# =============================================================================
+#
+# A bounded neighbourhood of one or more concepts, for pasting into a tutor
+# prompt. The walk follows links both ways (prerequisites through
+# related_concepts, dependents through the reverse link index) and only
+# looks at concepts it reaches, so its cost is set by the budget rather than
+# by the size of the model.
+
+def _context_item(model: Dict[str, Any], key: str, hops: int, via: Optional[str],
+                  relation: Optional[str], effective: int, now: datetime) -> Dict[str, Any]:
+    concept = model["concepts"][key]
+    misconceptions = [{"belief": m.get("belief", ""), "correction": m.get("correction", "")}
+                      for _, m in misconception_index(model).for_concept(key)
+                      if not m.get("resolved")]
+    struggles = list(concept.get("struggles", [])[-CONTEXT_STRUGGLES:])
+    reviewed = _parse_timestamp(concept.get("last_reviewed"))
+    if reviewed is not None and reviewed.tzinfo is not None:
+        reviewed = reviewed.astimezone().replace(tzinfo=None)
+    recent = reviewed is not None and (now - reviewed).days <= DECAY_HALF_LIFE_DAYS
+
+    item = {"concept": key, "id": concept_id(key, concept), "hops": hops,
+            "mastery": concept.get("mastery", 0), "effective": effective,
+            "confidence": concept.get("confidence", "unknown")}
+    if via is not None:
+        item["via"] = via
+        item["relation"] = relation
+    if struggles:
+        item["struggles"] = struggles
+    if misconceptions:
+        item["misconceptions"] = misconceptions
+    # Weak, misunderstood and recently troublesome concepts first, near ones
+    # before far ones
+    item["relevance"] = ((100 - effective) + 20 * len(misconceptions)
+                         + (10 * len(struggles) if recent else 0) - 15 * hops)
+    return item
+
+
+def extract_context(model: Dict[str, Any], keys: List[str], hops: int = None,
+                    budget: int = None, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Breadth-first neighbourhood of the given concept keys, up to hops links
+    away in either direction, ranked by relevance and cut to about budget
+    tokens. The starting concepts are always included.
+    """
+    hops = CONTEXT_HOPS if hops is None else hops
+    budget = CONTEXT_BUDGET if budget is None else budget
+    now = now or datetime.now()
+    links = link_index(model)
+    limit = max(len(keys), budget // CONTEXT_MIN_ITEM_TOKENS)
+
+    reached = {key: (0, None, None) for key in keys}     # key -> (hops, via, relation)
+    frontier = list(keys)
+    for depth in range(1, hops + 1):
+        next_frontier = []
+        for key in frontier:
+            neighbours = [(find_concept(model, name), "prerequisite")
+                          for name in model["concepts"][key].get("related_concepts", [])]
+            neighbours += [(source, "dependent") for source in links.sources(key)]
+            for neighbour, relation in neighbours:
+                if neighbour and neighbour not in reached and len(reached) < limit:
+                    reached[neighbour] = (depth, key, relation)
+                    next_frontier.append(neighbour)
+        frontier = next_frontier
+
+    effective = effective_masteries({key: model["concepts"][key] for key in reached}, now)
+    items = [_context_item(model, key, depth, via, relation, effective[key], now)
+             for key, (depth, via, relation) in reached.items()]
+    items.sort(key=lambda item: (item["hops"] > 0, -item["relevance"]))
+
+    included, used = [], 0
+    for item in items:
+        cost = len(json.dumps(item, ensure_ascii=False)) // 4
+        if item["hops"] > 0 and used + cost > budget:
+            continue
+        included.append(item)
+        used += cost
+    return {"focus": list(keys), "hops": hops, "budget": budget, "tokens": used,
+            "omitted": len(items) - len(included), "concepts": included}
+
+
+def context_markdown(context: Dict[str, Any]) -> str:
+    """Render an extracted context as compact markdown."""
+    lines = [f"## Learner context: {', '.join(context['focus'])}"]
+    for item in context["concepts"]:
+        mastery = f"{item['mastery']}%"
+        if item["effective"] < item["mastery"]:
+            mastery += f" (now {item['effective']}%)"
+        line = f"- **{item['concept']}**: {mastery}, {item['confidence']} confidence"
+        if "via" in item:
+            line += f"; {item['relation']} of {item['via']}"
+        lines.append(line)
+        if "struggles" in item:
+            lines.append(f"  - Struggles: {'; '.join(item['struggles'])}")
+        for misconception in item.get("misconceptions", []):
+            lines.append(f"  - Believes: {misconception['belief']} "
+                         f"(actually: {misconception['correction']})")
+    if context["omitted"]:
+        lines.append(f"\n_{context['omitted']} nearby concept(s) left out to stay within "
+                     f"{context['budget']} tokens._")
+    return "\n".join(lines)
 
-        return True
 
-    except Exception as e:
-        print(f"❌ Error saving model: {str(e)}")
-        return False
+# =============================================================================
+# TIME TRAVEL
+# =============================================================================
+#
+# The model as of time T is the newest generation or checkpoint saved
+# before T plus the logged events stamped before T that were appended after
+# the snapshot: each records where the session log ended when it was taken,
+# so an event is replayed exactly when the snapshot doesn't hold it,
+# whatever the clocks of the processes that logged them. Checkpoints
+# are taken every CHECKPOINT_EVERY events and on changes events cannot
+# replay (restore, merge-file, sync apply), so a recent reconstruction
+# replays at most that many events. The backup state notes how many events
+# had been logged at each checkpoint. Past CHECKPOINT_KEEP_RECENT they are
+# thinned so that at most CHECKPOINT_KEEP_EVERY events lie between two kept
+# ones (more only where a single save logged more), which bounds replay at
+# any age. Checkpoints for wholesale changes are never thinned, since
+# events can't replay across them, and neither is the oldest.
+
+def as_of_bound(value: str) -> str:
+    """
+    Turn an --as-of value into an exclusive ISO upper bound. A bare date
+    means the end of that day; a timestamp includes events at that instant.
+    """
+    moment = _parse_timestamp(value)
+    if moment is None:
+        raise ValueError(f"Invalid date: '{value}' (use YYYY-MM-DD or ISO format)")
+    if moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)
+    if len(value) == 10:
+        moment += timedelta(days=1)
+    else:
+        moment += timedelta(microseconds=1)
+    return moment.isoformat()
+
+
+def apply_event(model: Dict[str, Any], event: Dict[str, Any]) -> None:
+    """Replay one logged event onto a model."""
+    op = event.get("op")
+    name = event.get("concept")
+    concepts = model["concepts"]
+
+    if op == "add":
+        concepts[name] = dict(event.get("set", {}))
+        update_links(model, name, added=concepts[name].get("related_concepts", []))
+        mark_dirty(model, concept=name)
+        return
+    if op == "misconception_add":
+        misconception_index(model).add(event["misconception"])
+        mark_dirty(model, section="misconceptions")
+        return
+    if op == "misconception_resolve":
+        misconceptions = model["misconceptions"]
+        found = misconception_index(model).get(event["id"]) if event.get("id") else None
+        index = found[0] if found else event.get("index")
+        if isinstance(index, int) and 0 <= index < len(misconceptions):
+            misconceptions[index].update(event.get("set", {}))
+            mark_dirty(model, section="misconceptions")
+        return
+    if op == "rename":
+        if event.get("old") in concepts and name not in concepts:
+            rename_concept(model, event["old"], name)
+        return
+    if op == "merge":
+        if event.get("source") in concepts and name in concepts:
+            merge_concepts(model, event["source"], name)
+        return
+    if name not in concepts:
+        return  # Event for a concept the snapshot does not know
+
+    concept = concepts[name]
+    changes = event.get("set", {})
+    if "mastery" in changes or "confidence" in changes:
+        seed_history(concept, _parse_timestamp(event["t"]))
+    concept.update(changes)
+    if "mastery" in changes or "confidence" in changes:
+        append_history(concept, concept.get("mastery", 0),
+                       concept.get("confidence", "low"), _parse_timestamp(event["t"]))
+    for field in ENTRY_ID_FIELDS:
+        if field in event.get("add", {}):
+            entry_ids(name, concept, field)
+    for field, items in event.get("add", {}).items():
+        values = concept.setdefault(field, [])
+        values.extend(item for item in items if item not in values)
+    for field, items in event.get("remove", {}).items():
+        concept[field] = [item for item in concept.get(field, []) if item not in items]
+    update_links(model, name, added=event.get("add", {}).get("related_concepts", []),
+                 removed=event.get("remove", {}).get("related_concepts", []))
+    mark_dirty(model, concept=name)
+
+
+def model_as_of(value: str) -> Dict[str, Any]:
+    """
+    Reconstruct the model as it was at value (YYYY-MM-DD or ISO timestamp).
+    Raises ValueError if nothing was recorded that early.
+    """
+    until = as_of_bound(value)
+    store = backup_dir()
+    candidates = [(gen_id, kind) for kind in ("generations", "checkpoints")
+                  for gen_id in list_generations(store, kind)]
+    base = max((c for c in candidates if _generation_time(c[0]).isoformat() < until),
+               default=None)
+    if base is None:
+        checkpoints = list_generations(store, "checkpoints")
+        if checkpoints:
+            earliest = _generation_time(checkpoints[0]).isoformat(sep=' ')[:16]
+            raise ValueError(f"No recorded state before {earliest}")
+        raise ValueError("No recorded history yet (checkpoints need backups enabled)")
+
+    gen_id, kind = base
+    position = read_generation(gen_id, store, kind).get("log")
+    model = decode_model(generation_text(gen_id, store, kind))
+    if position is None:
+        # Recorded before generations noted the log position
+        events = query_events(since=_generation_time(gen_id).isoformat(), until=until)
+    else:
+        events = events_after(position, until)
+    for event in events:
+        apply_event(model, event)
+    return model
+
 
 def initialize_model(profile: str = "") -> Dict[str, Any]:
     """
@@ -156,7 +4965,7 @@ def initialize_model(profile: str = "") -> Dict[str, Any]:
     if profile:
         model["metadata"]["student_profile"] = profile
 
-    if save_model(model):
+    if save_model(model, checkpoint=True):
         print(f"✅ Initialized new student model at {DATA_FILE}")
         print(f"   Created: {model['metadata']['created']}")
         if profile:
@@ -168,75 +4977,1286 @@ def initialize_model(profile: str = "") -> Dict[str, Any]:
 
 def find_concept(model: Dict[str, Any], concept_name: str) -> Optional[str]:
     """
-    Find a concept by name (case-insensitive).
+    Find a concept by name (case-insensitive) or by ID written as @ID.
     Returns the exact key from the model, or None if not found.
     """
+    concepts = model["concepts"]
+    if isinstance(concepts, ConceptMap):
+        return concept_index(concepts).find(concept_name)
+
+    if concept_name.startswith('@'):
+        wanted = concept_name[1:].upper()
+        for key, record in concepts.items():
+            if isinstance(record, dict) and concept_id(key, record) == wanted:
+                return key
+        return None
     concept_lower = concept_name.lower()
-    for key in model["concepts"].keys():
+    for key in concepts.keys():
         if key.lower() == concept_lower:
             return key
     return None
 
 
+# =============================================================================
+# LIBRARY API
+# =============================================================================
+#
+# StudentModel is the interface for in-process callers. Its methods take
+# plain arguments, read and write through an injected store, return the
+# same result dicts the CLI prints with --json, and raise StudentModelError
+# instead of printing. The cmd_* handlers are a thin layer over it that
+# turns argparse namespaces into calls and results into text.
+
+class StudentModelError(Exception):
+    """A request the model could not carry out; hints suggest what to do instead."""
+
+    def __init__(self, message: str, *hints: str):
+        super().__init__(message)
+        self.hints = hints
+
+
+class ConceptNotFoundError(StudentModelError):
+    """No concept matches the given name or @ID."""
+
+
+class ConceptExistsError(StudentModelError):
+    """A concept with that name is already tracked."""
+
+
+class InvalidValueError(StudentModelError, ValueError):
+    """An argument is out of range or malformed."""
+
+
+class SaveError(StudentModelError):
+    """The store could not write the model."""
+
+
+# Messages a FileStore keeps from its recent calls
+STORE_MESSAGES = 100
+
+_file_locks: Dict[Path, threading.RLock] = {}
+_file_locks_guard = threading.Lock()
+
+
+def _file_lock(path: Path) -> threading.RLock:
+    """The lock calls on one model file take turns on."""
+    with _file_locks_guard:
+        return _file_locks.setdefault(path.resolve(), threading.RLock())
+
+
+class FileStore:
+    """
+    A model file, with its backup store and session log beside it. Each
+    call binds path (None: DATA_FILE at call time) for the storage
+    functions; calls on the same file take turns, other files go ahead in
+    parallel. Storage messages are kept in messages (the last
+    STORE_MESSAGES lines) unless echo is set.
+    """
+
+    def __init__(self, path: Optional[Path] = None, echo: bool = False):
+        self.path = Path(path).expanduser() if path is not None else None
+        self.echo = echo
+        self.messages = deque(maxlen=STORE_MESSAGES)
+
+    @contextlib.contextmanager
+    def _bound(self):
+        path = self.path if self.path is not None else DATA_FILE
+        sink = None if self.echo else io.StringIO()
+        with _file_lock(path), bind_model_file(path, sink):
+            try:
+                yield
+            finally:
+                if sink is not None:
+                    self.messages.extend(sink.getvalue().splitlines())
+
+    @property
+    def location(self) -> str:
+        return str(self.path if self.path is not None else DATA_FILE)
+
+    def load(self) -> Dict[str, Any]:
+        with self._bound():
+            return track(load_model())
+
+    def save(self, model: Dict[str, Any], checkpoint: bool = False) -> bool:
+        with self._bound():
+            return save_model(model, checkpoint=checkpoint)
+
+    def as_of(self, value: str) -> Dict[str, Any]:
+        with self._bound():
+            return model_as_of(value)
+
+    def log_summary(self, until: Optional[str] = None) -> Dict[str, int]:
+        with self._bound():
+            return log_summary(until)
+
+    def summary(self) -> Optional[Dict[str, Any]]:
+        """Metadata and index fields without loading the model (see concept_summary)."""
+        with self._bound():
+            return concept_summary()
+
+    def read(self) -> Dict[str, Any]:
+        """
+        The model exactly as stored, for diff and merge: raises
+        StudentModelError where load() would fall back to a backup or an
+        empty model.
+        """
+        with self._bound():
+            try:
+                model = decode_model(data_file().read_text(encoding='utf-8'))
+                if isinstance(model, TrackedModel) and "shards" in model:
+                    _attach_shards(model)
+                elif isinstance(model, TrackedModel) and "concept_files" in model:
+                    _attach_concept_files(model)
+            except (OSError, ValueError, LayoutLoadError) as e:
+                raise StudentModelError(f"Can't read {data_file()}: {e}") from e
+            if not isinstance(model, dict) or not validate_model(model):
+                raise StudentModelError(f"{data_file()} is not a student model",
+                                        f"Check it with: python student.py validate {data_file()}")
+            return model
+
+
+class MemoryStore:
+    """A store that keeps the model in memory, with no backups or log."""
+
+    location = ":memory:"
+
+    def __init__(self, model: Optional[Dict[str, Any]] = None):
+        self.model = track(model if model is not None else get_default_model())
+
+    def load(self) -> Dict[str, Any]:
+        return self.model
+
+    def save(self, model: Dict[str, Any], checkpoint: bool = False) -> bool:
+        if not validate_model(model):
+            return False
+        model["metadata"]["last_updated"] = datetime.now().isoformat()
+        model.pending_events = []
+        self.model = model
+        return True
+
+    def as_of(self, value: str) -> Dict[str, Any]:
+        raise ValueError("An in-memory model keeps no history")
+
+    def log_summary(self, until: Optional[str] = None) -> Dict[str, int]:
+        return {"events": 0, "sessions": 0}
+
+
+def _related_items(model: Dict[str, Any], related: List[str], now: Optional[datetime]) -> List[Dict[str, Any]]:
+    """Result entries for a related_concepts list, with effective mastery."""
+    keys = [find_concept(model, rel) for rel in related]
+    effective = effective_masteries({k: model['concepts'][k] for k in keys if k}, now)
+    items = []
+    for rel_name, rel_key in zip(related, keys):
+        if rel_key and rel_key in model['concepts']:
+            rel_data = model['concepts'][rel_key]
+            items.append({"concept": rel_name, "tracked": True,
+                          "mastery": rel_data.get('mastery', 0), "effective": effective[rel_key],
+                          "confidence": rel_data.get('confidence', 'unknown'),
+                          "last_reviewed": rel_data.get('last_reviewed'),
+                          # Flag low mastery prerequisites (after forgetting)
+                          "low": effective[rel_key] < 60})
+        else:
+            items.append({"concept": rel_name, "tracked": False})
+    return items
+
+
+def parse_edge(line: str) -> Optional[tuple]:
+    """Split an edge line "Concept -> Related" (or tab-separated) into its two names."""
+    for separator in ("->", "\t"):
+        if separator in line:
+            source, target = line.split(separator, 1)
+            if source.strip() and target.strip():
+                return source.strip(), target.strip()
+    return None
+
+
+# Fields a query can project; a concept's own name is always included
+QUERY_FIELDS = ("id", "mastery", "effective", "confidence", "first_encountered",
+                "last_reviewed", "struggles", "breakthroughs", "related")
+
+
+def _concept_record(key: str, concept: Dict[str, Any], effective: int) -> Dict[str, Any]:
+    """A concept's own fields as show and query report them, without related concepts."""
+    entries = {field: [{"text": text, "id": entry_id} for text, entry_id
+                       in zip(concept.get(field, []), entry_ids(key, concept, field))]
+               for field in ('struggles', 'breakthroughs')}
+    return {"concept": key, "id": concept_id(key, concept),
+            "mastery": concept.get('mastery', 'N/A'), "effective": effective,
+            "confidence": concept.get('confidence', 'N/A'),
+            "first_encountered": concept.get('first_encountered'),
+            "last_reviewed": concept.get('last_reviewed'),
+            "struggles": entries['struggles'], "breakthroughs": entries['breakthroughs']}
+
+
+class StudentModel:
+    """
+    A loaded student model and the operations on it.
+
+        model = StudentModel.open("~/student_model.json")
+        model.update("React Hooks", mastery=70)
+        model.get_concept("react hooks")["effective"]
+
+    Every change is saved through the store before the method returns.
+    """
+
+    def __init__(self, store=None, data: Optional[Dict[str, Any]] = None,
+                 now: Optional[datetime] = None, read_only: bool = False):
+        self.store = store if store is not None else FileStore()
+        self._data = data
+        self.now = now              # the moment described; None for the present
+        self.read_only = read_only
+
+    @property
+    def data(self) -> Dict[str, Any]:
+        """The model, loaded from the store when first used."""
+        if self._data is None:
+            self._data = self.store.load()
+        return self._data
+
+    @data.setter
+    def data(self, value: Dict[str, Any]) -> None:
+        self._data = value
+
+    def _summary(self) -> Optional[Dict[str, Any]]:
+        """The store's summary of the model while nothing is loaded, if it keeps one."""
+        if self._data is not None or not hasattr(self.store, "summary"):
+            return None
+        return self.store.summary()
+
+    @classmethod
+    def open(cls, path: Optional[Path] = None, store=None) -> "StudentModel":
+        """Load the model at path (default DATA_FILE), or from store."""
+        return cls(store if store is not None else FileStore(path))
+
+    @classmethod
+    def as_of(cls, value: str, store=None) -> "StudentModel":
+        """The model as it was at a date or ISO time; read-only."""
+        store = store if store is not None else FileStore()
+        try:
+            data = store.as_of(value)
+            return cls(store, data, now=datetime.fromisoformat(as_of_bound(value)),
+                       read_only=True)
+        except (ValueError, OSError) as e:
+            raise StudentModelError(str(e)) from e
+
+    def reload(self) -> None:
+        """Re-read the model from the store, dropping unsaved changes."""
+        self.data = self.store.load()
+
+    def save(self, checkpoint: bool = False) -> None:
+        if self.read_only:
+            raise StudentModelError("A reconstructed past model can't be changed")
+        if not self.store.save(self.data, checkpoint=checkpoint):
+            raise SaveError("Failed to save model")
+
+    def _key(self, name: str, *hints: str) -> str:
+        key = find_concept(self.data, name)
+        if not key:
+            raise ConceptNotFoundError(f"Concept '{name}' not found.", *hints)
+        return key
+
+    @staticmethod
+    def _check(mastery: Optional[int] = None, confidence: Optional[str] = None) -> None:
+        if mastery is not None and (not isinstance(mastery, int) or isinstance(mastery, bool)
+                                    or not 0 <= mastery <= 100):
+            raise InvalidValueError(f"Mastery must be 0-100, got {mastery!r}")
+        if confidence is not None and confidence not in CONFIDENCE_LEVELS:
+            raise InvalidValueError("Confidence must be: low, medium, or high")
+
+    # Reads
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Metadata and totals, with average stored and effective mastery.
+        For a past model, events and sessions count those logged by then.
+        """
+        summary = self._summary()
+        model = summary or self.data
+        layout = getattr(model, 'layout', None)
+        log = self.store.log_summary(None if self.now is None else self.now.isoformat())
+        result = {"ok": True, "path": self.store.location,
+                  "created": model['metadata']['created'],
+                  "last_updated": model['metadata']['last_updated'],
+                  "profile": model['metadata'].get('student_profile', ''),
+                  "concepts": len(model['concepts']),
+                  "layout": "concepts" if summary else layout_name(layout),
+                  "shards": layout.count if isinstance(layout, ShardLayout) else 0,
+                  "sessions": (summary['session_count'] if summary else len(model['sessions']))
+                              + log['sessions'],
+                  "events": log['events'],
+                  "avg_mastery": None, "avg_effective": None}
+
+        if model['concepts']:
+            masteries = [c.get('mastery', 0) for c in model['concepts'].values()]
+            effective = effective_masteries(model['concepts'], self.now).values()
+            result["avg_mastery"] = sum(masteries) / len(masteries)
+            result["avg_effective"] = sum(effective) / len(masteries)
+        return result
+
+    @staticmethod
+    def _other(source) -> Dict[str, Any]:
+        """A model given as a path to its file, or as the model itself."""
+        if isinstance(source, dict):
+            return source
+        return FileStore(source).read()
+
+    def diff(self, other) -> Dict[str, Any]:
+        """How the model at other (a path, or a model) differs from this one."""
+        result = diff_models(self.data, self._other(other))
+        return dict({"ok": True, "ours": self.store.location,
+                     "theirs": None if isinstance(other, dict) else str(other)}, **result)
+
+    def select(self, where) -> List[str]:
+        """Keys of the concepts matching a filter expression (see ConceptFilter)."""
+        return compile_filter(where).select(self.data, self.now)
+
+    def concepts(self, where: Union[str, "ConceptFilter", None] = None) -> Dict[str, Any]:
+        """Every concept, or those matching where, strongest effective mastery first."""
+        summary = self._summary() if where is None else None
+        concepts = summary['concepts'] if summary else self.data['concepts']
+        if where is not None:
+            concepts = {key: concepts[key] for key in self.select(where)}
+        effective = effective_masteries(concepts, self.now)
+        ordered = sorted(concepts.items(), key=lambda x: effective[x[0]], reverse=True)
+        items = [{"concept": name, "mastery": data.get('mastery', 0), "effective": effective[name],
+                  "confidence": data.get('confidence', 'unknown'),
+                  "last_reviewed": data.get('last_reviewed')}
+                 for name, data in ordered]
+        return {"ok": True, "where": None if where is None else str(where), "concepts": items}
+
+    def export(self, where: Union[str, "ConceptFilter", None] = None) -> Dict[str, Any]:
+        """
+        A standalone model holding every concept, or those matching where,
+        with their misconceptions. Sessions and history stay behind.
+        """
+        keys = list(self.data['concepts']) if where is None else self.select(where)
+        folded = {key.casefold() for key in keys}
+        exported = get_default_model()
+        exported["metadata"] = dict(self.data['metadata'], exported=datetime.now().isoformat(),
+                                    export_filter=None if where is None else str(where))
+        exported["concepts"] = json.loads(json.dumps(
+            {key: self.data['concepts'][key] for key in keys}, ensure_ascii=False))
+        exported["misconceptions"] = [
+            dict(m) for m in self.data.get('misconceptions', [])
+            if str(m.get('concept', '')).casefold() in folded]
+        return {"ok": True, "where": exported["metadata"]["export_filter"],
+                "concepts": len(keys), "model": exported}
+
+    def get_concept(self, name: str) -> Dict[str, Any]:
+        """One concept in full: entries with IDs, effective mastery, related concepts."""
+        concept_key = self._key(name, "Run 'python student.py list' to see tracked concepts.")
+        concept = self.data['concepts'][concept_key]
+        effective = effective_masteries({concept_key: concept}, self.now)[concept_key]
+        return dict({"ok": True}, **_concept_record(concept_key, concept, effective),
+                    related=_related_items(self.data, concept.get('related_concepts', []), self.now))
+
+    def query(self, names: List[str], fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Several concepts at once, each cut down to fields (default: all of
+        QUERY_FIELDS). A concept's "related" field names its links; the
+        linked concepts are described once for the whole batch under
+        "related". Names that match nothing are listed in missing.
+        """
+        fields = list(fields) if fields else list(QUERY_FIELDS)
+        unknown = [field for field in fields if field not in QUERY_FIELDS]
+        if unknown:
+            raise InvalidValueError(f"Unknown field(s): {', '.join(unknown)}",
+                                    f"Fields: {', '.join(QUERY_FIELDS)}")
+
+        concepts = self.data['concepts']
+        keys, missing = [], []
+        for name in names:
+            concept_key = find_concept(self.data, name)
+            if concept_key is None:
+                missing.append(name)
+            elif concept_key not in keys:
+                keys.append(concept_key)
+
+        effective = effective_masteries({k: concepts[k] for k in keys}, self.now)
+        items, linked = [], {}   # casefolded concept -> tracked key, or name as first linked
+        for concept_key in keys:
+            concept = concepts[concept_key]
+            record = _concept_record(concept_key, concept, effective[concept_key])
+            record["related"] = concept.get('related_concepts', [])
+            items.append(dict({"concept": concept_key}, **{f: record[f] for f in fields}))
+            if "related" in fields:
+                for rel in record["related"]:
+                    rel = find_concept(self.data, rel) or rel
+                    linked.setdefault(rel.casefold(), rel)
+
+        return {"ok": True, "fields": fields, "concepts": items,
+                "related": _related_items(self.data, list(linked.values()), self.now),
+                "missing": missing}
+
+    def related(self, name: str) -> Dict[str, Any]:
+        concept_key = self._key(name)
+        related = self.data['concepts'][concept_key].get('related_concepts', [])
+        return {"ok": True, "concept": concept_key,
+                "related": _related_items(self.data, related, self.now)}
+
+    def dependents(self, name: str, transitive: bool = False) -> Dict[str, Any]:
+        concept_key = self._key(name)
+        found = dependents(self.data, concept_key, transitive=transitive)
+        return {"ok": True, "concept": concept_key, "transitive": transitive,
+                "dependents": [{"concept": key, "depth": depth, "via": via,
+                                "mastery": self.data['concepts'][key].get('mastery', 0)}
+                               for key, depth, via in found]}
+
+    def context(self, names: List[str], hops: Optional[int] = None,
+                budget: Optional[int] = None) -> Dict[str, Any]:
+        keys = []
+        for name in names:
+            concept_key = self._key(name)
+            if concept_key not in keys:
+                keys.append(concept_key)
+        context = extract_context(self.data, keys, hops=hops, budget=budget, now=self.now)
+        return dict(context, ok=True)
+
+    def misconceptions(self, concept: Optional[str] = None,
+                       status: Optional[str] = None) -> Dict[str, Any]:
+        """Misconceptions, optionally for one concept and only "resolved" or "unresolved"."""
+        misconceptions = self.data.get("misconceptions", [])
+        total = len(misconceptions)
+        concept_key = None
+        if total and concept:
+            concept_key = self._key(concept)
+            misconceptions = [m for _, m in misconception_index(self.data).for_concept(concept_key)]
+        if status == "resolved":
+            misconceptions = [m for m in misconceptions if m["resolved"]]
+        elif status == "unresolved":
+            misconceptions = [m for m in misconceptions if not m["resolved"]]
+        if total:
+            misconception_index(self.data)  # Gives pre-ID misconceptions their stable IDs
+        return {"ok": True, "concept": concept_key, "status": status, "total": total,
+                "misconceptions": misconceptions}
+
+    def history(self, name: str, limit: Optional[int] = None) -> Dict[str, Any]:
+        concept_key = self._key(name)
+        points = decode_history(self.data["concepts"][concept_key].get("history", []))
+        return {"ok": True, "concept": concept_key, "total": len(points),
+                "points": points[-limit:] if limit else points}
+
+    def trend(self, name: str, target: Optional[int] = None) -> Dict[str, Any]:
+        concept_key = self._key(name)
+        points = decode_history(self.data["concepts"][concept_key].get("history", []))
+        if len(points) < 2:
+            return {"ok": True, "concept": concept_key, "points": len(points)}
+        return dict(mastery_trend(points, target), ok=True, concept=concept_key)
+
+    # Changes
+
+    def add_concept(self, name: str, mastery: int, confidence: str,
+                    related: Optional[List[str]] = None) -> Dict[str, Any]:
+        model = self.data
+        if find_concept(model, name):
+            raise ConceptExistsError(f"Concept '{name}' already exists.",
+                                     "Use 'python student.py update' to modify it.")
+        self._check(mastery, confidence)
+
+        related = list(related or [])
+        now = datetime.now().isoformat()
+        model["concepts"][name] = {
+            "mastery": mastery,
+            "confidence": confidence,
+            "first_encountered": now,
+            "last_reviewed": now,
+            "struggles": [],
+            "breakthroughs": [],
+            "related_concepts": related,
+            "history": [],
+            "id": new_id()
+        }
+        update_links(model, name, added=related)
+        untracked = [rel for rel in related if not find_concept(model, rel)]
+
+        append_history(model["concepts"][name], mastery, confidence)
+        record_event(model, "add", name, set=model["concepts"][name])
+        self.save()
+        return {"ok": True, "changed": True, "concept": name, "id": model["concepts"][name]["id"],
+                "mastery": mastery, "confidence": confidence,
+                "related": related, "untracked": untracked}
+
+    def update(self, name: str, mastery: Optional[int] = None,
+               confidence: Optional[str] = None) -> Dict[str, Any]:
+        """Change mastery and/or confidence, recording history and the event."""
+        concept_key = self._key(name, "Run 'python student.py list' to see tracked concepts.")
+        self._check(mastery, confidence)
+        if mastery is None and confidence is None:
+            return {"ok": True, "changed": False, "concept": concept_key,
+                    "message": "No changes specified"}
+
+        updated = self._set(concept_key, mastery, confidence)
+        self.save()
+        return {"ok": True, "changed": True, "concept": concept_key, "changes": updated}
+
+    def _set(self, concept_key: str, mastery: Optional[int], confidence: Optional[str],
+             session: Optional[str] = None) -> Dict[str, list]:
+        """Apply checked values with their history point and event; returns [old, new] per field."""
+        concept = self.data["concepts"][concept_key]
+        seed_history(concept)
+        changes, previous = {}, {}
+        if mastery is not None:
+            previous['mastery'] = concept.get('mastery', 0)
+            concept['mastery'] = changes['mastery'] = mastery
+        if confidence is not None:
+            previous['confidence'] = concept.get('confidence', 'unknown')
+            concept['confidence'] = changes['confidence'] = confidence
+        updated = {field: [previous[field], changes[field]] for field in changes}
+        append_history(concept, concept.get('mastery', 0), concept.get('confidence', 'low'))
+
+        concept['last_reviewed'] = changes['last_reviewed'] = datetime.now().isoformat()
+        mark_dirty(self.data, concept=concept_key)
+        record_event(self.data, "update", concept_key, session=session, set=changes, prev=previous)
+        return updated
+
+    def _log_entry(self, name: str, field: str, label: str, text: str) -> Dict[str, Any]:
+        concept_key = self._key(name, f"Add it first: python student.py add \"{name}\" 0 low")
+        concept = self.data["concepts"][concept_key]
+
+        # Add the entry, unless it's a duplicate
+        entry_id = add_entry(concept_key, concept, field, text)
+        if entry_id is None:
+            return {"ok": True, "changed": False, "concept": concept_key,
+                    "message": f"This {label} already logged."}
+
+        concept['last_reviewed'] = datetime.now().isoformat()
+        mark_dirty(self.data, concept=concept_key)
+        record_event(self.data, label, concept_key,
+                     add={field: [text], ENTRY_ID_FIELDS[field]: [entry_id]},
+                     set={"last_reviewed": concept['last_reviewed']})
+        self.save()
+        return {"ok": True, "changed": True, "concept": concept_key, label: text, "id": entry_id}
+
+    def log_struggle(self, name: str, text: str) -> Dict[str, Any]:
+        return self._log_entry(name, 'struggles', 'struggle', text)
+
+    def log_breakthrough(self, name: str, text: str) -> Dict[str, Any]:
+        return self._log_entry(name, 'breakthroughs', 'breakthrough', text)
+
+    def link(self, name: str, related: str) -> Dict[str, Any]:
+        """Link a concept to a related one; an untracked one is linked by the name given."""
+        concept_key = self._key(name)
+        related_key = find_concept(self.data, related)
+        link_name = related_key or related
+        result = {"ok": True, "changed": False, "concept": concept_key, "related": link_name,
+                  "tracked": related_key is not None}
+
+        related_list = self.data["concepts"][concept_key].setdefault('related_concepts', [])
+        if any(r.lower() == link_name.lower() for r in related_list):
+            return result
+
+        related_list.append(link_name)
+        update_links(self.data, concept_key, added=[link_name])
+        mark_dirty(self.data, concept=concept_key)
+        record_event(self.data, "link", concept_key, add={"related_concepts": [link_name]})
+        self.save()
+        return dict(result, changed=True)
+
+    def unlink(self, name: str, related: str) -> Dict[str, Any]:
+        concept_key = self._key(name)
+        related_list = self.data["concepts"][concept_key].get('related_concepts', [])
+        removed = next((rel for rel in related_list if rel.lower() == related.lower()), None)
+        if not removed:
+            return {"ok": True, "changed": False, "concept": concept_key,
+                    "message": f"No link found between '{concept_key}' and '{related}'"}
+
+        related_list.remove(removed)
+        update_links(self.data, concept_key, removed=[removed])
+        mark_dirty(self.data, concept=concept_key)
+        record_event(self.data, "unlink", concept_key, remove={"related_concepts": [removed]})
+        self.save()
+        return {"ok": True, "changed": True, "concept": concept_key, "related": removed}
+
+    def link_many(self, lines: List[str], unlink: bool = False) -> Dict[str, Any]:
+        """
+        Link (or unlink) every "Concept -> Related" line in one save. Blank
+        lines and '#' comments are skipped; bad lines are reported in errors.
+        """
+        model = self.data
+        errors = []
+        missing: Dict[str, str] = {}      # casefold -> name as first written
+        edge_sets: Dict[str, set] = {}    # concept key -> casefolded related names
+        changed: Dict[str, List[str]] = {}
+        skipped = 0
+
+        for number, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            edge = parse_edge(line)
+            if edge is None:
+                errors.append(f"Line {number}: expected 'Concept -> Related', got '{line}'")
+                continue
+
+            concept_key = find_concept(model, edge[0])
+            if not concept_key:
+                errors.append(f"Line {number}: concept '{edge[0]}' not found")
+                continue
+            related_list = model["concepts"][concept_key].setdefault('related_concepts', [])
+            edges = edge_sets.get(concept_key)
+            if edges is None:
+                edges = edge_sets[concept_key] = {r.casefold() for r in related_list}
+
+            if unlink:
+                wanted = (find_concept(model, edge[1]) or edge[1]).casefold()
+                if wanted not in edges:
+                    skipped += 1
+                    continue
+                removed = next(r for r in related_list if r.casefold() == wanted)
+                related_list.remove(removed)
+                edges.discard(wanted)
+                changed.setdefault(concept_key, []).append(removed)
+                continue
+
+            link_name = find_concept(model, edge[1])
+            if not link_name:
+                link_name = missing.setdefault(edge[1].casefold(), edge[1])
+            if link_name.casefold() in edges:
+                skipped += 1
+                continue
+            related_list.append(link_name)
+            edges.add(link_name.casefold())
+            changed.setdefault(concept_key, []).append(link_name)
+
+        for concept_key, names in changed.items():
+            mark_dirty(model, concept=concept_key)
+            if unlink:
+                update_links(model, concept_key, removed=names)
+                record_event(model, "unlink", concept_key, remove={"related_concepts": names})
+            else:
+                update_links(model, concept_key, added=names)
+                record_event(model, "link", concept_key, add={"related_concepts": names})
+        if changed:
+            self.save()
+        return {"ok": True, "changed": bool(changed), "unlink": unlink, "edges": changed,
+                "skipped": skipped, "untracked": list(missing.values()), "errors": errors}
+
+    def rename(self, name: str, new_name: str) -> Dict[str, Any]:
+        """Rename a concept, rewriting every link and misconception that names it."""
+        old_key = self._key(name)
+        new_name = new_name.strip()
+        if not new_name or new_name.startswith('@'):
+            raise InvalidValueError(f"Invalid concept name: '{new_name}'")
+        existing = find_concept(self.data, new_name)
+        if existing and existing != old_key:
+            raise ConceptExistsError(
+                f"Concept '{existing}' already exists.",
+                f"Combine them with: python student.py merge \"{old_key}\" \"{existing}\"")
+        if new_name == old_key:
+            return {"ok": True, "changed": False, "concept": old_key,
+                    "message": f"'{old_key}' already has that name."}
+
+        touched = rename_concept(self.data, old_key, new_name)
+        record_event(self.data, "rename", new_name, old=old_key)
+        self.save()
+        return {"ok": True, "changed": True, "old": old_key, "concept": new_name,
+                "references": touched}
+
+    def merge(self, source: str, target: str) -> Dict[str, Any]:
+        """Merge one concept into another and delete the first."""
+        source_key = self._key(source)
+        target_key = self._key(target)
+        if source_key == target_key:
+            raise InvalidValueError(f"Cannot merge '{source_key}' into itself.")
+
+        touched = merge_concepts(self.data, source_key, target_key)
+        record_event(self.data, "merge", target_key, source=source_key)
+        self.save()
+        concept = self.data["concepts"][target_key]
+        return {"ok": True, "changed": True, "source": source_key, "concept": target_key,
+                "mastery": concept.get('mastery', 0),
+                "confidence": concept.get('confidence', 'unknown'), "references": touched}
+
+    def merge_file(self, other, base=None, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Fold another copy of this model (a path, or a model) into this one
+        and save, as a checkpoint (see MODEL DIFF AND MERGE). base is the
+        copy both descend from, if known. With dry_run nothing is saved and
+        the merged model is returned in "model".
+        """
+        theirs = self._other(other)
+        original = self._other(base) if base is not None else None
+        target = track(json.loads(json.dumps(self.data))) if dry_run else self.data
+        report = merge_models(target, theirs, original)
+        source = None if isinstance(other, dict) else str(other)
+        changed = any(report[k] for k in ("added", "updated", "removed", "misconceptions", "sessions"))
+        result = dict({"ok": True, "changed": changed and not dry_run, "source": source,
+                       "base": None if base is None or isinstance(base, dict) else str(base)},
+                      **report)
+        if dry_run:
+            result["model"] = target
+        elif changed:
+            record_event(target, "merge_file", source=source,
+                         summary={k: len(report[k]) for k in ("added", "updated", "removed")},
+                         concepts=report["added"] + report["updated"] + report["removed"])
+            self.save(checkpoint=True)
+        elif not report["conflicts"]:
+            result["message"] = f"Nothing to merge: {source or 'the other model'} adds nothing to this one."
+        return result
+
+    def session_end(self, updates: Sequence[Tuple[str, int, str]] = (),
+                    struggles: Sequence[Tuple[str, str]] = (),
+                    breakthroughs: Sequence[Tuple[str, str]] = ()) -> Dict[str, Any]:
+        """
+        Apply a session's changes in one save: updates as (concept, mastery,
+        confidence), struggles and breakthroughs as (concept, text). Items
+        that can't be applied are reported in errors; the rest still apply.
+        """
+        model = self.data
+        session = new_session_id()
+        changes, errors = [], []
+        counts = {"updates": 0, "struggles": 0, "breakthroughs": 0}
+
+        for concept_name, mastery, confidence in updates:
+            try:
+                self._check(mastery=mastery)
+            except InvalidValueError:
+                errors.append(f"Invalid mastery for '{concept_name}': {mastery!r} (must be 0-100)")
+                continue
+            try:
+                self._check(confidence=confidence)
+            except InvalidValueError:
+                errors.append(f"Invalid confidence for '{concept_name}': {confidence} (must be low/medium/high)")
+                continue
+            concept_key = find_concept(model, concept_name)
+            if not concept_key:
+                errors.append(f"Concept '{concept_name}' not found")
+                continue
+
+            updated = self._set(concept_key, mastery, confidence, session)
+            counts["updates"] += 1
+            changes.append(dict(op="update", concept=concept_key, **updated))
+
+        for label, field, entries in (("struggle", "struggles", struggles),
+                                      ("breakthrough", "breakthroughs", breakthroughs)):
+            for concept_name, description in entries:
+                concept_key = find_concept(model, concept_name)
+                if not concept_key:
+                    errors.append(f"Concept '{concept_name}' not found")
+                    continue
+                concept = model["concepts"][concept_key]
+
+                # Add the entry, unless it's a duplicate
+                entry_id = add_entry(concept_key, concept, field, description)
+                if entry_id is None:
+                    changes.append({"op": label, "concept": concept_key, "duplicate": True})
+                    continue
+
+                concept['last_reviewed'] = datetime.now().isoformat()
+                mark_dirty(model, concept=concept_key)
+                record_event(model, label, concept_key, session=session,
+                             add={field: [description], ENTRY_ID_FIELDS[field]: [entry_id]},
+                             set={"last_reviewed": concept['last_reviewed']})
+                counts[field] += 1
+                changes.append({"op": label, "concept": concept_key,
+                                "text": description, "id": entry_id})
+
+        saved = False
+        if changes:
+            if any(counts.values()):
+                record_event(model, "session_end", session=session, summary=counts)
+            try:
+                self.save()
+                saved = True
+            except SaveError:
+                pass
+        return {"ok": saved or not changes, "changed": saved, "session": session,
+                "changes": changes, "counts": counts, "errors": errors}
+
+    def add_misconception(self, concept: str, belief: str, correction: str) -> Dict[str, Any]:
+        concept_key = self._key(concept, f"Add it first: python student.py add \"{concept}\" 0 low")
+        index = misconception_index(self.data)
+        if index.has(concept_key, belief):
+            return {"ok": True, "changed": False, "concept": concept_key,
+                    "message": "This misconception already logged."}
+
+        misconception = {
+            "id": new_id(),
+            "concept": concept_key,
+            "belief": belief,
+            "correction": correction,
+            "date_identified": datetime.now().isoformat(),
+            "resolved": False,
+            "date_resolved": None
+        }
+        index.add(misconception)
+        mark_dirty(self.data, section="misconceptions")
+        record_event(self.data, "misconception_add", concept_key, misconception=misconception)
+        self.save()
+        return {"ok": True, "changed": True, "misconception": misconception}
+
+    def resolve_misconception(self, concept: str, ref: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Resolve a concept's misconception by its position among the
+        unresolved ones or by ID; resolve_misconception("@ID") needs no concept.
+        """
+        index = misconception_index(self.data)
+        if ref is None:
+            found = index.get(concept.lstrip('@'))
+            if found is None:
+                raise StudentModelError(f"No misconception with ID '{concept}'",
+                                        "Usage: python student.py misconception resolve CONCEPT INDEX|ID")
+            ref, concept = found[1]["id"], found[1]["concept"]
+        concept_key = self._key(concept)
+
+        unresolved = [(i, m) for i, m in index.for_concept(concept_key) if not m["resolved"]]
+        if not unresolved:
+            return {"ok": True, "changed": False, "concept": concept_key,
+                    "message": f"No unresolved misconceptions for '{concept_key}'"}
+
+        hint = f"Run: python student.py misconception list \"{concept_key}\" --unresolved"
+        ref = str(ref).lstrip('@')
+        if ref.isdigit():
+            if int(ref) >= len(unresolved):
+                raise InvalidValueError(f"Index {ref} out of range (0-{len(unresolved)-1})", hint)
+            position, misconception = unresolved[int(ref)]
+        else:
+            found = index.get(ref)
+            if found is None or found not in unresolved:
+                raise StudentModelError(
+                    f"No unresolved misconception '{ref}' for '{concept_key}'", hint)
+            position, misconception = found
+
+        misconception["resolved"] = True
+        misconception["date_resolved"] = datetime.now().isoformat()
+        mark_dirty(self.data, section="misconceptions")
+        record_event(self.data, "misconception_resolve", concept_key, index=position,
+                     id=misconception["id"], belief=misconception["belief"],
+                     set={"resolved": True, "date_resolved": misconception["date_resolved"]})
+        self.save()
+        return {"ok": True, "changed": True, "misconception": misconception}
+
+    def reshard(self, count: int) -> Dict[str, Any]:
+        """
+        Split concepts across count shard files (see SHARDED LAYOUT), or keep
+        them in the model file itself for 0. Takes effect with this save.
+        """
+        if not 0 <= count <= MAX_SHARDS:
+            raise InvalidValueError(f"Shard count must be 0-{MAX_SHARDS}, got {count}")
+        return self.set_layout("shards" if count else "file", count or 1)
+
+    def set_layout(self, kind: str, shards: int = 16) -> Dict[str, Any]:
+        """
+        Keep the model in a single file ("file"), split its concepts across
+        shards files ("shards", see SHARDED LAYOUT) or store one file per
+        concept ("concepts", see CONCEPT FILES LAYOUT). Takes effect with
+        this save, which also removes the files of the previous layout.
+        """
+        if kind not in LAYOUTS:
+            raise InvalidValueError(f"Layout must be one of: {', '.join(LAYOUTS)}; got '{kind}'")
+        if kind == "shards" and not 1 <= shards <= MAX_SHARDS:
+            raise InvalidValueError(f"Shard count must be 1-{MAX_SHARDS}, got {shards}")
+        self.data = track(self.data)
+        current = self.data.layout
+        previous = current.count if isinstance(current, ShardLayout) else 0
+        count = shards if kind == "shards" else 0
+        if kind == layout_name(current) and count == previous:
+            where = {"file": "kept in a single file", "shards": f"split into {count} shards",
+                     "concepts": "stored one file per concept"}[kind]
+            return {"ok": True, "changed": False, "layout": kind, "shards": count,
+                    "message": f"Concepts are already {where}."}
+
+        if current is not None and kind != layout_name(current):
+            self.data.retired = current
+        self.data.layout = {"file": None, "shards": ShardLayout(count) if count else None,
+                            "concepts": ConceptFiles()}[kind]
+        self.save()
+        return {"ok": True, "changed": True, "layout": kind, "shards": count,
+                "previous": previous, "previous_layout": layout_name(current),
+                "concepts": len(self.data['concepts']), "path": self.store.location}
+
+
+# =============================================================================
+# ASYNC API AND SERVER
+# =============================================================================
+#
+# For asyncio programs serving many students at once. Each student's model
+# stays loaded; calls on it run one at a time in the default thread pool, so
+# the event loop never blocks on the disk. A write is acknowledged once it
+# is on disk, and writes that queue up behind a running save are written
+# together by the next one: the model saves through a GroupCommitter that
+# the async wrapper flushes itself instead of a background thread.
+
+ASYNC_READS = ("stats", "concepts", "get_concept", "query", "related", "dependents", "context",
+               "misconceptions", "history", "trend", "export")
+ASYNC_WRITES = ("add_concept", "update", "log_struggle", "log_breakthrough", "link",
+                "unlink", "link_many", "rename", "merge", "session_end",
+                "add_misconception", "resolve_misconception")
+
+_STUDENT_NAME = re.compile(r'[A-Za-z0-9_-][A-Za-z0-9_.-]{0,63}\Z')
+# Larger request bodies are refused with 413 before any of it is read
+SERVER_MAX_BODY = 1 << 20
+
+
+def _fits(value: Any, annotation: Any) -> bool:
+    """Whether a decoded JSON value fits a parameter annotation (lists stand in for tuples)."""
+    if annotation is inspect.Parameter.empty or annotation is Any:
+        return True
+    origin, args = get_origin(annotation), get_args(annotation)
+    if origin is Union:
+        return any(_fits(value, arg) for arg in args)
+    if origin in (list, abc.Sequence):
+        return isinstance(value, list) and all(_fits(item, args[0]) for item in value)
+    if origin is tuple:
+        return (isinstance(value, list) and len(value) == len(args)
+                and all(map(_fits, value, args)))
+    if annotation is type(None):
+        return value is None
+    if annotation is int:
+        return isinstance(value, int) and not isinstance(value, bool)
+    return isinstance(annotation, type) and isinstance(value, annotation)
+
+
+def argument_errors(name: str, arguments: Dict[str, Any]) -> List[str]:
+    """What is wrong with JSON arguments for the StudentModel method name."""
+    try:
+        signature = inspect.signature(getattr(StudentModel, name))
+        signature.bind(None, **arguments)
+    except TypeError as e:
+        return [str(e)]
+    return [f"'{key}' has the wrong type ({type(value).__name__})"
+            for key, value in arguments.items()
+            if not _fits(value, signature.parameters[key].annotation)]
+
+
+class AsyncStudentModel:
+    """
+    StudentModel for asyncio code:
+
+        model = await AsyncStudentModel.open(path)
+        await model.update("React Hooks", mastery=70)
+
+    The methods named in ASYNC_READS and ASYNC_WRITES are coroutines taking
+    the same arguments as StudentModel's. The model should be the only
+    writer of its file while it is open.
+    """
+
+    def __init__(self, model: StudentModel):
+        if not isinstance(model.store, GroupCommitter):
+            model.store = GroupCommitter(store=model.store, background=False)
+        self.model = model
+        self._committer = model.store
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    async def open(cls, path: Optional[Path] = None, store=None) -> "AsyncStudentModel":
+        """Load the model at path (default DATA_FILE), or from store, in a worker thread."""
+        store = GroupCommitter(store=store if store is not None else FileStore(path),
+                               background=False)
+        return cls(await asyncio.to_thread(StudentModel, store))
+
+    @property
+    def writes(self) -> int:
+        """How many saves have been written; at most one per write call."""
+        return self._committer.writes
+
+    def __getattr__(self, name: str):
+        if name not in ASYNC_READS and name not in ASYNC_WRITES:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+        method = getattr(self.model, name)
+        committer = self._committer
+
+        def locked(*args, **kwargs):
+            with committer.lock:
+                return method(*args, **kwargs)
+
+        async def call(*args, **kwargs):
+            async with self._lock:
+                result = await asyncio.to_thread(locked, *args, **kwargs)
+                change = committer.submitted
+            if change > committer.committed:
+                await self.flush(change)
+            return result
+
+        call.__name__, call.__doc__ = name, method.__doc__
+        return call
+
+    async def flush(self, change: Optional[int] = None) -> None:
+        """Write unsaved changes (those up to change, if given); raises SaveError."""
+        committer = self._committer
+        async with self._lock:
+            if committer.committed >= (committer.submitted if change is None else change):
+                return
+            if not await asyncio.to_thread(committer.flush):
+                raise SaveError("Failed to save model")
+
+
+class StudentServer:
+    """
+    HTTP/JSON front end over a directory of student models, one file each:
+
+        POST /students/<student>/<method>   body: JSON object of arguments
+        GET  /students/<student>/<method>   for reads without arguments
+
+    <method> is a StudentModel method from ASYNC_READS or ASYNC_WRITES. The
+    response is its result dict; errors are {"ok": false, "error": ...,
+    "hints": [...]} with status 400, 404 for unknown paths and concepts, 413
+    for bodies over SERVER_MAX_BODY, or 500 when the method fails
+    unexpectedly. Connections are kept alive between requests, except after
+    a bad or refused Content-Length.
+    """
+
+    STATUS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+              413: "Payload Too Large", 500: "Internal Server Error"}
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.models: Dict[str, AsyncStudentModel] = {}
+        self._open_lock = asyncio.Lock()
+
+    async def model(self, student: str) -> AsyncStudentModel:
+        """The open model for student, loading it on first use."""
+        model = self.models.get(student)
+        if model is None:
+            async with self._open_lock:
+                model = self.models.get(student)
+                if model is None:
+                    self.root.mkdir(parents=True, exist_ok=True)
+                    model = await AsyncStudentModel.open(self.root / f"{student}.json")
+                    self.models[student] = model
+        return model
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8765):
+        """Start listening; returns the asyncio server."""
+        return await asyncio.start_server(self.handle, host, port)
+
+    async def dispatch(self, verb: str, target: str, body: bytes) -> tuple:
+        """Run one request. Returns (status, response dict)."""
+        parts = target.split('?', 1)[0].strip('/').split('/')
+        if len(parts) != 3 or parts[0] != "students" or not _STUDENT_NAME.match(parts[1]):
+            return 404, {"ok": False, "error": f"Unknown path '{target}'"}
+        student, name = parts[1], parts[2]
+        if name not in ASYNC_READS and name not in ASYNC_WRITES:
+            return 404, {"ok": False, "error": f"Unknown method '{name}'"}
+        if verb not in ("GET", "POST") or (verb == "GET" and name in ASYNC_WRITES):
+            return 405, {"ok": False, "error": f"{name} needs POST"}
+
+        try:
+            arguments = json.loads(body) if body.strip() else {}
+        except ValueError as e:
+            return 400, {"ok": False, "error": f"Invalid JSON: {e}"}
+        if not isinstance(arguments, dict):
+            return 400, {"ok": False, "error": "Arguments must be a JSON object"}
+        errors = argument_errors(name, arguments)
+        if errors:
+            return 400, {"ok": False, "error": f"Invalid arguments for {name}: {'; '.join(errors)}"}
+
+        try:
+            model = await self.model(student)
+            return 200, await getattr(model, name)(**arguments)
+        except StudentModelError as e:
+            status = 404 if isinstance(e, ConceptNotFoundError) else 400
+            return status, {"ok": False, "error": str(e), "hints": list(e.hints)}
+        except Exception as e:
+            # Answer rather than drop the connection; the model is unchanged
+            # unless the failure came after its save
+            return 500, {"ok": False, "error": f"{name} failed: {type(e).__name__}: {e}"}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve requests on one connection until it closes."""
+        try:
+            while True:
+                request = await reader.readline()
+                if not request.strip():
+                    break
+                try:
+                    verb, target, version = request.decode('latin-1').split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    field, _, value = line.decode('latin-1').partition(':')
+                    headers[field.strip().lower()] = value.strip()
+                keep_alive = (version == "HTTP/1.1"
+                              and headers.get('connection', '').lower() != 'close')
+                length = headers.get('content-length') or '0'
+                if not length.isdigit():
+                    # The body can't be skipped without knowing its length
+                    status, keep_alive = 400, False
+                    response = {"ok": False, "error": f"Invalid Content-Length '{length}'"}
+                elif int(length) > SERVER_MAX_BODY:
+                    status, keep_alive = 413, False
+                    response = {"ok": False, "error": f"Request body over {SERVER_MAX_BODY} bytes"}
+                else:
+                    body = await reader.readexactly(int(length))
+                    status, response = await self.dispatch(verb, target, body)
+                data = json.dumps(response, ensure_ascii=False).encode('utf-8')
+                writer.write(f"HTTP/1.1 {status} {self.STATUS[status]}\r\n"
+                             f"Content-Type: application/json\r\n"
+                             f"Content-Length: {len(data)}\r\n"
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                             .encode('latin-1') + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+# =============================================================================
+# OUTPUT
+# =============================================================================
+#
+# Command handlers describe what they did as a result dict of plain JSON
+# data and hand it to emit() along with a text renderer. In text mode the
+# renderer prints the usual report; with --json the result is printed as one
+# compact object, and with --jsonl a listing prints one item per line.
+# Diagnostics printed along the way (recovery, backup warnings) go to stderr
+# in the JSON modes, so stdout holds nothing but results.
+
+_results_stream = None   # stdout while main() routes other prints to stderr
+
+
+def _print_json(value: Any) -> None:
+    print(json.dumps(value, ensure_ascii=False, separators=(',', ':')),
+          file=_results_stream or sys.stdout)
+
+
+def emit(result: Dict[str, Any], render=None, items: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Output a command result: render(result) in text mode, otherwise as
+    JSON. items names the list that --jsonl prints one entry per line.
+    """
+    if OUTPUT == "text":
+        if render is not None:
+            render(result)
+    elif OUTPUT == "jsonl" and items is not None:
+        for item in result[items]:
+            _print_json(item)
+    else:
+        _print_json(result)
+    return result
+
+
+def fail(message: str, *hints: str, **fields) -> Dict[str, Any]:
+    """Report a command that did nothing because of an error."""
+    def render(result):
+        print(f"❌ {message}")
+        for hint in hints:
+            print(f"   {hint}")
+    return emit(dict({"ok": False, "error": message}, **fields), render)
+
+
+def notice(message: str, *hints: str, **fields) -> Dict[str, Any]:
+    """Report a command that had nothing to change."""
+    def render(result):
+        print(f"ℹ️  {message}")
+        for hint in hints:
+            print(f"   {hint}")
+    return emit(dict({"ok": True, "changed": False, "message": message}, **fields), render)
+
+
+def _date(value: Any, missing: str) -> str:
+    """The date part of an ISO timestamp for display."""
+    return value.split('T')[0] if isinstance(value, str) else missing
+
+
 # =============================================================================
 # CLI COMMAND HANDLERS
 # =============================================================================
 
 # PHASE 1: Core commands
 
+def open_model(args) -> Optional[StudentModel]:
+    """
+    The model a command works on: the current one, or for a read command's
+    --as-of the reconstruction. Reports the problem and returns None if it
+    can't be rebuilt.
+    """
+    store = FileStore(echo=True)
+    as_of = getattr(args, 'as_of', None)
+    if not as_of:
+        return StudentModel(store)
+    try:
+        model = StudentModel.as_of(as_of, store)
+    except StudentModelError as e:
+        fail(str(e), *e.hints)
+        return None
+    if OUTPUT == "text":
+        print(f"🕰️  As of {as_of}\n")
+    return model
+
+
+def run_api(call, render=None, items: Optional[str] = None, hints=()) -> Dict[str, Any]:
+    """
+    Emit the result of a StudentModel call. Errors it raises are reported
+    with fail(); a result that changed nothing is reported with notice().
+    """
+    try:
+        result = call()
+    except StudentModelError as e:
+        return fail(str(e), *e.hints)
+    if result.get("changed") is False and "message" in result:
+        fields = {k: v for k, v in result.items() if k not in ("ok", "changed", "message")}
+        return notice(result["message"], *hints, **fields)
+    return emit(result, render, items)
+
+
 def cmd_init(args):
     """Initialize a new student model."""
-    initialize_model(args.profile if hasattr(args, 'profile') else "")
+    model = initialize_model(args.profile if hasattr(args, 'profile') else "")
+    # initialize_model reports to the user itself
+    return emit({"ok": DATA_FILE.exists(), "path": str(DATA_FILE),
+                 "created": model["metadata"].get("created"),
+                 "profile": model["metadata"].get("student_profile", "")})
 
-def cmd_info(args):
-    """Show model metadata and statistics."""
-    model = load_model()
 
+def _render_info(result):
     print("📊 Student Model Information")
-    print(f"   Location:      {DATA_FILE}")
-    print(f"   Created:       {model['metadata']['created'].split('T')[0]}")
-    print(f"   Last Updated:  {model['metadata']['last_updated'].split('T')[0]}")
+    print(f"   Location:      {result['path']}")
+    print(f"   Created:       {result['created'].split('T')[0]}")
+    print(f"   Last Updated:  {result['last_updated'].split('T')[0]}")
 
-    if model['metadata'].get('student_profile'):
-        print(f"   Profile:       {model['metadata']['student_profile']}")
+    if result['profile']:
+        print(f"   Profile:       {result['profile']}")
 
-    print(f"\n   Total Concepts: {len(model['concepts'])}")
-    print(f"   Total Sessions: {len(model['sessions'])}")
+    print(f"\n   Total Concepts: {result['concepts']}")
+    if result.get('shards'):
+        print(f"   Shards:         {result['shards']}")
+    elif result.get('layout') == "concepts":
+        print("   Layout:         one file per concept")
+    print(f"   Total Sessions: {result['sessions']}")
+    print(f"   Logged Events:  {result['events']}")
 
-    if model['concepts']:
-        masteries = [c.get('mastery', 0) for c in model['concepts'].values()]
-        avg_mastery = sum(masteries) / len(masteries)
-        print(f"   Avg Mastery:    {avg_mastery:.1f}%")
+    if result['concepts']:
+        print(f"   Avg Mastery:    {result['avg_mastery']:.1f}%")
+        print(f"   Avg Effective:  {result['avg_effective']:.1f}%")
 
 
-# PHASE 2: Read operations
+def cmd_info(args):
+    """Show model metadata and statistics."""
+    model = open_model(args)
+    if model is None:
+        return
+    return run_api(model.stats, _render_info)
 
-def cmd_list(args):
-    """List all concepts with summary info."""
-    model = load_model()
 
-    if not model['concepts']:
+# PHASE 2: Read operations
+
+def _render_list(result):
+    if not result['concepts'] and result.get('where'):
+        print(f"📚 No concepts match: {result['where']}")
+        return
+    if not result['concepts']:
         print("📚 No concepts tracked yet.")
         print("   Add your first concept with: python student.py add \"Concept Name\" 50 medium")
         return
 
-    print(f"📚 Tracked Concepts ({len(model['concepts'])} total)\n")
-
-    # Sort by mastery (descending) for better overview
-    sorted_concepts = sorted(
-        model['concepts'].items(),
-        key=lambda x: x[1].get('mastery', 0),
-        reverse=True
-    )
-
-    for name, data in sorted_concepts:
-        mastery = data.get('mastery', 0)
-        confidence = data.get('confidence', 'unknown')
-        last_reviewed = data.get('last_reviewed', 'never')
+    if result.get('where'):
+        print(f"📚 Concepts matching {result['where']} ({len(result['concepts'])})\n")
+    else:
+        print(f"📚 Tracked Concepts ({len(result['concepts'])} total)\n")
 
-        # Format last reviewed date
-        if last_reviewed != 'never':
-            last_reviewed = last_reviewed.split('T')[0]
+    for item in result['concepts']:
+        mastery = item['effective']
+        stored = item['mastery']
+        confidence = item['confidence']
+        last_reviewed = _date(item['last_reviewed'], 'never')
 
         # Mastery indicator
         if mastery >= 80:
@@ -253,471 +6273,427 @@ def cmd_list(args):
         if confidence == "low":
             conf_display = "⚠️  low"
 
-        print(f"{indicator} {name:<40} {mastery:>3}%  {conf_display:<12} (last: {last_reviewed})")
+        decayed = f"now {mastery}%" if mastery < stored else ""
+        print(f"{indicator} {item['concept']:<40} {stored:>3}% {decayed:<8}  {conf_display:<12} (last: {last_reviewed})")
 
-    print(f"\nLegend: ✅ 80%+  🟡 60-79%  🟠 40-59%  🔴 <40%")
+    print(f"\nLegend: ✅ 80%+  🟡 60-79%  🟠 40-59%  🔴 <40%  (by effective mastery: 'now' after forgetting)")
 
 
-def cmd_show(args):
-    """Show detailed information about a specific concept."""
-    model = load_model()
-    concept_key = find_concept(model, args.concept_name)
-
-    if not concept_key:
-        print(f"❌ Concept '{args.concept_name}' not found.")
-        print(f"   Run 'python student.py list' to see tracked concepts.")
+def cmd_list(args):
+    """List all concepts with summary info."""
+    model = open_model(args)
+    if model is None:
         return
+    return run_api(lambda: model.concepts(where=getattr(args, 'where', None)),
+                   _render_list, items="concepts")
 
-    concept = model['concepts'][concept_key]
 
-    print(f"📊 Concept: {concept_key}")
-    print(f"   Mastery:          {concept.get('mastery', 'N/A')}%")
-    print(f"   Confidence:       {concept.get('confidence', 'N/A')}")
+def _render_show(result):
+    print(f"📊 Concept: {result['concept']}")
+    print(f"   ID:               @{result['id']}")
+    print(f"   Mastery:          {result['mastery']}%")
+    if result['effective'] != result['mastery']:
+        print(f"   Effective:        {result['effective']}% (decayed since last review)")
+    print(f"   Confidence:       {result['confidence']}")
 
     # Dates
-    first = concept.get('first_encountered', 'N/A')
-    last = concept.get('last_reviewed', 'N/A')
-    if first != 'N/A':
-        first = first.split('T')[0]
-    if last != 'N/A':
-        last = last.split('T')[0]
-
-    print(f"   First Encountered: {first}")
-    print(f"   Last Reviewed:     {last}")
+    print(f"   First Encountered: {_date(result['first_encountered'], 'N/A')}")
+    print(f"   Last Reviewed:     {_date(result['last_reviewed'], 'N/A')}")
 
     # Struggles
-    struggles = concept.get('struggles', [])
-    if struggles:
+    if result['struggles']:
         print(f"   ⚠️  Struggles:")
-        for struggle in struggles:
-            print(f"      - {struggle}")
+        for entry in result['struggles']:
+            print(f"      - {entry['text']}  ({entry['id']})")
 
     # Breakthroughs
-    breakthroughs = concept.get('breakthroughs', [])
-    if breakthroughs:
+    if result['breakthroughs']:
         print(f"   💡 Breakthroughs:")
-        for breakthrough in breakthroughs:
-            print(f"      - {breakthrough}")
+        for entry in result['breakthroughs']:
+            print(f"      - {entry['text']}  ({entry['id']})")
 
     # Related concepts
-    related = concept.get('related_concepts', [])
-    if related:
+    if result['related']:
         print(f"   🔗 Related Concepts:")
-        for rel_name in related:
-            rel_key = find_concept(model, rel_name)
-            if rel_key and rel_key in model['concepts']:
-                rel_data = model['concepts'][rel_key]
-                rel_mastery = rel_data.get('mastery', 0)
-                rel_last = rel_data.get('last_reviewed', 'never')
-                if rel_last != 'never':
-                    rel_last = rel_last.split('T')[0]
-
-                # Flag low mastery prerequisites
-                if rel_mastery < 60:
-                    print(f"      - {rel_name} (Mastery: {rel_mastery}%, Last: {rel_last}) ⚠️ LOW")
-                else:
-                    print(f"      - {rel_name} (Mastery: {rel_mastery}%, Last: {rel_last}) ✓")
+        for rel in result['related']:
+            if rel['tracked']:
+                rel_last = _date(rel['last_reviewed'], 'never')
+                if rel['effective'] < rel['mastery']:
+                    rel_last += f", now {rel['effective']}%"
+                flag = "⚠️ LOW" if rel['low'] else "✓"
+                print(f"      - {rel['concept']} (Mastery: {rel['mastery']}%, Last: {rel_last}) {flag}")
             else:
-                print(f"      - {rel_name} (not tracked)")
+                print(f"      - {rel['concept']} (not tracked)")
 
 
-def cmd_related(args):
-    """Show concepts related to a specific concept."""
-    model = load_model()
-    concept_key = find_concept(model, args.concept_name)
+def cmd_show(args):
+    """Show detailed information about a specific concept."""
+    model = open_model(args)
+    if model is None:
+        return
+    return run_api(lambda: model.get_concept(args.concept_name), _render_show)
+
+
+def _render_query(result):
+    fields = result["fields"]
+    print(f"📋 Query: {len(result['concepts'])} concept(s)")
+
+    for item in result["concepts"]:
+        print(f"\n📊 {item['concept']}" + (f"  @{item['id']}" if 'id' in fields else ""))
+        if 'mastery' in item:
+            decayed = item.get('effective', item['mastery']) != item['mastery']
+            print(f"   Mastery: {item['mastery']}%" + (f" (now {item['effective']}%)" if decayed else ""))
+        elif 'effective' in item:
+            print(f"   Effective: {item['effective']}%")
+        if 'confidence' in fields:
+            print(f"   Confidence: {item['confidence']}")
+        if 'first_encountered' in fields:
+            print(f"   First Encountered: {_date(item['first_encountered'], 'N/A')}")
+        if 'last_reviewed' in fields:
+            print(f"   Last Reviewed: {_date(item['last_reviewed'], 'N/A')}")
+        for field, label in (('struggles', '⚠️  Struggles'), ('breakthroughs', '💡 Breakthroughs')):
+            if item.get(field):
+                print(f"   {label}:")
+                for entry in item[field]:
+                    print(f"      - {entry['text']}  ({entry['id']})")
+        if item.get('related'):
+            print(f"   🔗 Related: {', '.join(item['related'])}")
+
+    if result["related"]:
+        print(f"\n🔗 Related concepts across the batch ({len(result['related'])}):")
+        for rel in result["related"]:
+            if rel['tracked']:
+                rel_last = _date(rel['last_reviewed'], 'never')
+                if rel['effective'] < rel['mastery']:
+                    rel_last += f", now {rel['effective']}%"
+                flag = "⚠️ LOW" if rel['low'] else "✓"
+                print(f"   - {rel['concept']} (Mastery: {rel['mastery']}%, Last: {rel_last}) {flag}")
+            else:
+                print(f"   - {rel['concept']} (not tracked)")
 
-    if not concept_key:
-        print(f"❌ Concept '{args.concept_name}' not found.")
+    if result["missing"]:
+        print(f"\n❌ Not found: {', '.join(result['missing'])}")
+
+
+def cmd_query(args):
+    """
+    Show several concepts from one load: names from the command line and/or
+    a file (one per line, '-' for stdin), cut down to --fields.
+    """
+    names = list(args.concept_names)
+    if args.file:
+        try:
+            if args.file == '-':
+                lines = sys.stdin.read().splitlines()
+            else:
+                lines = Path(args.file).read_text(encoding='utf-8').splitlines()
+        except OSError as e:
+            return fail(f"Could not read concept names: {e}")
+        names += [line.strip() for line in lines
+                  if line.strip() and not line.strip().startswith('#')]
+    if not names:
+        return fail("No concepts given",
+                    "Usage: python student.py query CONCEPT... [--file FILE|-] [--fields a,b]")
+
+    model = open_model(args)
+    if model is None:
         return
+    fields = [f.strip() for f in args.fields.split(',') if f.strip()] if args.fields else None
+    return run_api(lambda: model.query(names, fields), _render_query, items="concepts")
 
-    concept = model['concepts'][concept_key]
-    related = concept.get('related_concepts', [])
 
-    if not related:
-        print(f"🔗 No related concepts tracked for '{concept_key}'")
-        print(f"   Link concepts with: python student.py link \"{concept_key}\" \"Related Concept\"")
+def cmd_export(args):
+    """
+    Write the concepts matching --where (default: all) as a standalone
+    model, to --output or to stdout.
+    """
+    model = open_model(args)
+    if model is None:
         return
+    where = getattr(args, 'where', None)
+    output = getattr(args, 'output', None)
 
-    print(f"🔗 Concepts related to '{concept_key}':")
+    def call():
+        result = model.export(where)
+        if output:
+            path = Path(output).expanduser()
+            try:
+                path.write_text(json.dumps(result["model"], indent=2, ensure_ascii=False) + "\n",
+                                encoding='utf-8')
+            except OSError as e:
+                raise StudentModelError(f"Could not write export: {e}") from e
+            result["path"] = str(path)
+        return result
+
+    def render(result):
+        if "path" in result:
+            scope = f" matching {result['where']}" if result['where'] else ""
+            print(f"✅ Exported {result['concepts']} concept(s){scope} to {result['path']}")
+        else:
+            print(json.dumps(result["model"], indent=2, ensure_ascii=False))
 
-    for rel_name in related:
-        rel_key = find_concept(model, rel_name)
-        if rel_key and rel_key in model['concepts']:
-            rel_data = model['concepts'][rel_key]
-            rel_mastery = rel_data.get('mastery', 0)
-            rel_confidence = rel_data.get('confidence', 'unknown')
-            rel_last = rel_data.get('last_reviewed', 'never')
+    return run_api(call, render)
 
-            if rel_last != 'never':
-                rel_last = rel_last.split('T')[0]
 
-            # Status indicator
-            if rel_mastery < 60:
-                status = "⚠️ LOW"
-            else:
-                status = "✓"
+def _render_related(result):
+    if not result['related']:
+        print(f"🔗 No related concepts tracked for '{result['concept']}'")
+        print(f"   Link concepts with: python student.py link \"{result['concept']}\" \"Related Concept\"")
+        return
 
-            print(f"   - {rel_name:<40} {rel_mastery:>3}%  {rel_confidence:<10}  (last: {rel_last}) {status}")
-        else:
-            print(f"   - {rel_name} (not tracked yet)")
+    print(f"🔗 Concepts related to '{result['concept']}':")
+    for rel in result['related']:
+        if rel['tracked']:
+            rel_last = _date(rel['last_reviewed'], 'never')
+            if rel['effective'] < rel['mastery']:
+                rel_last += f", now {rel['effective']}%"
 
+            # Status indicator (after forgetting)
+            status = "⚠️ LOW" if rel['low'] else "✓"
 
-# PHASE 3: Write operations
+            print(f"   - {rel['concept']:<40} {rel['mastery']:>3}%  {rel['confidence']:<10}  (last: {rel_last}) {status}")
+        else:
+            print(f"   - {rel['concept']} (not tracked yet)")
 
-def cmd_add(args):
-    """Add a new concept."""
-    model = load_model()
 
-    # Check for existing concept
-    if find_concept(model, args.concept_name):
-        print(f"❌ Concept '{args.concept_name}' already exists.")
-        print(f"   Use 'python student.py update' to modify it.")
+def cmd_related(args):
+    """Show concepts related to a specific concept."""
+    model = open_model(args)
+    if model is None:
         return
+    return run_api(lambda: model.related(args.concept_name), _render_related, items="related")
 
-    # Validate mastery range
-    if not (0 <= args.mastery <= 100):
-        print(f"❌ Mastery must be 0-100, got {args.mastery}")
-        return
 
-    # Validate confidence (argparse choices handles this, but be explicit)
-    if args.confidence not in ['low', 'medium', 'high']:
-        print(f"❌ Confidence must be: low, medium, or high")
+def cmd_context(args):
+    """Print a concept neighbourhood for a tutor prompt, as markdown or JSON."""
+    model = open_model(args)
+    if model is None:
         return
 
-    # Create new concept
-    model["concepts"][args.concept_name] = {
-        "mastery": args.mastery,
-        "confidence": args.confidence,
-        "first_encountered": datetime.now().isoformat(),
-        "last_reviewed": datetime.now().isoformat(),
-        "struggles": [],
-        "breakthroughs": [],
-        "related_concepts": []
-    }
+    def render(context):
+        if args.format == 'json':
+            print(json.dumps(context, ensure_ascii=False, separators=(',', ':')))
+        else:
+            print(context_markdown(context))
 
-    # Handle related concepts if provided
-    if hasattr(args, 'related') and args.related:
-        related_list = [r.strip() for r in args.related.split(',')]
-        model["concepts"][args.concept_name]["related_concepts"] = related_list
+    return run_api(lambda: model.context(args.concept_names, hops=args.hops, budget=args.budget),
+                   render, items="concepts")
 
-        # Warn about untracked related concepts
-        for rel in related_list:
-            if not find_concept(model, rel):
-                print(f"⚠️  Related concept '{rel}' not tracked yet.")
-
-    if save_model(model):
-        print(f"✅ Added concept: '{args.concept_name}'")
-        print(f"   Mastery: {args.mastery}%")
-        print(f"   Confidence: {args.confidence}")
-        if hasattr(args, 'related') and args.related:
-            print(f"   Related: {args.related}")
-    else:
-        print("❌ Failed to save model")
 
+def _render_dependents(result):
+    concept_key = result['concept']
+    if not result['dependents']:
+        print(f"🧩 Nothing builds on '{concept_key}' yet.")
+        print(f"   Concepts build on it when they link to it: python student.py link \"Concept\" \"{concept_key}\"")
+        return
+
+    scope = "directly or indirectly" if result['transitive'] else "directly"
+    print(f"🧩 Concepts building on '{concept_key}' {scope} ({len(result['dependents'])}):")
+    for item in result['dependents']:
+        route = "" if item['depth'] == 1 else f"  (via {item['via']})"
+        print(f"   {'  ' * (item['depth'] - 1)}- {item['concept']:<40} {item['mastery']:>3}%{route}")
 
-def cmd_update(args):
-    """Update an existing concept's mastery and/or confidence."""
-    model = load_model()
-    concept_key = find_concept(model, args.concept_name)
 
-    if not concept_key:
-        print(f"❌ Concept '{args.concept_name}' not found.")
-        print(f"   Run 'python student.py list' to see tracked concepts.")
+def cmd_dependents(args):
+    """Show concepts that build on a concept (link to it), directly or transitively."""
+    model = open_model(args)
+    if model is None:
         return
+    return run_api(lambda: model.dependents(args.concept_name, transitive=args.transitive),
+                   _render_dependents, items="dependents")
 
-    concept = model["concepts"][concept_key]
-    updated = []
 
-    # Update mastery if provided
-    if args.mastery is not None:
-        if not (0 <= args.mastery <= 100):
-            print(f"❌ Mastery must be 0-100, got {args.mastery}")
-            return
+# PHASE 3: Write operations
 
-        old = concept.get('mastery', 0)
-        concept['mastery'] = args.mastery
-        updated.append(f"mastery {old}% → {args.mastery}%")
+def cmd_add(args):
+    """Add a new concept."""
+    model = open_model(args)
+    related = []
+    if hasattr(args, 'related') and args.related:
+        related = [r.strip() for r in args.related.split(',')]
 
-    # Update confidence if provided
-    if args.confidence is not None:
-        if args.confidence not in ['low', 'medium', 'high']:
-            print(f"❌ Confidence must be: low, medium, or high")
-            return
+    def render(result):
+        # Warn about untracked related concepts
+        for rel in result['untracked']:
+            print(f"⚠️  Related concept '{rel}' not tracked yet.")
+        print(f"✅ Added concept: '{result['concept']}'")
+        print(f"   Mastery: {result['mastery']}%")
+        print(f"   Confidence: {result['confidence']}")
+        if related:
+            print(f"   Related: {args.related}")
+        print(f"   ID: @{result['id']}")
 
-        old = concept.get('confidence', 'unknown')
-        concept['confidence'] = args.confidence
-        updated.append(f"confidence {old} → {args.confidence}")
+    return run_api(lambda: model.add_concept(args.concept_name, args.mastery,
+                                             args.confidence, related), render)
 
-    # Always update last_reviewed timestamp
-    concept['last_reviewed'] = datetime.now().isoformat()
 
-    if updated:
-        if save_model(model):
-            print(f"✅ Updated '{concept_key}':")
-            for change in updated:
-                print(f"   {change}")
+def _render_update(result):
+    print(f"✅ Updated '{result['concept']}':")
+    for field, (old, new) in result['changes'].items():
+        if field == 'mastery':
+            print(f"   mastery {old}% → {new}%")
         else:
-            print("❌ Failed to save model")
-    else:
-        print("ℹ️  No changes specified")
-        print("   Use --mastery N or --confidence [low|medium|high]")
+            print(f"   confidence {old} → {new}")
 
 
-def cmd_struggle(args):
-    """Log a struggle with a concept."""
-    model = load_model()
-    concept_key = find_concept(model, args.concept_name)
-
-    if not concept_key:
-        print(f"❌ Concept '{args.concept_name}' not found.")
-        print(f"   Add it first: python student.py add \"{args.concept_name}\" 0 low")
-        return
+def cmd_update(args):
+    """Update an existing concept's mastery and/or confidence."""
+    model = open_model(args)
+    return run_api(lambda: model.update(args.concept_name, args.mastery, args.confidence),
+                   _render_update, hints=("Use --mastery N or --confidence [low|medium|high]",))
 
-    concept = model["concepts"][concept_key]
 
-    # Check for duplicate struggles
-    struggles = concept.get('struggles', [])
-    if args.description in struggles:
-        print(f"ℹ️  This struggle already logged.")
-        return
+def _render_entry(label: str):
+    def render(result):
+        print(f"✅ Logged {label} for '{result['concept']}'")
+        print(f"   {'💡 ' if label == 'breakthrough' else ''}\"{result[label]}\"")
+    return render
 
-    # Add the struggle
-    concept.setdefault('struggles', []).append(args.description)
-    concept['last_reviewed'] = datetime.now().isoformat()
 
-    if save_model(model):
-        print(f"✅ Logged struggle for '{concept_key}'")
-        print(f"   \"{args.description}\"")
-    else:
-        print("❌ Failed to save model")
+def cmd_struggle(args):
+    """Log a struggle with a concept."""
+    model = open_model(args)
+    return run_api(lambda: model.log_struggle(args.concept_name, args.description),
+                   _render_entry('struggle'))
 
 
 def cmd_breakthrough(args):
     """Log a breakthrough with a concept."""
-    model = load_model()
-    concept_key = find_concept(model, args.concept_name)
-
-    if not concept_key:
-        print(f"❌ Concept '{args.concept_name}' not found.")
-        print(f"   Add it first: python student.py add \"{args.concept_name}\" 0 low")
-        return
+    model = open_model(args)
+    return run_api(lambda: model.log_breakthrough(args.concept_name, args.description),
+                   _render_entry('breakthrough'))
 
-    concept = model["concepts"][concept_key]
 
-    # Check for duplicate breakthroughs
-    breakthroughs = concept.get('breakthroughs', [])
-    if args.description in breakthroughs:
-        print(f"ℹ️  This breakthrough already logged.")
-        return
-
-    # Add the breakthrough
-    concept.setdefault('breakthroughs', []).append(args.description)
-    concept['last_reviewed'] = datetime.now().isoformat()
-
-    if save_model(model):
-        print(f"✅ Logged breakthrough for '{concept_key}'")
-        print(f"   💡 \"{args.description}\"")
+def _render_link(result):
+    if not result['tracked']:
+        print(f"⚠️  '{result['related']}' not tracked yet.")
+        print(f"   Link will be created, but you should add it:")
+        print(f"   python student.py add \"{result['related']}\" 0 low")
+    if result['changed']:
+        print(f"✅ Linked '{result['concept']}' → '{result['related']}'")
     else:
-        print("❌ Failed to save model")
+        print(f"ℹ️  Already linked.")
 
 
 def cmd_link(args):
     """Link two concepts (create prerequisite relationship)."""
-    model = load_model()
-
-    # Find both concepts
-    concept_key = find_concept(model, args.concept_name)
-    related_key = find_concept(model, args.related_concept)
+    model = open_model(args)
+    return run_api(lambda: model.link(args.concept_name, args.related_concept), _render_link)
 
-    if not concept_key:
-        print(f"❌ Concept '{args.concept_name}' not found.")
-        return
 
-    # Warn if related concept doesn't exist yet
-    if not related_key:
-        print(f"⚠️  '{args.related_concept}' not tracked yet.")
-        print(f"   Link will be created, but you should add it:")
-        print(f"   python student.py add \"{args.related_concept}\" 0 low")
-        # Use the provided name as-is
-        link_name = args.related_concept
-    else:
-        # Use the exact key from the model
-        link_name = related_key
+def cmd_unlink(args):
+    """Remove a link between two concepts."""
+    model = open_model(args)
+    return run_api(lambda: model.unlink(args.concept_name, args.related_concept),
+                   lambda result: print(f"✅ Unlinked '{result['concept']}' ✗ '{result['related']}'"))
 
-    concept = model["concepts"][concept_key]
-    related_list = concept.setdefault('related_concepts', [])
 
-    # Check for duplicates (case-insensitive)
-    if any(r.lower() == link_name.lower() for r in related_list):
-        print(f"ℹ️  Already linked.")
+def _render_link_batch(result):
+    unlink, skipped, missing = result['unlink'], result['skipped'], result['untracked']
+    if result['errors']:
+        print("❌ Errors encountered:")
+        for error in result['errors']:
+            print(f"   {error}")
+        print()
+    if not result['changed']:
+        print(f"ℹ️  No changes to apply ({skipped} skipped as already {'absent' if unlink else 'linked'})")
         return
+    if missing:
+        print(f"⚠️  {len(missing)} linked concept(s) not tracked yet:")
+        for name in missing:
+            print(f"   python student.py add \"{name}\" 0 low")
+        print()
+    total = sum(len(names) for names in result['edges'].values())
+    verb = "Unlinked" if unlink else "Linked"
+    note = f", {skipped} skipped" if skipped else ""
+    print(f"✅ {verb} {total} edge(s) across {len(result['edges'])} concept(s){note}")
 
-    # Add the link
-    related_list.append(link_name)
 
-    if save_model(model):
-        print(f"✅ Linked '{concept_key}' → '{link_name}'")
-    else:
-        print("❌ Failed to save model")
+def cmd_link_batch(args):
+    """
+    Link (or with --unlink, unlink) many concept pairs in one save.
 
+    Reads one edge per line from a file, or stdin when the file is '-':
+        Concept -> Related
+    Blank lines and lines starting with '#' are skipped.
+    """
+    try:
+        if args.file == '-':
+            lines = sys.stdin.read().splitlines()
+        else:
+            lines = Path(args.file).read_text(encoding='utf-8').splitlines()
+    except OSError as e:
+        return fail(f"Could not read edges: {e}")
 
-def cmd_unlink(args):
-    """Remove a link between two concepts."""
-    model = load_model()
+    model = open_model(args)
+    return run_api(lambda: model.link_many(lines, unlink=getattr(args, 'unlink', False)),
+                   _render_link_batch)
 
-    concept_key = find_concept(model, args.concept_name)
 
-    if not concept_key:
-        print(f"❌ Concept '{args.concept_name}' not found.")
-        return
+def cmd_rename(args):
+    """Rename a concept, rewriting every link and misconception that names it."""
+    model = open_model(args)
 
-    concept = model["concepts"][concept_key]
-    related_list = concept.get('related_concepts', [])
+    def render(result):
+        print(f"✅ Renamed '{result['old']}' → '{result['concept']}'")
+        print(f"   {result['references']} reference(s) updated")
 
-    # Find the related concept to remove (case-insensitive)
-    removed = None
-    for rel in related_list:
-        if rel.lower() == args.related_concept.lower():
-            removed = rel
-            break
+    return run_api(lambda: model.rename(args.concept_name, args.new_name), render)
 
-    if not removed:
-        print(f"ℹ️  No link found between '{concept_key}' and '{args.related_concept}'")
-        return
 
-    # Remove the link
-    related_list.remove(removed)
+def cmd_merge(args):
+    """Merge one concept into another and delete the first."""
+    model = open_model(args)
 
-    if save_model(model):
-        print(f"✅ Unlinked '{concept_key}' ✗ '{removed}'")
-    else:
-        print("❌ Failed to save model")
+    def render(result):
+        print(f"✅ Merged '{result['source']}' into '{result['concept']}'")
+        print(f"   Mastery: {result['mastery']}% ({result['confidence']})")
+        print(f"   {result['references']} reference(s) updated")
+
+    return run_api(lambda: model.merge(args.source, args.target), render)
 
 
 def cmd_session_end(args):
     """
     Batch operation for session end - update multiple concepts atomically.
-    
+
     Format:
         --update "Concept:mastery:confidence"
         --struggle "Concept:description"
         --breakthrough "Concept:description"
     """
-    model = load_model()
-    
-    changes = []
+    model = open_model(args)
+    updates, struggles, breakthroughs = [], [], []
     errors = []
-    
-    # Process updates
-    if hasattr(args, 'update') and args.update:
-        for update_str in args.update:
-            try:
-                parts = update_str.split(':')
-                if len(parts) != 3:
-                    errors.append(f"Invalid update format: '{update_str}' (expected 'Concept:mastery:confidence')")
-                    continue
-                
-                concept_name, mastery_str, confidence = parts
-                mastery = int(mastery_str)
-                
-                # Validate
-                if not (0 <= mastery <= 100):
-                    errors.append(f"Invalid mastery for '{concept_name}': {mastery} (must be 0-100)")
-                    continue
-                
-                if confidence not in ['low', 'medium', 'high']:
-                    errors.append(f"Invalid confidence for '{concept_name}': {confidence} (must be low/medium/high)")
-                    continue
-                
-                # Find concept
-                concept_key = find_concept(model, concept_name)
-                if not concept_key:
-                    errors.append(f"Concept '{concept_name}' not found")
-                    continue
-                
-                concept = model["concepts"][concept_key]
-                old_mastery = concept.get('mastery', 0)
-                old_confidence = concept.get('confidence', 'unknown')
-                
-                # Apply changes
-                concept['mastery'] = mastery
-                concept['confidence'] = confidence
-                concept['last_reviewed'] = datetime.now().isoformat()
-                
-                changes.append(f"  ✅ Updated '{concept_key}': {old_mastery}% → {mastery}%, {old_confidence} → {confidence}")
-                
-            except ValueError:
-                errors.append(f"Invalid mastery value in: '{update_str}'")
-            except Exception as e:
-                errors.append(f"Error processing update '{update_str}': {str(e)}")
-    
-    # Process struggles
-    if hasattr(args, 'struggle') and args.struggle:
-        for struggle_str in args.struggle:
-            try:
-                # Format: "Concept:description"
-                if ':' not in struggle_str:
-                    errors.append(f"Invalid struggle format: '{struggle_str}' (expected 'Concept:description')")
-                    continue
-                
-                concept_name, description = struggle_str.split(':', 1)
-                
-                # Find concept
-                concept_key = find_concept(model, concept_name)
-                if not concept_key:
-                    errors.append(f"Concept '{concept_name}' not found")
-                    continue
-                
-                concept = model["concepts"][concept_key]
-                
-                # Check for duplicate
-                struggles = concept.get('struggles', [])
-                if description in struggles:
-                    changes.append(f"  ℹ️  Struggle already logged for '{concept_key}'")
-                    continue
-                
-                # Add struggle
-                concept.setdefault('struggles', []).append(description)
-                concept['last_reviewed'] = datetime.now().isoformat()
-                
-                changes.append(f"  ✅ Added struggle to '{concept_key}': \"{description}\"")
-                
-            except Exception as e:
-                errors.append(f"Error processing struggle '{struggle_str}': {str(e)}")
-    
-    # Process breakthroughs
-    if hasattr(args, 'breakthrough') and args.breakthrough:
-        for breakthrough_str in args.breakthrough:
-            try:
-                # Format: "Concept:description"
-                if ':' not in breakthrough_str:
-                    errors.append(f"Invalid breakthrough format: '{breakthrough_str}' (expected 'Concept:description')")
-                    continue
-                
-                concept_name, description = breakthrough_str.split(':', 1)
-                
-                # Find concept
-                concept_key = find_concept(model, concept_name)
-                if not concept_key:
-                    errors.append(f"Concept '{concept_name}' not found")
-                    continue
-                
-                concept = model["concepts"][concept_key]
-                
-                # Check for duplicate
-                breakthroughs = concept.get('breakthroughs', [])
-                if description in breakthroughs:
-                    changes.append(f"  ℹ️  Breakthrough already logged for '{concept_key}'")
-                    continue
-                
-                # Add breakthrough
-                concept.setdefault('breakthroughs', []).append(description)
-                concept['last_reviewed'] = datetime.now().isoformat()
-                
-                changes.append(f"  ✅ Added breakthrough to '{concept_key}': 💡 \"{description}\"")
-                
-            except Exception as e:
-                errors.append(f"Error processing breakthrough '{breakthrough_str}': {str(e)}")
+
+    # Parse updates
+    for update_str in getattr(args, 'update', None) or []:
+        parts = update_str.split(':')
+        if len(parts) != 3:
+            errors.append(f"Invalid update format: '{update_str}' (expected 'Concept:mastery:confidence')")
+            continue
+        concept_name, mastery_str, confidence = parts
+        try:
+            updates.append((concept_name, int(mastery_str), confidence))
+        except ValueError:
+            errors.append(f"Invalid mastery value in: '{update_str}'")
+
+    # Parse struggles and breakthroughs: "Concept:description"
+    for label, entries, parsed in (("struggle", getattr(args, 'struggle', None), struggles),
+                                   ("breakthrough", getattr(args, 'breakthrough', None), breakthroughs)):
+        for entry_str in entries or []:
+            if ':' not in entry_str:
+                errors.append(f"Invalid {label} format: '{entry_str}' (expected 'Concept:description')")
+                continue
+            parsed.append(tuple(entry_str.split(':', 1)))
+
+    result = model.session_end(updates, struggles, breakthroughs)
+    result["errors"] = errors + result["errors"]
+    return emit(result, _render_session_end)
+
+
+def _render_session_end(result):
+    errors, changes = result["errors"], result["changes"]
     
     # Report errors
     if errors:
@@ -726,21 +6702,30 @@ def cmd_session_end(args):
             print(f"   {error}")
         print()
     
-    # Report changes
-    if changes:
-        print("📊 Session-End Updates:")
-        for change in changes:
-            print(change)
-        
-        # Save model
-        if save_model(model):
-            print(f"\n✅ All changes saved successfully ({len(changes)} operations)")
-        else:
-            print("\n❌ Failed to save model - changes may be lost")
-    else:
+    if not changes:
         print("ℹ️  No changes to apply")
         if not errors:
             print("   Use --update, --struggle, or --breakthrough flags")
+        return
+    
+    # Report changes
+    print("📊 Session-End Updates:")
+    for change in changes:
+        concept_key = change["concept"]
+        if change["op"] == "update":
+            (old_mastery, mastery), (old_confidence, confidence) = change["mastery"], change["confidence"]
+            print(f"  ✅ Updated '{concept_key}': {old_mastery}% → {mastery}%, {old_confidence} → {confidence}")
+        elif change.get("duplicate"):
+            print(f"  ℹ️  {change['op'].capitalize()} already logged for '{concept_key}'")
+        elif change["op"] == "struggle":
+            print(f"  ✅ Added struggle to '{concept_key}': \"{change['text']}\"")
+        else:
+            print(f"  ✅ Added breakthrough to '{concept_key}': 💡 \"{change['text']}\"")
+    
+    if result["changed"]:
+        print(f"\n✅ All changes saved successfully ({len(changes)} operations)")
+    else:
+        print("\n❌ Failed to save model - changes may be lost")
 
 
 
@@ -748,119 +6733,45 @@ def cmd_session_end(args):
 
 def cmd_misconception_add(args):
     """Add a misconception for a concept."""
-    model = load_model()
-    
-    # Verify concept exists
-    concept_key = find_concept(model, args.concept_name)
-    if not concept_key:
-        print(f"❌ Concept '{args.concept_name}' not found.")
-        print(f"   Add it first: python student.py add \"{args.concept_name}\" 0 low")
-        return
-    
-    # Create misconception entry
-    misconception = {
-        "concept": concept_key,
-        "belief": args.belief,
-        "correction": args.correction,
-        "date_identified": datetime.now().isoformat(),
-        "resolved": False,
-        "date_resolved": None
-    }
-    
-    # Check for duplicate (same concept + same belief)
-    misconceptions = model.setdefault("misconceptions", [])
-    for m in misconceptions:
-        if (m["concept"].lower() == concept_key.lower() and 
-            m["belief"].lower() == args.belief.lower()):
-            print(f"ℹ️  This misconception already logged.")
-            return
-    
-    # Add misconception
-    misconceptions.append(misconception)
-    
-    if save_model(model):
-        print(f"✅ Logged misconception for '{concept_key}'")
-        print(f"   Belief: \"{args.belief}\"")
-        print(f"   Correction: \"{args.correction}\"")
-    else:
-        print("❌ Failed to save model")
+    model = open_model(args)
+
+    def render(result):
+        misconception = result["misconception"]
+        print(f"✅ Logged misconception for '{misconception['concept']}'")
+        print(f"   Belief: \"{misconception['belief']}\"")
+        print(f"   Correction: \"{misconception['correction']}\"")
+        print(f"   ID: {misconception['id']}")
+
+    return run_api(lambda: model.add_misconception(args.concept_name, args.belief,
+                                                   args.correction), render)
 
 
 def cmd_misconception_resolve(args):
     """Mark a misconception as resolved."""
-    model = load_model()
-    
-    concept_key = find_concept(model, args.concept_name)
-    if not concept_key:
-        print(f"❌ Concept '{args.concept_name}' not found.")
-        return
-    
-    # Find unresolved misconceptions for this concept
-    misconceptions = model.get("misconceptions", [])
-    concept_misconceptions = [
-        (i, m) for i, m in enumerate(misconceptions)
-        if m["concept"].lower() == concept_key.lower() and not m["resolved"]
-    ]
-    
-    if not concept_misconceptions:
-        print(f"ℹ️  No unresolved misconceptions for '{concept_key}'")
-        return
-    
-    # Validate index
-    if args.index >= len(concept_misconceptions):
-        print(f"❌ Index {args.index} out of range (0-{len(concept_misconceptions)-1})")
-        print(f"   Run: python student.py misconception list \"{concept_key}\" --unresolved")
-        return
-    
-    # Get the actual index in the misconceptions array
-    actual_index, misconception = concept_misconceptions[args.index]
-    
-    # Mark as resolved
-    misconceptions[actual_index]["resolved"] = True
-    misconceptions[actual_index]["date_resolved"] = datetime.now().isoformat()
-    
-    if save_model(model):
-        print(f"✅ Resolved misconception for '{concept_key}'")
+    model = open_model(args)
+
+    def render(result):
+        misconception = result["misconception"]
+        print(f"✅ Resolved misconception for '{misconception['concept']}'")
         print(f"   \"{misconception['belief']}\"")
-    else:
-        print("❌ Failed to save model")
 
+    # "resolve @ID" addresses a misconception without naming its concept
+    return run_api(lambda: model.resolve_misconception(args.concept_name,
+                                                       getattr(args, 'index', None)), render)
 
-def cmd_misconception_list(args):
-    """List all misconceptions, optionally filtered."""
-    model = load_model()
-    
-    misconceptions = model.get("misconceptions", [])
-    
-    if not misconceptions:
+
+def _render_misconception_list(result):
+    misconceptions = result["misconceptions"]
+    if result["total"] == 0:
         print("📚 No misconceptions tracked yet.")
         print("   Add one with: python student.py misconception add \"Concept\" --belief \"...\" --correction \"...\"")
         return
     
-    # Filter by concept if specified
-    display_concept = None
-    if hasattr(args, 'concept_name') and args.concept_name:
-        concept_key = find_concept(model, args.concept_name)
-        if not concept_key:
-            print(f"❌ Concept '{args.concept_name}' not found.")
-            return
-        misconceptions = [m for m in misconceptions if m["concept"].lower() == concept_key.lower()]
-        display_concept = concept_key
-    
-    # Filter by resolved status if specified
-    if hasattr(args, 'resolved_only') and args.resolved_only:
-        misconceptions = [m for m in misconceptions if m["resolved"]]
-    elif hasattr(args, 'unresolved_only') and args.unresolved_only:
-        misconceptions = [m for m in misconceptions if not m["resolved"]]
-    
     # Header
-    if display_concept:
-        status_filter = ""
-        if hasattr(args, 'resolved_only') and args.resolved_only:
-            status_filter = " (resolved only)"
-        elif hasattr(args, 'unresolved_only') and args.unresolved_only:
-            status_filter = " (unresolved only)"
-        print(f"🐛 Misconceptions for '{display_concept}'{status_filter}:\n")
+    if result["concept"]:
+        status_filter = {"resolved": " (resolved only)",
+                         "unresolved": " (unresolved only)"}.get(result["status"], "")
+        print(f"🐛 Misconceptions for '{result['concept']}'{status_filter}:\n")
     else:
         print(f"🐛 All Misconceptions ({len(misconceptions)} total):\n")
     
@@ -878,19 +6789,19 @@ def cmd_misconception_list(args):
     for concept, items in sorted(by_concept.items()):
         print(f"📌 {concept}:")
         
-        # Get unresolved items for this concept (for indexing)
-        unresolved_items = [m for m in items if not m["resolved"]]
+        # Unresolved items are numbered for resolve
+        unresolved_count = 0
         
-        for i, m in enumerate(items):
+        for m in items:
             status = "✅ Resolved" if m["resolved"] else "⚠️  Active"
             date = m["date_identified"].split('T')[0]
             
             # Show index only for unresolved items
             if not m["resolved"]:
-                index = unresolved_items.index(m)
-                print(f"   [{index}] {status}")
+                print(f"   [{unresolved_count}] {status}  ({m['id']})")
+                unresolved_count += 1
             else:
-                print(f"       {status}")
+                print(f"       {status}  ({m['id']})")
             
             print(f"       Belief: \"{m['belief']}\"")
             print(f"       Correction: \"{m['correction']}\"")
@@ -902,17 +6813,621 @@ def cmd_misconception_list(args):
             print()
 
 
+def cmd_misconception_list(args):
+    """List all misconceptions, optionally filtered."""
+    model = open_model(args)
+    if model is None:
+        return
+
+    status = None
+    if hasattr(args, 'resolved_only') and args.resolved_only:
+        status = "resolved"
+    elif hasattr(args, 'unresolved_only') and args.unresolved_only:
+        status = "unresolved"
+
+    return run_api(lambda: model.misconceptions(getattr(args, 'concept_name', None), status),
+                   _render_misconception_list, items="misconceptions")
+
+
+# Mastery history commands
+
+def _render_history(result):
+    concept_key = result["concept"]
+    if not result["total"]:
+        print(f"📈 No history recorded for '{concept_key}' yet.")
+        print(f"   History is recorded by add, update and session-end.")
+        return
+
+    print(f"📈 Mastery History: {concept_key} ({result['total']} points)\n")
+    previous = None
+    for point in result["points"]:
+        when = datetime.fromtimestamp(point["t"]).isoformat(sep=' ')[:16]
+        change = ""
+        if previous is not None and point["mastery"] != previous:
+            change = f" ({point['mastery'] - previous:+d})"
+        print(f"   {when}  {point['mastery']:>3}%{change:<7} {point['confidence']}")
+        previous = point["mastery"]
+
+
+def cmd_history(args):
+    """Show a concept's mastery/confidence history, oldest first."""
+    model = open_model(args)
+    return run_api(lambda: model.history(args.concept_name, args.limit),
+                   _render_history, items="points")
+
+
+def _render_trend(trend):
+    concept_key = trend["concept"]
+    if trend["points"] < 2:
+        print(f"📈 Not enough history for '{concept_key}' to compute a trend.")
+        print(f"   Need at least 2 recorded points, have {trend['points']}.")
+        return
+
+    slope = trend["slope_per_day"]
+    per_review = trend.get("slope_per_review")
+    print(f"📈 Trend: {concept_key}\n")
+    print(f"   Current: {trend['current']}% over {trend['points']} points")
+    if slope is not None:
+        print(f"   Velocity: {slope:+.2f} points/day ({slope * 7:+.1f}/week)")
+    elif per_review is not None:
+        print(f"   Velocity: {per_review:+.2f} points/review "
+              f"(history spans less than {TREND_MIN_DAYS} day(s))")
+    else:
+        print(f"   Velocity: unknown (all points at the same time)")
+
+    if trend["days_to_target"] == 0:
+        print(f"   ✅ At or above target ({trend['target']}%)")
+    elif trend["days_to_target"] is not None:
+        print(f"   Projected {trend['target']}%: in {trend['days_to_target']:.0f} days "
+              f"({trend['projected_date'][:10]})")
+    elif trend.get("reviews_to_target") is not None:
+        print(f"   Projected {trend['target']}%: in {trend['reviews_to_target']:.0f} reviews")
+    else:
+        print(f"   Projected {trend['target']}%: not on current trajectory")
+
+    if trend["plateaus"]:
+        print(f"\n   Plateaus:")
+        for plateau in trend["plateaus"]:
+            print(f"   • {plateau['start'][:10]} → {plateau['end'][:10]}: "
+                  f"~{plateau['mastery']}% for {plateau['days']:.0f} days")
+
+
+def cmd_trend(args):
+    """Show learning velocity, projected time to mastery and plateaus."""
+    model = open_model(args)
+    return run_api(lambda: model.trend(args.concept_name, args.target), _render_trend)
+
+
+# Session log commands
+
+def _time_bound(value: Optional[str]) -> Optional[str]:
+    """Accept YYYY-MM-DD or a full ISO timestamp for --since/--until."""
+    if not value:
+        return None
+    if _parse_timestamp(value) is None:
+        raise ValueError(f"Invalid date: '{value}' (use YYYY-MM-DD or ISO format)")
+    return value
+
+
+def _render_log(result):
+    events, concept = result["events"], result["concept"]
+    if not events:
+        print("📜 No logged events match.")
+        return
+
+    title = f" for '{concept}'" if concept else ""
+    print(f"📜 Session Log{title} (last {len(events)} events)\n")
+    for event in events:
+        when = event["t"].replace('T', ' ')[:16]
+        name = event.get("concept", "")
+        print(f"   {when}  {event['op']:<22} {name:<30} {describe_event(event)}")
+
+
+def cmd_log(args):
+    """Show logged events, optionally filtered by concept, time or session."""
+    try:
+        since = _time_bound(args.since)
+        until = _time_bound(args.until)
+    except ValueError as e:
+        return fail(str(e))
+
+    concept = None
+    if args.concept:
+        model = load_model()
+        concept = find_concept(model, args.concept) or args.concept
+
+    recent = deque(query_events(concept=concept, since=since, until=until,
+                                session=args.session), maxlen=args.limit)
+    return emit({"ok": True, "concept": concept, "events": list(recent)},
+                _render_log, items="events")
+
+
+def _render_sessions(result):
+    if not result["sessions"]:
+        print("🗓️  No sessions recorded yet.")
+        print("   Sessions are recorded by: python student.py session-end ...")
+        return
+
+    print(f"🗓️  Sessions (last {len(result['sessions'])})\n")
+    for event in result["sessions"]:
+        when = event["t"].replace('T', ' ')[:16]
+        print(f"   {when}  {event['session']}  {describe_event(event)}")
+    print(f"\nDetails: python student.py log --session <id>")
+
+
+def cmd_sessions(args):
+    """List recorded sessions, newest last."""
+    recent = deque(query_events(ops={"session_end"}), maxlen=args.limit)
+    return emit({"ok": True, "sessions": list(recent)}, _render_sessions, items="sessions")
+
+
+# Validation
+
+def _render_validate(result):
+    path, issues = result["path"], result["issues"]
+    if not issues:
+        print(f"✅ {path} is valid")
+        return
+
+    errors = [i for i in issues if i["severity"] == "error"]
+    warnings = [i for i in issues if i["severity"] == "warning"]
+    print(f"🔍 Validation of {path}: {len(errors)} errors, {len(warnings)} warnings\n")
+    for issue in errors + warnings:
+        icon = "❌" if issue["severity"] == "error" else "⚠️ "
+        print(f"{icon} {issue['path']}")
+        print(f"   {issue['message']}")
+
+
+def cmd_validate(args) -> bool:
+    """Check every model invariant in one streaming pass. Returns True if no errors."""
+    path = Path(args.file) if getattr(args, 'file', None) else DATA_FILE
+    if not path.exists():
+        fail(f"No model found at {path}")
+        return False
+
+    issues = validate_file(path)
+    valid = not any(i["severity"] == "error" for i in issues)
+    emit({"ok": valid, "path": str(path), "issues": issues}, _render_validate, items="issues")
+    return valid
+
+
+def cmd_salvage(args):
+    """Recover what is readable from a damaged model file."""
+    if not DATA_FILE.exists():
+        return fail(f"No model found at {DATA_FILE}")
+
+    text = DATA_FILE.read_text(encoding='utf-8', errors='replace')
+    try:
+        decode_model(text)
+
+        def render(result):
+            print(f"✅ {DATA_FILE} parses cleanly, nothing to salvage")
+            print(f"   Run 'python student.py validate' to check its contents.")
+        return emit({"ok": True, "changed": False, "message": "Model parses cleanly"}, render)
+    except json.JSONDecodeError:
+        pass
+
+    if args.dry_run:
+        _, report = salvage_model(text)
+
+        def render(result):
+            print_salvage_report(report)
+            print("\nℹ️  Dry run: nothing was written")
+        return emit({"ok": True, "changed": False, "report": report}, render)
+
+    # Salvage and restore report their progress as they go
+    if _salvage_data_file(text) is not None:
+        return emit({"ok": True, "changed": True, "source": "salvage"})
+    print("❌ Nothing could be salvaged from the damaged file")
+    if _restore_latest_backup() is not None:
+        return emit({"ok": True, "changed": True, "source": "backup"})
+    return emit({"ok": False, "error": "Nothing could be salvaged and no backup is available"},
+                lambda result: print("   No backup available either"))
+
+
+# Backup store commands
+
+def _render_backup_list(result):
+    generations = result["generations"]
+    if not generations:
+        print("🗄️  No backups yet.")
+        print("   A backup generation is recorded on every save.")
+        return
+
+    print(f"🗄️  Backups ({len(generations)} generations, {result['objects']} objects, "
+          f"{result['bytes'] / 1024:.1f} KB)\n")
+    for generation in generations:
+        created = generation["created"].replace('T', ' ').split('.')[0]
+        packed = " (compressed)" if generation["compressed"] else ""
+        print(f"   {generation['id']:<24} {created}  {generation['concepts']:>5} concepts{packed}")
+
+    checkpoints = result["checkpoints"]
+    if checkpoints:
+        print(f"\n   {len(checkpoints)} checkpoints kept for --as-of (oldest {checkpoints[0]})")
+    print(f"\nRestore with: python student.py backup restore <id|latest>")
+
+
+def cmd_backup_list(args):
+    """List backup generations, newest first."""
+    store = backup_dir()
+    result = {"ok": True, "generations": [], "objects": 0, "bytes": 0, "checkpoints": []}
+
+    generations = list_generations(store)
+    if generations:
+        result["objects"], result["bytes"] = store_usage(store)
+        result["checkpoints"] = list_generations(store, "checkpoints")
+    for gen_id in reversed(generations):
+        manifest = read_generation(gen_id, store)
+        result["generations"].append({"id": gen_id, "created": manifest["created"],
+                                      "concepts": manifest.get("count", len(manifest.get("concepts", []))),
+                                      "compressed": bool(manifest.get("compressed"))})
+    return emit(result, _render_backup_list, items="generations")
+
+
+def cmd_backup_restore(args):
+    """Restore the model from a backup generation."""
+    gen_id = resolve_generation(args.generation)
+    if not gen_id:
+        return fail(f"No unique backup generation matches '{args.generation}'",
+                    "Run 'python student.py backup list' to see generations.")
+
+    try:
+        text = generation_text(gen_id)
+    except (OSError, ValueError, KeyError) as e:
+        return fail(f"Backup {gen_id} is unreadable: {str(e)}")
+
+    errors = [i for i in validate_stream(io.StringIO(text)) if i["severity"] == "error"]
+    if errors and not getattr(args, 'force', False):
+        return fail(f"Backup {gen_id} failed validation ({len(errors)} errors), not restoring",
+                    *[f"{issue['path']}: {issue['message']}" for issue in errors[:5]],
+                    "Use --force to restore anyway.", issues=errors)
+
+    model = decode_model(text)
+    if not validate_model(model):
+        return fail(f"Backup {gen_id} has invalid structure, not restoring")
+
+    # The current state stays available as its own generation
+    keep_layout(model)
+    if not FileStore(echo=True).save(model, checkpoint=True):
+        return fail("Failed to save model")
+
+    def render(result):
+        print(f"✅ Restored model from backup {gen_id}")
+        print(f"   Concepts: {len(model['concepts'])}")
+    return emit({"ok": True, "changed": True, "generation": gen_id,
+                 "concepts": len(model['concepts'])}, render)
+
+
+def _render_backup_clean(result):
+    print(f"🧹 Cleaned backup store")
+    print(f"   Generations removed: {result['generations_removed']}")
+    if result['checkpoints_removed']:
+        print(f"   Checkpoints removed: {result['checkpoints_removed']}")
+    print(f"   Blobs removed:       {result['blobs_removed']}")
+    print(f"   Space freed:         {result['bytes_freed'] / 1024:.1f} KB")
+    print(f"   Generations kept:    {result['generations_kept']}")
+
+
+def cmd_backup_clean(args):
+    """Apply the retention policy and delete unreferenced blobs."""
+    store = backup_dir()
+    if not list_generations(store):
+        return emit({"ok": True, "changed": False, "message": "No backups to clean."},
+                    lambda result: print("🗄️  No backups to clean."))
+
+    keep_recent = args.keep_recent if args.keep_recent is not None else None
+    result = prune_backups(store, keep_recent=keep_recent, collect=True)
+    result.update(ok=True, changed=True, generations_kept=len(list_generations(store)))
+    return emit(result, _render_backup_clean)
+
+
+# Diff and merge
+
+def _render_diff(result):
+    print(f"🔍 {result['ours']} → {result['theirs']}")
+    if not any(result[k] for k in ("added", "removed", "renamed", "changed")) \
+            and not any(result['misconceptions'].values()):
+        print(f"✅ No differences ({result['unchanged']} concepts)")
+        return
+    for key in result['added']:
+        print(f"   + {key}")
+    for key in result['removed']:
+        print(f"   - {key}")
+    for item in result['renamed']:
+        print(f"   ↪ {item['concept']} → {item['to']}")
+    for item in result['changed']:
+        parts = []
+        for field, change in item['fields'].items():
+            if "added" in change:
+                parts.append(f"{field} +{len(change['added'])} -{len(change['removed'])}")
+            elif field == "history":
+                parts.append(f"history {change['ours']} → {change['theirs']} points")
+            else:
+                parts.append(f"{field} {change['ours']} → {change['theirs']}")
+        print(f"   ~ {item['concept']}: {'; '.join(parts)}")
+    counts = {k: len(v) for k, v in result['misconceptions'].items() if v}
+    if counts:
+        print(f"   Misconceptions: {', '.join(f'{n} {k}' for k, n in counts.items())}")
+    print(f"\n   {len(result['added'])} added, {len(result['removed'])} removed, "
+          f"{len(result['renamed'])} renamed, {len(result['changed'])} changed, "
+          f"{result['unchanged']} unchanged")
+
+
+def cmd_diff(args):
+    """Compare the model with another copy of it (or two model files)."""
+    if len(args.files) > 2:
+        return fail("diff takes one file (compared with the model) or two")
+    *ours, theirs = args.files
+    try:
+        model = (StudentModel(FileStore(ours[0]), data=FileStore(ours[0]).read())
+                 if ours else open_model(args))
+    except StudentModelError as e:
+        return fail(str(e), *e.hints)
+    return run_api(lambda: model.diff(theirs), _render_diff)
+
+
+def _conflict_value(value: Any) -> str:
+    if isinstance(value, dict):
+        return f"{value.get('mastery')}% ({value.get('confidence')})"
+    return str(value)
+
+
+def _render_merge_file(result):
+    if "path" in result:
+        print(f"✅ Merged {result['source']} into {result['path']}")
+    elif "model" in result:
+        print(f"🔍 Merging {result['source']} would change (nothing saved):")
+    else:
+        print(f"✅ Merged {result['source']} into the model")
+    print(f"   Concepts: {len(result['added'])} added, {len(result['updated'])} updated, "
+          f"{len(result['removed'])} removed")
+    if result['misconceptions'] or result['sessions']:
+        print(f"   Misconceptions: {result['misconceptions']}, sessions: {result['sessions']}")
+    if result['conflicts']:
+        print(f"\n⚠️  {len(result['conflicts'])} conflict(s):")
+        for conflict in result['conflicts']:
+            print(f"   {conflict['concept']}: {conflict['field']} ours {_conflict_value(conflict['ours'])}, "
+                  f"theirs {_conflict_value(conflict['theirs'])} → kept {conflict['kept']}")
+
+
+def cmd_merge_file(args):
+    """
+    Merge another copy of the model into it, or with --output into a new
+    file, reporting conflicts.
+    """
+    model = open_model(args)
+    output = getattr(args, 'output', None)
+
+    def call():
+        result = model.merge_file(args.other, base=args.base,
+                                  dry_run=bool(output) or args.dry_run)
+        if output:
+            path = Path(output).expanduser()
+            try:
+                path.write_text(json.dumps(result["model"], indent=2, ensure_ascii=False) + "\n",
+                                encoding='utf-8')
+            except OSError as e:
+                raise StudentModelError(f"Could not write merged model: {e}") from e
+            del result["model"]
+            result["path"] = str(path)
+        return result
+
+    return run_api(call, _render_merge_file)
+
+
+# Sync
+
+def _open_sync(store: FileStore):
+    """The sync state and the model with its local changes absorbed."""
+    state = SyncState()
+    model = store.load()
+    absorb_local_changes(state, model)
+    return state, model
+
+
+def _render_sync_status(result):
+    print(f"🔄 Replica {result['replica']} (clock {result['clock']})")
+    print(f"   Versioned entities: {result['entities']}")
+    print(f"   Unsynced changes:   {result['pending']}")
+    if not result['peers']:
+        print("   No peers yet: apply a changeset from another replica")
+    for peer in result['peers']:
+        print(f"   ↔ {peer['replica']}: has our changes up to {peer['has_ours']}, "
+              f"applied {_date(peer.get('applied'), 'never')}")
+
+
+def cmd_sync_status(args):
+    """Show this replica's ID, its clock and what each peer is known to have."""
+    try:
+        state = SyncState()
+        pending = absorb_local_changes(state, FileStore(echo=True).load())
+    except SyncError as e:
+        return fail(str(e))
+    peers = [{"replica": replica, "has_ours": info["known"].get(state.replica, 0),
+              "clock": info.get("clock", 0), "applied": info.get("applied")}
+             for replica, info in state.peers.items()]
+    return emit({"ok": True, "replica": state.replica, "clock": state.clock,
+                 "entities": len(state.versions), "pending": pending, "peers": peers},
+                _render_sync_status, items="peers")
+
+
+def _render_sync_export(result):
+    if "changeset" in result:
+        print(json.dumps(result["changeset"], indent=2, ensure_ascii=False))
+        return
+    print(f"✅ Exported {result['entities']} change(s) to {result['path']}")
+
+
+def cmd_sync_export(args):
+    """
+    Write the changes a peer (by default every known peer) may not have as
+    a changeset file, into a directory, or to stdout.
+    """
+    try:
+        state, model = _open_sync(FileStore(echo=True))
+        if args.since in (None, "peers"):
+            since = state.since()
+        elif args.since == "all":
+            since = {}
+        else:
+            peer = state.find_peer(args.since)
+            if peer is None:
+                return fail(f"No unique peer matches '{args.since}'",
+                            "Run 'python student.py sync status' to see peers, or use --since all.")
+            since = state.since(peer)
+        changeset = sync_export(model, state, since)
+    except SyncError as e:
+        return fail(str(e))
+
+    result = {"ok": True, "replica": state.replica, "clock": state.clock,
+              "entities": len(changeset["entities"])}
+    if args.dir and not changeset["entities"]:
+        state.save()
+        return notice("Nothing to export: every known peer has our changes", **result)
+    if args.output or args.dir:
+        path = Path(args.output or Path(args.dir) / f"{state.replica}-{state.clock:08d}.json").expanduser()
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            _write_atomic(path, json.dumps(changeset, ensure_ascii=False).encode('utf-8'))
+        except OSError as e:
+            return fail(f"Could not write changeset: {e}")
+        result.update(changed=True, path=str(path))
+    else:
+        result["changeset"] = changeset
+    state.save()
+    return emit(result, _render_sync_export)
+
+
+def _render_sync_apply(result):
+    for item in result['changesets']:
+        if item.get('skipped_file'):
+            print(f"   ⏭️  {item['path']}: {item['skipped_file']}")
+        else:
+            print(f"   ✅ {item['path']}: {item['taken']} taken, {item['joined']} joined, "
+                  f"{item['deleted']} deleted, {item['skipped']} already here")
+            if item.get('partial'):
+                print("      (built for a peer with more changes; ask its replica for 'sync export --since all')")
+    if result['changed']:
+        print(f"✅ Applied {result['applied']} changeset(s) to the model")
+    else:
+        print("ℹ️  Already up to date")
+
+
+def cmd_sync_apply(args):
+    """Merge changeset files (or every *.json in a directory) into the model."""
+    paths = []
+    for name in args.paths:
+        path = Path(name).expanduser()
+        paths.extend(sorted(path.glob('*.json')) if path.is_dir() else [path])
+    store = FileStore(echo=True)
+    try:
+        state, model = _open_sync(store)
+        result = {"ok": True, "changed": False, "applied": 0, "changesets": []}
+        changes = 0
+        for path in paths:
+            try:
+                changeset = json.loads(path.read_text(encoding='utf-8'))
+            except (OSError, ValueError) as e:
+                return fail(f"Unreadable changeset {path}: {e}")
+            if isinstance(changeset, dict) and changeset.get("replica") == state.replica:
+                result["changesets"].append({"path": str(path), "skipped_file": "our own"})
+                continue
+            if isinstance(changeset, dict) and vv_covers(state.known, changeset.get("known", {})):
+                result["changesets"].append({"path": str(path), "skipped_file": "already applied"})
+                continue
+            report = sync_apply(model, state, changeset)
+            result["changesets"].append(dict(report, path=str(path)))
+            result["applied"] += 1
+            changes += report["taken"] + report["joined"] + report["deleted"]
+    except SyncError as e:
+        return fail(str(e))
+
+    if changes:
+        record_event(model, "sync", changesets=result["applied"], entities=changes)
+        if not store.save(model, checkpoint=True):
+            return fail("Failed to save model")
+        result["changed"] = True
+    state.save()
+    return emit(result, _render_sync_apply, items="changesets")
+
+
+# Sharded layout
+
+def _render_reshard(result):
+    if result['shards']:
+        print(f"✅ Split {result['concepts']} concepts across {result['shards']} shards")
+        print(f"   Shard files: {shard_dir()}")
+    else:
+        print(f"✅ Merged {result['concepts']} concepts back into {result['path']}")
+
+
+def cmd_shard(args):
+    """Change how many files concepts are split across (0: the model file itself)."""
+    model = open_model(args)
+    if model is None:
+        return
+    return run_api(lambda: model.reshard(args.count), _render_reshard)
+
+
+def _render_layout(result):
+    if result['layout'] == "concepts":
+        print(f"✅ Stored {result['concepts']} concepts one file per concept")
+        print(f"   Concept files: {concept_dir()}")
+    else:
+        _render_reshard(result)
+
+
+def cmd_layout(args):
+    """Store the model as one file, in shards or as one file per concept."""
+    model = open_model(args)
+    if model is None:
+        return
+    return run_api(lambda: model.set_layout(args.kind, args.shards), _render_layout)
+
+
+# Server
+
+def cmd_serve(args):
+    """Serve a directory of student models over HTTP/JSON until interrupted."""
+    root = Path(args.root) if args.root else DATA_FILE.parent / "students"
+
+    async def serve():
+        listener = await StudentServer(root).start(args.host, args.port)
+        port = listener.sockets[0].getsockname()[1]
+        print(f"🌐 Serving student models from {root}")
+        print(f"   http://{args.host}:{port}/students/<student>/<method>")
+        async with listener:
+            await listener.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print("\n👋 Server stopped")
+
+
 # =============================================================================
 # MAIN CLI ENTRY POINT
 # =============================================================================
 
 def main():
     """Main CLI entry point."""
+    global DURABILITY, BACKUP_COMPRESS, OUTPUT, _results_stream
+
     parser = argparse.ArgumentParser(
         description='Student Model CLI - Track conceptual knowledge mastery',
         formatter_class=argparse.RawDescriptionHelpFormatter
     )
 
+    parser.add_argument('--durability', choices=DURABILITY_LEVELS, default=None,
+                        help=f'Crash-safety of saves (default: {DURABILITY})')
+    parser.add_argument('--compress-backups', action='store_true',
+                        help='Gzip new backup blobs')
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument('--json', dest='output', action='store_const', const='json',
+                        help='Print results as one JSON object')
+    output.add_argument('--jsonl', dest='output', action='store_const', const='jsonl',
+                        help='Print listed items as one JSON object per line')
+
     subparsers = parser.add_subparsers(dest='command', help='Available commands')
 
     # PHASE 1 COMMANDS
@@ -924,19 +7439,70 @@ def main():
 
     # Info command
     parser_info = subparsers.add_parser('info', help='Show model information')
+    parser_info.add_argument('--as-of', dest='as_of', type=str, default=None,
+                             help='Show the model as it was at this date or ISO time')
 
     # PHASE 2 COMMANDS
 
     # List command
     parser_list = subparsers.add_parser('list', help='List all tracked concepts')
+    parser_list.add_argument('--where', type=str, default=None,
+                             help=f"Only concepts matching a filter, e.g. '{FILTER_EXAMPLE}'")
+    parser_list.add_argument('--as-of', dest='as_of', type=str, default=None,
+                             help='Show the model as it was at this date or ISO time')
 
     # Show command
     parser_show = subparsers.add_parser('show', help='Show detailed concept information')
     parser_show.add_argument('concept_name', type=str, help='Name of the concept to show')
+    parser_show.add_argument('--as-of', dest='as_of', type=str, default=None,
+                             help='Show the model as it was at this date or ISO time')
+
+    # Query command
+    parser_query = subparsers.add_parser('query', help='Show many concepts from one load')
+    parser_query.add_argument('concept_names', type=str, nargs='*', help='Concepts to show')
+    parser_query.add_argument('--file', type=str, default=None,
+                              help="Also read concept names from a file, one per line ('-' for stdin)")
+    parser_query.add_argument('--fields', type=str, default=None,
+                              help=f"Comma-separated fields to include (default: all of {', '.join(QUERY_FIELDS)})")
+    parser_query.add_argument('--as-of', dest='as_of', type=str, default=None,
+                              help='Show the model as it was at this date or ISO time')
+
+    # Export command
+    parser_export = subparsers.add_parser('export', help='Write concepts as a standalone model')
+    parser_export.add_argument('--where', type=str, default=None,
+                               help="Only concepts matching a filter, e.g. 'mastery<50 and has:misconception'")
+    parser_export.add_argument('--output', '-o', type=str, default=None,
+                               help='File to write (default: stdout)')
+    parser_export.add_argument('--as-of', dest='as_of', type=str, default=None,
+                               help='Export the model as it was at this date or ISO time')
 
     # Related command
     parser_related = subparsers.add_parser('related', help='Show related concepts')
     parser_related.add_argument('concept_name', type=str, help='Name of the concept')
+    parser_related.add_argument('--as-of', dest='as_of', type=str, default=None,
+                                help='Show the model as it was at this date or ISO time')
+
+    # Context command
+    parser_context = subparsers.add_parser('context',
+                                           help='Extract a concept neighbourhood for a tutor prompt')
+    parser_context.add_argument('concept_names', type=str, nargs='+', help='Concepts to centre on')
+    parser_context.add_argument('--hops', type=int, default=CONTEXT_HOPS,
+                                help=f'How many links away to look (default: {CONTEXT_HOPS})')
+    parser_context.add_argument('--budget', type=int, default=CONTEXT_BUDGET,
+                                help=f'Approximate output size in tokens (default: {CONTEXT_BUDGET})')
+    parser_context.add_argument('--format', choices=['markdown', 'json'], default='markdown',
+                                help='Output format (default: markdown)')
+    parser_context.add_argument('--as-of', dest='as_of', type=str, default=None,
+                                help='Show the model as it was at this date or ISO time')
+
+    # Dependents command
+    parser_dependents = subparsers.add_parser('dependents',
+                                              help='Show concepts that build on a concept')
+    parser_dependents.add_argument('concept_name', type=str, help='Name of the concept')
+    parser_dependents.add_argument('--transitive', action='store_true',
+                                   help='Include concepts that build on it indirectly')
+    parser_dependents.add_argument('--as-of', dest='as_of', type=str, default=None,
+                                   help='Show the model as it was at this date or ISO time')
 
     # PHASE 3 COMMANDS
 
@@ -980,6 +7546,24 @@ def main():
     parser_unlink.add_argument('concept_name', type=str, help='Main concept')
     parser_unlink.add_argument('related_concept', type=str, help='Related concept to unlink')
 
+    # Link-batch command
+    parser_link_batch = subparsers.add_parser('link-batch',
+                                              help='Link or unlink many concept pairs at once')
+    parser_link_batch.add_argument('file', type=str, nargs='?', default='-',
+                                   help="File with one 'Concept -> Related' per line (default: stdin)")
+    parser_link_batch.add_argument('--unlink', action='store_true',
+                                   help='Remove the listed links instead of adding them')
+
+    # Rename command
+    parser_rename = subparsers.add_parser('rename', help='Rename a concept and its references')
+    parser_rename.add_argument('concept_name', type=str, help='Current name (or @ID)')
+    parser_rename.add_argument('new_name', type=str, help='New name')
+
+    # Merge command
+    parser_merge = subparsers.add_parser('merge', help='Merge one concept into another')
+    parser_merge.add_argument('source', type=str, help='Concept to merge and remove')
+    parser_merge.add_argument('target', type=str, help='Concept to keep')
+
     # Session-end command (Phase 3.2)
     parser_session_end = subparsers.add_parser(
         'session-end',
@@ -1030,9 +7614,10 @@ def main():
         'resolve',
         help='Mark a misconception as resolved'
     )
-    parser_misc_resolve.add_argument('concept_name', type=str, help='Concept name')
-    parser_misc_resolve.add_argument('index', type=int,
-                                    help='Index of misconception to resolve (from list)')
+    parser_misc_resolve.add_argument('concept_name', type=str,
+                                    help='Concept name or @ID, or a misconception @ID on its own')
+    parser_misc_resolve.add_argument('index', type=str, nargs='?', default=None,
+                                    help='Index of misconception to resolve (from list), or its ID')
     
     # misconception list
     parser_misc_list = misconception_subparsers.add_parser(
@@ -1047,6 +7632,121 @@ def main():
     parser_misc_list.add_argument('--unresolved', dest='unresolved_only',
                                  action='store_true',
                                  help='Show only unresolved misconceptions')
+    parser_misc_list.add_argument('--as-of', dest='as_of', type=str, default=None,
+                                  help='Show the model as it was at this date or ISO time')
+
+    # Mastery history commands
+    parser_history = subparsers.add_parser('history', help="Show a concept's mastery history")
+    parser_history.add_argument('concept_name', type=str, help='Name of the concept')
+    parser_history.add_argument('--limit', type=int, default=None, help='Show at most N most recent points')
+
+    parser_trend = subparsers.add_parser('trend', help='Show learning velocity and projected mastery')
+    parser_trend.add_argument('concept_name', type=str, help='Name of the concept')
+    parser_trend.add_argument('--target', type=int, default=MASTERY_TARGET,
+                              help=f'Mastery level to project towards (default: {MASTERY_TARGET})')
+
+    # Session log commands
+    parser_log = subparsers.add_parser('log', help='Show the event log')
+    parser_log.add_argument('--concept', type=str, default=None, help='Only events for this concept')
+    parser_log.add_argument('--since', type=str, default=None, help='Start date (YYYY-MM-DD or ISO)')
+    parser_log.add_argument('--until', type=str, default=None, help='End date, exclusive')
+    parser_log.add_argument('--session', type=str, default=None, help='Only events from this session')
+    parser_log.add_argument('--limit', type=int, default=50, help='Show at most N most recent events')
+
+    parser_sessions = subparsers.add_parser('sessions', help='List recorded sessions')
+    parser_sessions.add_argument('--limit', type=int, default=20, help='Show at most N most recent sessions')
+
+    # Validate command
+    parser_validate = subparsers.add_parser('validate', help='Check model integrity')
+    parser_validate.add_argument('file', type=str, nargs='?', default=None,
+                                 help='Model file to check (default: the active model)')
+
+    # Salvage command
+    parser_salvage = subparsers.add_parser('salvage',
+                                           help='Recover records from a damaged model file')
+    parser_salvage.add_argument('--dry-run', action='store_true',
+                                help='Report what would be recovered without writing')
+
+    # Backup commands
+    parser_backup = subparsers.add_parser(
+        'backup',
+        help='List, restore and clean backup generations'
+    )
+    backup_subparsers = parser_backup.add_subparsers(
+        dest='backup_command',
+        help='Backup operations'
+    )
+    backup_subparsers.add_parser('list', help='List backup generations')
+    parser_backup_restore = backup_subparsers.add_parser(
+        'restore',
+        help='Restore the model from a generation'
+    )
+    parser_backup_restore.add_argument('generation', type=str,
+                                       help="Generation ID, unique prefix, or 'latest'")
+    parser_backup_restore.add_argument('--force', action='store_true',
+                                       help='Restore even if validation finds errors')
+    parser_backup_clean = backup_subparsers.add_parser(
+        'clean',
+        help='Apply retention and delete unreferenced blobs'
+    )
+    parser_backup_clean.add_argument('--keep-recent', type=int, default=None,
+                                     help=f'Most recent generations to keep (default: {BACKUP_KEEP_RECENT})')
+
+    # Diff and merge-file commands
+    parser_diff = subparsers.add_parser('diff',
+                                        help='Compare the model with another copy of it')
+    parser_diff.add_argument('files', nargs='+', metavar='FILE',
+                             help='The other copy; with two files, compare them with each other')
+    parser_merge_file = subparsers.add_parser('merge-file',
+                                              help='Merge another copy of the model into it')
+    parser_merge_file.add_argument('other', type=str, help='The other copy of the model')
+    parser_merge_file.add_argument('--base', type=str, default=None,
+                                   help='The copy both descend from, for a three-way merge')
+    parser_merge_file.add_argument('--output', '-o', type=str, default=None,
+                                   help='Write the merged model here instead of saving it')
+    parser_merge_file.add_argument('--dry-run', action='store_true',
+                                   help='Report what would change without saving')
+
+    # Sync commands
+    parser_sync = subparsers.add_parser('sync', help='Exchange changes with other replicas of the model')
+    sync_subparsers = parser_sync.add_subparsers(dest='sync_command', help='Sync operations')
+    sync_subparsers.add_parser('status', help="Show this replica and what its peers have")
+    parser_sync_export = sync_subparsers.add_parser('export', help='Write a changeset of recent changes')
+    parser_sync_export.add_argument('--since', type=str, default=None,
+                                    help="Peer ID (or prefix) to export for, or 'all' (default: every known peer)")
+    parser_sync_export.add_argument('--output', '-o', type=str, default=None,
+                                    help='Write the changeset to this file (default: stdout)')
+    parser_sync_export.add_argument('--dir', type=str, default=None,
+                                    help='Write the changeset into this exchange directory')
+    parser_sync_apply = sync_subparsers.add_parser('apply', help='Merge changesets into the model')
+    parser_sync_apply.add_argument('paths', nargs='+', metavar='PATH',
+                                   help='Changeset files, or directories of them')
+
+    # Shard command
+    parser_shard = subparsers.add_parser('shard',
+                                         help='Split concepts across several files for parallel loading')
+    parser_shard.add_argument('count', type=int,
+                              help=f'Number of shard files, 1-{MAX_SHARDS} (0: back to a single file)')
+
+    # Layout command
+    parser_layout = subparsers.add_parser('layout',
+                                          help='Choose how the model is stored on disk')
+    parser_layout.add_argument('kind', choices=LAYOUTS,
+                               help='file: one JSON file; shards: concepts split across '
+                                    'several files; concepts: one file per concept')
+    parser_layout.add_argument('--shards', type=int, default=16,
+                               help='Number of shard files for the shards layout (default: 16)')
+
+    # Serve command
+    parser_serve = subparsers.add_parser('serve',
+                                         help='Serve student models over HTTP/JSON')
+    parser_serve.add_argument('--host', type=str, default='127.0.0.1',
+                              help='Address to listen on (default: 127.0.0.1)')
+    parser_serve.add_argument('--port', type=int, default=8765,
+                              help='Port to listen on (default: 8765)')
+    parser_serve.add_argument('--root', type=str, default=None,
+                              help='Directory of per-student model files '
+                                   '(default: students/ beside the model file)')
 
     # Parse arguments
     args = parser.parse_args()
@@ -1055,42 +7755,123 @@ def main():
         parser.print_help()
         return
 
-    # Route to command handlers
+    if args.durability:
+        DURABILITY = args.durability
+    if args.compress_backups:
+        BACKUP_COMPRESS = True
+
+    if args.output:
+        OUTPUT = args.output
+
+    if OUTPUT == "text":
+        with deferred_cache():
+            result = run_command(args)
+    else:
+        # Results alone on stdout; progress and warnings to stderr
+        _results_stream = sys.stdout
+        try:
+            with contextlib.redirect_stdout(sys.stderr), deferred_cache():
+                result = run_command(args)
+        finally:
+            _results_stream = None
+
+    if args.command == 'validate' and not result:
+        sys.exit(1)
+
+
+def run_command(args):
+    """Route parsed arguments to their handler and return its result."""
     if args.command == 'init':
-        cmd_init(args)
+        return cmd_init(args)
     elif args.command == 'info':
-        cmd_info(args)
+        return cmd_info(args)
     elif args.command == 'list':
-        cmd_list(args)
+        return cmd_list(args)
     elif args.command == 'show':
-        cmd_show(args)
+        return cmd_show(args)
+    elif args.command == 'query':
+        return cmd_query(args)
+    elif args.command == 'export':
+        return cmd_export(args)
     elif args.command == 'related':
-        cmd_related(args)
+        return cmd_related(args)
+    elif args.command == 'context':
+        return cmd_context(args)
+    elif args.command == 'dependents':
+        return cmd_dependents(args)
     elif args.command == 'add':
-        cmd_add(args)
+        return cmd_add(args)
     elif args.command == 'update':
-        cmd_update(args)
+        return cmd_update(args)
     elif args.command == 'struggle':
-        cmd_struggle(args)
+        return cmd_struggle(args)
     elif args.command == 'breakthrough':
-        cmd_breakthrough(args)
+        return cmd_breakthrough(args)
     elif args.command == 'link':
-        cmd_link(args)
+        return cmd_link(args)
     elif args.command == 'unlink':
-        cmd_unlink(args)
+        return cmd_unlink(args)
+    elif args.command == 'link-batch':
+        return cmd_link_batch(args)
+    elif args.command == 'rename':
+        return cmd_rename(args)
+    elif args.command == 'merge':
+        return cmd_merge(args)
     elif args.command == 'session-end':
-        cmd_session_end(args)
+        return cmd_session_end(args)
     elif args.command == 'misconception':
         if not args.misconception_command:
-            print("❌ Please specify: add, resolve, or list")
-            print("   Usage: python student.py misconception {add|resolve|list}")
-            return
+            return fail("Please specify: add, resolve, or list",
+                        "Usage: python student.py misconception {add|resolve|list}")
         if args.misconception_command == 'add':
-            cmd_misconception_add(args)
+            return cmd_misconception_add(args)
         elif args.misconception_command == 'resolve':
-            cmd_misconception_resolve(args)
+            return cmd_misconception_resolve(args)
         elif args.misconception_command == 'list':
-            cmd_misconception_list(args)
+            return cmd_misconception_list(args)
+    elif args.command == 'history':
+        return cmd_history(args)
+    elif args.command == 'trend':
+        return cmd_trend(args)
+    elif args.command == 'log':
+        return cmd_log(args)
+    elif args.command == 'sessions':
+        return cmd_sessions(args)
+    elif args.command == 'validate':
+        return cmd_validate(args)
+    elif args.command == 'salvage':
+        return cmd_salvage(args)
+    elif args.command == 'diff':
+        return cmd_diff(args)
+    elif args.command == 'merge-file':
+        return cmd_merge_file(args)
+    elif args.command == 'sync':
+        if not args.sync_command:
+            return fail("Please specify: status, export, or apply",
+                        "Usage: python student.py sync {status|export|apply}")
+        if args.sync_command == 'status':
+            return cmd_sync_status(args)
+        elif args.sync_command == 'export':
+            return cmd_sync_export(args)
+        elif args.sync_command == 'apply':
+            return cmd_sync_apply(args)
+    elif args.command == 'shard':
+        return cmd_shard(args)
+    elif args.command == 'layout':
+        return cmd_layout(args)
+    elif args.command == 'serve':
+        return cmd_serve(args)
+    elif args.command == 'backup':
+        if not args.backup_command:
+            return fail("Please specify: list, restore, or clean",
+                        "Usage: python student.py backup {list|restore|clean}")
+        if args.backup_command == 'list':
+            return cmd_backup_list(args)
+        elif args.backup_command == 'restore':
+            return cmd_backup_restore(args)
+        elif args.backup_command == 'clean':
+            return cmd_backup_clean(args)
+
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,211 @@
+"""
+test_async_api.py - Tests for the asyncio API and HTTP/JSON server
+
+Tests cover:
+- Coroutine methods matching StudentModel's
+- Concurrent writes serialized, all saved, and coalesced into fewer saves
+- Errors raised as StudentModelError
+- Server routing, status codes and keep-alive connections
+- Bad and oversized Content-Length refused without reading the body
+"""
+
+import asyncio
+import json
+
+import pytest
+
+import student
+
+
+def _concept_args(name, mastery=50):
+    return {"name": name, "mastery": mastery, "confidence": "medium"}
+
+
+class TestAsyncModel:
+    """Test AsyncStudentModel."""
+
+    def test_calls(self, temp_data_file):
+        """Reads and writes are awaitable and reach the file."""
+        async def scenario():
+            model = await student.AsyncStudentModel.open()
+            await model.add_concept(**_concept_args("Closures"))
+            await model.update("Closures", mastery=65)
+            return await model.get_concept("closures")
+
+        assert asyncio.run(scenario())["mastery"] == 65
+        assert student.load_model()["concepts"]["Closures"]["mastery"] == 65
+
+    def test_concurrent_writes_coalesce(self, temp_data_file):
+        """Writes issued together are all saved, with fewer saves than writes."""
+        async def scenario():
+            model = await student.AsyncStudentModel.open()
+            await model.add_concept(**_concept_args("Closures"))
+            before = model.writes
+            await asyncio.gather(*(model.log_struggle("Closures", f"struggle {i}")
+                                   for i in range(20)))
+            return model.writes - before
+
+        writes = asyncio.run(scenario())
+        assert 1 <= writes < 20
+        assert len(student.load_model()["concepts"]["Closures"]["struggles"]) == 20
+
+    def test_errors_raise(self, temp_data_file):
+        """Failures surface as StudentModelError and save nothing."""
+        async def scenario():
+            model = await student.AsyncStudentModel.open()
+            with pytest.raises(student.ConceptNotFoundError):
+                await model.update("Nope", mastery=10)
+            return model.writes
+
+        assert asyncio.run(scenario()) == 0
+
+    def test_unknown_method(self, temp_data_file):
+        """Only the listed methods are exposed."""
+        async def scenario():
+            return await student.AsyncStudentModel.open()
+
+        with pytest.raises(AttributeError):
+            asyncio.run(scenario()).save
+
+
+async def _request(port, verb, path, body=None, reader_writer=None):
+    """One HTTP request; returns (status, response, (reader, writer))."""
+    reader, writer = reader_writer or await asyncio.open_connection("127.0.0.1", port)
+    data = json.dumps(body).encode() if body is not None else b""
+    writer.write(f"{verb} {path} HTTP/1.1\r\nHost: test\r\n"
+                 f"Content-Length: {len(data)}\r\n\r\n".encode() + data)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while (line := await reader.readline()) != b"\r\n":
+        name, _, value = line.decode().partition(":")
+        headers[name.lower()] = value.strip()
+    response = json.loads(await reader.readexactly(int(headers["content-length"])))
+    return status, response, (reader, writer)
+
+
+async def _close(reader_writer):
+    """Close a client connection and let the server notice."""
+    reader_writer[1].close()
+    await reader_writer[1].wait_closed()
+    await asyncio.sleep(0.01)
+
+
+class TestServer:
+    """Test StudentServer over a real socket."""
+
+    def _serve(self, root, requests):
+        async def scenario():
+            server = student.StudentServer(root)
+            listener = await server.start(port=0)
+            port = listener.sockets[0].getsockname()[1]
+            try:
+                return await requests(port), server
+            finally:
+                listener.close()
+                await listener.wait_closed()
+        return asyncio.run(scenario())
+
+    def test_round_trip(self, tmp_path):
+        """Writes and reads on one kept-alive connection, one file per student."""
+        async def requests(port):
+            status, added, conn = await _request(port, "POST", "/students/ada/add_concept",
+                                                 _concept_args("Closures", 40))
+            _, shown, conn = await _request(port, "POST", "/students/ada/get_concept",
+                                            {"name": "closures"}, conn)
+            _, other, conn = await _request(port, "GET", "/students/bob/concepts?x=1",
+                                            None, conn)
+            await _close(conn)
+            return status, added, shown, other
+
+        (status, added, shown, other), server = self._serve(tmp_path, requests)
+        assert status == 200 and added["changed"] is True
+        assert shown["concept"] == "Closures" and shown["mastery"] == 40
+        assert other["concepts"] == []
+        assert (tmp_path / "ada.json").exists()
+        assert set(server.models) == {"ada", "bob"}
+
+    def test_error_statuses(self, tmp_path):
+        """Unknown paths, methods, concepts and bad arguments get error statuses."""
+        async def requests(port):
+            results = []
+            for verb, path, body in [
+                    ("GET", "/students/ada/get_concept", None),
+                    ("POST", "/students/ada/get_concept", {"name": "Nope"}),
+                    ("POST", "/students/ada/add_concept", {"nam": "X"}),
+                    ("GET", "/students/ada/update", None),
+                    ("GET", "/students/ada/save", None),
+                    ("GET", "/students/../etc", None)]:
+                status, response, conn = await _request(port, verb, path, body)
+                await _close(conn)
+                results.append((status, response))
+            return results
+
+        results, _ = self._serve(tmp_path, requests)
+        assert [status for status, _ in results] == [400, 404, 400, 405, 404, 404]
+        assert results[1][1]["hints"]
+        assert all(response["ok"] is False for _, response in results)
+
+    def test_argument_types_checked(self, tmp_path):
+        """Arguments of the wrong JSON type are refused before the method runs."""
+        async def requests(port):
+            results = []
+            await _request(port, "POST", "/students/ada/add_concept", _concept_args("A"))
+            for path, body in [
+                    ("update", {"name": "A", "mastery": "x"}),
+                    ("update", {"name": "A", "mastery": True}),
+                    ("session_end", {"updates": [["A", 50]]}),
+                    ("session_end", {"struggles": "A"}),
+                    ("context", {"names": "A"}),
+                    ("concepts", {"where": 5}),
+                    ("session_end", {"updates": [["A", 60, "high"]], "struggles": [["A", "x"]]}),
+                    ("update", {"name": "A", "mastery": None, "confidence": "low"})]:
+                status, response, conn = await _request(port, "POST", f"/students/ada/{path}", body)
+                await _close(conn)
+                results.append((status, response))
+            return results
+
+        results, _ = self._serve(tmp_path, requests)
+        assert [status for status, _ in results] == [400] * 6 + [200, 200]
+        assert "'mastery' has the wrong type (str)" in results[0][1]["error"]
+
+    def test_unexpected_errors_answered(self, tmp_path, monkeypatch):
+        """An exception the method does not expect becomes a 500 response."""
+        def broken(self, where=None):
+            raise RuntimeError("boom")
+        monkeypatch.setattr(student.StudentModel, "concepts", broken)
+
+        async def requests(port):
+            status, response, conn = await _request(port, "GET", "/students/ada/concepts")
+            _, after, conn = await _request(port, "GET", "/students/ada/stats", None, conn)
+            await _close(conn)
+            return status, response, after
+
+        (status, response, after), _ = self._serve(tmp_path, requests)
+        assert status == 500 and response == {"ok": False, "error": "concepts failed: RuntimeError: boom"}
+        assert after["ok"] is True
+
+    def test_content_length_checked(self, tmp_path, monkeypatch):
+        """A negative, non-numeric or too large Content-Length is refused and closes."""
+        monkeypatch.setattr(student, "SERVER_MAX_BODY", 100)
+
+        async def requests(port):
+            results = []
+            for length in ("-1", "abc", "101", "1e3"):
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                writer.write(f"POST /students/ada/stats HTTP/1.1\r\n"
+                             f"Content-Length: {length}\r\n\r\n".encode())
+                await writer.drain()
+                raw = await reader.read()       # the server closes after answering
+                head, _, data = raw.partition(b"\r\n\r\n")
+                results.append((int(head.split()[1]), b"Connection: close" in head,
+                                json.loads(data)))
+                writer.close()
+                await writer.wait_closed()
+            return results
+
+        results, server = self._serve(tmp_path, requests)
+        assert [(status, closed) for status, closed, _ in results] == \
+            [(400, True), (400, True), (413, True), (400, True)]
+        assert "Invalid Content-Length '-1'" in results[0][2]["error"]
+        assert server.models == {}
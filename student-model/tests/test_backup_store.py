@@ -0,0 +1,307 @@
+"""
+test_backup_store.py - Tests for the rotating, deduplicated backup store
+
+Tests cover:
+- Generations are recorded on save and rebuild the exact file
+- Unchanged concepts are deduplicated across generations
+- Saves hash only re-encoded concepts; manifests list changes since a base
+- Optional compression and packed blobs
+- Pack and index appends locked against other writers
+- Stores written before packs stay readable
+- Hourly/daily retention and blob garbage collection
+- backup list/restore/clean commands
+- Corruption recovery from the store
+"""
+
+import argparse
+import hashlib
+import json
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+import student
+
+
+def _blobs(store):
+    return sorted(student.pack_index(store))
+
+
+def _raw_blob(store, digest):
+    pack, offset, length = student.pack_index(store)[digest]
+    with open(store / "packs" / f"{pack}.pack", 'rb') as f:
+        f.seek(offset)
+        return f.read(length)
+
+
+def _save_fake_generation(store, when):
+    """Write an empty-manifest generation with a given timestamp."""
+    gen_dir = store / "generations"
+    gen_dir.mkdir(parents=True, exist_ok=True)
+    gen_id = when.strftime(student._GENERATION_FORMAT)
+    (gen_dir / f"{gen_id}.json").write_text(json.dumps(
+        {"created": when.isoformat(), "sections": [], "concepts": []}))
+    return gen_id
+
+
+class TestGenerations:
+    """Test generation recording and reconstruction."""
+
+    def test_generation_rebuilds_exact_file(self, sample_model, temp_data_file):
+        """A generation's text equals the file that was saved."""
+        model = student.load_model()
+        student.save_model(model)
+        latest = student.list_generations()[-1]
+        assert student.generation_text(latest) == temp_data_file.read_text(encoding='utf-8')
+
+    def test_unchanged_concepts_are_deduplicated(self, sample_model, temp_data_file):
+        """Changing one concept adds only that concept and metadata blobs."""
+        model = student.load_model()
+        student.save_model(model)
+        before = _blobs(student.backup_dir())
+
+        model["concepts"]["React Hooks"]["mastery"] = 90
+        student.mark_dirty(model, concept="React Hooks")
+        student.save_model(model)
+        after = _blobs(student.backup_dir())
+
+        assert len(after) - len(before) == 2
+
+    def test_compressed_blobs(self, temp_data_file, monkeypatch):
+        """Compressed blobs are written as .gz and read back transparently."""
+        monkeypatch.setattr(student, 'BACKUP_COMPRESS', True)
+        model = student.get_default_model()
+        model["metadata"]["student_profile"] = "zipped"
+        student.save_model(model)
+
+        store = student.backup_dir()
+        assert all(_raw_blob(store, digest)[:2] == b'\x1f\x8b' for digest in _blobs(store))
+        text = student.generation_text(student.list_generations()[-1])
+        assert json.loads(text)["metadata"]["student_profile"] == "zipped"
+
+    def test_backups_disabled(self, temp_data_file, monkeypatch):
+        """No store is created when backups are disabled."""
+        monkeypatch.setattr(student, 'BACKUPS_ENABLED', False)
+        student.save_model(student.get_default_model())
+        assert not student.backup_dir().exists()
+
+
+class TestIncremental:
+    """Test that a save costs the size of its change."""
+
+    @pytest.fixture
+    def many(self, temp_data_file):
+        model = student.get_default_model()
+        for i in range(40):
+            model["concepts"][f"C{i:02d}"] = {"mastery": i, "confidence": "low", "struggles": []}
+        student.save_model(model)
+        return student.load_model()
+
+    def test_only_changed_concepts_hashed(self, many, monkeypatch):
+        hashed = []
+        put = student._BlobWriter.put
+        monkeypatch.setattr(student._BlobWriter, "put",
+                            lambda self, text: hashed.append(text) or put(self, text))
+        many["concepts"]["C07"]["mastery"] = 99
+        student.mark_dirty(many, concept="C07")
+        student.save_model(many)
+        assert sum('"mastery": 99' in text for text in hashed) == 1
+        assert len(hashed) == 1 + len(many) - 1     # the concept and each section but "concepts"
+
+    def test_manifest_lists_changes_since_base(self, many, temp_data_file):
+        many["concepts"]["C03"]["mastery"] = 77
+        student.mark_dirty(many, concept="C03")
+        del many["concepts"]["C05"]
+        many["concepts"]["New"] = {"mastery": 1}
+        student.save_model(many)
+        manifest = student.read_generation(student.list_generations()[-1])
+        assert [name for name, _ in manifest["concepts"]] == ["C03", "New"]
+        assert manifest["removed"] == ["C05"] and manifest["count"] == 40
+        assert student.generation_text(student.list_generations()[-1]) == temp_data_file.read_text()
+
+    def test_reorder_writes_new_base(self, many, temp_data_file):
+        record = many["concepts"].pop("C00")
+        many["concepts"]["C00"] = record
+        student.save_model(many)
+        latest = student.list_generations()[-1]
+        assert student.read_generation(latest)["base"] == latest
+        assert student.generation_text(latest) == temp_data_file.read_text()
+
+    def test_changed_file_is_rehashed(self, many, temp_data_file):
+        """A file saved without backups is not trusted to match the store."""
+        text = temp_data_file.read_text().replace('"mastery": 3,', '"mastery": 33,')
+        temp_data_file.write_text(text)
+        model = student.load_model()
+        model["metadata"]["student_profile"] = "x"
+        student.save_model(model)
+        assert student.generation_text(student.list_generations()[-1]) == temp_data_file.read_text()
+
+    def test_one_pack_file(self, many):
+        packs = list((student.backup_dir() / "packs").glob('*.pack'))
+        assert len(packs) == 1
+
+    @pytest.mark.skipif(student.fcntl is None, reason="needs fcntl")
+    def test_flush_waits_for_other_writer(self, temp_data_file, monkeypatch):
+        """A flush waits for another process's lock and appends after its blobs."""
+        monkeypatch.setattr(student, "BACKUP_COMPRESS", False)
+        store = student.backup_dir()
+        state = {}
+        writer = student._BlobWriter(store, state, set())
+        writer.put("first")
+        writer.flush()
+
+        writer.put("second")
+        index = store / "packs" / "index.jsonl"
+        with open(index, 'ab') as other:
+            student.fcntl.flock(other.fileno(), student.fcntl.LOCK_EX)
+            flushing = threading.Thread(target=writer.flush)
+            flushing.start()
+            flushing.join(timeout=0.2)
+            assert flushing.is_alive()
+            # The other process appends a blob while it holds the lock
+            with open(store / "packs" / f"{state['pack']}.pack", 'ab') as pack:
+                pack.write(b"other")
+            student.fcntl.flock(other.fileno(), student.fcntl.LOCK_UN)
+        flushing.join()
+
+        digest = hashlib.sha256(b"second").hexdigest()
+        assert _raw_blob(store, digest) == b"second"
+
+    def test_legacy_store_readable(self, temp_data_file):
+        """Stores with one file per blob and full manifests still restore and clean."""
+        store = student.backup_dir()
+        text = '{\n  "metadata": {"created": "x", "last_updated": "x"},\n  "concepts": {},\n  "sessions": []\n}'
+        digest = hashlib.sha256(b'{"created": "x", "last_updated": "x"}').hexdigest()
+        (store / "objects" / digest[:2]).mkdir(parents=True)
+        (store / "objects" / digest[:2] / digest).write_text('{"created": "x", "last_updated": "x"}')
+        orphan = store / "objects" / "ff" / ("f" * 64)
+        orphan.parent.mkdir()
+        orphan.write_text("{}")
+        for key, value in (("concepts", "{}"), ("sessions", "[]")):
+            h = hashlib.sha256(value.encode()).hexdigest()
+            (store / "objects" / h[:2]).mkdir(exist_ok=True)
+            (store / "objects" / h[:2] / h).write_text(value)
+        gen_id = _save_fake_generation(store, datetime.now())
+        (store / "generations" / f"{gen_id}.json").write_text(json.dumps({
+            "created": "x", "sections": [
+                ["metadata", digest],
+                ["concepts", hashlib.sha256(b"{}").hexdigest()],
+                ["sessions", hashlib.sha256(b"[]").hexdigest()]], "concepts": []}))
+        assert student.generation_text(gen_id) == text
+        student.prune_backups(store, collect=True)
+        assert not orphan.exists() and student.generation_text(gen_id) == text
+
+
+class TestRetention:
+    """Test the recent/hourly/daily retention policy."""
+
+    def test_retention_thins_old_generations(self, temp_data_file, monkeypatch):
+        """Old generations collapse to one per hour, then one per day."""
+        monkeypatch.setattr(student, 'BACKUP_KEEP_RECENT', 0)
+        store = student.backup_dir()
+        now = datetime.now()
+        # Three generations in the same hour two hours ago (mid-hour, so
+        # they never straddle an hour boundary)
+        hour = now.replace(minute=30) - timedelta(hours=2)
+        hourly = [_save_fake_generation(store, hour - timedelta(minutes=m))
+                  for m in (1, 2, 3)]
+        # Two generations on the same day five days ago
+        daily = [_save_fake_generation(store, now - timedelta(days=5, minutes=m))
+                 for m in (1, 2)]
+        # One generation beyond the daily window
+        ancient = _save_fake_generation(store, now - timedelta(days=90))
+
+        student.prune_backups(store)
+        kept = set(student.list_generations(store))
+
+        assert hourly[0] in kept and not {hourly[1], hourly[2]} & kept
+        assert daily[0] in kept and daily[1] not in kept
+        assert ancient not in kept
+
+    def test_recent_generations_always_kept(self, temp_data_file):
+        """The newest BACKUP_KEEP_RECENT generations survive pruning."""
+        model = student.get_default_model()
+        for i in range(15):
+            model["metadata"]["student_profile"] = f"v{i}"
+            student.save_model(model)
+        assert len(student.list_generations()) >= student.BACKUP_KEEP_RECENT
+
+    def test_clean_collects_orphan_blobs(self, temp_data_file, capsys):
+        """backup clean removes blobs only pruned generations referenced; checkpoints keep theirs."""
+        model = student.get_default_model()
+        for i in range(5):
+            model["metadata"]["student_profile"] = f"v{i}"
+            student.save_model(model)
+
+        student.cmd_backup_clean(argparse.Namespace(keep_recent=1))
+        captured = capsys.readouterr()
+        assert "Cleaned backup store" in captured.out
+
+        store = student.backup_dir()
+        gen_ids = student.list_generations(store)
+        live = set()
+        for kind in ("generations", "checkpoints"):
+            for gen_id in student.list_generations(store, kind):
+                manifest = student.read_generation(gen_id, store, kind)
+                live |= student._manifest_hashes(manifest)
+                live.update(h for _, h in student.manifest_concepts(manifest, store))
+        assert set(_blobs(store)) == live
+        # Newest generation must still rebuild
+        assert "v4" in student.generation_text(gen_ids[-1])
+
+
+class TestBackupCommands:
+    """Test backup list/restore."""
+
+    def test_list_empty(self, temp_data_file, capsys):
+        """Listing with no store explains how backups are made."""
+        student.cmd_backup_list(argparse.Namespace())
+        assert "No backups yet" in capsys.readouterr().out
+
+    def test_list_shows_generations(self, sample_model, temp_data_file, capsys):
+        """Listing shows each generation with its concept count."""
+        student.save_model(student.load_model())
+        student.cmd_backup_list(argparse.Namespace())
+        captured = capsys.readouterr()
+        assert "1 generations" in captured.out
+        assert "2 concepts" in captured.out
+
+    def test_restore_older_generation(self, temp_data_file, capsys):
+        """Restoring brings back an older version as the current model."""
+        model = student.get_default_model()
+        model["metadata"]["student_profile"] = "old"
+        student.save_model(model)
+        old_id = student.list_generations()[-1]
+        model["metadata"]["student_profile"] = "new"
+        student.save_model(model)
+
+        student.cmd_backup_restore(argparse.Namespace(generation=old_id))
+        captured = capsys.readouterr()
+        assert "Restored model from backup" in captured.out
+        assert student.load_model()["metadata"]["student_profile"] == "old"
+
+    def test_resolve_generation_prefix(self, temp_data_file, monkeypatch):
+        """Generations resolve by 'latest' or a unique prefix."""
+        store = student.backup_dir()
+        a = _save_fake_generation(store, datetime(2024, 1, 1, 10))
+        b = _save_fake_generation(store, datetime(2024, 2, 1, 10))
+        assert student.resolve_generation("latest") == b
+        assert student.resolve_generation("202401") == a
+        assert student.resolve_generation("2024") is None
+
+    def test_restore_unknown_generation(self, temp_data_file, capsys):
+        """Unknown generation references are rejected."""
+        student.cmd_backup_restore(argparse.Namespace(generation="1999"))
+        assert "No unique backup generation" in capsys.readouterr().out
+
+    def test_corrupt_file_recovers_from_store(self, temp_data_file, capsys):
+        """load_model falls back to the newest generation on corrupt JSON."""
+        model = student.get_default_model()
+        model["metadata"]["student_profile"] = "From Store"
+        student.save_model(model)
+        temp_data_file.write_text('{"metadata": {"created": ')
+
+        loaded = student.load_model()
+        assert loaded["metadata"]["student_profile"] == "From Store"
+        assert "Restored from backup" in capsys.readouterr().out
@@ -0,0 +1,183 @@
+"""
+test_concept_files.py - Tests for the one-file-per-concept layout
+
+Tests cover:
+- Switching a model into the layout and back out of it
+- Saves rewrite only the touched concept file and append to the index
+- list and info served from the index without opening concept files
+- Renames, removals and index compaction
+- Backup restores, validation and the layout command
+"""
+
+import argparse
+import builtins
+import json
+
+import pytest
+
+import student
+
+
+def _concept(mastery):
+    return {"mastery": mastery, "confidence": "medium",
+            "first_encountered": "2025-01-01T12:00:00", "last_reviewed": "2025-01-01T12:00:00",
+            "struggles": [], "breakthroughs": [], "related_concepts": []}
+
+
+@pytest.fixture
+def per_concept(temp_data_file, capsys):
+    """Ten concepts and a misconception, one file per concept."""
+    model = student.get_default_model()
+    for i in range(10):
+        model["concepts"][f"Concept {i}"] = _concept(10 * i)
+    model["misconceptions"] = [{"concept": "Concept 1", "belief": "b", "correction": "c",
+                                "date_identified": "2025-01-01T12:00:00", "resolved": False}]
+    student.save_model(model)
+    result = student.StudentModel.open().set_layout("concepts")
+    assert result["changed"] is True and result["previous_layout"] == "file"
+    return temp_data_file
+
+
+def _concept_files():
+    return {p.name: p.read_text() for p in (student.concept_dir() / "concepts").iterdir()}
+
+
+def _index_lines():
+    return (student.concept_dir() / "index.jsonl").read_text().splitlines()
+
+
+class TestLayout:
+    """Test switching layouts."""
+
+    def test_files(self, per_concept):
+        on_disk = json.loads(per_concept.read_text())
+        assert "concepts" not in on_disk and "misconceptions" not in on_disk
+        assert on_disk["concept_files"]["directory"] == student.concept_dir().name
+        files = _concept_files()
+        assert len(files) == 10
+        assert json.loads(files[student.concept_file_name("Concept 3")]) == {
+            "concepts": {"Concept 3": _concept(30)}}
+        assert len(_index_lines()) == 10
+
+    def test_load_matches_single_file(self, per_concept):
+        model = student.load_model()
+        assert list(model) == ["schema_version", "metadata", "concepts", "misconceptions", "sessions"]
+        assert list(model["concepts"]) == [f"Concept {i}" for i in range(10)]
+        assert model["misconceptions"][0]["concept"] == "Concept 1"
+        assert isinstance(model.layout, student.ConceptFiles)
+
+    def test_back_to_file(self, per_concept):
+        result = student.StudentModel.open().set_layout("file")
+        assert result["previous_layout"] == "concepts"
+        assert not student.concept_dir().exists()
+        on_disk = json.loads(per_concept.read_text())
+        assert len(on_disk["concepts"]) == 10 and len(on_disk["misconceptions"]) == 1
+
+    def test_to_shards(self, per_concept):
+        student.StudentModel.open().set_layout("shards", 2)
+        assert not student.concept_dir().exists()
+        assert len(list(student.shard_dir().iterdir())) == 2
+        assert len(student.load_model()["concepts"]) == 10
+
+    def test_unchanged(self, per_concept):
+        result = student.StudentModel.open().set_layout("concepts")
+        assert result["changed"] is False
+
+    def test_invalid(self, per_concept):
+        with pytest.raises(student.InvalidValueError):
+            student.StudentModel.open().set_layout("folders")
+
+
+class TestSaves:
+    """Test that saves touch one concept file."""
+
+    def test_update_writes_one_file(self, per_concept):
+        before = _concept_files()
+        student.StudentModel.open().update("Concept 4", mastery=99)
+        after = _concept_files()
+        assert [name for name in after if after[name] != before[name]] == \
+            [student.concept_file_name("Concept 4")]
+        assert json.loads(_index_lines()[-1])["mastery"] == 99
+        assert student.load_model()["concepts"]["Concept 4"]["mastery"] == 99
+
+    def test_struggle_leaves_misconceptions(self, per_concept):
+        path = student.concept_dir() / "misconceptions.json"
+        before = path.stat().st_mtime_ns
+        student.StudentModel.open().log_struggle("Concept 2", "off by one")
+        assert path.stat().st_mtime_ns == before
+        assert student.load_model()["concepts"]["Concept 2"]["struggles"] == ["off by one"]
+
+    def test_rename_and_remove(self, per_concept):
+        model = student.StudentModel.open()
+        model.rename("Concept 5", "Renamed")
+        assert student.concept_file_name("Concept 5") not in _concept_files()
+        assert student.concept_file_name("Renamed") in _concept_files()
+        loaded = student.load_model()["concepts"]
+        assert "Renamed" in loaded and "Concept 5" not in loaded and len(loaded) == 10
+
+    def test_compaction(self, per_concept):
+        model = student.StudentModel.open()
+        for mastery in range(40):
+            model.update("Concept 0", mastery=mastery)
+        lines = _index_lines()
+        assert len(lines) <= 2 * 10 + 16
+        assert json.loads(lines[-1]) == student._index_entry("Concept 0", model.data["concepts"]["Concept 0"])
+        assert student.load_model()["concepts"]["Concept 0"]["mastery"] == 39
+
+
+class TestReads:
+    """Test reads served from the index."""
+
+    @pytest.fixture
+    def no_concept_files(self, monkeypatch):
+        real_open = builtins.open
+
+        def guarded(path, *args, **kwargs):
+            assert "/concepts/" not in str(path), f"opened {path}"
+            return real_open(path, *args, **kwargs)
+        monkeypatch.setattr(builtins, "open", guarded)
+
+    def test_list(self, per_concept, no_concept_files, capsys):
+        student.drop_cache()
+        result = student.cmd_list(argparse.Namespace(where=None, as_of=None))
+        assert [c["concept"] for c in result["concepts"]][:2] == ["Concept 9", "Concept 8"]
+        assert "📚 Tracked Concepts (10 total)" in capsys.readouterr().out
+
+    def test_info(self, per_concept, no_concept_files, capsys):
+        result = student.cmd_info(argparse.Namespace(as_of=None))
+        assert result["concepts"] == 10 and result["layout"] == "concepts"
+        assert result["avg_mastery"] == 45
+        assert "Layout:         one file per concept" in capsys.readouterr().out
+
+    def test_summary_matches_loaded(self, per_concept):
+        student.StudentModel.open().update("Concept 7", mastery=12)
+        from_index = student.StudentModel.open().concepts()
+        loaded = student.StudentModel.open()
+        assert loaded.data["concepts"]
+        assert from_index == loaded.concepts()
+
+
+class TestRecovery:
+    """Test restores and validation."""
+
+    def test_missing_file_restores_backup(self, per_concept, capsys):
+        (student.concept_dir() / "concepts" / student.concept_file_name("Concept 6")).unlink()
+        model = student.load_model()
+        assert "Unreadable concept file" in capsys.readouterr().out
+        assert len(model["concepts"]) == 10
+        assert isinstance(student.load_model().layout, student.ConceptFiles)
+
+    def test_valid(self, per_concept):
+        assert student.validate_file(per_concept) == []
+
+    def test_bad_concept_file(self, per_concept):
+        path = student.concept_dir() / "concepts" / student.concept_file_name("Concept 8")
+        path.write_text(json.dumps({"concepts": {"Concept 8": dict(_concept(80), mastery=500)}}))
+        issues = student.validate_file(per_concept)
+        assert any("out of range" in i["message"] for i in issues)
+
+    def test_command(self, per_concept, capsys):
+        student.cmd_layout(argparse.Namespace(kind="file", shards=16))
+        assert "✅ Merged 10 concepts back into" in capsys.readouterr().out
+        student.cmd_layout(argparse.Namespace(kind="concepts", shards=16))
+        assert "✅ Stored 10 concepts one file per concept" in capsys.readouterr().out
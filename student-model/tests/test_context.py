@@ -0,0 +1,143 @@
+"""
+test_context.py - Tests for tutor context extraction
+
+Tests cover:
+- k-hop neighbourhood in both link directions, with route and relation
+- Relevance ranking: low mastery, open misconceptions, recent struggles
+- Token budget and the concept limit it implies
+- Markdown and JSON output, several focus concepts, unknown concepts
+"""
+
+import argparse
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import student
+
+
+NOW = datetime(2025, 6, 1, 12, 0, 0)
+
+
+def _concept(mastery=50, related=(), struggles=(), days_ago=1):
+    return {"mastery": mastery, "confidence": "medium",
+            "last_reviewed": (NOW - timedelta(days=days_ago)).isoformat(),
+            "struggles": list(struggles), "breakthroughs": [],
+            "related_concepts": list(related)}
+
+
+@pytest.fixture
+def graph(temp_data_file, capsys):
+    """Hooks -> Closures -> Scope -> Variables; Context -> Hooks; Far is unlinked."""
+    model = student.get_default_model()
+    model["concepts"].update({
+        "Hooks": _concept(40, related=["Closures"], struggles=["deps array"]),
+        "Closures": _concept(70, related=["Scope"]),
+        "Scope": _concept(30, related=["Variables"], struggles=["hoisting"]),
+        "Variables": _concept(90),
+        "Context": _concept(60, related=["Hooks"]),
+        "Far": _concept(5),
+    })
+    model["misconceptions"] = [{
+        "concept": "Closures", "belief": "copies values", "correction": "captures bindings",
+        "date_identified": NOW.isoformat(), "resolved": False, "date_resolved": None}]
+    student.save_model(model)
+    return temp_data_file
+
+
+def _names(context):
+    return [item["concept"] for item in context["concepts"]]
+
+
+class TestExtract:
+    """Test extract_context."""
+
+    def test_hops_both_directions(self, graph):
+        """Prerequisites and dependents within reach are found, nothing further."""
+        context = student.extract_context(student.load_model(), ["Hooks"], hops=2, now=NOW)
+        assert set(_names(context)) == {"Hooks", "Closures", "Context", "Scope"}
+
+        by_name = {item["concept"]: item for item in context["concepts"]}
+        assert (by_name["Scope"]["hops"], by_name["Scope"]["via"]) == (2, "Closures")
+        assert by_name["Context"]["relation"] == "dependent"
+        assert by_name["Closures"]["relation"] == "prerequisite"
+
+    def test_ranking(self, graph):
+        """Focus first, then open misconceptions, low mastery and struggles first."""
+        context = student.extract_context(student.load_model(), ["Hooks"], hops=2, now=NOW)
+        assert _names(context)[0] == "Hooks"
+        # Closures: 30 + 20 misconception - 15; Context: 40 - 15; Scope: 70 + 10 - 30
+        assert _names(context)[1:] == ["Scope", "Closures", "Context"]
+
+    def test_old_struggles_count_less(self, graph):
+        """Struggles only boost concepts reviewed recently."""
+        model = student.load_model()
+        fresh = student.extract_context(model, ["Scope"], hops=0, now=NOW)["concepts"][0]
+        stale = student.extract_context(model, ["Scope"], hops=0,
+                                        now=NOW + timedelta(days=60))["concepts"][0]
+        assert fresh["relevance"] == 100 - fresh["effective"] + 10
+        assert stale["relevance"] == 100 - stale["effective"]
+
+    def test_offset_timestamps(self, graph):
+        """last_reviewed with a UTC offset is compared in local time, not rejected."""
+        model = student.load_model()
+        reviewed = (NOW - timedelta(days=1)).astimezone().astimezone(timezone(timedelta(hours=5)))
+        model["concepts"]["Scope"]["last_reviewed"] = reviewed.isoformat()
+        item = student.extract_context(model, ["Scope"], hops=0, now=NOW)["concepts"][0]
+        assert item["relevance"] == 100 - item["effective"] + 10
+
+    def test_budget_cuts_lowest_ranked(self, graph):
+        """A small budget keeps the focus and drops the least relevant neighbours."""
+        model = student.load_model()
+        full = student.extract_context(model, ["Hooks"], hops=3, budget=10000, now=NOW)
+        small = student.extract_context(model, ["Hooks"], hops=3, budget=120, now=NOW)
+
+        assert small["omitted"] > 0
+        assert small["tokens"] <= 120
+        assert _names(small)[0] == "Hooks"
+        assert set(_names(small)) < set(_names(full))
+
+    def test_focus_always_included(self, graph):
+        """Focus concepts are kept even with no budget."""
+        context = student.extract_context(student.load_model(), ["Hooks", "Far"],
+                                          budget=0, now=NOW)
+        assert set(_names(context)) == {"Hooks", "Far"}
+
+    def test_walk_limited_by_budget(self, graph, monkeypatch):
+        """Only as many concepts as could fit are visited."""
+        monkeypatch.setattr(student, "CONTEXT_MIN_ITEM_TOKENS", 100)
+        context = student.extract_context(student.load_model(), ["Hooks"], hops=3,
+                                          budget=200, now=NOW)
+        assert len(context["concepts"]) + context["omitted"] == 2
+
+
+class TestCommand:
+    """Test cmd_context."""
+
+    def _run(self, names, fmt="markdown", hops=2, budget=1500):
+        student.cmd_context(argparse.Namespace(concept_names=names, hops=hops,
+                                               budget=budget, format=fmt))
+
+    def test_markdown(self, graph, capsys):
+        """Markdown shows mastery, route, struggles and open misconceptions."""
+        self._run(["hooks"])
+        output = capsys.readouterr().out
+        assert output.startswith("## Learner context: Hooks")
+        assert "- **Closures**" in output and "prerequisite of Hooks" in output
+        assert "Believes: copies values (actually: captures bindings)" in output
+        assert "Struggles: deps array" in output
+
+    def test_json(self, graph, capsys):
+        """JSON output is one compact line."""
+        self._run(["Hooks", "Far"], fmt="json", hops=1)
+        output = capsys.readouterr().out
+        assert output.count("\n") == 1
+        context = json.loads(output)
+        assert context["focus"] == ["Hooks", "Far"]
+        assert "Far" in _names(context)
+
+    def test_unknown(self, graph, capsys):
+        """An unknown concept is reported."""
+        self._run(["Hooks", "Nope"])
+        assert "Concept 'Nope' not found" in capsys.readouterr().out
@@ -101,7 +101,9 @@ class TestSaveLoad:
         assert loaded["metadata"]["student_profile"] == "Test Student"
     
     def test_save_creates_backup(self, temp_data_file):
-        """Saving creates backup of existing file."""
+        """Saving records a backup generation for each version."""
+        from student import list_generations, generation_text
+
         # Create initial model
         model1 = get_default_model()
         model1["metadata"]["student_profile"] = "Version 1"
@@ -112,13 +114,12 @@ class TestSaveLoad:
         model2["metadata"]["student_profile"] = "Version 2"
         save_model(model2)
         
-        # Check backup exists
-        backup = temp_data_file.with_suffix('.json.backup')
-        assert backup.exists()
+        # Check backup generations exist
+        generations = list_generations()
+        assert len(generations) == 2
         
-        # Backup should have version 1
-        with open(backup, 'r') as f:
-            backup_data = json.load(f)
+        # Previous generation should have version 1
+        backup_data = json.loads(generation_text(generations[0]))
         assert backup_data["metadata"]["student_profile"] == "Version 1"
     
     def test_save_updates_timestamp(self, temp_data_file):
@@ -279,11 +280,11 @@ class TestAtomicWrites:
         save_model(model2)  # Should fail
         
         # Backup should still have good data
-        backup = temp_data_file.with_suffix('.json.backup')
-        with open(backup, 'r') as f:
-            backup_data = json.load(f)
+        from student import list_generations, generation_text
+        generations = list_generations()
+        assert len(generations) == 1
+        backup_data = json.loads(generation_text(generations[-1]))
         assert backup_data["metadata"]["student_profile"] == "Good Backup"
 
-
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
\ No newline at end of file
@@ -0,0 +1,129 @@
+"""
+test_dependents.py - Tests for the dependents command
+
+Tests cover:
+- Direct and transitive dependents, with depth and route
+- Cycles and case-insensitive links
+- The reverse link index kept current by link, unlink, add --related and replay
+- Command output and --as-of
+"""
+
+import argparse
+import time
+from datetime import datetime
+
+import pytest
+
+import student
+
+
+def _concept(related=()):
+    return {"mastery": 50, "confidence": "medium", "struggles": [], "breakthroughs": [],
+            "related_concepts": list(related)}
+
+
+@pytest.fixture
+def chain(temp_data_file, capsys):
+    """Scope <- Closures <- Hooks <- Context, and Callbacks <- closures."""
+    model = student.get_default_model()
+    model["concepts"].update({
+        "Scope": _concept(),
+        "Closures": _concept(related=["Scope"]),
+        "Hooks": _concept(related=["closures"]),
+        "Callbacks": _concept(related=["Closures"]),
+        "Context": _concept(related=["Hooks"]),
+    })
+    student.save_model(model, checkpoint=True)
+    return temp_data_file
+
+
+class TestDependents:
+    """Test the dependents function."""
+
+    def test_direct(self, chain):
+        """Only concepts linking straight to the concept are returned."""
+        model = student.load_model()
+        assert student.dependents(model, "Closures") == [
+            ("Hooks", 1, "Closures"), ("Callbacks", 1, "Closures")]
+
+    def test_transitive(self, chain):
+        """Dependents of dependents follow, with the concept they come through."""
+        model = student.load_model()
+        found = student.dependents(model, "Scope", transitive=True)
+        assert found == [("Closures", 1, "Scope"), ("Hooks", 2, "Closures"),
+                         ("Callbacks", 2, "Closures"), ("Context", 3, "Hooks")]
+
+    def test_cycle(self, chain):
+        """A cycle back to the concept does not loop or list it."""
+        model = student.load_model()
+        model["concepts"]["Scope"]["related_concepts"] = ["Context"]
+        found = student.dependents(model, "Scope", transitive=True)
+        assert [key for key, _, _ in found] == ["Closures", "Hooks", "Callbacks", "Context"]
+
+
+class TestIndexMaintenance:
+    """Test that writes keep the built index current."""
+
+    def test_link_and_unlink(self, chain, capsys):
+        """Links made and removed on one model show up without a rebuild."""
+        model = student.load_model()
+        index = student.link_index(model)
+        student.update_links(model, "Scope", added=["Hooks"])
+        assert student.dependents(model, "Hooks") == [("Context", 1, "Hooks"),
+                                                      ("Scope", 1, "Hooks")]
+        student.update_links(model, "Context", removed=["Hooks"])
+        assert student.dependents(model, "Hooks") == [("Scope", 1, "Hooks")]
+        assert student.link_index(model) is index
+
+    def test_commands_persist_links(self, chain, capsys):
+        """link, unlink and add --related change what dependents reports."""
+        student.cmd_link(argparse.Namespace(concept_name="Scope", related_concept="Hooks"))
+        student.cmd_unlink(argparse.Namespace(concept_name="Context", related_concept="Hooks"))
+        student.cmd_add(argparse.Namespace(concept_name="Refs", mastery=10,
+                                           confidence="low", related="Hooks"))
+
+        found = student.dependents(student.load_model(), "Hooks")
+        assert [key for key, _, _ in found] == ["Scope", "Refs"]
+
+    def test_replay_updates_index(self, chain, capsys):
+        """Replaying link patches onto a model with a built index keeps it right."""
+        model = student.load_model()
+        student.link_index(model)
+        student.apply_event(model, {"op": "update", "concept": "Scope",
+                                    "add": {"related_concepts": ["Hooks"]}})
+        student.apply_event(model, {"op": "update", "concept": "Context",
+                                    "remove": {"related_concepts": ["Hooks"]}})
+        assert student.dependents(model, "Hooks") == [("Scope", 1, "Hooks")]
+
+
+class TestCommand:
+    """Test cmd_dependents."""
+
+    def test_output(self, chain, capsys):
+        """Transitive output indents by depth and names the route."""
+        student.cmd_dependents(argparse.Namespace(concept_name="scope", transitive=True))
+        output = capsys.readouterr().out
+        assert "Concepts building on 'Scope' directly or indirectly (4)" in output
+        assert "(via Hooks)" in output
+
+    def test_none(self, chain, capsys):
+        """A concept nothing links to says so."""
+        student.cmd_dependents(argparse.Namespace(concept_name="Context", transitive=False))
+        assert "Nothing builds on 'Context'" in capsys.readouterr().out
+
+    def test_unknown(self, chain, capsys):
+        """An unknown concept is reported."""
+        student.cmd_dependents(argparse.Namespace(concept_name="Nope", transitive=False))
+        assert "not found" in capsys.readouterr().out
+
+    def test_as_of(self, chain, capsys):
+        """Dependents can be read from the past."""
+        time.sleep(0.002)
+        before = datetime.now().isoformat()
+        time.sleep(0.002)
+        student.cmd_link(argparse.Namespace(concept_name="Scope", related_concept="Context"))
+        capsys.readouterr()
+
+        student.cmd_dependents(argparse.Namespace(concept_name="Context", transitive=False,
+                                                  as_of=before))
+        assert "Nothing builds on" in capsys.readouterr().out
@@ -0,0 +1,229 @@
+"""
+test_durability.py - Tests for durability levels and group commit
+
+Tests cover:
+- Every durability level writes a loadable file and keeps a backup
+- fsync calls match the requested level
+- A broken backup never fails a save that reached the disk
+- GroupCommitter coalesces many submissions into few writes
+- Mutating under the committer's lock while it writes in the background
+- GroupCommitter as a store for StudentModel, with retries after a failure
+- Bounded retries with backoff, and giving up reported to later saves
+"""
+
+import json
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+import student
+
+
+@pytest.mark.parametrize("level", student.DURABILITY_LEVELS)
+def test_each_level_roundtrips(temp_data_file, level):
+    """All levels produce a valid file and record backup history."""
+    model = student.get_default_model()
+    model["metadata"]["student_profile"] = "v1"
+    assert student.save_model(model, durability=level)
+
+    model["metadata"]["student_profile"] = "v2"
+    assert student.save_model(model, durability=level)
+
+    assert student.load_model()["metadata"]["student_profile"] == "v2"
+    first = student.list_generations()[0]
+    assert json.loads(student.generation_text(first))["metadata"]["student_profile"] == "v1"
+    assert not temp_data_file.with_suffix('.json.tmp').exists()
+
+
+@pytest.mark.parametrize("level,file_syncs,dir_syncs", [
+    ("none", 0, 0),
+    ("rename-only", 0, 0),
+    ("fsync-file", 1, 0),
+    ("fsync-file-and-dir", 1, 1),
+])
+def test_fsync_policy(temp_data_file, monkeypatch, level, file_syncs, dir_syncs):
+    """fsync is called on the file and directory only when requested."""
+    calls = []
+    monkeypatch.setattr(student.os, 'fsync', lambda fd: calls.append(fd))
+    dir_calls = []
+    monkeypatch.setattr(student, '_fsync_dir', lambda path: dir_calls.append(path))
+
+    assert student.save_model(student.get_default_model(), durability=level)
+    assert len(calls) == file_syncs
+    assert len(dir_calls) == dir_syncs
+
+
+def test_backup_error_does_not_fail_save(temp_data_file, monkeypatch, capsys):
+    """A save on disk succeeds and logs its events even if the backup breaks."""
+    def broken(*args, **kwargs):
+        raise ValueError("corrupt pack index")
+    monkeypatch.setattr(student, "snapshot_backup", broken)
+    model = student.track(student.get_default_model())
+    student.record_event(model, "add", "Scope", set={"mastery": 50})
+    assert student.save_model(model)
+    assert "Backup failed: corrupt pack index" in capsys.readouterr().out
+    assert model.pending_events == []
+    assert [e["op"] for e in student.query_events()] == ["add"]
+
+
+def test_unknown_level_refused(temp_data_file, capsys):
+    """An unknown durability level is rejected without writing."""
+    assert student.save_model(student.get_default_model(), durability="paranoid") is False
+    assert not temp_data_file.exists()
+    assert "Unknown durability" in capsys.readouterr().out
+
+
+def test_cli_durability_flag(tmp_path):
+    """--durability is accepted as a global option."""
+    script = Path(__file__).parent.parent / "student.py"
+    result = subprocess.run(
+        [sys.executable, str(script), '--durability', 'fsync-file-and-dir', '--help'],
+        capture_output=True, text=True)
+    assert result.returncode == 0
+    assert '--durability' in result.stdout
+
+
+class TestGroupCommitter:
+    """Test coalesced durable writes for long-running processes."""
+
+    def test_many_submissions_one_write(self, temp_data_file, monkeypatch):
+        """Submissions within one interval share a single save."""
+        saves = []
+        original = student.save_model
+
+        def counting_save(model, durability=None, **kwargs):
+            saves.append(durability)
+            return original(model, durability=durability, **kwargs)
+
+        monkeypatch.setattr(student, 'save_model', counting_save)
+        committer = student.GroupCommitter(interval=0.05)
+        model = student.get_default_model()
+        tickets = []
+        for i in range(50):
+            model["concepts"][f"C{i}"] = {"mastery": i}
+            tickets.append(committer.submit(model))
+
+        assert committer.wait(tickets[-1], timeout=5)
+        committer.close()
+
+        assert 1 <= len(saves) <= 2
+        assert saves[0] == "fsync-file-and-dir"
+        assert len(json.loads(temp_data_file.read_text())["concepts"]) == 50
+
+    def test_close_flushes_pending(self, temp_data_file):
+        """close() writes whatever is still pending."""
+        committer = student.GroupCommitter(interval=10)
+        model = student.get_default_model()
+        model["metadata"]["student_profile"] = "flushed"
+        committer.submit(model)
+        assert committer.close()
+        assert json.loads(temp_data_file.read_text())["metadata"]["student_profile"] == "flushed"
+
+    def test_submit_after_close_raises(self, temp_data_file):
+        """A closed committer refuses new work."""
+        committer = student.GroupCommitter(interval=0.01)
+        committer.close()
+        with pytest.raises(RuntimeError):
+            committer.submit(student.get_default_model())
+
+    def test_mutations_under_lock_while_flushing(self, temp_data_file):
+        """A writer holding the lock never races the background commit."""
+        committer = student.GroupCommitter(interval=0.001, durability="none")
+        model = student.track(student.get_default_model())
+
+        def mutate():
+            for i in range(3000):
+                with committer.lock:
+                    model["concepts"][f"C{i}"] = {"mastery": i % 101}
+                    student.mark_dirty(model, concept=f"C{i}")
+                    ticket = committer.submit(model)
+                if i % 1000 == 999:     # make sure commits happen along the way
+                    committer.wait(ticket, timeout=5)
+        writer = threading.Thread(target=mutate)
+        writer.start()
+        writer.join()
+        assert committer.close()
+
+        assert committer.writes > 1 and committer._failed == 0
+        assert len(json.loads(temp_data_file.read_text())["concepts"]) == 3000
+
+    def test_commit_holds_lock(self, temp_data_file):
+        """Other threads can't take the lock while the model is being written."""
+        taken = []
+
+        class Probe:
+            def save(self, model, checkpoint=False):
+                other = threading.Thread(
+                    target=lambda: taken.append(committer.lock.acquire(blocking=False)))
+                other.start()
+                other.join()
+                return True
+
+        committer = student.GroupCommitter(store=Probe(), background=False)
+        committer.submit(student.get_default_model())
+        assert committer.flush() and taken == [False]
+
+    def test_store_for_student_model(self, temp_data_file):
+        """Through a committer, a StudentModel's saves wait for flush() and share it."""
+        committer = student.GroupCommitter(store=student.FileStore(), background=False)
+        model = student.StudentModel(committer)
+        model.add_concept("Scope", 70, "medium")
+        model.update("Scope", mastery=80)
+        assert not temp_data_file.exists()
+
+        assert committer.flush() and committer.writes == 1
+        assert committer.committed == committer.submitted == 2
+        assert student.load_model()["concepts"]["Scope"]["mastery"] == 80
+
+    def test_failed_commit_retried(self, temp_data_file):
+        """A failed write stays pending, checkpoint and all, for the next flush."""
+        class Flaky:
+            location = "flaky"
+
+            def __init__(self):
+                self.calls = []
+
+            def save(self, model, checkpoint=False):
+                self.calls.append(checkpoint)
+                return len(self.calls) > 1
+
+        store = Flaky()
+        committer = student.GroupCommitter(store=store, background=False)
+        ticket = committer.submit(student.get_default_model(), checkpoint=True)
+        assert not committer.flush() and not committer.wait(ticket, timeout=0)
+        assert committer.flush() and committer.wait(ticket, timeout=0)
+        assert store.calls == [True, True]
+
+    def test_gives_up_after_retries(self, temp_data_file):
+        """A commit that keeps failing is retried a few times, then reported to later saves."""
+        class Broken:
+            location = "broken"
+
+            def __init__(self):
+                self.calls = 0
+                self.works = False
+
+            def save(self, model, checkpoint=False):
+                self.calls += 1
+                return self.works
+
+        store = Broken()
+        committer = student.GroupCommitter(interval=0.01, store=store, retries=2)
+        ticket = committer.submit(student.get_default_model())
+        assert not committer.wait(ticket, timeout=5)
+        deadline = time.monotonic() + 5
+        while committer.error is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert committer.error and store.calls == 3
+        time.sleep(0.1)
+        assert store.calls == 3             # no retries after giving up
+        assert committer.save(student.get_default_model()) is False
+
+        store.works = True
+        assert committer.flush() and committer.error is None
+        assert committer.save(student.get_default_model()) is True
+        assert committer.close()
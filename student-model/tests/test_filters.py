@@ -0,0 +1,168 @@
+"""
+test_filters.py - Tests for concept filter expressions
+
+Tests cover:
+- Comparisons, has: tests, and/or/not and parentheses
+- Index-backed candidates agree with testing every concept, in model order
+- Sorted indexes rebuilt after changes
+- Parse errors with their position
+- list --where, export and StudentModel.export
+"""
+
+import argparse
+import json
+from datetime import datetime
+
+import pytest
+
+import student
+
+
+NOW = datetime(2025, 3, 1, 12, 0, 0)
+
+
+def _concept(mastery, confidence="medium", reviewed="2025-02-28T12:00:00", **extra):
+    return dict({"mastery": mastery, "confidence": confidence,
+                 "first_encountered": "2025-01-01T12:00:00", "last_reviewed": reviewed,
+                 "struggles": [], "breakthroughs": [], "related_concepts": []}, **extra)
+
+
+@pytest.fixture
+def model(temp_data_file, capsys):
+    data = student.get_default_model()
+    data["concepts"].update({
+        "Scope": _concept(80, "high"),
+        "Closures": _concept(40, "low", "2025-01-10T09:00:00", struggles=["returns"]),
+        "Hooks": _concept(30, "low", "2025-01-05T09:00:00", related_concepts=["Closures"]),
+        "Promises": _concept(55, "medium", "2025-02-20T09:00:00"),
+    })
+    data["misconceptions"] = [
+        {"concept": "hooks", "belief": "effects run once", "correction": "deps",
+         "date_identified": "2025-01-05T09:00:00", "resolved": False},
+        {"concept": "Scope", "belief": "var is block scoped", "correction": "function",
+         "date_identified": "2025-01-05T09:00:00", "resolved": True},
+    ]
+    student.save_model(data)
+    return student.StudentModel(now=NOW)
+
+
+class TestExpressions:
+    """Test what filters select."""
+
+    @pytest.mark.parametrize("where, expected", [
+        ("mastery<50", ["Closures", "Hooks"]),
+        ("mastery>=55", ["Scope", "Promises"]),
+        ("confidence=low", ["Closures", "Hooks"]),
+        ("confidence>=medium", ["Scope", "Promises"]),
+        ("reviewed_before=30d", ["Closures", "Hooks"]),
+        ("reviewed_after=2025-02-01", ["Scope", "Promises"]),
+        ("has:misconception", ["Hooks"]),
+        ("has:struggle or has:related", ["Closures", "Hooks"]),
+        ("name=p*", ["Promises"]),
+        ('name="SCOPE"', ["Scope"]),
+        ("not confidence=low", ["Scope", "Promises"]),
+        ("(mastery<35 or mastery>75) and not has:misconception", ["Scope"]),
+        ("mastery<50 and confidence=low and reviewed_before=30d and has:misconception", ["Hooks"]),
+    ])
+    def test_select(self, model, where, expected):
+        assert model.select(where) == expected
+
+    def test_effective(self, model):
+        """effective compares decayed mastery, at the model's moment."""
+        decayed = student.effective_masteries(model.data["concepts"], NOW)
+        assert model.select("effective>=40") == [k for k, v in decayed.items() if v >= 40]
+
+    @pytest.mark.parametrize("where", [
+        "mastery<50", "mastery!=40", "effective>30", "reviewed_before=3w",
+        "has:misconception or mastery>70", "not mastery<50 and confidence=high",
+    ])
+    def test_candidates_agree(self, model, where):
+        """Index shortcuts select exactly what testing every concept would, in the same order."""
+        compiled = student.ConceptFilter(where)
+        everything = [k for k in model.data["concepts"]
+                      if compiled.matches(model.data, k, NOW)]
+        assert compiled.select(model.data, NOW) == everything
+
+
+class TestIndexes:
+    """Test the sorted indexes behind the shortcuts."""
+
+    def test_reused_until_changed(self, model):
+        model.select("mastery<50")
+        index = model.data.indexes["sorted:mastery"]
+        model.select("mastery>50")
+        assert model.data.indexes["sorted:mastery"] is index
+
+        model.update("Scope", mastery=10)
+        assert model.select("mastery<50") == ["Scope", "Closures", "Hooks"]
+        assert model.data.indexes["sorted:mastery"] is not index
+
+    def test_plain_dict(self):
+        """Filters work on plain dict models, which keep no indexes."""
+        data = student.get_default_model()
+        data["concepts"]["A"] = _concept(10)
+        assert student.ConceptFilter("mastery<20").select(data, NOW) == ["A"]
+
+    def test_non_object_records_skipped(self):
+        """A damaged record that isn't an object neither breaks an index nor matches."""
+        data = student.track(student.get_default_model())
+        data["concepts"].update({"A": _concept(10), "Broken": 5, "B": _concept(15)})
+        assert student.ConceptFilter("mastery<20").select(data, NOW) == ["A", "B"]
+        assert student.ConceptFilter("not has:struggle").select(data, NOW) == ["A", "B"]
+
+
+class TestErrors:
+    """Test rejected expressions."""
+
+    @pytest.mark.parametrize("where, message", [
+        ("mastery<", "at end of filter"),
+        ("mastery<abc", "'abc' at position 9"),
+        ("bogus=1", "unknown field 'bogus'"),
+        ("has:nothing", "unknown test"),
+        ("(mastery<50", "expected ')'"),
+        ("mastery<50 )", "unexpected ')'"),
+        ("reviewed_before<30d", "unsupported operator"),
+        ("reviewed_before=soon", "bad time"),
+        ("confidence=huge", "bad confidence"),
+    ])
+    def test_invalid(self, where, message):
+        with pytest.raises(student.InvalidValueError) as excinfo:
+            student.ConceptFilter(where)
+        assert message in str(excinfo.value)
+        assert excinfo.value.hints[0].startswith("Example:")
+
+
+class TestCommands:
+    """Test list --where and export."""
+
+    def test_list_where(self, model, capsys):
+        result = student.cmd_list(argparse.Namespace(where="confidence=low", as_of=None))
+        assert [c["concept"] for c in result["concepts"]] == ["Closures", "Hooks"]
+        assert "📚 Concepts matching confidence=low (2)" in capsys.readouterr().out
+
+    def test_list_no_match(self, model, capsys):
+        student.cmd_list(argparse.Namespace(where="mastery>99", as_of=None))
+        assert "📚 No concepts match: mastery>99" in capsys.readouterr().out
+
+    def test_list_bad_filter(self, model, capsys):
+        result = student.cmd_list(argparse.Namespace(where="mastery<<", as_of=None))
+        assert result["ok"] is False
+        assert "Invalid filter" in capsys.readouterr().out
+
+    def test_export_model(self, model):
+        """The export is a model of its own, with the matching misconceptions."""
+        exported = model.export("has:misconception or name=scope")["model"]
+        assert list(exported["concepts"]) == ["Scope", "Hooks"]
+        assert len(exported["misconceptions"]) == 2
+        assert exported["metadata"]["export_filter"] == "has:misconception or name=scope"
+        assert student.validate_model(exported)
+
+    def test_export_file(self, model, tmp_path, capsys):
+        target = tmp_path / "weak.json"
+        student.cmd_export(argparse.Namespace(where="mastery<50", output=str(target), as_of=None))
+        assert "✅ Exported 2 concept(s) matching mastery<50" in capsys.readouterr().out
+        assert sorted(json.loads(target.read_text())["concepts"]) == ["Closures", "Hooks"]
+
+    def test_export_stdout(self, model, capsys):
+        student.cmd_export(argparse.Namespace(where=None, output=None, as_of=None))
+        assert len(json.loads(capsys.readouterr().out)["concepts"]) == 4
@@ -0,0 +1,149 @@
+"""
+test_incremental_save.py - Tests for dirty tracking and partial serialization
+
+Tests cover:
+- Loaded models keep cached fragments and track changes
+- Saves re-encode only touched concepts/sections
+- Output is identical to a full json.dump, with history arrays on one line
+- Non-canonical files are fully re-encoded
+"""
+
+import json
+import re
+import argparse
+
+import student
+
+
+def _canonical(model):
+    """json.dump(indent=2), with history arrays collapsed onto one line."""
+    text = json.dumps(model, indent=2, ensure_ascii=False)
+    return re.sub(r'"history": (\[[-\d\s,\[\]]*\])',
+                  lambda m: '"history": ' + json.dumps(json.loads(m.group(1))), text)
+
+
+class TestDecodeModel:
+    """Test fragment-preserving decoding."""
+
+    def test_decode_matches_json_loads(self, sample_model, temp_data_file):
+        """decode_model produces the same data as json.loads."""
+        text = temp_data_file.read_text(encoding='utf-8')
+        model = student.decode_model(text)
+        assert model == json.loads(text)
+        assert isinstance(model, student.TrackedModel)
+        assert isinstance(model["concepts"], student.ConceptMap)
+
+    def test_decode_caches_fragments(self, sample_model, temp_data_file):
+        """Canonical files keep section and concept fragments."""
+        model = student.decode_model(temp_data_file.read_text(encoding='utf-8'))
+        assert "sessions" in model.fragments
+        assert set(model["concepts"].fragments) == {"React Hooks", "JavaScript Closures"}
+        assert json.loads(model["concepts"].fragments["React Hooks"]) == \
+            sample_model["concepts"]["React Hooks"]
+
+    def test_decode_corrupt_raises(self):
+        """Corrupt input raises JSONDecodeError like json.loads."""
+        import pytest
+        with pytest.raises(json.JSONDecodeError):
+            student.decode_model('{"concepts": {"A": {"mastery": }}}')
+        with pytest.raises(json.JSONDecodeError):
+            student.decode_model('{"concepts": {}} trailing')
+
+    def test_non_canonical_file_not_cached(self, temp_data_file):
+        """Compact files are decoded but not spliced on save."""
+        model = student.get_default_model()
+        model["concepts"]["A"] = {"mastery": 1}
+        temp_data_file.write_text(json.dumps(model), encoding='utf-8')
+
+        loaded = student.load_model()
+        assert loaded["concepts"].fragments == {}
+        assert student.save_model(loaded)
+        assert temp_data_file.read_text(encoding='utf-8') == _canonical(loaded)
+
+
+class TestIncrementalSave:
+    """Test that saves only re-encode what changed."""
+
+    def test_untouched_save_is_identical_to_full_dump(self, sample_model, temp_data_file):
+        """Spliced output equals a full canonical encoding."""
+        model = student.load_model()
+        assert student.save_model(model)
+        assert temp_data_file.read_text(encoding='utf-8') == _canonical(model)
+
+    def test_update_reencodes_only_touched_concept(self, sample_model, temp_data_file,
+                                                   monkeypatch, capsys):
+        """cmd_update re-encodes one concept plus metadata."""
+        encoded = []
+        original = student._encode_value
+
+        def spy(value, level):
+            encoded.append(value)
+            return original(value, level)
+
+        monkeypatch.setattr(student, '_encode_value', spy)
+        student.cmd_update(argparse.Namespace(
+            concept_name="react hooks", mastery=70, confidence=None))
+
+        concepts_encoded = [v for v in encoded if isinstance(v, dict) and "mastery" in v]
+        assert len(concepts_encoded) == 1
+        assert concepts_encoded[0]["mastery"] == 70
+
+        text = temp_data_file.read_text(encoding='utf-8')
+        assert text == _canonical(json.loads(text))
+        assert json.loads(text)["concepts"]["React Hooks"]["mastery"] == 70
+
+    def test_history_on_one_line(self, sample_model, temp_data_file, capsys):
+        """A concept's history takes one line however many points it has."""
+        for mastery in (70, 75, 80):
+            student.cmd_update(argparse.Namespace(
+                concept_name="React Hooks", mastery=mastery, confidence=None))
+        text = temp_data_file.read_text(encoding='utf-8')
+        line = next(line for line in text.splitlines() if '"history"' in line)
+        assert json.loads(line.strip().rstrip(',')[len('"history": '):])[-1][1] == 5
+        assert len(student.load_model()["concepts"]["React Hooks"]["history"]) == 4
+
+    def test_nested_edit_requires_mark_dirty(self, sample_model, temp_data_file):
+        """In-place edits are saved once reported with mark_dirty."""
+        model = student.load_model()
+        model["concepts"]["JavaScript Closures"]["struggles"].append("hoisting")
+        student.mark_dirty(model, concept="JavaScript Closures")
+        assert student.save_model(model)
+
+        reloaded = json.loads(temp_data_file.read_text(encoding='utf-8'))
+        assert reloaded["concepts"]["JavaScript Closures"]["struggles"] == ["hoisting"]
+
+    def test_added_and_removed_concepts(self, sample_model, temp_data_file):
+        """Key-level changes on the concept map are tracked automatically."""
+        model = student.load_model()
+        del model["concepts"]["React Hooks"]
+        model["concepts"]["Python Generators"] = {"mastery": 10}
+        assert student.save_model(model)
+
+        reloaded = json.loads(temp_data_file.read_text(encoding='utf-8'))
+        assert set(reloaded["concepts"]) == {"JavaScript Closures", "Python Generators"}
+
+    def test_section_replacement_is_saved(self, sample_model, temp_data_file):
+        """Assigning a top-level section marks it dirty."""
+        model = student.load_model()
+        model["sessions"] = [{"date": "2024-02-01"}]
+        assert student.save_model(model)
+
+        reloaded = json.loads(temp_data_file.read_text(encoding='utf-8'))
+        assert reloaded["sessions"] == [{"date": "2024-02-01"}]
+
+    def test_dirty_cleared_after_save(self, sample_model, temp_data_file):
+        """A successful save adopts the new fragments."""
+        model = student.load_model()
+        model["concepts"]["JavaScript Closures"]["mastery"] = 99
+        student.mark_dirty(model, concept="JavaScript Closures")
+        student.save_model(model)
+
+        assert not model["concepts"].dirty
+        assert '"mastery": 99' in model["concepts"].fragments["JavaScript Closures"]
+
+    def test_mark_dirty_ignores_plain_dicts(self):
+        """Plain dict models are unaffected by mark_dirty."""
+        model = student.get_default_model()
+        before = json.loads(json.dumps(model))
+        student.mark_dirty(model, concept="Anything", section="sessions")
+        assert model == before
@@ -0,0 +1,116 @@
+"""
+test_json_output.py - Tests for --json and --jsonl output
+
+Tests cover:
+- Handlers return structured results in every mode
+- --json prints one compact object; --jsonl one line per listed item
+- Errors and no-op results are structured
+- Diagnostics go to stderr so stdout parses
+- Text output is unchanged
+"""
+
+import argparse
+import json
+
+import pytest
+
+import student
+
+
+def _run(monkeypatch, *argv):
+    """Run the CLI entry point with the given arguments."""
+    monkeypatch.setattr(student, "OUTPUT", student.OUTPUT)   # restored after the test
+    monkeypatch.setattr("sys.argv", ["student.py", *argv])
+    student.main()
+
+
+@pytest.fixture
+def json_mode(monkeypatch):
+    monkeypatch.setattr(student, "OUTPUT", "json")
+
+
+class TestResults:
+    """Test the result objects handlers return."""
+
+    def test_handlers_return_results(self, sample_model, capsys):
+        """Read and write handlers return what they reported."""
+        result = student.cmd_show(argparse.Namespace(concept_name="react hooks"))
+        assert result["concept"] == "React Hooks"
+        assert result["struggles"][0]["text"] == "understanding useEffect dependencies"
+
+        result = student.cmd_update(argparse.Namespace(
+            concept_name="React Hooks", mastery=70, confidence=None))
+        assert result["changes"] == {"mastery": [60, 70]}
+
+    def test_errors_and_notices(self, sample_model, capsys):
+        """Failures and no-ops say so in the result."""
+        result = student.cmd_show(argparse.Namespace(concept_name="Nope"))
+        assert result == {"ok": False, "error": "Concept 'Nope' not found."}
+
+        result = student.cmd_unlink(argparse.Namespace(
+            concept_name="React Hooks", related_concept="Nope"))
+        assert result["ok"] and result["changed"] is False
+
+
+class TestJsonMode:
+    """Test --json rendering."""
+
+    def test_one_compact_object(self, sample_model, json_mode, capsys):
+        """Each command prints exactly one JSON line and no text."""
+        student.cmd_list(argparse.Namespace())
+        output = capsys.readouterr().out
+        assert output.count("\n") == 1
+        names = [c["concept"] for c in json.loads(output)["concepts"]]
+        assert set(names) == {"React Hooks", "JavaScript Closures"}
+
+    def test_error_object(self, sample_model, json_mode, capsys):
+        """Errors print an object instead of the emoji lines."""
+        student.cmd_add(argparse.Namespace(concept_name="React Hooks", mastery=10,
+                                           confidence="low", related=None))
+        output = capsys.readouterr().out
+        assert json.loads(output) == {"ok": False, "error": "Concept 'React Hooks' already exists."}
+
+    def test_session_end_changes(self, sample_model, json_mode, capsys):
+        """Batch results list each change."""
+        student.cmd_session_end(argparse.Namespace(
+            update=["React Hooks:80:high"], struggle=["Nope:x"], breakthrough=None))
+        result = json.loads(capsys.readouterr().out)
+        assert result["changes"] == [{"op": "update", "concept": "React Hooks",
+                                      "mastery": [60, 80], "confidence": ["medium", "high"]}]
+        assert result["errors"] == ["Concept 'Nope' not found"]
+
+
+class TestCommandLine:
+    """Test the global flags through main()."""
+
+    def test_jsonl_lines(self, sample_model, monkeypatch, capsys):
+        """--jsonl prints one object per listed item."""
+        _run(monkeypatch, "--jsonl", "list")
+        lines = capsys.readouterr().out.splitlines()
+        assert len(lines) == 2
+        assert {json.loads(line)["concept"] for line in lines} == {
+            "React Hooks", "JavaScript Closures"}
+
+    def test_diagnostics_to_stderr(self, temp_data_file, monkeypatch, capsys):
+        """Messages printed along the way don't corrupt stdout."""
+        _run(monkeypatch, "--json", "info")
+        captured = capsys.readouterr()
+        assert "No model found" in captured.err
+        assert json.loads(captured.out)["concepts"] == 0
+
+    def test_flags_exclusive(self, monkeypatch):
+        """--json and --jsonl can't be combined."""
+        with pytest.raises(SystemExit):
+            _run(monkeypatch, "--json", "--jsonl", "list")
+
+    def test_validate_exit_code(self, temp_data_file, monkeypatch, capsys):
+        """validate still exits non-zero on errors in JSON mode."""
+        temp_data_file.write_text(json.dumps({"concepts": {"A": {"mastery": 500}}}))
+        with pytest.raises(SystemExit):
+            _run(monkeypatch, "--json", "validate")
+        assert json.loads(capsys.readouterr().out)["ok"] is False
+
+    def test_text_unchanged(self, sample_model, monkeypatch, capsys):
+        """Without a flag the emoji text is printed."""
+        _run(monkeypatch, "show", "React Hooks")
+        assert capsys.readouterr().out.startswith("📊 Concept: React Hooks\n")
@@ -0,0 +1,189 @@
+"""
+test_library_api.py - Tests for the StudentModel library API
+
+Tests cover:
+- Reads and writes through an in-memory store
+- session_end validating and recording history like update
+- Errors raised as StudentModelError subclasses, with hints
+- No printing, including from the file store's storage layer
+- File-backed models saved where the CLI reads them
+- File stores on different files running side by side, each with its own messages
+- Read-only reconstructions for as_of
+"""
+
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+import student
+
+
+@pytest.fixture
+def memory():
+    """A model with two concepts, kept in memory."""
+    model = student.StudentModel(student.MemoryStore())
+    model.add_concept("Scope", 70, "medium")
+    model.add_concept("Closures", 40, "low", related=["Scope", "Hoisting"])
+    return model
+
+
+class TestMemoryStore:
+    """Test the API over an in-memory store."""
+
+    def test_reads(self, memory):
+        """Reads return plain result dicts."""
+        concept = memory.get_concept("closures")
+        assert concept["concept"] == "Closures"
+        assert [r["tracked"] for r in concept["related"]] == [True, False]
+        assert memory.stats()["concepts"] == 2
+        assert memory.dependents("Scope")["dependents"][0]["concept"] == "Closures"
+
+    def test_writes(self, memory):
+        """Writes change the stored model and report what changed."""
+        result = memory.update("Closures", mastery=55)
+        assert result["changes"] == {"mastery": [40, 55]}
+        assert memory.log_struggle("Closures", "scope chain")["changed"] is True
+        assert memory.log_struggle("Closures", "scope chain")["changed"] is False
+        assert memory.store.model["concepts"]["Closures"]["mastery"] == 55
+
+    def test_session_end(self, memory):
+        """A session applies what it can and lists the rest as errors."""
+        result = memory.session_end(updates=[("Scope", 90, "high"), ("Nope", 1, "low")],
+                                    breakthroughs=[("Closures", "captures bindings")])
+        assert result["counts"] == {"updates": 1, "struggles": 0, "breakthroughs": 1}
+        assert result["errors"] == ["Concept 'Nope' not found"]
+
+    def test_session_end_shares_update_path(self, memory):
+        """Session updates record history like update, and bad values are listed as errors."""
+        legacy = {"mastery": 30, "confidence": "low", "last_reviewed": "2025-01-01T12:00:00"}
+        memory.store.model["concepts"]["Legacy"] = dict(legacy)
+        memory.store.model["concepts"]["Other"] = dict(legacy)
+        result = memory.session_end(updates=[("Legacy", 60, "medium"), ("Scope", "90", "high"),
+                                             ("Scope", True, "high")])
+        memory.update("Other", mastery=60, confidence="medium")
+
+        assert result["counts"]["updates"] == 1
+        assert result["changes"][0]["mastery"] == [30, 60]
+        assert result["errors"] == ["Invalid mastery for 'Scope': '90' (must be 0-100)",
+                                    "Invalid mastery for 'Scope': True (must be 0-100)"]
+        concepts = memory.store.model["concepts"]
+        points = student.decode_history(concepts["Legacy"]["history"])
+        assert [(p["mastery"], p["confidence"]) for p in points] == [(30, "low"), (60, "medium")]
+        assert len(concepts["Legacy"]["history"]) == len(concepts["Other"]["history"])
+
+    def test_misconceptions(self, memory):
+        """Misconceptions are added, resolved by ID and filtered."""
+        added = memory.add_misconception("Closures", "copies values", "captures bindings")
+        memory.resolve_misconception("@" + added["misconception"]["id"])
+        assert memory.misconceptions("Closures", "unresolved")["misconceptions"] == []
+        assert memory.misconceptions(status="resolved")["misconceptions"][0]["resolved"]
+
+
+class TestErrors:
+    """Test the exceptions raised instead of printed errors."""
+
+    def test_not_found(self, memory):
+        """Unknown concepts raise ConceptNotFoundError with a hint."""
+        with pytest.raises(student.ConceptNotFoundError) as excinfo:
+            memory.update("Nope", mastery=10)
+        assert str(excinfo.value) == "Concept 'Nope' not found."
+        assert excinfo.value.hints
+
+    def test_invalid_values(self, memory):
+        """Out-of-range values raise InvalidValueError, which is a ValueError."""
+        with pytest.raises(ValueError):
+            memory.update("Scope", mastery=101)
+        with pytest.raises(student.InvalidValueError):
+            memory.merge("Scope", "scope")
+
+    def test_exists(self, memory):
+        """Adding or renaming onto a tracked name raises ConceptExistsError."""
+        with pytest.raises(student.ConceptExistsError):
+            memory.add_concept("scope", 10, "low")
+        with pytest.raises(student.ConceptExistsError):
+            memory.rename("Closures", "SCOPE")
+
+    def test_save_error(self, memory, monkeypatch):
+        """A store that can't save raises SaveError."""
+        monkeypatch.setattr(memory.store, "save", lambda model, checkpoint=False: False)
+        with pytest.raises(student.SaveError):
+            memory.link("Scope", "Closures")
+
+
+class TestFileStore:
+    """Test file-backed models."""
+
+    def test_silent(self, temp_data_file, capsys):
+        """Nothing is printed; storage messages are collected instead."""
+        model = student.StudentModel.open()
+        model.add_concept("Scope", 70, "medium")
+        model.link("Scope", "Closures")
+        assert capsys.readouterr().out == ""
+        assert any("No model found" in line for line in model.store.messages)
+
+    def test_shared_with_cli(self, sample_model, temp_data_file, capsys):
+        """Changes are saved to the file the commands read."""
+        model = student.StudentModel.open(temp_data_file)
+        model.update("React Hooks", mastery=85)
+        assert student.load_model()["concepts"]["React Hooks"]["mastery"] == 85
+        assert student.StudentModel.open().get_concept("react hooks")["mastery"] == 85
+
+    def test_explicit_path(self, temp_data_file, tmp_path):
+        """A store bound to another path leaves DATA_FILE alone."""
+        other = tmp_path / "other.json"
+        student.StudentModel.open(other).add_concept("Scope", 70, "medium")
+        assert student.StudentModel.open(other).concepts()["concepts"][0]["concept"] == "Scope"
+        assert student.DATA_FILE == temp_data_file
+        assert not temp_data_file.exists()
+
+    def test_stores_on_different_files_overlap(self, temp_data_file, tmp_path, monkeypatch, capsys):
+        """One store's call neither blocks another file's nor collects other threads' output."""
+        a, b = student.FileStore(tmp_path / "a.json"), student.FileStore(tmp_path / "b.json")
+        entered, released = threading.Event(), threading.Event()
+
+        def log_summary(until=None):
+            student.say(f"summary of {student.data_file().name}")
+            if student.data_file().name == "a.json":
+                entered.set()
+                released.wait(5)
+            return {"events": 0, "sessions": 0}
+        monkeypatch.setattr(student, "log_summary", log_summary)
+
+        worker = threading.Thread(target=a.log_summary)
+        worker.start()
+        assert entered.wait(5)
+        b.log_summary()             # would wait for a under a process-wide lock
+        print("elsewhere")
+        released.set()
+        worker.join()
+
+        assert list(a.messages) == ["summary of a.json"]
+        assert list(b.messages) == ["summary of b.json"]
+        assert capsys.readouterr().out == "elsewhere\n"
+        assert student.DATA_FILE == temp_data_file
+
+    def test_messages_bounded(self, temp_data_file, monkeypatch):
+        """Only the most recent storage messages are kept."""
+        monkeypatch.setattr(student, "STORE_MESSAGES", 3)
+        store = student.FileStore()
+        for _ in range(5):
+            store.load()
+        assert len(store.messages) == 3
+
+    def test_as_of_read_only(self, sample_model, temp_data_file):
+        """Past models describe their moment and refuse changes."""
+        model = student.StudentModel.open()
+        model.store.save(model.data, checkpoint=True)
+        time.sleep(0.002)
+        before = datetime.now().isoformat()
+        time.sleep(0.002)
+        model.update("React Hooks", mastery=90)
+
+        past = student.StudentModel.as_of(before)
+        assert past.get_concept("React Hooks")["mastery"] == 60
+        with pytest.raises(student.StudentModelError):
+            past.update("React Hooks", mastery=10)
+        with pytest.raises(student.StudentModelError):
+            student.StudentModel.as_of("garbage")
@@ -0,0 +1,106 @@
+"""
+test_link_batch.py - Tests for the link-batch command
+
+Tests cover:
+- Edge parsing, comments and malformed lines
+- Duplicate edges within the batch and against existing links
+- Untracked targets reported once
+- One save and one event per concept
+- --unlink and reading from stdin
+"""
+
+import argparse
+import io
+
+import pytest
+
+import student
+
+
+@pytest.fixture
+def concepts(temp_data_file, capsys):
+    """Three concepts; Hooks already links to Closures."""
+    model = student.get_default_model()
+    for name, related in (("Closures", []), ("Hooks", ["Closures"]), ("Scope", [])):
+        model["concepts"][name] = {"mastery": 50, "confidence": "medium", "struggles": [],
+                                   "breakthroughs": [], "related_concepts": related}
+    student.save_model(model)
+    return temp_data_file
+
+
+def _run(tmp_path, text, unlink=False):
+    path = tmp_path / "edges.txt"
+    path.write_text(text)
+    student.cmd_link_batch(argparse.Namespace(file=str(path), unlink=unlink))
+
+
+class TestParseEdge:
+    """Test edge line parsing."""
+
+    def test_separators(self):
+        """Arrows and tabs both separate the two names."""
+        assert student.parse_edge("A -> B") == ("A", "B")
+        assert student.parse_edge("A\tB") == ("A", "B")
+        assert student.parse_edge("A B") is None
+        assert student.parse_edge("A ->") is None
+
+
+class TestLinkBatch:
+    """Test cmd_link_batch."""
+
+    def test_links_and_dedupes(self, concepts, tmp_path, capsys):
+        """Repeated and existing edges are skipped, case-insensitively."""
+        _run(tmp_path, "# curriculum\nHooks -> scope\nhooks -> SCOPE\n"
+                       "Hooks -> closures\nClosures -> Scope\n")
+        output = capsys.readouterr().out
+        assert "Linked 2 edge(s) across 2 concept(s), 2 skipped" in output
+
+        model = student.load_model()
+        assert model["concepts"]["Hooks"]["related_concepts"] == ["Closures", "Scope"]
+        assert model["concepts"]["Closures"]["related_concepts"] == ["Scope"]
+
+    def test_missing_targets_reported_once(self, concepts, tmp_path, capsys):
+        """Untracked targets are listed once, with the name as first written."""
+        _run(tmp_path, "Hooks -> Refs\nScope -> refs\nClosures -> Refs\n")
+        output = capsys.readouterr().out
+        assert "1 linked concept(s) not tracked yet" in output
+        assert output.count('add "Refs"') == 1
+        assert student.load_model()["concepts"]["Scope"]["related_concepts"] == ["Refs"]
+
+    def test_errors_do_not_block_other_edges(self, concepts, tmp_path, capsys):
+        """Bad lines and unknown sources are reported; the rest is applied."""
+        _run(tmp_path, "nonsense\nNope -> Scope\nScope -> Hooks\n")
+        output = capsys.readouterr().out
+        assert "Line 1" in output and "Line 2: concept 'Nope' not found" in output
+        assert student.load_model()["concepts"]["Scope"]["related_concepts"] == ["Hooks"]
+
+    def test_one_save_one_event_per_concept(self, concepts, tmp_path, monkeypatch, capsys):
+        """The batch saves once and logs one event per changed concept."""
+        saves = []
+        save = student.save_model
+        monkeypatch.setattr(student, "save_model", lambda m, **kw: saves.append(1) or save(m, **kw))
+        _run(tmp_path, "Scope -> Hooks\nScope -> Closures\nClosures -> Hooks\n")
+
+        assert len(saves) == 1
+        events = [e for e in student.query_events() if e["op"] == "link"]
+        assert sorted((e["concept"], e["add"]["related_concepts"]) for e in events) == [
+            ("Closures", ["Hooks"]), ("Scope", ["Hooks", "Closures"])]
+        assert {k for k, _, _ in student.dependents(student.load_model(), "Hooks")} == {
+            "Scope", "Closures"}
+
+    def test_unlink(self, concepts, tmp_path, capsys):
+        """--unlink removes listed links and skips absent ones."""
+        _run(tmp_path, "hooks -> CLOSURES\nHooks -> Scope\n", unlink=True)
+        assert "Unlinked 1 edge(s) across 1 concept(s), 1 skipped" in capsys.readouterr().out
+        assert student.load_model()["concepts"]["Hooks"]["related_concepts"] == []
+
+    def test_stdin(self, concepts, monkeypatch, capsys):
+        """'-' reads edges from stdin."""
+        monkeypatch.setattr("sys.stdin", io.StringIO("Scope -> Closures\n"))
+        student.cmd_link_batch(argparse.Namespace(file="-", unlink=False))
+        assert student.load_model()["concepts"]["Scope"]["related_concepts"] == ["Closures"]
+
+    def test_nothing_to_do(self, concepts, tmp_path, capsys):
+        """A batch of existing links changes nothing."""
+        _run(tmp_path, "Hooks -> Closures\n")
+        assert "No changes to apply" in capsys.readouterr().out
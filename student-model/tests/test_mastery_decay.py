@@ -0,0 +1,128 @@
+"""
+test_mastery_decay.py - Tests for decay-aware effective mastery
+
+Tests cover:
+- Forgetting curve: half-life, growth with reviews, floor
+- Concepts never reviewed keep their stored mastery
+- Decay at a later or offset-aware time
+- Effective mastery in list, show, related and info
+"""
+
+import argparse
+from datetime import datetime, timedelta
+
+import student
+
+
+NOW = datetime(2025, 6, 1, 12, 0, 0)
+
+
+def _concept(mastery, days_ago, reviews=0):
+    concept = {"mastery": mastery, "confidence": "medium",
+               "last_reviewed": (NOW - timedelta(days=days_ago)).isoformat()}
+    if reviews:
+        concept["history"] = [[0, 0, 0]] * reviews
+    return concept
+
+
+class TestForgettingCurve:
+    """Test effective_mastery values."""
+
+    def test_fresh_review_keeps_mastery(self):
+        """Nothing is forgotten at the moment of review."""
+        assert student.effective_mastery(_concept(80, 0), NOW) == 80
+
+    def test_one_half_life(self):
+        """After one half-life the decaying part has halved."""
+        days = student.DECAY_HALF_LIFE_DAYS
+        expected = round(80 * (student.DECAY_FLOOR + (1 - student.DECAY_FLOOR) / 2))
+        assert student.effective_mastery(_concept(80, days), NOW) == expected
+
+    def test_reviews_slow_forgetting(self):
+        """More reviews mean a longer half-life."""
+        once = student.effective_mastery(_concept(80, 60, reviews=1), NOW)
+        often = student.effective_mastery(_concept(80, 60, reviews=6), NOW)
+        assert once < often < 80
+
+    def test_floor(self):
+        """Very old reviews decay to the floor, not to zero."""
+        value = student.effective_mastery(_concept(80, 730), NOW)
+        assert value == round(80 * student.DECAY_FLOOR)
+
+    def test_never_reviewed_does_not_decay(self):
+        """Without last_reviewed the stored mastery is used."""
+        assert student.effective_mastery({"mastery": 70}, NOW) == 70
+
+    def test_batch_matches_single(self):
+        """The batch computation agrees with per-concept calls."""
+        concepts = {f"C{i}": _concept(i, i * 3, reviews=i % 4) for i in range(50)}
+        batch = student.effective_masteries(concepts, NOW)
+        assert batch == {name: student.effective_mastery(c, NOW)
+                         for name, c in concepts.items()}
+
+
+class TestTime:
+    """Test the time decay is computed at."""
+
+    def test_later_time_decays_more(self):
+        """Decay keeps growing with time, not in steps."""
+        concept = _concept(80, 20)
+        assert student.effective_mastery(concept, NOW + timedelta(days=30)) \
+            < student.effective_mastery(concept, NOW)
+
+    def test_aware_time(self):
+        """A time with an offset is compared in local time."""
+        concept = _concept(80, 20)
+        aware = NOW.astimezone()
+        assert student.effective_mastery(concept, aware) == student.effective_mastery(concept, NOW)
+
+
+class TestCommands:
+    """Test effective mastery in read commands."""
+
+    def _save(self, concepts):
+        model = student.get_default_model()
+        model["concepts"].update(concepts)
+        student.save_model(model)
+
+    def test_list_shows_decay_and_sorts_by_it(self, temp_data_file, capsys):
+        """Stale concepts show their effective value and sink in the list."""
+        now = datetime.now()
+        self._save({
+            "Stale": {"mastery": 80, "confidence": "high",
+                      "last_reviewed": (now - timedelta(days=730)).isoformat()},
+            "Fresh": {"mastery": 60, "confidence": "medium",
+                      "last_reviewed": now.isoformat()},
+        })
+        student.cmd_list(argparse.Namespace())
+
+        output = capsys.readouterr().out
+        assert "now 20%" in output
+        assert output.index("Fresh") < output.index("Stale")
+
+    def test_show_effective(self, temp_data_file, capsys):
+        """show prints effective mastery when it differs."""
+        self._save({"Old": {"mastery": 80, "confidence": "high",
+                            "last_reviewed": "2020-01-01T00:00:00"}})
+        student.cmd_show(argparse.Namespace(concept_name="Old"))
+        assert "Effective:        20%" in capsys.readouterr().out
+
+    def test_related_flags_forgotten_prerequisite(self, temp_data_file, capsys):
+        """A high but stale prerequisite is flagged LOW."""
+        self._save({
+            "Main": {"mastery": 50, "confidence": "low", "related_concepts": ["Prereq"]},
+            "Prereq": {"mastery": 80, "confidence": "high",
+                       "last_reviewed": "2020-01-01T00:00:00"},
+        })
+        student.cmd_related(argparse.Namespace(concept_name="Main"))
+
+        output = capsys.readouterr().out
+        assert "now 20%" in output
+        assert "LOW" in output
+
+    def test_info_average(self, temp_data_file, capsys):
+        """info reports the average effective mastery."""
+        self._save({"Old": {"mastery": 80, "confidence": "high",
+                            "last_reviewed": "2020-01-01T00:00:00"}})
+        student.cmd_info(argparse.Namespace())
+        assert "Avg Effective:  20.0%" in capsys.readouterr().out
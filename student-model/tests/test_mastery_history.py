@@ -0,0 +1,230 @@
+"""
+test_mastery_history.py - Tests for per-concept mastery history and trends
+
+Tests cover:
+- Delta encoding round-trips through decode_history
+- add, update and session-end append points; legacy concepts get a baseline
+- Velocity, projection and plateau detection in mastery_trend
+- history and trend commands
+- Validation of malformed history arrays
+"""
+
+import argparse
+import io
+import json
+from datetime import datetime, timedelta
+
+import student
+
+
+T0 = datetime(2024, 1, 1, 12, 0, 0)
+
+
+def _concept_with(*points):
+    """Build a concept by appending (day, mastery, confidence) points."""
+    concept = {}
+    for day, mastery, confidence in points:
+        student.append_history(concept, mastery, confidence, T0 + timedelta(days=day))
+    return concept
+
+
+class TestEncoding:
+    """Test the delta-encoded history array."""
+
+    def test_round_trip(self):
+        """Points decode back to the absolute values appended."""
+        concept = _concept_with((0, 10, "low"), (2, 30, "medium"), (5, 25, "high"))
+        points = student.decode_history(concept["history"])
+
+        assert [p["mastery"] for p in points] == [10, 30, 25]
+        assert [p["confidence"] for p in points] == ["low", "medium", "high"]
+        assert points[1]["t"] - points[0]["t"] == 2 * 86400
+
+    def test_stored_as_deltas(self):
+        """Only the first entry is absolute."""
+        concept = _concept_with((0, 10, "low"), (1, 30, "medium"))
+
+        assert concept["history"][0] == [int(T0.timestamp()), 10, 0]
+        assert concept["history"][1] == [86400, 20, 1]
+
+    def test_legacy_concept_is_seeded(self):
+        """A concept without history gets its last-reviewed state as a baseline."""
+        concept = {"mastery": 40, "confidence": "medium",
+                   "last_reviewed": T0.isoformat()}
+        student.append_history(concept, 60, "high", T0 + timedelta(days=3))
+
+        points = student.decode_history(concept["history"])
+        assert [p["mastery"] for p in points] == [40, 60]
+        assert points[0]["t"] == int(T0.timestamp())
+
+
+class TestRecording:
+    """Test that commands record history."""
+
+    def test_add_records_first_point(self, temp_data_file, capsys):
+        """cmd_add starts history at the initial mastery."""
+        student.cmd_add(argparse.Namespace(
+            concept_name="Recursion", mastery=20, confidence="low", related=None))
+
+        model = student.load_model()
+        points = student.decode_history(model["concepts"]["Recursion"]["history"])
+        assert [p["mastery"] for p in points] == [20]
+
+    def test_update_records_point_with_baseline(self, sample_model, temp_data_file, capsys):
+        """cmd_update seeds the previous state before recording the new one."""
+        student.cmd_update(argparse.Namespace(
+            concept_name="React Hooks", mastery=80, confidence=None))
+
+        model = student.load_model()
+        points = student.decode_history(model["concepts"]["React Hooks"]["history"])
+        assert [(p["mastery"], p["confidence"]) for p in points] == [
+            (60, "medium"), (80, "medium")]
+
+    def test_update_without_changes_records_nothing(self, sample_model, temp_data_file, capsys):
+        """No history point is recorded when nothing changed."""
+        student.cmd_update(argparse.Namespace(
+            concept_name="React Hooks", mastery=None, confidence=None))
+
+        model = student.load_model()
+        assert "history" not in model["concepts"]["React Hooks"]
+
+    def test_history_persists_across_saves(self, sample_model, temp_data_file, capsys):
+        """Untouched concepts keep their history through incremental saves."""
+        student.cmd_update(argparse.Namespace(
+            concept_name="React Hooks", mastery=70, confidence=None))
+        student.cmd_update(argparse.Namespace(
+            concept_name="JavaScript Closures", mastery=90, confidence=None))
+
+        model = student.load_model()
+        assert len(model["concepts"]["React Hooks"]["history"]) == 2
+        assert len(model["concepts"]["JavaScript Closures"]["history"]) == 2
+
+
+class TestTrend:
+    """Test mastery_trend."""
+
+    def test_linear_slope_and_projection(self):
+        """Steady progress gives its slope and a projected date."""
+        concept = _concept_with((0, 20, "low"), (10, 40, "low"), (20, 60, "medium"))
+        trend = student.mastery_trend(student.decode_history(concept["history"]), target=80)
+
+        assert abs(trend["slope_per_day"] - 2.0) < 1e-9
+        assert abs(trend["days_to_target"] - 10) < 1e-9
+        assert trend["projected_date"].startswith("2024-01-31")
+
+    def test_target_already_reached(self):
+        """Concepts at or above target need zero days."""
+        concept = _concept_with((0, 70, "medium"), (1, 90, "high"))
+        trend = student.mastery_trend(student.decode_history(concept["history"]), target=80)
+        assert trend["days_to_target"] == 0
+
+    def test_declining_has_no_projection(self):
+        """Negative velocity never reaches the target."""
+        concept = _concept_with((0, 60, "medium"), (5, 40, "low"))
+        trend = student.mastery_trend(student.decode_history(concept["history"]))
+
+        assert trend["slope_per_day"] < 0
+        assert trend["days_to_target"] is None
+
+    def test_short_span_gives_per_review_slope(self):
+        """Points seconds apart give velocity per review, not an absurd daily rate."""
+        concept = {}
+        for second, mastery in ((0, 20), (30, 40), (60, 60)):
+            student.append_history(concept, mastery, "low", T0 + timedelta(seconds=second))
+        trend = student.mastery_trend(student.decode_history(concept["history"]), target=80)
+
+        assert trend["slope_per_day"] is None and trend["days_to_target"] is None
+        assert trend["slope_per_review"] == 20
+        assert trend["reviews_to_target"] == 1
+
+    def test_plateau_detected(self):
+        """A long stretch within tolerance is reported as a plateau."""
+        concept = _concept_with((0, 20, "low"), (1, 50, "medium"), (5, 52, "medium"),
+                                (10, 49, "medium"), (12, 75, "high"))
+        trend = student.mastery_trend(student.decode_history(concept["history"]))
+
+        assert len(trend["plateaus"]) == 1
+        plateau = trend["plateaus"][0]
+        assert plateau["days"] == 9
+        assert plateau["points"] == 3
+
+    def test_short_stall_is_not_a_plateau(self):
+        """Flat stretches shorter than PLATEAU_MIN_DAYS are ignored."""
+        concept = _concept_with((0, 50, "low"), (3, 51, "low"), (4, 70, "medium"))
+        trend = student.mastery_trend(student.decode_history(concept["history"]))
+        assert trend["plateaus"] == []
+
+
+class TestCommands:
+    """Test the history and trend commands."""
+
+    def _set_history(self, *points):
+        model = student.load_model()
+        concept = model["concepts"]["React Hooks"]
+        concept.update(_concept_with(*points))
+        student.mark_dirty(model, concept="React Hooks")
+        student.save_model(model)
+
+    def test_history_command(self, sample_model, temp_data_file, capsys):
+        """history lists points with changes."""
+        self._set_history((0, 20, "low"), (3, 45, "medium"))
+        student.cmd_history(argparse.Namespace(concept_name="react hooks", limit=None))
+
+        output = capsys.readouterr().out
+        assert "React Hooks (2 points)" in output
+        assert "45%" in output and "(+25)" in output
+
+    def test_history_command_empty(self, sample_model, temp_data_file, capsys):
+        """A concept without history says so."""
+        student.cmd_history(argparse.Namespace(concept_name="React Hooks", limit=None))
+        assert "No history recorded" in capsys.readouterr().out
+
+    def test_trend_command(self, sample_model, temp_data_file, capsys):
+        """trend prints velocity and projection."""
+        self._set_history((0, 20, "low"), (10, 40, "low"), (20, 60, "medium"))
+        student.cmd_trend(argparse.Namespace(concept_name="React Hooks", target=80))
+
+        output = capsys.readouterr().out
+        assert "+2.00 points/day" in output
+        assert "in 10 days" in output
+
+    def test_trend_command_per_review(self, sample_model, temp_data_file, capsys):
+        """trend over a short history prints velocity per review."""
+        self._set_history((0, 20, "low"), (0.001, 40, "low"))
+        student.cmd_trend(argparse.Namespace(concept_name="React Hooks", target=80))
+
+        output = capsys.readouterr().out
+        assert "+20.00 points/review" in output
+        assert "in 2 reviews" in output
+
+    def test_trend_needs_two_points(self, sample_model, temp_data_file, capsys):
+        """trend explains when there is too little history."""
+        student.cmd_trend(argparse.Namespace(concept_name="React Hooks", target=80))
+        assert "Not enough history" in capsys.readouterr().out
+
+
+class TestValidation:
+    """Test history checks in the validator."""
+
+    def _validate(self, history):
+        model = student.get_default_model()
+        model["concepts"]["A"] = {"mastery": 50, "confidence": "low",
+                                  "first_encountered": T0.isoformat(),
+                                  "last_reviewed": T0.isoformat(),
+                                  "struggles": [], "breakthroughs": [],
+                                  "related_concepts": [], "history": history}
+        return student.validate_stream(io.StringIO(json.dumps(model)))
+
+    def test_valid_history(self):
+        """Well-formed history raises no issues."""
+        assert self._validate([[1704110400, 20, 0], [86400, 30, 1]]) == []
+
+    def test_malformed_entry(self):
+        """Entries must be integer triples."""
+        issues = self._validate([[1704110400, "20", 0]])
+        assert any("history" in issue["path"] for issue in issues)
+
+    def test_mastery_out_of_range(self):
+        """Cumulative mastery must stay within 0-100."""
+        issues = self._validate([[1704110400, 90, 0], [10, 20, 1]])
+        assert any("out of range" in issue["message"] for issue in issues)
@@ -0,0 +1,247 @@
+"""
+test_merge_file.py - Tests for diffing and merging two copies of a model
+
+Tests cover:
+- Pairing concepts by casefolded name and spotting renames by ID
+- Set fields merged as sets, mastery from the side reviewed last
+- Three-way merges: one-sided changes, deletions and conflicts
+- Misconceptions, sessions and history from both sides, ending at the kept mastery
+- The diff and merge-file commands and StudentModel.merge_file
+"""
+
+import argparse
+import json
+
+import pytest
+
+import student
+
+
+def _concept(mastery, reviewed="2025-01-10T12:00:00", **extra):
+    return dict({"mastery": mastery, "confidence": "medium",
+                 "first_encountered": "2025-01-01T12:00:00", "last_reviewed": reviewed,
+                 "struggles": [], "breakthroughs": [], "related_concepts": []}, **extra)
+
+
+def _model(**concepts):
+    model = student.get_default_model()
+    model["concepts"].update(concepts)
+    return model
+
+
+def _copy(model):
+    return json.loads(json.dumps(model))
+
+
+class TestDiff:
+    """Test diff_models."""
+
+    def test_added_removed_changed(self):
+        ours = _model(Hooks=_concept(50, struggles=["deps"]), Scope=_concept(80))
+        theirs = _model(hooks=_concept(70, struggles=["deps", "cleanup"]), Promises=_concept(10))
+        result = student.diff_models(ours, theirs)
+        assert result["added"] == ["Promises"]
+        assert result["removed"] == ["Scope"]
+        assert result["renamed"] == [{"concept": "Hooks", "to": "hooks"}]
+        fields = result["changed"][0]["fields"]
+        assert fields["mastery"] == {"ours": 50, "theirs": 70}
+        assert fields["struggles"] == {"added": ["cleanup"], "removed": []}
+
+    def test_rename_by_id(self):
+        ours = _model(Hooks=_concept(50, id="06A1YABW03TWTX04"))
+        theirs = _model(**{"React Hooks": _concept(50, id="06A1YABW03TWTX04")})
+        result = student.diff_models(ours, theirs)
+        assert result["renamed"] == [{"concept": "Hooks", "to": "React Hooks"}]
+        assert result["added"] == result["removed"] == result["changed"] == []
+
+    def test_links_compare_case_insensitively(self):
+        ours = _model(A=_concept(1, related_concepts=["Closures"]))
+        theirs = _model(A=_concept(1, related_concepts=["closures"]))
+        assert student.diff_models(ours, theirs)["changed"] == []
+
+    def test_misconceptions(self):
+        ours = _model(A=_concept(1))
+        ours["misconceptions"] = [{"concept": "A", "belief": "x", "resolved": False}]
+        theirs = _copy(ours)
+        theirs["misconceptions"][0]["resolved"] = True
+        theirs["misconceptions"].append({"concept": "a", "belief": "y", "resolved": False})
+        result = student.diff_models(ours, theirs)["misconceptions"]
+        assert [m["belief"] for m in result["added"]] == ["y"]
+        assert [m["belief"] for m in result["resolved"]] == ["x"]
+
+
+class TestTwoWayMerge:
+    """Test merging without a base."""
+
+    def test_sets_union_and_latest_mastery(self):
+        ours = _model(Hooks=_concept(50, "2025-01-10T12:00:00", struggles=["deps"],
+                                     related_concepts=["Closures"]))
+        theirs = _model(hooks=_concept(70, "2025-02-01T12:00:00", struggles=["cleanup", "deps"],
+                                       related_concepts=["closures", "Scope"]))
+        report = student.merge_models(ours, theirs)
+        hooks = ours["concepts"]["Hooks"]
+        assert hooks["struggles"] == ["deps", "cleanup"]
+        assert len(hooks["struggle_ids"]) == 2
+        assert hooks["related_concepts"] == ["Closures", "Scope"]
+        assert hooks["mastery"] == 70 and hooks["last_reviewed"] == "2025-02-01T12:00:00"
+        assert report["updated"] == ["Hooks"]
+        assert report["conflicts"] == [{"concept": "Hooks", "field": "mastery",
+                                        "ours": {"mastery": 50, "confidence": "medium"},
+                                        "theirs": {"mastery": 70, "confidence": "medium"},
+                                        "kept": "theirs"}]
+
+    def test_tie_keeps_ours(self):
+        ours = _model(A=_concept(50))
+        theirs = _model(A=_concept(60))
+        report = student.merge_models(ours, theirs)
+        assert ours["concepts"]["A"]["mastery"] == 50
+        assert report["conflicts"][0]["kept"] == "ours"
+
+    def test_one_sided_concepts_kept(self):
+        ours = _model(A=_concept(1))
+        theirs = _model(B=_concept(2))
+        report = student.merge_models(ours, theirs)
+        assert list(ours["concepts"]) == ["A", "B"]
+        assert report["added"] == ["B"] and report["removed"] == []
+
+    def test_history_interleaved(self):
+        ours = _model(A=_concept(50, history=[[1000, 20, 0], [100, 30, 1]]))
+        theirs = _model(A=_concept(50, history=[[1000, 20, 0], [50, 10, 1]]))
+        student.merge_models(ours, theirs)
+        points = student.decode_history(ours["concepts"]["A"]["history"])
+        assert [(p["t"], p["mastery"]) for p in points] == [(1000, 20), (1050, 30), (1100, 50)]
+
+    def test_history_ends_at_kept_mastery(self):
+        """Their later history points don't outlast the mastery kept from ours."""
+        day = 86400
+        ours = _model(A=_concept(40, "2025-01-12T12:00:00", history=[[1000, 40, 1]]))
+        theirs = _model(A=_concept(80, "2025-01-11T12:00:00",
+                                   history=[[1000, 40, 1], [day, 40, 2]]))
+        student.merge_models(ours, theirs)
+        merged = ours["concepts"]["A"]
+        assert merged["mastery"] == 40
+        last = student.decode_history(merged["history"])[-1]
+        assert (last["mastery"], last["confidence"]) == (merged["mastery"], merged["confidence"])
+        assert last["t"] == int(student.datetime(2025, 1, 12, 12).timestamp())
+
+    def test_identical_is_a_no_op(self, temp_data_file):
+        ours = student.track(_model(A=_concept(1, struggles=["x"])))
+        report = student.merge_models(ours, _copy(ours))
+        assert not any(report[k] for k in ("added", "updated", "removed", "conflicts"))
+        assert not ours["concepts"].dirty
+
+    def test_misconceptions_and_sessions(self):
+        ours = _model(A=_concept(1))
+        ours["misconceptions"] = [{"concept": "A", "belief": "x", "resolved": False}]
+        ours["sessions"] = [{"id": 1}]
+        theirs = _copy(ours)
+        theirs["misconceptions"][0].update(resolved=True, date_resolved="2025-02-01T00:00:00")
+        theirs["misconceptions"].append({"concept": "A", "belief": "y", "resolved": False})
+        theirs["sessions"].append({"id": 2})
+        report = student.merge_models(ours, theirs)
+        assert [m["resolved"] for m in ours["misconceptions"]] == [True, False]
+        assert ours["misconceptions"][0]["date_resolved"] == "2025-02-01T00:00:00"
+        assert ours["sessions"] == [{"id": 1}, {"id": 2}]
+        assert report["misconceptions"] == 2 and report["sessions"] == 1
+
+
+class TestThreeWayMerge:
+    """Test merging against the copy both sides started from."""
+
+    @pytest.fixture
+    def base(self):
+        return _model(A=_concept(50, struggles=["x", "y"]), B=_concept(40), C=_concept(30))
+
+    def test_unchanged_side_yields(self, base):
+        ours, theirs = _copy(base), _copy(base)
+        theirs["concepts"]["A"]["mastery"] = 20        # reviewed no later, but only they changed it
+        report = student.merge_models(ours, theirs, base)
+        assert ours["concepts"]["A"]["mastery"] == 20
+        assert report["conflicts"] == []
+
+    def test_removals_stick(self, base):
+        ours, theirs = _copy(base), _copy(base)
+        ours["concepts"]["A"]["struggles"] = ["x"]
+        theirs["concepts"]["A"]["struggles"] = ["x", "y", "z"]
+        student.merge_models(ours, theirs, base)
+        assert ours["concepts"]["A"]["struggles"] == ["x", "z"]
+
+    def test_deletions(self, base):
+        ours, theirs = _copy(base), _copy(base)
+        del theirs["concepts"]["B"]                    # deleted there, untouched here
+        del ours["concepts"]["C"]                      # deleted here, untouched there
+        report = student.merge_models(ours, theirs, base)
+        assert sorted(ours["concepts"]) == ["A"]
+        assert report["removed"] == ["B"] and report["added"] == []
+
+    def test_delete_and_change_conflict(self, base):
+        ours, theirs = _copy(base), _copy(base)
+        del theirs["concepts"]["B"]
+        ours["concepts"]["B"]["mastery"] = 90
+        report = student.merge_models(ours, theirs, base)
+        assert ours["concepts"]["B"]["mastery"] == 90
+        assert report["conflicts"] == [{"concept": "B", "field": "concept", "ours": "changed",
+                                        "theirs": "deleted", "kept": "ours"}]
+
+
+class TestCommands:
+    """Test the library method and the CLI commands."""
+
+    @pytest.fixture
+    def copies(self, temp_data_file, tmp_path, capsys):
+        base = _model(Hooks=_concept(50), Scope=_concept(80))
+        student.save_model(_copy(base))
+        theirs = _copy(base)
+        theirs["concepts"]["Hooks"].update(mastery=75, last_reviewed="2025-03-01T12:00:00")
+        theirs["concepts"]["Promises"] = _concept(10)
+        (tmp_path / "base.json").write_text(json.dumps(base))
+        (tmp_path / "theirs.json").write_text(json.dumps(theirs))
+        return tmp_path
+
+    def test_merge_file_saves(self, copies):
+        result = student.StudentModel.open().merge_file(copies / "theirs.json",
+                                                        base=copies / "base.json")
+        assert result["changed"] is True and result["conflicts"] == []
+        loaded = student.load_model()
+        assert loaded["concepts"]["Hooks"]["mastery"] == 75 and "Promises" in loaded["concepts"]
+        events = list(student.query_events())
+        assert events[-1]["op"] == "merge_file"
+        assert student.list_generations(student.backup_dir(), "checkpoints")
+
+    def test_dry_run(self, copies, temp_data_file):
+        before = temp_data_file.read_text()
+        result = student.StudentModel.open().merge_file(copies / "theirs.json", dry_run=True)
+        assert result["changed"] is False and "Promises" in result["model"]["concepts"]
+        assert temp_data_file.read_text() == before
+
+    def test_unreadable_other(self, copies):
+        with pytest.raises(student.StudentModelError):
+            student.StudentModel.open().diff(copies / "missing.json")
+
+    def test_diff_command(self, copies, capsys):
+        result = student.cmd_diff(argparse.Namespace(files=[str(copies / "theirs.json")], as_of=None))
+        assert result["added"] == ["Promises"]
+        out = capsys.readouterr().out
+        assert "+ Promises" in out and "~ Hooks: mastery 50 → 75" in out
+
+    def test_diff_two_files(self, copies, capsys):
+        result = student.cmd_diff(argparse.Namespace(
+            files=[str(copies / "base.json"), str(copies / "theirs.json")], as_of=None))
+        assert result["ours"] == str(copies / "base.json")
+        assert len(result["changed"]) == 1
+
+    def test_merge_file_command_output(self, copies, temp_data_file, capsys):
+        target = copies / "merged.json"
+        before = temp_data_file.read_text()
+        student.cmd_merge_file(argparse.Namespace(other=str(copies / "theirs.json"), base=None,
+                                                  output=str(target), dry_run=False, as_of=None))
+        out = capsys.readouterr().out
+        assert f"✅ Merged {copies / 'theirs.json'} into {target}" in out
+        assert "1 conflict(s)" in out and "kept theirs" in out
+        assert len(json.loads(target.read_text())["concepts"]) == 3
+        assert temp_data_file.read_text() == before
+
+    def test_nothing_to_merge(self, copies, capsys):
+        student.cmd_merge_file(argparse.Namespace(other=str(copies / "base.json"), base=None,
+                                                  output=None, dry_run=False, as_of=None))
+        assert "Nothing to merge" in capsys.readouterr().out
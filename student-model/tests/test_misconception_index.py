@@ -0,0 +1,164 @@
+"""
+test_misconception_index.py - Tests for the misconception index and IDs
+
+Tests cover:
+- new_id format, ordering and seeded determinism
+- Index by concept and ID, and the duplicate-belief set
+- Stable IDs for misconceptions saved before IDs existed
+- Resolve by ID; index reuse across commands on one model
+"""
+
+import argparse
+import io
+import json
+from datetime import datetime, timedelta
+
+import student
+
+
+def _model_with(misconceptions):
+    model = student.initialize_model()
+    for name in ("Closures", "Hooks"):
+        model["concepts"][name] = {"mastery": 50, "confidence": "medium",
+                                   "last_reviewed": datetime.now().isoformat(),
+                                   "struggles": [], "breakthroughs": [],
+                                   "related_concepts": []}
+    model["misconceptions"] = misconceptions
+    student.save_model(model)
+
+
+def _legacy(concept, belief, resolved=False):
+    return {"concept": concept, "belief": belief, "correction": "fix",
+            "date_identified": "2024-01-01T12:00:00", "resolved": resolved,
+            "date_resolved": None}
+
+
+class TestNewId:
+    """Test ID generation."""
+
+    def test_format(self):
+        """IDs are 16 Crockford base32 characters."""
+        value = student.new_id()
+        assert len(value) == 16
+        assert set(value) <= set(student._CROCKFORD)
+
+    def test_sorted_by_time(self):
+        """Later IDs sort after earlier ones."""
+        t = datetime(2024, 1, 1)
+        assert student.new_id(t) < student.new_id(t + timedelta(milliseconds=1))
+
+    def test_seeded_is_deterministic(self):
+        """A seed fixes the random part."""
+        t = datetime(2024, 1, 1)
+        assert student.new_id(t, "x") == student.new_id(t, "x")
+        assert student.new_id(t, "x") != student.new_id(t, "y")
+
+
+class TestIndex:
+    """Test MisconceptionIndex."""
+
+    def test_lookups(self):
+        """Entries are found by concept (any case) and by ID."""
+        items = [_legacy("Closures", "a"), _legacy("Hooks", "b"), _legacy("closures", "c")]
+        index = student.MisconceptionIndex(items)
+
+        assert [p for p, _ in index.for_concept("CLOSURES")] == [0, 2]
+        assert index.get(items[1]["id"]) == (1, items[1])
+        assert index.get(items[1]["id"].lower()) == (1, items[1])
+        assert index.has("closures", "A")
+        assert not index.has("Hooks", "a")
+
+    def test_legacy_ids_are_stable(self, temp_data_file):
+        """Misconceptions without IDs get the same derived ID on every load."""
+        _model_with([_legacy("Closures", "a")])
+
+        first = student.misconception_index(student.load_model()).items[0]["id"]
+        second = student.misconception_index(student.load_model()).items[0]["id"]
+        assert first == second
+
+    def test_legacy_ids_ignore_position(self):
+        """Removing or reordering entries leaves the other derived IDs alone."""
+        items = [_legacy("Closures", "a"), _legacy("Hooks", "b"), _legacy("Closures", "c")]
+        ids = {m["belief"]: m["id"] for m in student.MisconceptionIndex(items).items}
+
+        rest = [_legacy("Closures", "c"), _legacy("Hooks", "b")]
+        assert {m["belief"]: m["id"] for m in student.MisconceptionIndex(rest).items} == \
+            {"b": ids["b"], "c": ids["c"]}
+
+    def test_legacy_duplicates_get_distinct_ids(self):
+        """Two identical legacy entries still get two IDs."""
+        index = student.MisconceptionIndex([_legacy("Closures", "a"), _legacy("Closures", "a")])
+        assert len(index.by_id) == 2
+
+    def test_index_cached_and_maintained(self, temp_data_file, capsys):
+        """The index is built once per model and follows appends."""
+        _model_with([])
+        model = student.load_model()
+        index = student.misconception_index(model)
+        index.add(_legacy("Hooks", "new"))
+
+        assert student.misconception_index(model) is index
+        assert index.has("hooks", "NEW")
+
+    def test_rebuilt_when_list_replaced(self, temp_data_file, capsys):
+        """Replacing the list invalidates the cached index."""
+        _model_with([_legacy("Closures", "a")])
+        model = student.load_model()
+        student.misconception_index(model)
+        model["misconceptions"] = []
+        assert student.misconception_index(model).by_id == {}
+
+
+class TestCommands:
+    """Test commands using IDs."""
+
+    def test_add_assigns_id(self, temp_data_file, capsys):
+        """New misconceptions are stored with an ID."""
+        _model_with([])
+        student.cmd_misconception_add(argparse.Namespace(
+            concept_name="Hooks", belief="b", correction="c"))
+
+        stored = student.load_model()["misconceptions"][0]
+        assert len(stored["id"]) == 16
+        assert f"ID: {stored['id']}" in capsys.readouterr().out
+
+    def test_resolve_by_id(self, temp_data_file, capsys):
+        """An ID keeps addressing the same entry as others are resolved."""
+        _model_with([_legacy("Closures", "a"), _legacy("Closures", "b")])
+        target = student.misconception_index(student.load_model()).items[1]["id"]
+
+        student.cmd_misconception_resolve(argparse.Namespace(concept_name="Closures", index="0"))
+        student.cmd_misconception_resolve(argparse.Namespace(concept_name="Closures", index=target))
+
+        stored = student.load_model()["misconceptions"]
+        assert [m["resolved"] for m in stored] == [True, True]
+        assert stored[1]["id"] == target
+
+    def test_resolve_unknown_id(self, temp_data_file, capsys):
+        """An ID from another concept or unknown is rejected."""
+        _model_with([_legacy("Closures", "a"), _legacy("Hooks", "b")])
+        other = student.misconception_index(student.load_model()).items[1]["id"]
+
+        student.cmd_misconception_resolve(argparse.Namespace(concept_name="Closures", index=other))
+        assert "No unresolved misconception" in capsys.readouterr().out
+        assert not any(m["resolved"] for m in student.load_model()["misconceptions"])
+
+    def test_list_numbers_unresolved_and_shows_ids(self, temp_data_file, capsys):
+        """list numbers only unresolved entries, in order, with their IDs."""
+        _model_with([_legacy("Closures", "a"), _legacy("Closures", "b", resolved=True),
+                     _legacy("Closures", "c")])
+        student.cmd_misconception_list(argparse.Namespace(concept_name="Closures"))
+
+        output = capsys.readouterr().out
+        assert "[0]" in output and "[1]" in output and "[2]" not in output
+        ids = [m["id"] for m in student.misconception_index(student.load_model()).items]
+        assert all(i in output for i in ids)
+
+    def test_validator_flags_duplicate_ids(self):
+        """Two misconceptions with one ID are an error."""
+        model = student.get_default_model()
+        model["concepts"]["A"] = {"mastery": 1, "confidence": "low"}
+        model["misconceptions"] = [dict(_legacy("A", "x"), id="SAME"),
+                                   dict(_legacy("A", "y"), id="SAME")]
+        issues = student.validate_stream(io.StringIO(json.dumps(model)))
+        assert any("Duplicate ID" in i["message"] for i in issues)
@@ -0,0 +1,158 @@
+"""
+test_model_cache.py - Tests for the parsed-model read cache
+
+Tests cover:
+- Repeated loads of an unchanged file skip parsing
+- save_model drops the cache; outside edits miss it, also to shard and concept files
+- Damaged or disabled caches fall back to parsing
+- CLI commands cache the model only when they leave it unchanged
+- Deferred caching scoped to the thread that opened it
+- Models loaded from the cache save incrementally like parsed ones
+"""
+
+import json
+import os
+import threading
+
+import pytest
+
+import student
+
+
+class TestReadThrough:
+    """Test cache hits and misses."""
+
+    def test_second_load_uses_cache(self, sample_model, temp_data_file, monkeypatch):
+        """Once parsed, an unchanged file is loaded from the cache."""
+        first = student.load_model()
+        assert student.cache_path().exists()
+
+        monkeypatch.setattr(student, "decode_model", None)
+        second = student.load_model()
+        assert second == first
+        assert isinstance(second["concepts"], student.ConceptMap)
+        assert second is not first
+
+    def test_save_invalidates(self, sample_model, temp_data_file):
+        """Writes through save_model are seen by the next load."""
+        model = student.load_model()
+        model["concepts"]["React Hooks"]["mastery"] = 99
+        student.mark_dirty(model, concept="React Hooks")
+        student.save_model(model)
+        assert not student.cache_path().exists()
+        assert student.load_model()["concepts"]["React Hooks"]["mastery"] == 99
+
+    def test_outside_edit_misses(self, sample_model, temp_data_file):
+        """A file changed by something else is parsed again."""
+        student.load_model()
+        data = json.loads(temp_data_file.read_text())
+        data["concepts"]["React Hooks"]["mastery"] = 11
+        temp_data_file.write_text(json.dumps(data, indent=2))
+        stat = temp_data_file.stat()
+        os.utime(temp_data_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        assert student.load_model()["concepts"]["React Hooks"]["mastery"] == 11
+
+    @pytest.mark.parametrize("layout", ["shards", "concepts"])
+    def test_outside_layout_edit_misses(self, sample_model, temp_data_file, layout):
+        """A shard or concept file changed beside an untouched model file is parsed again."""
+        student.StudentModel.open().set_layout(layout, 2)
+        student.load_model()
+        assert student.cache_path().exists()
+
+        directory = temp_data_file.with_suffix(f".{layout}")
+        path = next(p for p in directory.rglob("*.json") if "React Hooks" in p.read_text())
+        path.write_text(path.read_text().replace('"mastery": 60', '"mastery": 11'))
+        assert student.load_model()["concepts"]["React Hooks"]["mastery"] == 11
+
+
+class TestFallback:
+    """Test that a bad or disabled cache never breaks loading."""
+
+    def test_damaged_cache(self, sample_model, temp_data_file):
+        """Garbage in the cache file is ignored."""
+        student.load_model()
+        student.cache_path().write_bytes(b"not a pickle")
+        assert student.load_model()["concepts"]["React Hooks"]["mastery"] == 60
+
+    def test_old_format(self, sample_model, temp_data_file, monkeypatch):
+        """A cache written in another format is not used."""
+        student.load_model()
+        monkeypatch.setattr(student, "_CACHE_FORMAT", student._CACHE_FORMAT + 1)
+        calls = []
+        decode = student.decode_model
+        monkeypatch.setattr(student, "decode_model", lambda text: calls.append(1) or decode(text))
+        student.load_model()
+        assert calls == [1]
+
+    def test_disabled(self, sample_model, temp_data_file, monkeypatch):
+        """MODEL_CACHE = False writes no cache."""
+        monkeypatch.setattr(student, "MODEL_CACHE", False)
+        student.load_model()
+        assert not student.cache_path().exists()
+
+
+class TestCachedSaves:
+    """Test saving a model that came from the cache."""
+
+    def test_incremental_save_matches(self, sample_model, temp_data_file, monkeypatch):
+        """Cached fragments are reused, and the file matches a full encode."""
+        student.save_model(student.load_model())   # rewrite in save_model's layout
+        student.load_model()                         # parse and cache
+
+        monkeypatch.setattr(student, "decode_model", None)
+        model = student.load_model()
+        assert set(model["concepts"].fragments) == {"React Hooks", "JavaScript Closures"}
+        model["concepts"]["React Hooks"]["mastery"] = 70
+        student.mark_dirty(model, concept="React Hooks")
+        assert student.save_model(model)
+
+        text = temp_data_file.read_text()
+        on_disk = json.loads(text)
+        assert on_disk["concepts"]["React Hooks"]["mastery"] == 70
+        assert text == student.serialize_model(on_disk)[0]
+
+
+class TestCommands:
+    """Test when CLI commands write the cache."""
+
+    def _run(self, monkeypatch, *argv):
+        monkeypatch.setattr(student, "OUTPUT", student.OUTPUT)   # restored after the test
+        monkeypatch.setattr("sys.argv", ["student.py", *argv])
+        student.main()
+
+    def test_read_command_caches(self, sample_model, temp_data_file, monkeypatch, capsys):
+        """A read-only command leaves a cache for the next one."""
+        self._run(monkeypatch, "list")
+        assert student.cache_path().exists()
+        monkeypatch.setattr(student, "decode_model", None)
+        self._run(monkeypatch, "show", "React Hooks")
+        assert "React Hooks" in capsys.readouterr().out
+
+    def test_write_command_writes_no_cache(self, sample_model, temp_data_file, monkeypatch, capsys):
+        """A command that saves never pickles the model it is about to change."""
+        pickled = []
+        monkeypatch.setattr(student, "_write_cache", lambda *args: pickled.append(args))
+        self._run(monkeypatch, "update", "React Hooks", "--mastery", "70")
+        self._run(monkeypatch, "--json", "struggle", "React Hooks", "stale state")
+        assert pickled == []
+        assert student.load_model()["concepts"]["React Hooks"]["mastery"] == 70
+
+    def test_other_threads_cache_at_once(self, sample_model, temp_data_file):
+        """Loads in another thread are not held for the block's end."""
+        with student.deferred_cache():
+            worker = threading.Thread(target=student.load_model)
+            worker.start()
+            worker.join()
+            assert student.cache_path().exists()
+            student.drop_cache()
+            student.load_model()
+            assert not student.cache_path().exists()
+        assert student.cache_path().exists()
+
+    def test_failed_change_not_cached(self, sample_model, temp_data_file, monkeypatch):
+        """A model changed in memory but not saved is not cached."""
+        with student.deferred_cache():
+            model = student.load_model()
+            model["concepts"]["React Hooks"]["mastery"] = 1
+            student.mark_dirty(model, concept="React Hooks")
+        assert not student.cache_path().exists()
@@ -0,0 +1,103 @@
+"""
+test_query.py - Tests for the batch query command
+
+Tests cover:
+- Many concepts from one load, in request order, without duplicates
+- Field projection and unknown fields
+- Related concepts described once across the batch
+- Names from a file or stdin, and names that match nothing
+"""
+
+import argparse
+import io
+import json
+
+import pytest
+
+import student
+
+
+def _concept(mastery=50, related=()):
+    return {"mastery": mastery, "confidence": "medium",
+            "first_encountered": "2025-01-01T12:00:00", "last_reviewed": "2025-01-01T12:00:00",
+            "struggles": [], "breakthroughs": [], "related_concepts": list(related)}
+
+
+@pytest.fixture
+def graph(temp_data_file, capsys):
+    """Hooks and Callbacks both link to Closures; Closures links to Scope."""
+    model = student.get_default_model()
+    model["concepts"].update({
+        "Scope": _concept(70),
+        "Closures": _concept(40, related=["Scope", "Hoisting"]),
+        "Hooks": _concept(60, related=["closures", "Scope"]),
+        "Callbacks": _concept(55, related=["Closures"]),
+    })
+    student.save_model(model)
+    return temp_data_file
+
+
+def _args(*names, file=None, fields=None):
+    return argparse.Namespace(concept_names=list(names), file=file, fields=fields)
+
+
+class TestQuery:
+    """Test StudentModel.query."""
+
+    def test_batch(self, graph):
+        """Concepts come back in request order, once each."""
+        result = student.StudentModel.open().query(["hooks", "Callbacks", "HOOKS", "Nope"])
+        assert [c["concept"] for c in result["concepts"]] == ["Hooks", "Callbacks"]
+        assert result["missing"] == ["Nope"]
+
+    def test_related_deduplicated(self, graph):
+        """Links to one concept, however spelled, are described once."""
+        result = student.StudentModel.open().query(["Hooks", "Callbacks", "Closures"])
+        assert [r["concept"] for r in result["related"]] == [
+            "Closures", "Scope", "Hoisting"]
+        assert result["related"][2]["tracked"] is False
+        assert result["concepts"][0]["related"] == ["closures", "Scope"]
+
+    def test_projection(self, graph):
+        """Only the requested fields are returned; the name always is."""
+        result = student.StudentModel.open().query(["Scope"], fields=["mastery"])
+        assert result["concepts"] == [{"concept": "Scope", "mastery": 70}]
+        assert result["related"] == []
+
+    def test_unknown_field(self, graph):
+        """Unknown fields are rejected with the list of valid ones."""
+        with pytest.raises(student.InvalidValueError) as excinfo:
+            student.StudentModel.open().query(["Scope"], fields=["bogus"])
+        assert "mastery" in excinfo.value.hints[0]
+
+
+class TestCommand:
+    """Test cmd_query."""
+
+    def test_text(self, graph, capsys):
+        """Each concept is shown, then the shared related concepts and misses."""
+        student.cmd_query(_args("Hooks", "Callbacks", "Nope"))
+        output = capsys.readouterr().out
+        assert "📋 Query: 2 concept(s)" in output
+        assert "Related concepts across the batch (2)" in output
+        assert "❌ Not found: Nope" in output
+
+    def test_names_from_stdin(self, graph, monkeypatch, capsys):
+        """Names are read from stdin with '-', skipping blanks and comments."""
+        monkeypatch.setattr("sys.stdin", io.StringIO("Scope\n\n# skipped\nClosures\n"))
+        result = student.cmd_query(_args("Hooks", file="-", fields="mastery"))
+        assert [c["concept"] for c in result["concepts"]] == ["Hooks", "Scope", "Closures"]
+
+    def test_jsonl(self, graph, monkeypatch, capsys):
+        """--jsonl prints one projected concept per line."""
+        monkeypatch.setattr(student, "OUTPUT", "jsonl")
+        student.cmd_query(_args("Scope", "Closures", fields="confidence"))
+        lines = capsys.readouterr().out.splitlines()
+        assert [json.loads(line) for line in lines] == [
+            {"concept": "Scope", "confidence": "medium"},
+            {"concept": "Closures", "confidence": "medium"}]
+
+    def test_no_names(self, graph, capsys):
+        """A query needs at least one name."""
+        result = student.cmd_query(_args())
+        assert result["ok"] is False
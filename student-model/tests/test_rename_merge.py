@@ -0,0 +1,197 @@
+"""
+test_rename_merge.py - Tests for concept rename and merge
+
+Tests cover:
+- Reverse link index construction and lookups
+- rename rewrites links and misconceptions, keeps the ID
+- merge combines entries, links, mastery and history without duplicates
+- Only referencing concepts are marked dirty
+- Commands, error cases and replay through --as-of
+"""
+
+import argparse
+import time
+from datetime import datetime
+
+import pytest
+
+import student
+
+
+def _concept(mastery=50, related=(), struggles=(), reviewed="2025-01-01T12:00:00"):
+    return {"mastery": mastery, "confidence": "medium",
+            "first_encountered": "2025-01-01T12:00:00", "last_reviewed": reviewed,
+            "struggles": list(struggles), "breakthroughs": [],
+            "related_concepts": list(related)}
+
+
+@pytest.fixture
+def graph(temp_data_file, capsys):
+    """Closures is linked from Hooks and Callbacks and has a misconception."""
+    model = student.get_default_model()
+    model["concepts"].update({
+        "Closures": _concept(40, related=["Scope"], struggles=["lexical scope"]),
+        "Scope": _concept(70),
+        "Hooks": _concept(60, related=["closures", "Scope"]),
+        "Callbacks": _concept(55, related=["Closures"]),
+        "Unrelated": _concept(10),
+    })
+    model["misconceptions"] = [{
+        "concept": "Closures", "belief": "copies values", "correction": "captures bindings",
+        "date_identified": "2025-01-02T12:00:00", "resolved": False, "date_resolved": None,
+    }]
+    student.save_model(model)
+    return temp_data_file
+
+
+class TestLinkIndex:
+    """Test the reverse link index."""
+
+    def test_sources(self):
+        """Linkers are found case-insensitively, in order."""
+        index = student.LinkIndex({"A": _concept(related=["c"]), "B": _concept(related=["C"]),
+                                   "C": _concept()})
+        assert index.sources("C") == ["A", "B"]
+        index.remove("A", "C")
+        assert index.sources("c") == ["B"]
+
+    def test_cached_per_model(self, graph):
+        """The index is built once per loaded model."""
+        model = student.load_model()
+        assert student.link_index(model) is student.link_index(model)
+
+
+class TestRename:
+    """Test rename_concept and cmd_rename."""
+
+    def test_rewrites_references(self, graph, capsys):
+        """Links and misconceptions follow the new name; the ID is kept."""
+        before = student.load_model()
+        old_id = student.concept_id("Closures", before["concepts"]["Closures"])
+
+        student.cmd_rename(argparse.Namespace(concept_name="closures", new_name="JS Closures"))
+        assert "3 reference(s) updated" in capsys.readouterr().out
+
+        model = student.load_model()
+        assert "Closures" not in model["concepts"]
+        assert model["concepts"]["JS Closures"]["id"] == old_id
+        assert model["concepts"]["Hooks"]["related_concepts"] == ["JS Closures", "Scope"]
+        assert model["concepts"]["Callbacks"]["related_concepts"] == ["JS Closures"]
+        assert model["misconceptions"][0]["concept"] == "JS Closures"
+        assert student.find_concept(model, "@" + old_id) == "JS Closures"
+
+    def test_only_referrers_dirty(self, graph):
+        """Concepts that don't mention the renamed one are not re-encoded."""
+        model = student.load_model()
+        student.rename_concept(model, "Closures", "JS Closures")
+        assert model["concepts"].dirty == {"Closures", "JS Closures", "Hooks", "Callbacks"}
+
+    def test_case_only_rename(self, graph, capsys):
+        """Changing only the case is allowed."""
+        student.cmd_rename(argparse.Namespace(concept_name="Closures", new_name="CLOSURES"))
+        model = student.load_model()
+        assert "CLOSURES" in model["concepts"]
+        assert model["concepts"]["Callbacks"]["related_concepts"] == ["CLOSURES"]
+
+    def test_existing_name_rejected(self, graph, capsys):
+        """Renaming onto another concept points at merge instead."""
+        student.cmd_rename(argparse.Namespace(concept_name="Closures", new_name="scope"))
+        output = capsys.readouterr().out
+        assert "already exists" in output and "merge" in output
+        assert "Closures" in student.load_model()["concepts"]
+
+
+class TestMerge:
+    """Test merge_concepts and cmd_merge."""
+
+    def test_merge_combines(self, graph, capsys):
+        """Entries and links are combined without duplicates or self links."""
+        model = student.load_model()
+        model["concepts"]["Hooks"]["struggles"] = ["lexical scope", "rules"]
+        student.mark_dirty(model, concept="Hooks")
+        student.save_model(model)
+
+        student.cmd_merge(argparse.Namespace(source="Closures", target="Hooks"))
+        model = student.load_model()
+        hooks = model["concepts"]["Hooks"]
+
+        assert "Closures" not in model["concepts"]
+        assert hooks["struggles"] == ["lexical scope", "rules"]
+        assert len(hooks["struggle_ids"]) == 2
+        # Hooks → Closures became a self link and was dropped; Scope not doubled
+        assert hooks["related_concepts"] == ["Scope"]
+        assert model["concepts"]["Callbacks"]["related_concepts"] == ["Hooks"]
+        assert model["misconceptions"][0]["concept"] == "Hooks"
+        assert hooks["mastery"] == 60
+
+    def test_merge_keeps_higher_mastery(self, graph, capsys):
+        """The higher mastery wins, with its confidence."""
+        student.cmd_merge(argparse.Namespace(source="Scope", target="Closures"))
+        closures = student.load_model()["concepts"]["Closures"]
+        assert closures["mastery"] == 70
+
+    def test_merge_interleaves_history(self, graph, capsys):
+        """History points from both concepts end up in time order."""
+        model = student.load_model()
+        a = model["concepts"]["Closures"]
+        b = model["concepts"]["Scope"]
+        a["history"] = student.encode_history([
+            {"t": 100, "mastery": 10, "confidence": "low"},
+            {"t": 300, "mastery": 30, "confidence": "low"}])
+        b["history"] = student.encode_history([{"t": 200, "mastery": 20, "confidence": "high"}])
+        student.merge_concepts(model, "Scope", "Closures")
+
+        points = student.decode_history(a["history"])
+        assert [(p["t"], p["mastery"]) for p in points] == [(100, 10), (200, 20), (300, 30)]
+
+    def test_merge_dedupes_shared_misconceptions(self, graph, capsys):
+        """A belief both concepts hold is kept once, preferring the unresolved entry."""
+        model = student.load_model()
+        model["misconceptions"] += [
+            {"concept": "Hooks", "belief": "Copies values", "correction": "captures bindings",
+             "date_identified": "2025-01-01T12:00:00", "resolved": True,
+             "date_resolved": "2025-01-03T12:00:00"},
+            {"concept": "Hooks", "belief": "run once", "correction": "every render",
+             "date_identified": "2025-01-01T12:00:00", "resolved": False, "date_resolved": None},
+        ]
+        student.mark_dirty(model, section="misconceptions")
+        student.save_model(model)
+
+        student.cmd_merge(argparse.Namespace(source="Closures", target="Hooks"))
+        misconceptions = student.load_model()["misconceptions"]
+        assert [(m["belief"], m["resolved"]) for m in misconceptions] == \
+            [("copies values", False), ("run once", False)]
+        model = student.load_model()
+        index = student.misconception_index(model)
+        assert [p for p, _ in index.for_concept("hooks")] == [0, 1]
+
+    def test_merge_dedupes_identical_entries(self, graph, capsys):
+        """Two identical beliefs keep the earliest entry."""
+        model = student.load_model()
+        model["misconceptions"].append(dict(model["misconceptions"][0], concept="Hooks",
+                                            date_identified="2025-01-05T12:00:00"))
+        student.merge_concepts(model, "Closures", "Hooks")
+        assert [m["date_identified"] for m in model["misconceptions"]] == ["2025-01-02T12:00:00"]
+
+    def test_merge_into_itself_rejected(self, graph, capsys):
+        """A concept can't be merged into itself."""
+        student.cmd_merge(argparse.Namespace(source="Closures", target="closures"))
+        assert "into itself" in capsys.readouterr().out
+
+
+class TestReplay:
+    """Test that rename and merge replay for --as-of."""
+
+    def test_as_of_after_rename_and_merge(self, graph, capsys):
+        """Reconstruction applies rename and merge events."""
+        student.save_model(student.load_model(), checkpoint=True)
+        time.sleep(0.002)
+        student.cmd_rename(argparse.Namespace(concept_name="Closures", new_name="JS Closures"))
+        student.cmd_merge(argparse.Namespace(source="Callbacks", target="JS Closures"))
+        time.sleep(0.002)
+
+        model = student.model_as_of(datetime.now().isoformat())
+        current = student.load_model()
+        assert set(model["concepts"]) == set(current["concepts"])
+        assert model["concepts"]["Hooks"]["related_concepts"] == ["JS Closures", "Scope"]
+        assert model["misconceptions"][0]["concept"] == "JS Closures"
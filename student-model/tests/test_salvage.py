@@ -0,0 +1,145 @@
+"""
+test_salvage.py - Tests for corruption salvage
+
+Tests cover:
+- Complete records are recovered from truncated files
+- Damaged records are skipped and scanning resumes at the next record
+- Gaps are filled from the newest backup; unrecoverable records are reported
+- load_model salvages instead of resetting, and the salvage command
+"""
+
+import argparse
+import json
+
+import student
+
+
+def _model_with(n, misconceptions=0):
+    model = student.get_default_model()
+    for i in range(n):
+        model["concepts"][f"Concept {i}"] = {
+            "mastery": i, "confidence": "low",
+            "first_encountered": "2024-01-01T00:00:00",
+            "last_reviewed": "2024-01-02T00:00:00",
+            "struggles": [], "breakthroughs": [], "related_concepts": [],
+        }
+    model["misconceptions"] = [
+        {"concept": "Concept 0", "belief": f"belief {i}", "correction": "c",
+         "date_identified": "2024-01-01T00:00:00", "resolved": False,
+         "date_resolved": None}
+        for i in range(misconceptions)
+    ]
+    return model
+
+
+def _text(model):
+    return json.dumps(model, indent=2, ensure_ascii=False)
+
+
+class TestSalvageText:
+    """Test the tolerant scanner."""
+
+    def test_truncated_file_keeps_complete_concepts(self):
+        """Everything before the truncation point is recovered."""
+        text = _text(_model_with(10))
+        cut = text.index('"Concept 7"') + 30
+        sections, damaged = student.salvage_text(text[:cut])
+        assert set(sections["concepts"]) == {f"Concept {i}" for i in range(7)}
+        assert damaged[0]["name"] == "Concept 7"
+        assert sections["metadata"]["created"]
+
+    def test_damaged_record_is_skipped(self):
+        """Scanning resumes after a damaged concept and in later sections."""
+        text = _text(_model_with(5, misconceptions=2))
+        start = text.index('"Concept 2"')
+        text = text[:start + 20] + "#### garbage ####" + text[start + 40:]
+        sections, damaged = student.salvage_text(text)
+
+        assert set(sections["concepts"]) == {"Concept 0", "Concept 1", "Concept 3", "Concept 4"}
+        assert len(sections["misconceptions"]) == 2
+        assert sections["sessions"] == []
+        assert [d["name"] for d in damaged] == ["Concept 2"]
+
+    def test_damaged_misconception_item(self):
+        """Damaged list items are skipped individually."""
+        text = _text(_model_with(1, misconceptions=3))
+        start = text.index('"belief 1"')
+        text = text[:start] + '"belief 1 , }' + text[start + 12:]
+        sections, damaged = student.salvage_text(text)
+        assert [m["belief"] for m in sections["misconceptions"]] == ["belief 0", "belief 2"]
+        assert damaged[0]["section"] == "misconceptions"
+
+    def test_not_an_object(self):
+        """Input that is not an object yields nothing."""
+        sections, damaged = student.salvage_text("garbage")
+        assert sections == {} and len(damaged) == 1
+
+
+class TestSalvageModel:
+    """Test merging salvaged data with backups."""
+
+    def test_backup_fills_gaps(self, temp_data_file):
+        """Concepts lost to damage come back from the newest backup."""
+        student.save_model(_model_with(5))
+        text = _text(_model_with(5))
+        cut = text.index('"Concept 3"') + 15
+        model, report = student.salvage_model(text[:cut])
+
+        assert set(model["concepts"]) == {f"Concept {i}" for i in range(5)}
+        assert report["recovered_concepts"] == 3
+        assert report["from_backup"] == ["Concept 3", "Concept 4"]
+        assert report["lost"] == []
+        assert student.validate_model(model)
+
+    def test_salvaged_records_win_over_backup(self, temp_data_file):
+        """A record present in both keeps the newer salvaged version."""
+        student.save_model(_model_with(3))
+        newer = _model_with(3)
+        newer["concepts"]["Concept 1"]["mastery"] = 99
+        text = _text(newer)
+        model, _ = student.salvage_model(text[:text.index('"Concept 2"') + 5])
+        assert model["concepts"]["Concept 1"]["mastery"] == 99
+
+    def test_lost_records_reported(self, temp_data_file):
+        """Damaged records missing from every backup are reported as lost."""
+        text = _text(_model_with(3))
+        model, report = student.salvage_model(text[:text.index('"Concept 2"') + 20])
+        assert [d["name"] for d in report["lost"]] == ["Concept 2"]
+        assert report["backup_source"] is None
+
+
+class TestSalvageIntegration:
+    """Test load_model and the salvage command."""
+
+    def test_load_model_salvages_truncated_file(self, temp_data_file, capsys):
+        """A truncated model keeps its complete concepts."""
+        text = _text(_model_with(6))
+        temp_data_file.write_text(text[:text.index('"Concept 5"') + 15], encoding='utf-8')
+
+        model = student.load_model()
+        captured = capsys.readouterr()
+
+        assert len(model["concepts"]) == 5
+        assert "Corrupt JSON" in captured.out
+        assert "Salvaged 5 concepts" in captured.out
+        assert "Lost concept 'Concept 5'" in captured.out
+        assert temp_data_file.with_suffix('.json.corrupt').exists()
+        # The rebuilt model was saved
+        assert len(json.loads(temp_data_file.read_text())["concepts"]) == 5
+
+    def test_salvage_dry_run(self, temp_data_file, capsys):
+        """--dry-run reports without writing."""
+        text = _text(_model_with(4))
+        damaged = text[:text.index('"Concept 3"') + 15]
+        temp_data_file.write_text(damaged, encoding='utf-8')
+
+        student.cmd_salvage(argparse.Namespace(dry_run=True))
+        captured = capsys.readouterr()
+        assert "Salvaged 3 concepts" in captured.out
+        assert "Dry run" in captured.out
+        assert temp_data_file.read_text(encoding='utf-8') == damaged
+
+    def test_salvage_clean_file(self, sample_model, temp_data_file, capsys):
+        """A file that parses needs no salvage."""
+        student.cmd_salvage(argparse.Namespace(dry_run=False))
+        assert "nothing to salvage" in capsys.readouterr().out
@@ -0,0 +1,203 @@
+"""
+test_session_log.py - Tests for the time-partitioned session log
+
+Tests cover:
+- Mutations append compact events only after a successful save
+- session-end groups its events under a session ID
+- Concept/session indexes and the sparse time index
+- Lazy index catch-up and tolerance of partial lines
+- Out-of-order events within a partition
+- Concept queries following renames
+- log, sessions and info commands
+"""
+
+import argparse
+import json
+
+import student
+
+
+def _event(t, op="update", concept="A", **fields):
+    event = {"t": t, "op": op, "concept": concept}
+    event.update(fields)
+    return json.dumps(event, separators=(',', ':'))
+
+
+class TestRecording:
+    """Test that commands write events."""
+
+    def test_update_appends_event(self, sample_model, temp_data_file, capsys):
+        """cmd_update logs one update event with old and new values."""
+        student.cmd_update(argparse.Namespace(
+            concept_name="React Hooks", mastery=80, confidence="high"))
+
+        events = list(student.query_events())
+        assert len(events) == 1
+        event = events[0]
+        assert event["op"] == "update"
+        assert event["concept"] == "React Hooks"
+        assert event["set"]["mastery"] == 80
+        assert event["prev"] == {"mastery": 60, "confidence": "medium"}
+
+        partition = event["t"][:7]
+        assert (student.log_dir() / f"{partition}.jsonl").exists()
+
+    def test_events_wait_for_save(self, temp_data_file):
+        """Events on a tracked model are written by save_model."""
+        model = student.load_model()
+        model["concepts"]["X"] = {"mastery": 1}
+        student.record_event(model, "add", "X", set={"mastery": 1})
+        assert list(student.query_events()) == []
+
+        assert student.save_model(model)
+        assert [e["op"] for e in student.query_events()] == ["add"]
+
+    def test_session_end_groups_events(self, sample_model, temp_data_file, capsys):
+        """session-end tags its events and logs a summary record."""
+        student.cmd_session_end(argparse.Namespace(
+            update=["React Hooks:70:high"],
+            struggle=["JavaScript Closures:hoisting"],
+            breakthrough=None))
+
+        ends = list(student.query_events(ops={"session_end"}))
+        assert len(ends) == 1
+        session = ends[0]["session"]
+        assert ends[0]["summary"] == {"updates": 1, "struggles": 1, "breakthroughs": 0}
+
+        ops = [e["op"] for e in student.query_events(session=session)]
+        assert ops == ["update", "struggle", "session_end"]
+
+    def test_no_event_for_rejected_change(self, sample_model, temp_data_file, capsys):
+        """Commands that change nothing log nothing."""
+        student.cmd_struggle(argparse.Namespace(
+            concept_name="React Hooks",
+            description="understanding useEffect dependencies"))
+        assert list(student.query_events()) == []
+
+
+class TestQueries:
+    """Test index-backed queries across partitions."""
+
+    def test_concept_and_time_filters(self, temp_data_file):
+        """Queries filter by concept (case-insensitive) and time range."""
+        student.append_events([
+            _event("2024-01-05T10:00:00", concept="A"),
+            _event("2024-01-06T10:00:00", concept="B"),
+            _event("2024-02-01T10:00:00", concept="A"),
+            _event("2024-03-01T10:00:00", concept="A"),
+        ])
+        assert student.list_partitions() == ["2024-01", "2024-02", "2024-03"]
+
+        times = [e["t"][:10] for e in student.query_events(concept="a")]
+        assert times == ["2024-01-05", "2024-02-01", "2024-03-01"]
+
+        times = [e["t"][:10] for e in student.query_events(
+            since="2024-01-06", until="2024-03-01")]
+        assert times == ["2024-01-06", "2024-02-01"]
+
+    def test_index_catches_up_after_append(self, temp_data_file):
+        """An index covering part of a partition indexes the new tail."""
+        student.append_events([_event("2024-01-01T00:00:00", concept="A")])
+        first = student.partition_index("2024-01")
+        assert first["count"] == 1
+
+        student.append_events([_event("2024-01-02T00:00:00", concept="A")])
+        index = student.partition_index("2024-01")
+        assert index["count"] == 2
+        assert len(index["concepts"]["a"]) == 2
+        assert index["size"] == (student.log_dir() / "2024-01.jsonl").stat().st_size
+
+    def test_sparse_time_index(self, temp_data_file, monkeypatch):
+        """Every Nth event is recorded for seeking by time."""
+        monkeypatch.setattr(student, 'LOG_TIME_INDEX_EVERY', 2)
+        student.append_events([_event(f"2024-01-{d:02d}T00:00:00") for d in range(1, 8)])
+        index = student.partition_index("2024-01")
+        assert [t[:10] for t, _ in index["times"]] == \
+            ["2024-01-01", "2024-01-03", "2024-01-05", "2024-01-07"]
+
+        times = [e["t"][:10] for e in student.query_events(since="2024-01-06")]
+        assert times == ["2024-01-06", "2024-01-07"]
+
+    def test_out_of_order_events(self, temp_data_file, monkeypatch):
+        """A late event is neither cut off by until nor skipped by the time index."""
+        monkeypatch.setattr(student, 'LOG_TIME_INDEX_EVERY', 2)
+        student.append_events([_event(t) for t in (
+            "2024-01-05T00:00:00", "2024-01-09T00:00:00",
+            "2024-01-02T00:00:00", "2024-01-03T00:00:00", "2024-01-10T00:00:00")])
+        assert student.partition_index("2024-01")["ordered"] is False
+
+        times = [e["t"][:10] for e in student.query_events(until="2024-01-06")]
+        assert times == ["2024-01-05", "2024-01-02", "2024-01-03"]
+        times = [e["t"][:10] for e in student.query_events(since="2024-01-04")]
+        assert times == ["2024-01-05", "2024-01-09", "2024-01-10"]
+
+    def test_concept_follows_renames(self, temp_data_file):
+        """A concept's events include those logged under its earlier names."""
+        student.append_events([
+            _event("2024-01-01T00:00:00", concept="Closures"),
+            _event("2024-01-02T00:00:00", op="rename", concept="JS Closures", old="closures"),
+            _event("2024-01-03T00:00:00", op="add", concept="Closures"),
+            _event("2024-02-01T00:00:00", op="rename", concept="Lexical Closures",
+                   old="JS Closures"),
+            _event("2024-02-02T00:00:00", concept="Lexical Closures"),
+        ])
+        events = list(student.query_events(concept="lexical closures"))
+        assert [(e["t"][:10], e["op"]) for e in events] == [
+            ("2024-01-01", "update"), ("2024-01-02", "rename"),
+            ("2024-02-01", "rename"), ("2024-02-02", "update")]
+        # The new concept that took the old name keeps only its own events
+        assert [e["t"][:10] for e in student.query_events(concept="Closures")] == ["2024-01-03"]
+
+    def test_index_without_renames_rebuilt(self, temp_data_file):
+        """An index written before renames were indexed is rebuilt."""
+        student.append_events([_event("2024-01-02T00:00:00", op="rename",
+                                      concept="B", old="A")])
+        index = student.partition_index("2024-01")
+        del index["renames"]
+        (student.log_dir() / "2024-01.idx.json").write_text(json.dumps(index))
+        assert student.partition_index("2024-01")["renames"] == [["b", "a", "2024-01-02T00:00:00"]]
+
+    def test_partial_line_is_ignored(self, temp_data_file):
+        """A torn final line is skipped until it is completed."""
+        student.append_events([_event("2024-01-01T00:00:00")])
+        with open(student.log_dir() / "2024-01.jsonl", 'a') as f:
+            f.write('{"t":"2024-01-02T00:00:00","op":"upd')
+
+        assert len(list(student.query_events())) == 1
+        assert student.partition_index("2024-01")["count"] == 1
+
+
+class TestLogCommands:
+    """Test log, sessions and info output."""
+
+    def test_log_command(self, sample_model, temp_data_file, capsys):
+        """log prints events with descriptions."""
+        student.cmd_update(argparse.Namespace(
+            concept_name="React Hooks", mastery=65, confidence=None))
+        capsys.readouterr()
+
+        student.cmd_log(argparse.Namespace(concept="react hooks", since=None,
+                                           until=None, session=None, limit=10))
+        captured = capsys.readouterr()
+        assert "Session Log for 'React Hooks'" in captured.out
+        assert "mastery 60% → 65%" in captured.out
+
+    def test_log_rejects_bad_date(self, temp_data_file, capsys):
+        """Invalid dates are reported."""
+        student.cmd_log(argparse.Namespace(concept=None, since="last week",
+                                           until=None, session=None, limit=10))
+        assert "Invalid date" in capsys.readouterr().out
+
+    def test_sessions_and_info(self, sample_model, temp_data_file, capsys):
+        """sessions lists session-end records; info counts them."""
+        student.cmd_session_end(argparse.Namespace(
+            update=["React Hooks:70:high"], struggle=None, breakthrough=None))
+        capsys.readouterr()
+
+        student.cmd_sessions(argparse.Namespace(limit=5))
+        assert "1 updates" in capsys.readouterr().out
+
+        student.cmd_info(argparse.Namespace())
+        captured = capsys.readouterr()
+        assert "Total Sessions: 1" in captured.out
+        assert "Logged Events:  2" in captured.out
@@ -0,0 +1,157 @@
+"""
+test_shards.py - Tests for the sharded on-disk layout
+
+Tests cover:
+- Splitting a model into shards and merging it back
+- Saves rewrite only the shards holding changed concepts
+- Parallel and in-process decoding agree
+- Missing shards, stale files, validation and the read cache
+"""
+
+import argparse
+import json
+
+import pytest
+
+import student
+
+
+def _concept(mastery):
+    return {"mastery": mastery, "confidence": "medium",
+            "first_encountered": "2025-01-01T12:00:00", "last_reviewed": "2025-01-01T12:00:00",
+            "struggles": [], "breakthroughs": [], "related_concepts": []}
+
+
+@pytest.fixture
+def sharded(temp_data_file, capsys):
+    """Forty concepts split across four shards."""
+    model = student.get_default_model()
+    for i in range(40):
+        model["concepts"][f"Concept {i:02d}"] = _concept(i)
+    student.save_model(model)
+    result = student.StudentModel.open().reshard(4)
+    assert result["changed"] is True
+    return temp_data_file
+
+
+def _files():
+    return student.load_model().layout.files
+
+
+class TestLayout:
+    """Test splitting, loading and merging."""
+
+    def test_manifest_replaces_concepts(self, sharded):
+        on_disk = json.loads(sharded.read_text())
+        assert "concepts" not in on_disk
+        assert len(on_disk["shards"]["files"]) == 4
+        assert sorted(p.name for p in student.shard_dir().iterdir()) == sorted(on_disk["shards"]["files"])
+
+        model = student.load_model()
+        assert list(model) == ["schema_version", "metadata", "concepts", "misconceptions", "sessions"]
+        assert len(model["concepts"]) == 40
+        for key in model["concepts"]:
+            assert key in model.layout.members[student.shard_of(key, 4)]
+
+    def test_merge_back(self, sharded):
+        student.StudentModel.open().reshard(0)
+        assert not student.shard_dir().exists()
+        on_disk = json.loads(sharded.read_text())
+        assert len(on_disk["concepts"]) == 40
+        assert student.load_model().layout is None
+
+    def test_invalid_count(self, sharded):
+        with pytest.raises(student.InvalidValueError):
+            student.StudentModel.open().reshard(student.MAX_SHARDS + 1)
+
+    def test_command(self, sharded, capsys):
+        result = student.cmd_shard(argparse.Namespace(count=2))
+        assert result["previous"] == 4
+        assert "✅ Split 40 concepts across 2 shards" in capsys.readouterr().out
+        assert len(list(student.shard_dir().iterdir())) == 2
+
+
+class TestSaves:
+    """Test that saves touch only dirty shards."""
+
+    def test_update_rewrites_one_shard(self, sharded):
+        before = _files()
+        student.StudentModel.open().update("Concept 07", mastery=99)
+        after = _files()
+        changed = [i for i in range(4) if before[i] != after[i]]
+        assert changed == [student.shard_of("Concept 07", 4)]
+        assert len(list(student.shard_dir().iterdir())) == 4
+        assert student.load_model()["concepts"]["Concept 07"]["mastery"] == 99
+
+    def test_add_and_remove(self, sharded):
+        model = student.StudentModel.open()
+        model.add_concept("Brand New", 10, "low")
+        model.rename("Concept 03", "Renamed")
+        loaded = student.load_model()["concepts"]
+        assert "Brand New" in loaded and "Renamed" in loaded
+        assert "Concept 03" not in loaded and len(loaded) == 41
+
+    def test_unchanged_shard_text_matches(self, sharded):
+        """Shard files hold the same fragments a single file would."""
+        model = student.load_model()
+        shard = model.layout.files[0]
+        text = (student.shard_dir() / shard).read_text()
+        keys = list(model.layout.members[0])
+        assert json.loads(text)["concepts"] == {k: model["concepts"][k] for k in keys}
+        assert all(model["concepts"].fragments[k] in text for k in keys)
+
+
+class TestLoading:
+    """Test decoding and failure handling."""
+
+    def test_parallel_matches_serial(self, sharded, monkeypatch):
+        monkeypatch.setattr(student, "MODEL_CACHE", False)
+        serial = student.load_model()
+        monkeypatch.setattr(student, "SHARD_WORKERS", 2)
+        monkeypatch.setattr(student, "SHARD_PARALLEL_MIN_BYTES", 0)
+        parallel = student.load_model()
+        assert parallel == serial
+        assert list(parallel["concepts"]) == list(serial["concepts"])
+        assert parallel["concepts"].fragments == serial["concepts"].fragments
+
+    def test_cache_keeps_layout(self, sharded, monkeypatch):
+        student.load_model()
+        monkeypatch.setattr(student, "decode_model", None)
+        cached = student.load_model()
+        assert cached.layout is not None and cached.layout.count == 4
+
+    def test_missing_shard_restores_backup(self, sharded, capsys):
+        (student.shard_dir() / _files()[1]).unlink()
+        student.drop_cache()
+        model = student.load_model()
+        assert "Unreadable shard" in capsys.readouterr().out
+        assert len(model["concepts"]) == 40
+        assert model.layout is not None   # restored in the same layout
+        assert len(student.load_model()["concepts"]) == 40
+
+    def test_stale_files_removed(self, sharded):
+        stale = student.shard_dir() / "001-000000000000.json"
+        stale.write_text("{}")
+        student.StudentModel.open().update("Concept 01", mastery=5)
+        assert not stale.exists()
+
+
+class TestValidation:
+    """Test that validate reads the shards."""
+
+    def test_valid(self, sharded):
+        assert student.validate_file(sharded) == []
+
+    def test_bad_concept_in_shard(self, sharded):
+        path = student.shard_dir() / _files()[2]
+        data = json.loads(path.read_text())
+        name = next(iter(data["concepts"]))
+        data["concepts"][name]["mastery"] = 500
+        path.write_text(json.dumps(data, indent=2))
+        issues = student.validate_file(sharded)
+        assert any("out of range" in i["message"] for i in issues)
+
+    def test_missing_shard(self, sharded):
+        (student.shard_dir() / _files()[0]).unlink()
+        issues = student.validate_file(sharded)
+        assert any("unreadable" in i["message"] for i in issues)
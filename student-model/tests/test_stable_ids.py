@@ -0,0 +1,145 @@
+"""
+test_stable_ids.py - Tests for concept, struggle and breakthrough IDs
+
+Tests cover:
+- New concepts, struggles and breakthroughs get IDs
+- Older records get stable derived IDs
+- @ID addressing through find_concept and commands
+- The name/ID index follows adds, removals and replacements
+- Validation of ID fields
+"""
+
+import argparse
+import io
+import json
+
+import student
+
+
+def _add(name, mastery=50):
+    student.cmd_add(argparse.Namespace(
+        concept_name=name, mastery=mastery, confidence="medium", related=None))
+
+
+class TestAssignment:
+    """Test that new entities get IDs."""
+
+    def test_add_assigns_concept_id(self, temp_data_file, capsys):
+        """cmd_add stores an ID and prints it."""
+        _add("Closures")
+        concept = student.load_model()["concepts"]["Closures"]
+        assert len(concept["id"]) == 16
+        assert f"ID: @{concept['id']}" in capsys.readouterr().out
+
+    def test_struggle_and_breakthrough_ids(self, temp_data_file, capsys):
+        """Entries get IDs in parallel lists; duplicates get none."""
+        _add("Closures")
+        student.cmd_struggle(argparse.Namespace(concept_name="Closures", description="scope"))
+        student.cmd_struggle(argparse.Namespace(concept_name="Closures", description="scope"))
+        student.cmd_breakthrough(argparse.Namespace(concept_name="Closures", description="got it"))
+
+        concept = student.load_model()["concepts"]["Closures"]
+        assert concept["struggles"] == ["scope"]
+        assert len(concept["struggle_ids"]) == 1
+        assert len(concept["breakthrough_ids"]) == 1
+
+    def test_legacy_entries_get_ids_first(self, sample_model, temp_data_file, capsys):
+        """Older struggles get derived IDs before a new one is appended."""
+        student.cmd_struggle(argparse.Namespace(concept_name="React Hooks", description="new one"))
+
+        concept = student.load_model()["concepts"]["React Hooks"]
+        assert len(concept["struggles"]) == len(concept["struggle_ids"]) == 2
+        expected = student.entry_ids("React Hooks",
+                                     {"struggles": concept["struggles"][:1],
+                                      "first_encountered": concept["first_encountered"]},
+                                     "struggles")
+        assert concept["struggle_ids"][0] == expected[0]
+
+    def test_legacy_concept_id_is_stable(self, sample_model, temp_data_file):
+        """Concepts saved without an ID derive the same one on every load."""
+        first = student.concept_id("React Hooks", student.load_model()["concepts"]["React Hooks"])
+        second = student.concept_id("React Hooks", student.load_model()["concepts"]["React Hooks"])
+        assert first == second
+
+
+class TestAddressing:
+    """Test @ID lookups."""
+
+    def test_find_by_id(self, sample_model, temp_data_file):
+        """find_concept resolves @ID on tracked and plain models."""
+        model = student.load_model()
+        concept_id = student.concept_id("React Hooks", model["concepts"]["React Hooks"])
+
+        assert student.find_concept(model, f"@{concept_id}") == "React Hooks"
+        assert student.find_concept(model, f"@{concept_id.lower()}") == "React Hooks"
+        plain = json.loads(temp_data_file.read_text())
+        assert student.find_concept(plain, f"@{concept_id}") == "React Hooks"
+        assert student.find_concept(model, "@NOPE") is None
+
+    def test_commands_accept_id(self, temp_data_file, capsys):
+        """Any command taking a concept accepts @ID."""
+        _add("Closures", 40)
+        concept_id = student.load_model()["concepts"]["Closures"]["id"]
+        student.cmd_update(argparse.Namespace(
+            concept_name=f"@{concept_id}", mastery=70, confidence=None))
+        assert student.load_model()["concepts"]["Closures"]["mastery"] == 70
+
+    def test_index_follows_changes(self, sample_model, temp_data_file):
+        """Adds, removals and replacements keep name and ID lookups right."""
+        model = student.load_model()
+        concepts = model["concepts"]
+        assert student.find_concept(model, "react hooks") == "React Hooks"
+
+        concepts["New"] = {"mastery": 1, "confidence": "low", "id": "NEWID"}
+        del concepts["React Hooks"]
+        assert student.find_concept(model, "new") == "New"
+        assert student.find_concept(model, "@NEWID") == "New"
+        assert student.find_concept(model, "react hooks") is None
+
+        concepts["New"] = {"mastery": 2, "confidence": "low", "id": "OTHER"}
+        assert student.find_concept(model, "@NEWID") is None
+        assert student.find_concept(model, "@OTHER") == "New"
+
+    def test_resolve_misconception_by_id_alone(self, temp_data_file, capsys):
+        """misconception resolve @ID needs no concept name."""
+        _add("Closures")
+        student.cmd_misconception_add(argparse.Namespace(
+            concept_name="Closures", belief="b", correction="c"))
+        misconception_id = student.load_model()["misconceptions"][0]["id"]
+
+        student.cmd_misconception_resolve(argparse.Namespace(
+            concept_name=f"@{misconception_id}", index=None))
+        assert student.load_model()["misconceptions"][0]["resolved"] is True
+
+    def test_show_prints_ids(self, temp_data_file, capsys):
+        """show lists the concept ID and entry IDs."""
+        _add("Closures")
+        student.cmd_struggle(argparse.Namespace(concept_name="Closures", description="scope"))
+        capsys.readouterr()
+        student.cmd_show(argparse.Namespace(concept_name="Closures"))
+
+        concept = student.load_model()["concepts"]["Closures"]
+        output = capsys.readouterr().out
+        assert f"@{concept['id']}" in output
+        assert concept["struggle_ids"][0] in output
+
+
+class TestValidation:
+    """Test ID checks in the validator."""
+
+    def _issues(self, concepts):
+        model = student.get_default_model()
+        model["concepts"] = concepts
+        return student.validate_stream(io.StringIO(json.dumps(model)))
+
+    def test_duplicate_concept_ids(self):
+        """Two concepts with one ID are an error."""
+        issues = self._issues({"A": {"mastery": 1, "confidence": "low", "id": "X"},
+                               "B": {"mastery": 1, "confidence": "low", "id": "X"}})
+        assert any("Duplicate ID" in i["message"] for i in issues)
+
+    def test_more_ids_than_entries(self):
+        """An ID list longer than its entries is an error."""
+        issues = self._issues({"A": {"mastery": 1, "confidence": "low",
+                                     "struggles": [], "struggle_ids": ["X"]}})
+        assert any("struggle_ids" in i["path"] for i in issues)
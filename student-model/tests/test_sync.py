@@ -0,0 +1,366 @@
+"""
+test_sync.py - Tests for syncing replicas through changeset files
+
+Tests cover:
+- Version vectors and the sync state kept beside the model
+- Local changes found from save notes and hashes, not the session log
+- A first sync sending everything, later ones only what changed
+- Idempotent applies, concurrent edits joined the same way everywhere
+- Mastery as a last-writer-wins register on its own write time
+- Renames, deletions and misconceptions crossing between replicas
+- Three replicas converging through a shared directory
+- The sync status, export and apply commands
+"""
+
+import argparse
+import json
+
+import pytest
+
+import student
+
+
+def _concept(mastery, reviewed="2025-01-10T12:00:00", **extra):
+    return dict({"mastery": mastery, "confidence": "medium",
+                 "first_encountered": "2025-01-01T12:00:00", "last_reviewed": reviewed,
+                 "struggles": [], "breakthroughs": [], "related_concepts": []}, **extra)
+
+
+@pytest.fixture
+def replicas(tmp_path, monkeypatch):
+    """Switch between replicas of one model, each in its own directory."""
+    monkeypatch.setattr(student, "BACKUPS_ENABLED", False)
+    start = student.get_default_model()
+    start["concepts"] = {"Hooks": _concept(50), "Scope": _concept(80)}
+    for name in "abc":
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "student_model.json").write_text(json.dumps(start))
+
+    def use(name):
+        monkeypatch.setattr(student, "DATA_FILE", tmp_path / name / "student_model.json")
+        return student.StudentModel.open()
+    return use
+
+
+def _export(since=None):
+    state = student.SyncState()
+    model = student.load_model()
+    student.absorb_local_changes(state, model)
+    changeset = student.sync_export(model, state, state.since() if since is None else since)
+    state.save()
+    return json.loads(json.dumps(changeset))
+
+
+def _apply(changeset):
+    state = student.SyncState()
+    model = student.load_model()
+    student.absorb_local_changes(state, model)
+    report = student.sync_apply(model, state, changeset)
+    if report["taken"] or report["joined"] or report["deleted"]:
+        student.save_model(model)
+    state.save()
+    return report
+
+
+def _sync(use, a, b):
+    """Send a's changes to b and b's back to a."""
+    use(a)
+    to_b = _export()
+    use(b)
+    _apply(to_b)
+    to_a = _export()
+    use(a)
+    _apply(to_a)
+
+
+class TestVersionVectors:
+    """Test the vector helpers and the sync state."""
+
+    def test_covers_and_join(self):
+        assert student.vv_covers({"A": 2, "B": 1}, {"A": 2})
+        assert not student.vv_covers({"A": 2}, {"A": 2, "B": 1})
+        assert student.vv_join({"A": 2, "B": 1}, {"A": 1, "C": 3}) == {"A": 2, "B": 1, "C": 3}
+
+    def test_entity_keys_ignore_case(self):
+        assert student.entity_key("concept", "Hooks") == student.entity_key("concept", "hooks")
+
+    def test_state_round_trip(self, replicas):
+        replicas("a")
+        state = student.SyncState()
+        state.bump(student.entity_key("concept", "Hooks"))
+        state.save()
+        again = student.SyncState()
+        assert again.replica == state.replica and again.clock == 1
+        assert again.versions == {student.entity_key("concept", "hooks"): {state.replica: 1}}
+
+    def test_clock_recovered_from_versions(self, replicas):
+        replicas("a")
+        state = student.SyncState()
+        state.bump(student.entity_key("concept", "Hooks"))
+        state.save()
+        (student.sync_dir() / "state.json").write_text(json.dumps(
+            {"format": 1, "replica": state.replica, "clock": 0, "known": {}, "peers": {}}))
+        assert student.SyncState().clock == 1
+
+    def test_unreadable_state(self, replicas):
+        replicas("a")
+        student.sync_dir().mkdir()
+        (student.sync_dir() / "state.json").write_text("{")
+        with pytest.raises(student.SyncError):
+            student.SyncState()
+
+    def test_versions_compacted(self, replicas):
+        replicas("a")
+        state = student.SyncState()
+        for _ in range(40):
+            state.bump(student.entity_key("concept", "Hooks"))
+            state.save()
+        assert len((student.sync_dir() / "versions.jsonl").read_text().splitlines()) <= 18
+        assert student.SyncState().clock == 40
+
+
+class TestChangesets:
+    """Test what a changeset carries."""
+
+    def test_first_sync_sends_everything(self, replicas):
+        replicas("a")
+        changeset = _export()
+        assert sorted(e["name"] for e in changeset["entities"]) == ["Hooks", "Scope"]
+
+    def test_after_sync_only_changes(self, replicas):
+        _sync(replicas, "a", "b")
+        replicas("a").update("Hooks", mastery=65)
+        changeset = _export()
+        assert [e["name"] for e in changeset["entities"]] == ["Hooks"]
+        assert changeset["entities"][0]["record"]["mastery"] == 65
+
+    def test_nothing_new(self, replicas):
+        _sync(replicas, "a", "b")
+        replicas("a")
+        assert _export()["entities"] == []
+
+    def test_own_changeset_skipped(self, replicas):
+        replicas("a").update("Hooks", mastery=65)
+        changeset = _export()
+        assert _apply(changeset)["skipped"] == 2
+
+
+class TestLocalChanges:
+    """Test finding local changes without relying on the session log."""
+
+    def test_unlogged_change_exported(self, replicas, monkeypatch):
+        _sync(replicas, "a", "b")
+
+        def broken(events):
+            raise OSError("disk full")
+        monkeypatch.setattr(student, "append_events", broken)
+        replicas("a").update("Hooks", mastery=65)
+        assert [e["name"] for e in _export()["entities"]] == ["Hooks"]
+
+    def test_whole_model_save_compared_by_hash(self, replicas):
+        _sync(replicas, "a", "b")
+        replicas("a")
+        model = json.loads(student.DATA_FILE.read_text())
+        model["concepts"]["Scope"]["mastery"] = 95
+        student.save_model(model)           # as a restore or salvage does
+        changeset = _export()
+        assert [e["name"] for e in changeset["entities"]] == ["Scope"]
+        replicas("b")
+        _apply(changeset)
+        assert student.load_model()["concepts"]["Scope"]["mastery"] == 95
+
+    def test_hand_edit_found(self, replicas):
+        _sync(replicas, "a", "b")
+        replicas("a")
+        model = json.loads(student.DATA_FILE.read_text())
+        model["concepts"]["Hooks"]["struggles"].append("edited by hand")
+        student.DATA_FILE.write_text(json.dumps(model, indent=2))
+        assert [e["name"] for e in _export()["entities"]] == ["Hooks"]
+
+    def test_unchanged_save_not_exported(self, replicas):
+        _sync(replicas, "a", "b")
+        replicas("a")
+        student.save_model(student.load_model())
+        assert _export()["entities"] == []
+
+    def test_notes_compacted(self, replicas, monkeypatch):
+        monkeypatch.setattr(student, "SYNC_TOUCHED_COMPACT", 0)
+        _sync(replicas, "a", "b")
+        replicas("a").update("Hooks", mastery=65)
+        assert len(_export()["entities"]) == 1
+        assert (student.sync_dir() / "touched.jsonl").read_bytes() == b""
+        replicas("a").update("Hooks", mastery=70)
+        assert len(_export()["entities"]) == 1
+
+
+class TestApply:
+    """Test merging changesets."""
+
+    def test_one_sided_change_taken(self, replicas):
+        _sync(replicas, "a", "b")
+        replicas("a").log_struggle("Hooks", "stale closures")
+        changeset = _export()
+        replicas("b")
+        report = _apply(changeset)
+        assert report["taken"] == 1 and report["joined"] == 0
+        assert student.load_model()["concepts"]["Hooks"]["struggles"] == ["stale closures"]
+
+    def test_idempotent(self, replicas):
+        _sync(replicas, "a", "b")
+        replicas("a").update("Hooks", mastery=65)
+        changeset = _export()
+        replicas("b")
+        _apply(changeset)
+        before = student.DATA_FILE.read_text()
+        report = _apply(changeset)
+        assert report["skipped"] == 1 and report["taken"] == 0
+        assert student.DATA_FILE.read_text() == before
+
+    def test_concurrent_edits_converge(self, replicas):
+        _sync(replicas, "a", "b")
+        replicas("a").log_struggle("Hooks", "cleanup")
+        replicas("b").log_struggle("Hooks", "deps")
+        replicas("b").update("Hooks", mastery=70)
+        _sync(replicas, "a", "b")
+        hooks_a = replicas("a").data["concepts"]["Hooks"]
+        hooks_b = replicas("b").data["concepts"]["Hooks"]
+        assert hooks_a == hooks_b
+        assert sorted(hooks_a["struggles"]) == ["cleanup", "deps"]
+        assert hooks_a["mastery"] == 70     # reviewed last
+        replicas("a")
+        assert _export()["entities"] == []
+
+    def test_mastery_write_beats_later_struggle(self, replicas):
+        """A struggle logged later doesn't undo a concurrent mastery write."""
+        model = replicas("a")
+        added = int(student.datetime(2025, 1, 10, 12).timestamp())
+        model.data["concepts"]["Hooks"]["history"] = [[added, 50, 1]]
+        student.mark_dirty(model.data, concept="Hooks")
+        model.save()
+        _sync(replicas, "a", "b")
+        replicas("b").update("Hooks", mastery=80)
+        replicas("a").log_struggle("Hooks", "stale closures")
+        _sync(replicas, "a", "b")
+        for name in "ab":
+            hooks = replicas(name).data["concepts"]["Hooks"]
+            assert hooks["mastery"] == 80 and hooks["struggles"] == ["stale closures"]
+            points = student.decode_history(hooks["history"])
+            assert student.mastery_trend(points)["current"] == 80
+
+    def test_tie_is_deterministic(self):
+        a = _concept(40)
+        b = _concept(60)
+        assert student.join_records("concept", "Hooks", a, b) == \
+            student.join_records("concept", "Hooks", b, a)
+
+    def test_rename_propagates(self, replicas):
+        _sync(replicas, "a", "b")
+        replicas("a").rename("Hooks", "React Hooks")
+        _sync(replicas, "a", "b")
+        assert sorted(replicas("b").data["concepts"]) == ["React Hooks", "Scope"]
+
+    def test_edit_beats_concurrent_delete(self, replicas):
+        _sync(replicas, "a", "b")
+        replicas("a").merge("Scope", "Hooks")           # deletes Scope here
+        replicas("b").update("Scope", mastery=90)
+        _sync(replicas, "a", "b")
+        for name in "ab":
+            concepts = replicas(name).data["concepts"]
+            assert concepts["Scope"]["mastery"] == 90
+
+    def test_misconception_resolved_wins(self, replicas):
+        replicas("a").add_misconception("Hooks", "effects run once", "they run after every render")
+        _sync(replicas, "a", "b")
+        assert len(replicas("b").data["misconceptions"]) == 1
+        replicas("b").resolve_misconception("Hooks", "0")
+        replicas("a").update("Hooks", mastery=55)
+        _sync(replicas, "a", "b")
+        for name in "ab":
+            assert replicas(name).data["misconceptions"][0]["resolved"] is True
+
+    def test_not_a_changeset(self, replicas):
+        replicas("a")
+        with pytest.raises(student.SyncError):
+            _apply({"entities": []})
+
+    @pytest.mark.parametrize("entity", [
+        "Hooks",
+        {"kind": "lesson", "name": "Hooks", "vv": {}},
+        {"kind": "concept", "vv": {"X": 1}},
+        {"kind": "concept", "name": "Hooks", "vv": {"X": "1"}},
+        {"kind": "concept", "name": "Hooks", "vv": {"X": 1}, "record": 5},
+        {"kind": "misconception", "concept": "Hooks", "vv": {"X": 1}},
+    ])
+    def test_malformed_entity(self, replicas, entity):
+        """A bad entity is refused before any entity in the changeset is applied."""
+        replicas("a")
+        good = {"kind": "concept", "name": "Promises", "vv": {"X": 1}, "record": _concept(20)}
+        changeset = {"format": student.SYNC_FORMAT, "replica": "X", "entities": [good, entity]}
+        model = student.load_model()
+        with pytest.raises(student.SyncError, match="Malformed"):
+            student.sync_apply(model, student.SyncState(), changeset)
+        assert "Promises" not in model["concepts"]
+
+
+class TestCommands:
+    """Test the sync commands with a shared directory."""
+
+    def _export_to(self, exchange):
+        return student.cmd_sync_export(argparse.Namespace(since=None, output=None, dir=str(exchange)))
+
+    def _apply_from(self, exchange):
+        return student.cmd_sync_apply(argparse.Namespace(paths=[str(exchange)]))
+
+    def test_three_replicas_converge(self, replicas, tmp_path, capsys):
+        exchange = tmp_path / "exchange"
+        replicas("a").update("Hooks", mastery=60)
+        replicas("b").add_concept("Promises", 20, "low")
+        replicas("c").log_breakthrough("Scope", "closures capture bindings")
+        for _ in range(2):
+            for name in "abc":
+                replicas(name)
+                self._export_to(exchange)
+                self._apply_from(exchange)
+        models = [replicas(name).data["concepts"] for name in "abc"]
+        assert models[0] == models[1] == models[2]
+        assert models[0]["Hooks"]["mastery"] == 60 and "Promises" in models[0]
+        assert models[0]["Scope"]["breakthroughs"] == ["closures capture bindings"]
+
+    def test_apply_output_and_event(self, replicas, tmp_path, capsys):
+        exchange = tmp_path / "exchange"
+        replicas("a").update("Hooks", mastery=60)
+        self._export_to(exchange)
+        replicas("b")
+        result = self._apply_from(exchange)
+        assert result["changed"] is True and result["applied"] == 1
+        assert "✅ Applied 1 changeset(s)" in capsys.readouterr().out
+        assert list(student.query_events())[-1]["op"] == "sync"
+        result = self._apply_from(exchange)
+        assert result["changed"] is False
+        assert "already applied" in capsys.readouterr().out
+
+    def test_status_and_stdout_export(self, replicas, capsys):
+        replicas("a")
+        student.cmd_sync_export(argparse.Namespace(since="all", output=None, dir=None))
+        changeset = json.loads(capsys.readouterr().out)
+        assert len(changeset["entities"]) == 2
+        replicas("b")
+        _apply(changeset)
+        result = student.cmd_sync_status(argparse.Namespace())
+        assert result["peers"][0]["replica"] == changeset["replica"]
+        assert f"↔ {changeset['replica']}: has our changes up to 0" in capsys.readouterr().out
+
+    def test_malformed_changeset_reported(self, replicas, tmp_path, capsys):
+        replicas("a")
+        path = tmp_path / "bad.json"
+        path.write_text(json.dumps({"format": student.SYNC_FORMAT, "replica": "X",
+                                    "known": {"X": 1},
+                                    "entities": [{"kind": "concept", "vv": {}}]}))
+        result = student.cmd_sync_apply(argparse.Namespace(paths=[str(path)]))
+        assert result["ok"] is False
+        assert "Malformed changeset entity" in capsys.readouterr().out
+
+    def test_unknown_peer(self, replicas, capsys):
+        replicas("a")
+        student.cmd_sync_export(argparse.Namespace(since="ZZZ", output=None, dir=None))
+        assert "No unique peer matches 'ZZZ'" in capsys.readouterr().out
@@ -0,0 +1,236 @@
+"""
+test_time_travel.py - Tests for --as-of reconstruction
+
+Tests cover:
+- Checkpoints: first save, every CHECKPOINT_EVERY events, wholesale replacements
+- Checkpoint retention: recent, then spaced by event count, forced ones and the first
+- Reconstruction from a snapshot plus the events logged after it
+- Replay of concept patches and misconceptions
+- Checkpoints surviving generation pruning and blob collection
+- --as-of on read commands, info counting the events logged by then
+"""
+
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import student
+
+
+def _now():
+    """A timestamp strictly between the surrounding mutations."""
+    time.sleep(0.002)
+    moment = datetime.now().isoformat()
+    time.sleep(0.002)
+    return moment
+
+
+def _add(name, mastery=20, confidence="low"):
+    student.cmd_add(argparse.Namespace(
+        concept_name=name, mastery=mastery, confidence=confidence, related=None))
+
+
+def _update(name, mastery=None, confidence=None):
+    student.cmd_update(argparse.Namespace(
+        concept_name=name, mastery=mastery, confidence=confidence))
+
+
+@pytest.fixture
+def fresh_model(temp_data_file, capsys):
+    """A model saved once through save_model, so it has its first checkpoint."""
+    student.save_model(student.get_default_model())
+    return temp_data_file
+
+
+class TestCheckpoints:
+    """Test when checkpoints are taken."""
+
+    def test_first_save_is_checkpoint(self, fresh_model):
+        """The first generation in a store is kept as a checkpoint."""
+        assert len(student.list_generations(kind="checkpoints")) == 1
+
+    def test_checkpoint_every_n_events(self, fresh_model, monkeypatch, capsys):
+        """A checkpoint is taken once CHECKPOINT_EVERY events are logged."""
+        monkeypatch.setattr(student, "CHECKPOINT_EVERY", 3)
+        _add("A")
+        for mastery in range(30, 90, 10):
+            _update("A", mastery)
+
+        # 7 events after the initial checkpoint: checkpoints at events 3 and 6
+        assert len(student.list_generations(kind="checkpoints")) == 3
+
+    def test_restore_forces_checkpoint(self, fresh_model, capsys):
+        """Restoring a generation replaces the model, so it checkpoints."""
+        _add("A")
+        before = len(student.list_generations(kind="checkpoints"))
+        student.cmd_backup_restore(argparse.Namespace(generation="latest", force=False))
+        assert len(student.list_generations(kind="checkpoints")) == before + 1
+
+    def test_old_checkpoints_thinned_by_events(self, fresh_model, monkeypatch):
+        """Kept checkpoints stay CHECKPOINT_KEEP_EVERY events apart; forced and first stay."""
+        monkeypatch.setattr(student, "CHECKPOINT_KEEP_RECENT", 0)
+        monkeypatch.setattr(student, "CHECKPOINT_KEEP_EVERY", 10)
+        store = student.backup_dir()
+        first = student.list_generations(store, "checkpoints")[0]
+        data = (store / "checkpoints" / f"{first}.json").read_bytes()
+        state = json.loads((store / "state.json").read_text())
+        assert state["checkpoints"] == {first: [0, True]}
+
+        # One checkpoint every 3 events; the one at 15 took a wholesale change
+        ids = {0: first}
+        for i in range(1, 13):
+            when = student._generation_time(first) + timedelta(seconds=i)
+            ids[3 * i] = when.strftime(student._GENERATION_FORMAT)
+            (store / "checkpoints" / f"{ids[3 * i]}.json").write_bytes(data)
+            state["checkpoints"][ids[3 * i]] = [3 * i, i == 5]
+        (store / "state.json").write_text(json.dumps(state))
+
+        result = student.prune_backups(store)
+        kept = student.list_generations(store, "checkpoints")
+        assert kept == [ids[n] for n in (0, 9, 15, 24, 33, 36)]
+        assert result["checkpoints_removed"] == 7
+        assert set(json.loads((store / "state.json").read_text())["checkpoints"]) == set(kept)
+        assert student.model_as_of(datetime.now().isoformat())["concepts"] == {}
+
+
+class TestReconstruction:
+    """Test model_as_of."""
+
+    def test_past_mastery(self, fresh_model, capsys):
+        """Mastery is reported as it was at the requested time."""
+        _add("A", 20)
+        middle = _now()
+        _update("A", 50)
+
+        assert student.model_as_of(middle)["concepts"]["A"]["mastery"] == 20
+        assert student.model_as_of(_now())["concepts"]["A"]["mastery"] == 50
+
+    def test_concept_absent_before_added(self, fresh_model, capsys):
+        """Concepts added later do not exist in the past."""
+        before = _now()
+        _add("A")
+        assert "A" not in student.model_as_of(before)["concepts"]
+
+    def test_before_history_raises(self, fresh_model):
+        """Nothing can be reconstructed before the first checkpoint."""
+        with pytest.raises(ValueError, match="No recorded state"):
+            student.model_as_of("2000-01-01")
+
+    def test_replays_across_pruned_generations(self, fresh_model, monkeypatch, capsys):
+        """With generations pruned away, the checkpoint plus events still rebuild."""
+        monkeypatch.setattr(student, "BACKUP_KEEP_RECENT", 1)
+        monkeypatch.setattr(student, "BACKUP_KEEP_HOURLY", 0)
+        monkeypatch.setattr(student, "BACKUP_KEEP_DAILY", 0)
+        _add("A", 10)
+        _update("A", 30)
+        middle = _now()
+        _update("A", 60)
+        student.prune_backups(collect=True)
+
+        assert len(student.list_generations()) == 1
+        model = student.model_as_of(middle)
+        assert model["concepts"]["A"]["mastery"] == 30
+        points = student.decode_history(model["concepts"]["A"]["history"])
+        assert [p["mastery"] for p in points] == [10, 30]
+
+    def test_replays_list_patches(self, fresh_model, capsys):
+        """Struggles and links are added and removed by replay."""
+        _add("A")
+        _add("B")
+        student.cmd_link(argparse.Namespace(concept_name="A", related_concept="B"))
+        student.cmd_struggle(argparse.Namespace(concept_name="A", description="stuck"))
+        linked = _now()
+        student.cmd_unlink(argparse.Namespace(concept_name="A", related_concept="B"))
+
+        concept = student.model_as_of(linked)["concepts"]["A"]
+        assert concept["related_concepts"] == ["B"]
+        assert concept["struggles"] == ["stuck"]
+        assert student.model_as_of(_now())["concepts"]["A"]["related_concepts"] == []
+
+    def test_replays_misconceptions(self, fresh_model, capsys):
+        """Misconceptions appear and resolve at the right time."""
+        _add("A")
+        student.cmd_misconception_add(argparse.Namespace(
+            concept_name="A", belief="wrong", correction="right"))
+        open_time = _now()
+        student.cmd_misconception_resolve(argparse.Namespace(concept_name="A", index=0))
+
+        assert student.model_as_of(open_time)["misconceptions"][0]["resolved"] is False
+        assert student.model_as_of(_now())["misconceptions"][0]["resolved"] is True
+
+    def test_late_append_replayed(self, fresh_model, capsys):
+        """An event stamped before a snapshot but logged after it is still replayed."""
+        _add("A", 20)
+        taken = student._generation_time(student.list_generations()[-1])
+        stamped = (taken - timedelta(milliseconds=1)).isoformat()
+        student.append_events([json.dumps({"t": stamped, "op": "update", "concept": "A",
+                                           "set": {"mastery": 70}}, separators=(",", ":"))])
+        assert student.model_as_of(_now())["concepts"]["A"]["mastery"] == 70
+
+    def test_event_in_snapshot_not_replayed(self, fresh_model, capsys):
+        """An event the snapshot already holds isn't replayed, even if stamped after it."""
+        _add("A", 20)
+        model = student.load_model()
+        student.append_history(model["concepts"]["A"], 40, "low")
+        model["concepts"]["A"]["mastery"] = 40
+        student.mark_dirty(model, concept="A")
+        ahead = datetime.now() + timedelta(seconds=2)      # a clock running ahead
+        model.pending_events.append(json.dumps(
+            {"t": ahead.isoformat(), "op": "update", "concept": "A", "set": {"mastery": 40}},
+            separators=(",", ":")))
+        student.save_model(model)
+
+        past = student.model_as_of((ahead + timedelta(seconds=1)).isoformat())
+        assert past["concepts"]["A"]["history"] == student.load_model()["concepts"]["A"]["history"]
+
+    def test_bare_date_means_end_of_day(self):
+        """A date includes everything that happened on that day."""
+        assert student.as_of_bound("2024-05-01") == "2024-05-02T00:00:00"
+        assert student.as_of_bound("2024-05-01T10:00:00") == "2024-05-01T10:00:00.000001"
+        with pytest.raises(ValueError):
+            student.as_of_bound("last week")
+
+
+class TestReadCommands:
+    """Test --as-of on read commands."""
+
+    def test_list_as_of(self, fresh_model, capsys):
+        """list shows past mastery."""
+        _add("A", 20)
+        middle = _now()
+        _update("A", 90)
+        capsys.readouterr()
+
+        student.cmd_list(argparse.Namespace(as_of=middle))
+        output = capsys.readouterr().out
+        assert f"As of {middle}" in output
+        assert "20%" in output and "90%" not in output
+
+    def test_show_as_of_error(self, fresh_model, capsys):
+        """An unreconstructable time prints an error instead of the model."""
+        _add("A")
+        capsys.readouterr()
+        student.cmd_show(argparse.Namespace(concept_name="A", as_of="2000-01-01"))
+        assert "No recorded state" in capsys.readouterr().out
+
+    def test_info_counts_events_as_of(self, fresh_model, capsys):
+        """info --as-of counts only the events logged by then."""
+        _add("A", 20)
+        middle = _now()
+        _update("A", 50)
+        _update("A", 90)
+        capsys.readouterr()
+        assert student.cmd_info(argparse.Namespace(as_of=middle))["events"] == 1
+        assert "Logged Events:  1" in capsys.readouterr().out
+        assert student.cmd_info(argparse.Namespace())["events"] == 3
+
+    def test_without_as_of_reads_current(self, fresh_model, capsys):
+        """Omitting --as-of reads the current model."""
+        _add("A", 20)
+        _update("A", 90)
+        capsys.readouterr()
+        student.cmd_info(argparse.Namespace())
+        assert "As of" not in capsys.readouterr().out
@@ -0,0 +1,162 @@
+"""
+test_validation.py - Tests for the streaming model validator
+
+Tests cover:
+- JSONStream reads values across chunk boundaries, numbers cut anywhere included
+- Every invariant reports an issue with its JSON path
+- Forward references are settled by the deferred table
+- validate command and validation before backup restore
+"""
+
+import argparse
+import io
+import json
+
+import pytest
+
+import student
+
+
+def _issues(model, chunk_size=1 << 16):
+    text = json.dumps(model, indent=2)
+    return student.validate_stream(io.StringIO(text), chunk_size)
+
+
+def _paths(issues):
+    return {i["path"] for i in issues}
+
+
+class TestJSONStream:
+    """Test the incremental reader."""
+
+    @pytest.mark.parametrize("chunk_size", [1, 3, 7, 1024])
+    def test_values_across_chunks(self, chunk_size):
+        """Values split across chunk boundaries decode correctly."""
+        text = '{"a": 12345, "b": [true, null, "x\\"y"], "c": {"d": -1.5e3}}'
+        stream = student.JSONStream(io.StringIO(text), chunk_size)
+        result = {key: stream.read_value() for key in stream.items()}
+        assert result == json.loads(text)
+
+    @pytest.mark.parametrize("chunk_size", range(1, 16))
+    def test_number_split_at_boundary(self, chunk_size):
+        """A number cut after its point or exponent marker is read whole."""
+        text = '{"a": 1.5, "b": 2.25e-3, "c": -7E+2}'
+        stream = student.JSONStream(io.StringIO(text), chunk_size)
+        result = {key: stream.read_value() for key in stream.items()}
+        assert result == {"a": 1.5, "b": 2.25e-3, "c": -700.0}
+
+    def test_truncated_input_raises(self):
+        """Truncated input raises JSONStreamError with an offset."""
+        stream = student.JSONStream(io.StringIO('{"a": [1, 2'), 4)
+        with pytest.raises(student.JSONStreamError) as exc:
+            for key in stream.items():
+                stream.read_value()
+        assert exc.value.offset >= 6
+
+    def test_json_path_formatting(self):
+        """Identifiers use dot notation, other keys are quoted."""
+        assert student.json_path("concepts", "React Hooks", "mastery") == \
+            '$.concepts["React Hooks"].mastery'
+        assert student.json_path("misconceptions", 3, "concept") == \
+            '$.misconceptions[3].concept'
+
+
+class TestInvariants:
+    """Test each invariant the validator checks."""
+
+    def test_valid_model_has_no_issues(self, sample_model):
+        """The sample model is clean."""
+        assert _issues(sample_model) == []
+
+    def test_bad_mastery_and_confidence(self, sample_model):
+        """Out-of-range mastery and unknown confidence are errors."""
+        sample_model["concepts"]["React Hooks"]["mastery"] = 140
+        sample_model["concepts"]["JavaScript Closures"]["confidence"] = "sure"
+        issues = _issues(sample_model)
+        assert _paths(issues) == {
+            '$.concepts["React Hooks"].mastery',
+            '$.concepts["JavaScript Closures"].confidence',
+        }
+        assert all(i["severity"] == "error" for i in issues)
+
+    def test_malformed_timestamps(self, sample_model):
+        """Unparseable timestamps are reported."""
+        sample_model["concepts"]["React Hooks"]["last_reviewed"] = "yesterday"
+        sample_model["metadata"]["created"] = 42
+        assert _paths(_issues(sample_model)) == {
+            '$.concepts["React Hooks"].last_reviewed',
+            '$.metadata.created',
+        }
+
+    def test_orphaned_related_concept_is_warning(self, sample_model):
+        """Links to untracked concepts are warnings."""
+        sample_model["concepts"]["React Hooks"]["related_concepts"] = ["Nowhere"]
+        issues = _issues(sample_model)
+        assert issues[0]["path"] == '$.concepts["React Hooks"].related_concepts[0]'
+        assert issues[0]["severity"] == "warning"
+
+    def test_forward_reference_is_resolved(self, sample_model):
+        """A link to a concept defined later in the file is not an issue."""
+        sample_model["concepts"]["React Hooks"]["related_concepts"] = ["javascript closures"]
+        assert _issues(sample_model, chunk_size=16) == []
+
+    def test_misconception_missing_concept(self, sample_model):
+        """Misconceptions about deleted concepts are errors."""
+        sample_model["misconceptions"] = [{
+            "concept": "Deleted Concept", "belief": "b", "correction": "c",
+            "date_identified": "2024-01-01T00:00:00", "resolved": False,
+            "date_resolved": None,
+        }]
+        issues = _issues(sample_model)
+        assert _paths(issues) == {'$.misconceptions[0].concept'}
+        assert issues[0]["severity"] == "error"
+
+    def test_duplicate_concept_names(self):
+        """Concept names differing only by case are duplicates."""
+        text = ('{"metadata": {"created": "2024-01-01", "last_updated": "2024-01-01"},'
+                ' "concepts": {"A": {"mastery": 1, "confidence": "low",'
+                ' "first_encountered": "2024-01-01", "last_reviewed": "2024-01-01"},'
+                ' "a": {"mastery": 1, "confidence": "low",'
+                ' "first_encountered": "2024-01-01", "last_reviewed": "2024-01-01"}},'
+                ' "sessions": []}')
+        issues = student.validate_stream(io.StringIO(text))
+        assert _paths(issues) == {'$.concepts.a'}
+
+    def test_missing_sections(self):
+        """Missing required sections are reported at the root."""
+        issues = student.validate_stream(io.StringIO('{"concepts": {}}'))
+        messages = {i["message"] for i in issues}
+        assert "Missing required section 'metadata'" in messages
+        assert "Missing required section 'sessions'" in messages
+
+
+class TestValidateCommand:
+    """Test the validate command and restore integration."""
+
+    def test_validate_clean_model(self, sample_model, temp_data_file, capsys):
+        """A clean model reports valid."""
+        assert student.cmd_validate(argparse.Namespace(file=None)) is True
+        assert "is valid" in capsys.readouterr().out
+
+    def test_validate_reports_paths(self, sample_model, temp_data_file, capsys):
+        """Errors are printed with their JSON path."""
+        sample_model["concepts"]["React Hooks"]["mastery"] = -5
+        temp_data_file.write_text(json.dumps(sample_model))
+        assert student.cmd_validate(argparse.Namespace(file=None)) is False
+        captured = capsys.readouterr()
+        assert '$.concepts["React Hooks"].mastery' in captured.out
+        assert "1 errors" in captured.out
+
+    def test_restore_refuses_invalid_generation(self, sample_model, temp_data_file, capsys):
+        """backup restore validates before overwriting the model."""
+        model = student.load_model()
+        model["concepts"]["React Hooks"]["mastery"] = 500
+        student.mark_dirty(model, concept="React Hooks")
+        student.save_model(model)
+        bad = student.list_generations()[-1]
+
+        student.cmd_backup_restore(argparse.Namespace(generation=bad, force=False))
+        assert "failed validation" in capsys.readouterr().out
+
+        student.cmd_backup_restore(argparse.Namespace(generation=bad, force=True))
+        assert "Restored model from backup" in capsys.readouterr().out